@@ -1,23 +1,26 @@
 #!/usr/bin/env python3
 """DonutBuffer CI/CD Monitoring with Cursor Agent"""
 
-import subprocess
 import sys
 import os
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "github_mcp_server"))
+from src.core.cursor_client import CursorAgentClient  # noqa: E402
+from src.core.scheduler import BATCH  # noqa: E402
+
 def run_cursor_query(query):
-    """Run Cursor Agent query with error handling."""
+    """Run Cursor Agent query with error handling (batch priority, behind interactive and ambient work)."""
     try:
-        result = subprocess.run(
-            ["cursor-agent", "--print", "--output-format", "text", query],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        return result.stdout if result.returncode == 0 else f"Error: {result.stderr}"
-    except subprocess.TimeoutExpired:
-        return "Error: Timeout"
+        client = CursorAgentClient(deadline=60, priority=BATCH)
+        chunks = []
+        ok = client.send_stream(query, on_chunk=chunks.append)
+        if ok:
+            return "".join(chunks)
+        if client.last_error == "deadline exceeded":
+            return "Error: Timeout"
+        stderr = "\n".join(client.last_stderr)
+        return f"Error: {stderr or client.last_error}"
     except Exception as e:
         return f"Error: {e}"
 
@@ -3,6 +3,8 @@
 
 Функционал:
 - Подключение к уже запущенной сессии cursor-agent по session_id
+- Своя беседа для каждого потребителя (ambient-ci, ambient-pr) через SessionManager:
+  запросы одной беседы идут по очереди, разные беседы — параллельно
 - Отправка сообщений от имени пользователя (user role) в активную сессию
 - Получение ответа ассистента и возврат результата вызывающему коду
 
@@ -17,21 +19,36 @@ from pathlib import Path
 # Импортируем из родительского пакета
 sys.path.append(str(Path(__file__).parent.parent))
 from ..core.base_wizard import BaseWizard
-from ..core.cursor_client import get_global_cursor_client
+from ..core.cursor_client import CancellationToken, CursorAgentClient
+from ..core.scheduler import AMBIENT
+from ..core.session_manager import AMBIENT_CI, SessionManager, get_session_manager
 
 class AgentInjector(BaseWizard):
-    """Инжектор промптов в cursor-agent через центральный клиент."""
+    """Инжектор промптов в cursor-agent через менеджер сессий."""
 
-    def __init__(self) -> None:
+    def __init__(self, session: str = AMBIENT_CI, sessions: Optional[SessionManager] = None) -> None:
+        """
+        Args:
+            session: Имя беседы по умолчанию
+            sessions: Менеджер сессий (по умолчанию общий для процесса)
+        """
         super().__init__()
-        self._client = get_global_cursor_client()
+        self.session = session
+        self._sessions = sessions or get_session_manager()
+        # Общий токен отмены всех запросов инжектора (срабатывает при остановке агента)
+        self._cancel = CancellationToken()
 
-    def attach_session(self, session_id: str) -> None:
+    def cancel_all(self) -> None:
+        """Прерывает все текущие запросы (процессы cursor-agent завершаются вместе с группой)."""
+        token, self._cancel = self._cancel, CancellationToken()
+        token.cancel()
+
+    def attach_session(self, session_id: str, session: Optional[str] = None) -> None:
         """Привязаться к уже запущенной сессии cursor-agent."""
-        self._client.attach_session(session_id)
+        self._sessions.attach(session or self.session, session_id)
 
-    def send_prompt(self, prompt: str) -> str:
-        """Отправляет промпт и возвращает ответ ассистента как строку (без печати)."""
+    def send_prompt(self, prompt: str, session: Optional[str] = None) -> str:
+        """Отправляет промпт в беседу и возвращает ответ ассистента как строку (без печати)."""
         chunks: list[str] = []
 
         def _on_chunk(t: str) -> None:
@@ -41,7 +58,19 @@ class AgentInjector(BaseWizard):
             # итоговое событие зафиксировано; ответ уже собран из чанков
             pass
 
-        ok = self._client.send_stream(prompt, on_chunk=_on_chunk, on_result=_on_result)
+        ok = self._sessions.send_stream(session or self.session, prompt, on_chunk=_on_chunk, on_result=_on_result,
+                                        cancel=self._cancel)
+        return "".join(chunks) if ok else ""
+
+    def send_prompt_detached(self, prompt: str, priority: int = AMBIENT) -> str:
+        """Отправляет промпт в отдельный одноразовый диалог, не затрагивая общую сессию.
+
+        Такие вызовы можно выполнять параллельно (например, ревью частей большого диффа).
+        Каждый вызов тратит токен бюджета класса priority в планировщике
+        (CURSOR_AGENT_RATE_*/CURSOR_AGENT_BURST_*, см. core.scheduler).
+        """
+        chunks: list[str] = []
+        ok = CursorAgentClient(priority=priority).send_stream(prompt, on_chunk=chunks.append, cancel=self._cancel)
         return "".join(chunks) if ok else ""
 
     # Публичный API для стриминга с колбэками (без печати)
@@ -51,12 +80,16 @@ class AgentInjector(BaseWizard):
         on_user: Optional[Callable[[str], None]] = None,
         on_chunk: Optional[Callable[[str], None]] = None,
         on_result: Optional[Callable[[str], None]] = None,
+        session: Optional[str] = None,
+        cancel: Optional[CancellationToken] = None,
     ) -> bool:
-        return self._client.send_stream(prompt, on_user=on_user, on_chunk=on_chunk, on_result=on_result)
+        return self._sessions.send_stream(session or self.session, prompt,
+                                          on_user=on_user, on_chunk=on_chunk, on_result=on_result,
+                                          cancel=cancel or self._cancel)
 
     def check_cursor_agent_availability(self) -> bool:
         try:
-            return self._client.available()
+            return self._sessions.session(self.session).client.available()
         except Exception:
             return False
 
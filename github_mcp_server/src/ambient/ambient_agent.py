@@ -4,16 +4,21 @@
 Связывает все компоненты системы: мониторинг, события, генерацию промптов и инжекцию.
 """
 
+import multiprocessing
+import os
 import time
 import signal
 import sys
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
 # Импортируем из родительского пакета
 sys.path.append(str(Path(__file__).parent.parent))
 from ..core.base_wizard import BaseWizard
 from ..core.env_manager import EnvManager
+from ..core.session_manager import get_session_manager
+from ..core.shm_ring_buffer import ShmRingBuffer
 
 # Импортируем ambient компоненты
 from .event_system import EventSystem, Event, EventType
@@ -21,6 +26,23 @@ from .github_monitor import GitHubMonitor
 from .prompt_generator import PromptGenerator
 from .agent_injector import AgentInjector
 from .event_handlers import EventHandlers
+from .analysis_cache import AnalysisCache
+from .failure_clustering import FailureClusterIndex
+from .git_context import GitContextProvider
+from .pr_analyzer import PRAnalyzer, PRReviewStore
+from .flaky_triage import FlakyIndex, FlakyTriage
+from .shm_transport import BridgeStats, bridge_to_event_system, run_monitor_process
+
+N = TypeVar("N", int, float)
+
+
+def _env_number(name: str, default: N, cast: Callable[[str], N]) -> N:
+    """Числовая настройка из окружения; пустое или нечисловое значение — default"""
+    try:
+        return cast(os.environ.get(name, "").strip() or default)
+    except ValueError:
+        return default
+
 
 class AmbientAgent(BaseWizard):
     """Главный ambient agent для автоматического мониторинга и анализа"""
@@ -28,6 +50,7 @@ class AmbientAgent(BaseWizard):
     def __init__(self, donut_dir: Path, install_signal_handlers: bool = True):
         self.donut_dir = donut_dir
         self.running = False
+        self._stop_event = threading.Event()
         
         # Инициализируем компоненты
         self.env_manager = EnvManager(donut_dir)
@@ -35,11 +58,67 @@ class AmbientAgent(BaseWizard):
         
         self.event_system = EventSystem()
         self.github_monitor = GitHubMonitor(self.event_system, self.env_manager)
-        self.prompt_generator = PromptGenerator()
+        # Опционально: опрос GitHub в отдельном процессе, события — через кольцо в shared memory
+        self.shm_transport = os.environ.get("AMBIENT_SHM_TRANSPORT", "").strip().lower() in ("1", "true", "yes")
+        self.shm_stats = BridgeStats()
+        self._ring: Optional[ShmRingBuffer] = None
+        self._monitor_process = None
+        self._monitor_stop = None
+        self._bridge_stop: Optional[threading.Event] = None
+        # Локальный дифф «последний зелёный → упавший» через один git cat-file --batch
+        self.git_context = GitContextProvider.for_repo(
+            donut_dir, Path.home() / ".cursor" / "ambient" / "commit_graph.json"
+        )
+        self.prompt_generator = PromptGenerator(
+            token_budget=_env_number("AMBIENT_PROMPT_TOKEN_BUDGET", 6000, int),
+            git_context=self.git_context,
+        )
         self.agent_injector = AgentInjector()
         
+        # Кэш анализов по сигнатуре падения (переживает перезапуски)
+        self.analysis_cache = AnalysisCache(
+            Path.home() / ".cursor" / "ambient" / "analysis_cache.json",
+            donut_dir=donut_dir,
+        )
+        
+        # Триаж флейков: индекс по test_results и локальной истории, решение в памяти
+        self.flaky_triage = None
+        if os.environ.get("AMBIENT_FLAKY_TRIAGE", "1").strip().lower() not in ("0", "false", "no"):
+            self.flaky_triage = FlakyTriage(
+                FlakyIndex(
+                    Path.home() / ".cursor" / "ambient" / "test_history.jsonl",
+                    min_runs=_env_number("AMBIENT_FLAKY_MIN_RUNS", 5, int),
+                    flip_threshold=_env_number("AMBIENT_FLAKY_THRESHOLD", 0.1, float),
+                ),
+                self.github_monitor,
+                rerun=os.environ.get("AMBIENT_FLAKY_RERUN", "").strip().lower() in ("1", "true", "yes"),
+            )
+            if self.shm_transport:
+                # Завершения run приходят из процесса мониторинга событиями
+                self.event_system.register_handler(
+                    EventType.GITHUB_RUN_COMPLETED, lambda event: self.flaky_triage.observe_run(event.data)
+                )
+            else:
+                self.github_monitor.run_listeners.append(self.flaky_triage.observe_run)
+        
         # Создаем обработчики событий
-        self.event_handlers = EventHandlers(self.prompt_generator, self.agent_injector)
+        self.event_handlers = EventHandlers(
+            self.prompt_generator,
+            self.agent_injector,
+            analysis_cache=self.analysis_cache,
+            force_reanalysis=os.environ.get("AMBIENT_FORCE_REANALYSIS", "").strip().lower() in ("1", "true", "yes"),
+            cluster_index=FailureClusterIndex(),
+            batch_window=_env_number("AMBIENT_BATCH_WINDOW", 0.0, float),
+            batch_max=_env_number("AMBIENT_BATCH_MAX", 5, int),
+            batch_schedule=self.event_system.call_later,
+            pr_analyzer=PRAnalyzer(
+                self.github_monitor,
+                self.prompt_generator,
+                self.agent_injector,
+                PRReviewStore(Path.home() / ".cursor" / "ambient" / "pr_reviews.json"),
+            ),
+            triage=self.flaky_triage,
+        )
         
         # Регистрируем обработчики событий
         self.setup_event_handlers()
@@ -55,9 +134,21 @@ class AmbientAgent(BaseWizard):
         # Регистрируем обработчики событий
         self.event_system.register_handler(EventType.GITHUB_WORKFLOW_EVENT, self.event_handlers.handle_workflow_event)
         self.event_system.register_handler(EventType.GITHUB_PR_CREATED, self.event_handlers.handle_pr_created)
+        self.event_system.register_handler(EventType.GITHUB_PR_UPDATED, self.event_handlers.handle_pr_updated)
         self.event_system.register_handler(EventType.MANUAL_TRIGGER, self.event_handlers.handle_manual_trigger)
         self.event_system.register_handler(EventType.SYSTEM_TEST, self.event_handlers.handle_system_test)
         self.event_system.register_handler(EventType.GITHUB_ISSUE_TEST, self.event_handlers.handle_test_issue)
+        
+        # Периодически закрываем устаревшие кластеры падений
+        if self.event_handlers.cluster_index is not None:
+            self.event_system.call_every(600, self.event_handlers.cluster_index.prune)
+        
+        # Беседы ambient-ci/ambient-pr, простаивающие дольше idle_ttl, закрываются
+        self.event_system.call_every(600, get_session_manager().reap_idle)
+        
+        # Индекс флейков пересобирается в фоне: сразу и затем раз в 5 минут
+        if self.flaky_triage is not None:
+            self.event_system.call_every(300, self.flaky_triage.index.refresh_async, first_delay=0)
 
     
     def start(self) -> None:
@@ -67,6 +158,7 @@ class AmbientAgent(BaseWizard):
         # Префлайт-проверки выполняются в ./wizard через tests/preflight/runner
         
         self.running = True
+        self._stop_event.clear()
         
         # Запускаем систему событий
         self.print_info("[ambient] starting event system")
@@ -74,7 +166,9 @@ class AmbientAgent(BaseWizard):
         
         # Запускаем мониторинг GitHub
         self.print_info("[ambient] starting GitHub monitor")
-        if self.github_monitor.start_monitoring():
+        if self.shm_transport and self.start_monitor_process():
+            self.print_success("🔍 GitHub мониторинг запущен в отдельном процессе (shm)")
+        elif self.github_monitor.start_monitoring():
             self.print_success("🔍 GitHub мониторинг активен")
         else:
             self.print_warning("⚠️ GitHub мониторинг не запущен (проверьте токен)")
@@ -90,18 +184,57 @@ class AmbientAgent(BaseWizard):
         finally:
             self.stop()
     
+    def start_monitor_process(self) -> bool:
+        """
+        Запускает GitHubMonitor в отдельном процессе и мост из его кольца в EventSystem
+
+        Returns:
+            bool: False, если кольцо или процесс создать не удалось (мониторинг остаётся в процессе)
+        """
+        try:
+            ring = ShmRingBuffer(
+                capacity=_env_number("AMBIENT_SHM_CAPACITY", 256, int),
+                slot_size=_env_number("AMBIENT_SHM_SLOT_SIZE", 16 * 1024, int),
+            )
+        except (ValueError, OSError) as e:
+            self.print_error(f"Кольцо событий не создано: {e}")
+            return False
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        process = context.Process(target=run_monitor_process, args=(ring.name, self.donut_dir, None, stop),
+                                  name="ambient-github-monitor", daemon=True)
+        try:
+            process.start()
+        except OSError as e:
+            self.print_error(f"Процесс мониторинга не запущен: {e}")
+            ring.close()
+            ring.unlink()
+            return False
+        self._ring, self._monitor_process, self._monitor_stop = ring, process, stop
+        self._bridge_stop = bridge_to_event_system(ring, self.event_system, stats=self.shm_stats, close_ring=True)
+        return True
+    
+    def stop_monitor_process(self) -> None:
+        """Останавливает процесс мониторинга, затем мост, и освобождает кольцо"""
+        if self._monitor_process is None:
+            return
+        self._monitor_stop.set()
+        self._monitor_process.join(timeout=15)
+        if self._monitor_process.is_alive():
+            self._monitor_process.terminate()
+            self._monitor_process.join(timeout=5)
+        # Кольцо закрывает сам поток моста; имя сегмента освобождаем сразу
+        self._bridge_stop.set()
+        self._ring.unlink()
+        self._monitor_process = self._monitor_stop = self._bridge_stop = self._ring = None
+    
     # Префлайт-проверка перенесена в tests/preflight/runner.py
     
     def main_loop(self) -> None:
         """Основной цикл ambient agent"""
+        # Периодическая работа живёт в таймерах EventSystem; здесь только ждём остановки
         while self.running:
-            try:                
-                # Ожидаем
-                time.sleep(300)  # 5 минут
-                
-            except Exception as e:
-                self.print_error(f"Ошибка в main loop: {e}")
-                time.sleep(60)
+            self._stop_event.wait(300)
     
     def get_uptime(self) -> str:
         """Возвращает время работы"""
@@ -117,10 +250,19 @@ class AmbientAgent(BaseWizard):
         self.print_info("🛑 Останавливаю Ambient Agent...")
         
         self.running = False
+        self._stop_event.set()
+        dropped = self.event_handlers.drop_pending()
+        if dropped:
+            self.print_info(f"📦 Пакет из {dropped} падений не проанализирован — отброшен при остановке")
+        # Не ждём зависший cursor-agent: текущие запросы прерываются
+        self.agent_injector.cancel_all()
         
         # Останавливаем компоненты
+        self.stop_monitor_process()
         self.github_monitor.stop_monitoring()
         self.event_system.stop_processing()
+        if self.git_context is not None:
+            self.git_context.close()
         
         self.print_success("🤖 Ambient Agent остановлен")
     
@@ -128,6 +270,7 @@ class AmbientAgent(BaseWizard):
         """Обработчик сигналов для graceful shutdown"""
         self.print_info(f"\n📡 Получен сигнал {signum}")
         self.running = False
+        self._stop_event.set()
     
     def trigger_manual_analysis(self, analysis_type: str, content: str) -> None:
         """Запускает ручной анализ"""
@@ -0,0 +1,225 @@
+"""
+🗄️ Analysis Cache - кэш анализов по сигнатуре падения
+
+Один и тот же сломанный тест (например RingBufferTests.TestThreadSafety)
+падает во многих run и ветках. Сигнатура падения — упавшие джобы/шаги,
+имена упавших тестов и строки ошибок, очищенные от таймстемпов, адресов и
+путей конкретного run. Анализ cursor-agent сохраняется по сигнатуре на диск
+(LRU) и инвалидируется, когда меняются связанные исходники.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Префикс времени в логах GitHub Actions: 2024-05-01T12:34:56.1234567Z
+_TIMESTAMP_RE = re.compile(r"^(?:\ufeff)?\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?Z\s?")
+_INLINE_TIME_RE = re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?\b")
+_HEX_RE = re.compile(r"\b0x[0-9a-fA-F]+\b")
+_RUNNER_PATH_RE = re.compile(r"(?:/home/runner/work|/__w|[A-Za-z]:\\a)/[^/\s]+/[^/\s]+/")
+_TMP_PATH_RE = re.compile(r"/tmp/[^\s:'\"]+")
+_DURATION_RE = re.compile(r"\(\d+(?:\.\d+)? ?(?:ms|s|sec)\)")
+_PID_RE = re.compile(r"==\d+==")
+_THREAD_RE = re.compile(r"\b(thread|Thread|T)\s?#?\d+\b")
+_LONG_NUMBER_RE = re.compile(r"\b\d{5,}\b")
+
+_FAILED_TEST_RE = re.compile(r"\[\s*FAILED\s*\] ([\w/.:-]+\.[\w/.:-]+)")
+_ERROR_MARKERS = (
+    "error:", "Error:", "ERROR:", "Failure", "FAILED", "Assertion", "assertion",
+    "Expected", "Which is:", "AddressSanitizer", "ThreadSanitizer", "LeakSanitizer",
+    "UndefinedBehaviorSanitizer", "runtime error:", "Segmentation fault", "terminate called",
+    "Aborted", "Timeout", "timed out",
+)
+_SOURCE_FILE_RE = re.compile(r"\b((?:src|tests)/[\w./-]+\.(?:cpp|cc|cxx|h|hpp|py))\b")
+
+# Что считать «связанными исходниками», если в логах не упомянуто ни одного файла
+_DEFAULT_WATCH_GLOBS = ("src/ringbuffer/*", "tests/*.cpp")
+
+
+def normalize_log_line(line: str) -> str:
+    """Убирает из строки лога всё, что зависит от конкретного run"""
+    line = _TIMESTAMP_RE.sub("", line.rstrip())
+    line = _RUNNER_PATH_RE.sub("", line)
+    line = _TMP_PATH_RE.sub("/tmp/<path>", line)
+    line = _HEX_RE.sub("0x<addr>", line)
+    line = _DURATION_RE.sub("", line)
+    line = _PID_RE.sub("==<pid>==", line)
+    line = _INLINE_TIME_RE.sub("<time>", line)
+    line = _THREAD_RE.sub(r"\1 <n>", line)
+    line = _LONG_NUMBER_RE.sub("<n>", line)
+    return " ".join(line.split())
+
+
+def is_error_line(line: str) -> bool:
+    """Похожа ли строка лога на сообщение об ошибке"""
+    return any(marker in line for marker in _ERROR_MARKERS)
+
+
+@dataclass
+class FailureSignature:
+    """Нормализованная сигнатура падения workflow"""
+    jobs: List[str] = field(default_factory=list)
+    tests: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+
+    max_errors = 20
+
+    @classmethod
+    def from_event_data(cls, data: Dict[str, Any]) -> "FailureSignature":
+        """Строит сигнатуру из данных события GITHUB_WORKFLOW_EVENT (поле failed_jobs)"""
+        jobs, tests, errors, files = set(), set(), [], set()
+        seen_errors = set()
+        for job in data.get("failed_jobs") or []:
+            name = str(job.get("name", ""))
+            steps = job.get("failed_steps") or [""]
+            for step in steps:
+                jobs.add(f"{name} / {step}" if step else name)
+            for raw in str(job.get("log") or "").splitlines():
+                line = normalize_log_line(raw)
+                if not line:
+                    continue
+                match = _FAILED_TEST_RE.search(line)
+                if match:
+                    tests.add(match.group(1))
+                for path in _SOURCE_FILE_RE.findall(line):
+                    files.add(path)
+                if is_error_line(line) and line not in seen_errors and len(errors) < cls.max_errors:
+                    seen_errors.add(line)
+                    errors.append(line)
+        return cls(jobs=sorted(jobs), tests=sorted(tests), errors=sorted(errors), files=sorted(files))
+
+    def is_empty(self) -> bool:
+        """Пустая сигнатура не отличает одно падение от другого — кэшировать нельзя"""
+        return not (self.tests or self.errors)
+
+    @property
+    def key(self) -> str:
+        canonical = json.dumps(
+            {"jobs": self.jobs, "tests": self.tests, "errors": self.errors},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def summary(self) -> str:
+        parts = []
+        if self.tests:
+            parts.append("тесты: " + ", ".join(self.tests[:5]))
+        if self.jobs:
+            parts.append("джобы: " + ", ".join(self.jobs[:3]))
+        return "; ".join(parts) or "без деталей"
+
+
+class AnalysisCache:
+    """Персистентный LRU-кэш анализов с инвалидацией по изменению исходников"""
+
+    def __init__(self, path: Path, donut_dir: Path, max_entries: int = 256):
+        """
+        Args:
+            path: JSON-файл кэша
+            donut_dir: Корень DonutBuffer (относительно него берутся пути файлов)
+            max_entries: Максимум записей (старые вытесняются по LRU)
+        """
+        self.path = Path(path)
+        self.donut_dir = Path(donut_dir)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def get(self, signature: FailureSignature) -> Optional[str]:
+        """Возвращает сохранённый анализ или None (промах / устаревшая запись)"""
+        with self._lock:
+            entry = self._entries.get(signature.key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.get("fingerprints") != self._fingerprints(entry.get("files") or []):
+                # Связанные исходники изменились — анализ мог устареть
+                del self._entries[signature.key]
+                self._save()
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature.key)
+            entry["last_hit"] = time.time()
+            self.hits += 1
+            return entry.get("analysis")
+
+    def put(self, signature: FailureSignature, analysis: str) -> None:
+        """Сохраняет анализ для сигнатуры"""
+        if not analysis or signature.is_empty():
+            return
+        files = self._watched_files(signature)
+        with self._lock:
+            self._entries[signature.key] = {
+                "analysis": analysis,
+                "summary": signature.summary(),
+                "files": files,
+                "fingerprints": self._fingerprints(files),
+                "created_at": time.time(),
+                "last_hit": time.time(),
+            }
+            self._entries.move_to_end(signature.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def invalidate(self, signature: FailureSignature) -> None:
+        """Удаляет запись (например, при принудительном повторном анализе)"""
+        with self._lock:
+            if self._entries.pop(signature.key, None) is not None:
+                self._save()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- файлы и отпечатки ---
+
+    def _watched_files(self, signature: FailureSignature) -> List[str]:
+        files = [f for f in signature.files if (self.donut_dir / f).is_file()]
+        if not files:
+            for pattern in _DEFAULT_WATCH_GLOBS:
+                files.extend(
+                    str(p.relative_to(self.donut_dir)) for p in sorted(self.donut_dir.glob(pattern)) if p.is_file()
+                )
+        return files
+
+    def _fingerprints(self, files: Iterable[str]) -> Dict[str, str]:
+        result = {}
+        for rel in files:
+            path = self.donut_dir / rel
+            try:
+                result[rel] = hashlib.sha1(path.read_bytes()).hexdigest()
+            except OSError:
+                result[rel] = ""
+        return result
+
+    # --- персистентность ---
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, entry in sorted(data.items(), key=lambda kv: kv[1].get("last_hit", 0)):
+                self._entries[key] = entry
+        except (OSError, ValueError):
+            pass
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
@@ -5,34 +5,88 @@
 """
 
 import sys
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Callable, Hashable, List, Optional, Set
 
 # Импортируем из родительского пакета
 sys.path.append(str(Path(__file__).parent.parent))
 from ..core.base_wizard import BaseWizard
+from ..core.session_manager import AMBIENT_PR
 from .event_system import Event, EventType
+from .single_flight import SingleFlight, workflow_request_key
+from .analysis_cache import AnalysisCache, FailureSignature
+from .failure_clustering import FailureCluster, FailureClusterIndex, failure_text
+from .failure_batcher import FailureBatcher
 
 # Избегаем циклических импортов
 if TYPE_CHECKING:
     from .prompt_generator import PromptGenerator
     from .agent_injector import AgentInjector
+    from .pr_analyzer import PRAnalyzer
+    from .flaky_triage import FlakyTriage
+
+
+@dataclass
+class PendingAnalysis:
+    """Упавший workflow, ожидающий анализа (одиночного или в пакете)"""
+    event: Event
+    prompt: str
+    signature: Optional[FailureSignature] = None
+    cluster: Optional[FailureCluster] = None
+    key: Optional[Hashable] = None
+
 
 class EventHandlers(BaseWizard):
     """Класс для обработки различных типов событий"""
     
-    def __init__(self, prompt_generator: "PromptGenerator", agent_injector: "AgentInjector"):
+    def __init__(self,
+                 prompt_generator: "PromptGenerator",
+                 agent_injector: "AgentInjector",
+                 dedup_window: float = 600.0,
+                 analysis_cache: Optional[AnalysisCache] = None,
+                 force_reanalysis: bool = False,
+                 cluster_index: Optional[FailureClusterIndex] = None,
+                 batch_window: float = 0.0,
+                 batch_max: int = 5,
+                 batch_schedule: Optional[Callable[[float, Callable[[], None]], Any]] = None,
+                 pr_analyzer: Optional["PRAnalyzer"] = None,
+                 triage: Optional["FlakyTriage"] = None):
         """
         Инициализация обработчиков
         
         Args:
             prompt_generator: Генератор промптов
             agent_injector: Инжектор промптов в cursor-agent
+            dedup_window: Сколько секунд переиспользовать готовый анализ того же run
+            analysis_cache: Кэш анализов по сигнатуре падения (None — без кэша)
+            force_reanalysis: Всегда анализировать заново, игнорируя кэш
+            cluster_index: Индекс кластеров похожих падений (None — без кластеризации)
+            batch_window: Окно сбора падений в один промпт, сек (0 — без пакетирования)
+            batch_max: Максимум падений в одном пакетном промпте
+            batch_schedule: Планировщик отложенной отправки пакета (например EventSystem.call_later)
+            pr_analyzer: Инкрементальный анализатор PR (None — один промпт на событие)
+            triage: Отсев известных флейков до анализа (None — анализировать все падения)
         """
         super().__init__()
         self.prompt_generator = prompt_generator
         self.agent_injector = agent_injector
         self.test_event_processed = False  # Флаг для E2E теста
+        # Повторы одного и того же упавшего run ждут и разделяют первый анализ
+        self.single_flight = SingleFlight(result_ttl=dedup_window)
+        self.analysis_cache = analysis_cache
+        self.force_reanalysis = force_reanalysis
+        self.cluster_index = cluster_index
+        self.batcher: Optional[FailureBatcher[PendingAnalysis]] = None
+        if batch_window > 0 and batch_max > 1:
+            self.batcher = FailureBatcher(self._flush_batch, window=batch_window,
+                                          max_items=batch_max, schedule=batch_schedule)
+        # Ключи run, чей анализ ждёт в пакете или выполняется прямо сейчас
+        self._pending_keys: Set[Hashable] = set()
+        self._pending_lock = threading.Lock()
+        self.pr_analyzer = pr_analyzer
+        self.triage = triage
     
     def handle_workflow_event(self, event: Event) -> None:
         """Обрабатывает события workflow"""
@@ -43,18 +97,190 @@ class EventHandlers(BaseWizard):
         
         self.print_info(f"🚀 Workflow {workflow_name} (#{run_number}) {event_type}")
         
-        # Генерируем промпт ТОЛЬКО для упавших workflow
-        prompt = self.prompt_generator.generate_prompt(event)
-        if not prompt:
+        # Падают только известные флейки — агента не зовём (перезапуск или пометка)
+        if self.triage is not None:
+            decision = self.triage.decide(event.data)
+            if decision.action != "analyze":
+                icon = "🔁" if decision.action == "rerun" else "🎲"
+                self.print_info(f"{icon} Run #{run_number}: {decision.reason}")
+                self._publish(f"{icon} {workflow_name} (Run #{run_number}): {self.triage.describe(decision)}")
+                return
+        
+        # Анализируем ТОЛЬКО упавшие workflow
+        if not self.prompt_generator.needs_analysis(event):
             return
+        
+        # Та же сигнатура падения уже анализировалась — отдаём сохранённый анализ сразу,
+        # не собирая промпт (логи, git-дифф)
+        signature = self._failure_signature(event)
+        force = self.force_reanalysis or bool(event.data.get("force_reanalysis"))
+        if signature is not None and self.analysis_cache is not None and not force:
+            cached = self.analysis_cache.get(signature)
+            if cached:
+                self.print_info(f"🗄️ Анализ из кэша ({signature.summary()})")
+                self._publish(f"🗄️ Известное падение ({signature.summary()}), анализ из кэша:\n\n{cached}")
+                return
+        
+        # Повтор того же run (ждёт в пакете, анализируется или недавно разобран) пропускается
+        # до кластеризации: ни второго участника кластера, ни второй публикации
+        key = workflow_request_key(event.data)
+        if key is not None and not self._claim(key):
+            self.print_info(f"♻️ Run #{run_number} уже разобран или разбирается — повтор пропущен")
+            return
+        
+        handed_off = False
+        try:
+            # Похожее падение уже анализируется/проанализировано — только присоединяем к кластеру
+            cluster = None
+            if signature is not None and self.cluster_index is not None:
+                run_id = str(event.data.get("run_id", run_number))
+                cluster, is_new = self.cluster_index.assign(run_id, failure_text(signature))
+                if not is_new:
+                    self.print_info(f"🧩 Run #{run_number} присоединён к кластеру #{cluster.id} ({len(cluster.members)} падений)")
+                    text = self._cluster_joined_text(workflow_name, run_number, cluster)
+                    self._publish(text)
+                    if key is not None:
+                        self.single_flight.put(key, text)
+                    return
+            
+            # Промпт собирается только когда анализ действительно нужен
+            prompt = self.prompt_generator.generate_prompt(event)
+            if not prompt:
+                if cluster is not None:
+                    self.cluster_index.close(cluster.id)
+                return
+            
+            item = PendingAnalysis(event=event, prompt=prompt, signature=signature, cluster=cluster, key=key)
+            handed_off = True
+            if self.batcher is not None and item.key is not None:
+                self.print_info(f"📦 Run #{run_number} добавлен в пакет анализа")
+                self.batcher.add(item)
+                return
+            self._analyze_single(item)
+        finally:
+            if not handed_off and key is not None:
+                self._release(key)
+    
+    def _claim(self, key: Hashable) -> bool:
+        """Берёт ключ run в работу; False — такой run уже ждёт, анализируется или недавно разобран"""
+        with self._pending_lock:
+            if key in self._pending_keys or self.single_flight.contains(key):
+                return False
+            self._pending_keys.add(key)
+            return True
+    
+    def _release(self, key: Hashable) -> None:
+        with self._pending_lock:
+            self._pending_keys.discard(key)
+    
+    @staticmethod
+    def _cluster_joined_text(workflow_name: str, run_number: Any, cluster: FailureCluster) -> str:
+        head = (f"🧩 {workflow_name} (Run #{run_number}): похоже на ту же причину, что и run {cluster.leader} "
+                f"(кластер #{cluster.id}, падений: {len(cluster.members)})")
+        if cluster.analysis:
+            return f"{head}. Анализ кластера:\n\n{cluster.analysis}"
+        return f"{head} — анализ run {cluster.leader} ещё выполняется, отдельный не запускаю."
+    
+    def _analyze_single(self, item: PendingAnalysis) -> None:
+        """Отдельный запуск cursor-agent для одного падения"""
+        def _analyze() -> str:
+            answer = self.agent_injector.send_prompt(item.prompt)
+            self._record_analysis(item, answer)
+            return answer
+        
         # Отправляем промпт и публикуем ответ в UI (без печати здесь)
-        answer = self.agent_injector.send_prompt(prompt)
+        try:
+            if item.key is None:
+                answer, shared = _analyze(), False
+            else:
+                answer, shared = self.single_flight.do(item.key, _analyze)
+        finally:
+            # Готовый ответ уже в окне single_flight — дальше повторы отсекает он
+            if item.key is not None:
+                self._release(item.key)
+        if shared:
+            # Ответ уже опубликован первым (исходным) запросом
+            self.print_info(f"♻️ Анализ run #{item.event.data.get('run_number', '?')} уже выполнен/выполняется — повтор пропущен")
+            return
         if answer:
-            try:
-                from ..ui.message_bus import UIEventBus
-                UIEventBus.instance().publish_assistant_message(answer)
-            except Exception:
-                pass
+            self._publish(answer)
+    
+    def _flush_batch(self, items: List[PendingAnalysis]) -> None:
+        """Анализирует пакет падений одним вызовом cursor-agent и раскладывает ответ по run"""
+        try:
+            if len(items) == 1:
+                self._analyze_single(items[0])
+                return
+            
+            events = [item.event for item in items]
+            run_ids = [self.prompt_generator.batch_run_id(e.data) for e in events]
+            self.print_info(f"📦 Пакетный анализ {len(items)} падений: {', '.join(run_ids)}")
+            answer = self.agent_injector.send_prompt(self.prompt_generator.generate_batch_prompt(events))
+            parts = self.prompt_generator.split_batch_answer(answer, run_ids) if answer else {}
+            
+            for item, run_id in zip(items, run_ids):
+                part = parts.get(run_id, "")
+                self._record_analysis(item, part)
+                if item.key is not None:
+                    # Повторы этого run в окне дедупликации отсекаются по готовому ответу
+                    self.single_flight.put(item.key, part)
+                if part:
+                    data = item.event.data
+                    self._publish(f"🛠️ {data.get('workflow_name', 'Unknown')} (Run #{data.get('run_number', '?')}):\n\n{part}")
+            if answer and not parts:
+                # Агент не разметил ответ — публикуем целиком
+                self._publish(answer)
+        finally:
+            for item in items:
+                if item.key is not None:
+                    self._release(item.key)
+    
+    def _record_analysis(self, item: PendingAnalysis, answer: str) -> None:
+        """Сохраняет ответ в кэш и кластер (или закрывает кластер, если анализа нет)"""
+        if answer and item.signature is not None and self.analysis_cache is not None:
+            self.analysis_cache.put(item.signature, answer)
+        if item.cluster is not None and self.cluster_index is not None:
+            if answer:
+                self.cluster_index.set_analysis(item.cluster.id, answer)
+            else:
+                # Анализ не удался — следующее похожее падение должно запустить свой
+                self.cluster_index.close(item.cluster.id)
+    
+    def drop_pending(self) -> int:
+        """
+        Отбрасывает накопленный пакет без анализа (при остановке агента)
+
+        Пакетный анализ может идти минуты, при остановке его не ждём: ключи
+        run освобождаются, а кластеры без анализа закрываются, чтобы после
+        перезапуска эти падения проанализировались заново.
+
+        Returns:
+            int: Сколько падений отброшено
+        """
+        if self.batcher is None:
+            return 0
+        items = self.batcher.discard()
+        for item in items:
+            self._record_analysis(item, "")
+            if item.key is not None:
+                self._release(item.key)
+        return len(items)
+    
+    def _failure_signature(self, event: Event) -> Optional[FailureSignature]:
+        """Сигнатура падения для кэша/кластеров (None если они выключены или деталей нет)"""
+        if self.analysis_cache is None and self.cluster_index is None:
+            return None
+        signature = FailureSignature.from_event_data(event.data)
+        return None if signature.is_empty() else signature
+    
+    def _publish(self, text: str) -> None:
+        """Публикует текст ассистента в UI"""
+        try:
+            from ..ui.message_bus import UIEventBus
+            UIEventBus.instance().publish_assistant_message(text)
+        except Exception:
+            pass
+    
     def handle_pr_created(self, event: Event) -> None:
         """Обрабатывает создание новых PR"""
         pr_number = event.data.get('pr_number', '?')
@@ -63,13 +289,26 @@ class EventHandlers(BaseWizard):
         
         self.print_info(f"📋 Анализирую новый PR #{pr_number}: {pr_title[:50]}...")
         self.print_info(f"👤 Автор: {author}")
-        
-        prompt = self.prompt_generator.generate_prompt(event)
-        if not prompt:
-            return
-        answer = self.agent_injector.send_prompt(prompt)
+        self._analyze_pr(event)
+    
+    def handle_pr_updated(self, event: Event) -> None:
+        """Обрабатывает новый пуш в открытый PR (ревью только новых изменений)"""
+        pr_number = event.data.get('pr_number', '?')
+        head_sha = str(event.data.get('head_sha') or '')[:7]
+        self.print_info(f"📋 Новый пуш в PR #{pr_number} ({head_sha}) — ревью изменений с прошлого анализа")
+        self._analyze_pr(event)
+    
+    def _analyze_pr(self, event: Event) -> None:
+        if self.pr_analyzer is not None:
+            answer = self.pr_analyzer.analyze(event)
+        else:
+            prompt = self.prompt_generator.generate_prompt(event)
+            if not prompt:
+                return
+            answer = self.agent_injector.send_prompt(prompt, session=AMBIENT_PR)
         if answer:
             self.print_success("✅ Анализ PR отправлен в cursor-agent и получен ответ")
+            self._publish(answer)
     
     def handle_manual_trigger(self, event: Event) -> None:
         """Обрабатывает ручные триггеры"""
@@ -6,8 +6,9 @@
 
 import asyncio
 import time
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, List, Callable, Any, Optional
+from typing import Deque, Dict, List, Callable, Any, Optional
 from enum import Enum
 import threading
 import sys
@@ -16,11 +17,14 @@ from pathlib import Path
 # Импортируем из родительского пакета
 sys.path.append(str(Path(__file__).parent.parent))
 from ..core.base_wizard import BaseWizard
+from .timer_wheel import Timer, TimerWheel
 
 class EventType(Enum):
     """Типы событий в системе"""
     GITHUB_WORKFLOW_EVENT = "github_workflow_event"  # Любые события с workflows
     GITHUB_PR_CREATED = "github_pr_created"
+    GITHUB_PR_UPDATED = "github_pr_updated"  # Новый пуш в открытый PR
+    GITHUB_RUN_COMPLETED = "github_run_completed"  # Завершение попытки run (из процесса мониторинга)
     SYSTEM_ERROR = "system_error"
     MANUAL_TRIGGER = "manual_trigger"
     SYSTEM_TEST = "system_test"  # Для тестирования системы событий
@@ -39,15 +43,43 @@ class Event:
         if not self.timestamp:
             self.timestamp = time.time()
 
+@dataclass
+class DeadLetter:
+    """Событие, которое обработчик не смог обработать после всех повторов"""
+    event: Event
+    handler_name: str
+    error: str
+    attempts: int
+    timestamp: float
+
 class EventSystem(BaseWizard):
     """Система событий для управления триггерами"""
     
-    def __init__(self):
+    def __init__(self,
+                 max_retries: int = 3,
+                 retry_base_delay: float = 1.0,
+                 retry_max_delay: float = 60.0,
+                 dead_letter_limit: int = 1000):
+        """
+        Args:
+            max_retries: Сколько раз повторять упавший обработчик
+            retry_base_delay: Задержка перед первым повтором (далее x2)
+            retry_max_delay: Верхняя граница задержки повтора
+            dead_letter_limit: Сколько последних неудач хранить в dead-letter очереди
+        """
         self.handlers: Dict[EventType, List[Callable]] = {}
         self.event_queue: List[Event] = []
         self.running = False
         self.processing_thread: Optional[threading.Thread] = None
         
+        # Таймеры (emit_after/emit_every/повторы) и синхронизация очереди
+        self.timer_wheel = TimerWheel()
+        self._cond = threading.Condition()
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.dead_letters: Deque[DeadLetter] = deque(maxlen=dead_letter_limit)
+        
     def register_handler(self, event_type: EventType, handler: Callable) -> None:
         """
         Регистрирует обработчик для типа события
@@ -68,8 +100,10 @@ class EventSystem(BaseWizard):
         Args:
             event: Событие для обработки
         """
-        self.event_queue.append(event)
-        self.event_queue.sort(key=lambda e: (-e.priority, e.timestamp))
+        with self._cond:
+            self.event_queue.append(event)
+            self.event_queue.sort(key=lambda e: (-e.priority, e.timestamp))
+            self._cond.notify()
     
     def emit_simple(self, 
                    event_type: EventType, 
@@ -88,6 +122,58 @@ class EventSystem(BaseWizard):
         )
         self.emit(event)
     
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """
+        Планирует вызов callback в потоке обработки событий через delay секунд
+        
+        Returns:
+            Timer: Дескриптор таймера (timer.cancel() для отмены)
+        """
+        with self._cond:
+            timer = self.timer_wheel.schedule(delay, callback)
+            self._cond.notify()
+        return timer
+    
+    def call_every(self, interval: float, callback: Callable[[], None],
+                   first_delay: Optional[float] = None) -> Timer:
+        """Периодически вызывает callback в потоке обработки событий"""
+        with self._cond:
+            timer = self.timer_wheel.schedule(
+                interval if first_delay is None else first_delay, callback, interval=interval
+            )
+            self._cond.notify()
+        return timer
+    
+    def emit_after(self,
+                   delay: float,
+                   event_type: EventType,
+                   data: Dict[str, Any],
+                   source: str = "unknown",
+                   priority: int = 1) -> Timer:
+        """
+        Генерирует событие через delay секунд (timestamp — момент срабатывания)
+        """
+        return self.call_later(
+            delay, lambda: self.emit_simple(event_type, dict(data), source=source, priority=priority)
+        )
+    
+    def emit_every(self,
+                   interval: float,
+                   event_type: EventType,
+                   data: Dict[str, Any],
+                   source: str = "unknown",
+                   priority: int = 1) -> Timer:
+        """
+        Генерирует событие каждые interval секунд, пока таймер не отменён
+        """
+        return self.call_every(
+            interval, lambda: self.emit_simple(event_type, dict(data), source=source, priority=priority)
+        )
+    
+    def cancel_timer(self, timer: Timer) -> None:
+        """Отменяет отложенное/периодическое событие или повтор"""
+        timer.cancel()
+    
     def start_processing(self) -> None:
         """Запускает обработку событий в фоновом потоке"""
         if self.running:
@@ -103,6 +189,8 @@ class EventSystem(BaseWizard):
     def stop_processing(self) -> None:
         """Останавливает обработку событий"""
         self.running = False
+        with self._cond:
+            self._cond.notify_all()
         if self.processing_thread:
             self.processing_thread.join(timeout=5)
         self.print_info("📡 Система событий остановлена")
@@ -111,14 +199,39 @@ class EventSystem(BaseWizard):
         """Основной цикл обработки событий"""
         while self.running:
             try:
-                if self.event_queue:
-                    event = self.event_queue.pop(0)
+                self.run_due_timers()
+                event = self._next_event()
+                if event is not None:
                     self.process_event(event)
-                else:
-                    time.sleep(1)  # Небольшая пауза если нет событий
             except Exception as e:
                 self.print_error(f"Ошибка в цикле событий: {e}")
-                time.sleep(5)  # Пауза при ошибке
+                with self._cond:
+                    self._cond.wait(timeout=5)  # Пауза при ошибке (прерывается stop)
+    
+    def _next_event(self) -> Optional[Event]:
+        """Берёт событие из очереди, ожидая не дольше ближайшего таймера"""
+        with self._cond:
+            if not self.event_queue and self.running:
+                self._cond.wait(timeout=self.timer_wheel.time_until_next(60.0))
+            if self.event_queue:
+                return self.event_queue.pop(0)
+        return None
+    
+    def run_due_timers(self) -> int:
+        """
+        Выполняет сработавшие таймеры
+        
+        Returns:
+            int: Количество выполненных callback'ов
+        """
+        with self._cond:
+            due = self.timer_wheel.advance()
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception as e:
+                self.print_error(f"Ошибка в таймере: {e}")
+        return len(due)
     
     def process_event(self, event: Event) -> None:
         """
@@ -129,15 +242,13 @@ class EventSystem(BaseWizard):
         """
         if event.type in self.handlers:
             for handler in self.handlers[event.type]:
-                try:
-                    handler(event)
-                except Exception as e:
-                    self.print_error(f"Ошибка в обработчике {handler.__name__}: {e}")
+                self._invoke_handler(handler, event, attempt=0)
         else:
             # Показываем только для неизвестных событий
             event_descriptions = {
                 EventType.GITHUB_WORKFLOW_EVENT: "🚀 событие workflow",
                 EventType.GITHUB_PR_CREATED: "📋 новый Pull Request",
+                EventType.GITHUB_PR_UPDATED: "📋 обновление Pull Request",
                 EventType.MANUAL_TRIGGER: "🎯 ручной запрос анализа",
                 EventType.SYSTEM_TEST: "🧪 системный тест",
                 EventType.GITHUB_ISSUE_TEST: "🔬 E2E тест через GitHub Issue"
@@ -145,12 +256,39 @@ class EventSystem(BaseWizard):
             description = event_descriptions.get(event.type, event.type.value)
             self.print_warning(f"Нет обработчиков для {description}")
     
+    def _invoke_handler(self, handler: Callable, event: Event, attempt: int) -> None:
+        """Вызывает обработчик; при исключении планирует повтор с экспоненциальной задержкой"""
+        try:
+            handler(event)
+        except Exception as e:
+            name = getattr(handler, "__name__", repr(handler))
+            if attempt < self.max_retries:
+                delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+                self.print_warning(
+                    f"Ошибка в обработчике {name}: {e} — повтор {attempt + 1}/{self.max_retries} через {delay:.1f}с"
+                )
+                self.call_later(delay, lambda: self._invoke_handler(handler, event, attempt + 1))
+            else:
+                self.print_error(f"Ошибка в обработчике {name}: {e} — событие в dead-letter очереди")
+                self.dead_letters.append(DeadLetter(
+                    event=event,
+                    handler_name=name,
+                    error=str(e),
+                    attempts=attempt + 1,
+                    timestamp=time.time(),
+                ))
+    
     def get_pending_events_count(self) -> int:
         """Возвращает количество событий в очереди"""
         return len(self.event_queue)
     
+    def get_pending_timers_count(self) -> int:
+        """Возвращает количество ожидающих таймеров (отложенные события и повторы)"""
+        return len(self.timer_wheel)
+    
     def clear_queue(self) -> None:
         """Очищает очередь событий"""
-        cleared = len(self.event_queue)
-        self.event_queue.clear()
+        with self._cond:
+            cleared = len(self.event_queue)
+            self.event_queue.clear()
         self.print_info(f"🧹 Очищено {cleared} событий из очереди") 
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+📦 Failure Batcher - пакетирование анализов упавших workflow
+
+При неудачном пуше несколько workflow падают с разницей в секунды. Вместо
+отдельного процесса cursor-agent на каждое падение они собираются в пакет:
+до max_items штук или пока не истечёт окно window секунд с первого
+падения, после чего пакет целиком передаётся в flush.
+"""
+
+import threading
+from typing import Any, Callable, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+Scheduler = Callable[[float, Callable[[], None]], Any]
+
+
+def _thread_timer(delay: float, callback: Callable[[], None]) -> threading.Timer:
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class FailureBatcher(Generic[T]):
+    """Собирает элементы в пакеты по времени и размеру"""
+
+    def __init__(self,
+                 flush: Callable[[List[T]], None],
+                 window: float = 5.0,
+                 max_items: int = 5,
+                 schedule: Optional[Scheduler] = None):
+        """
+        Args:
+            flush: Обработчик готового пакета (вызывается вне блокировки)
+            window: Сколько секунд ждать остальные падения после первого
+            max_items: Размер пакета, при котором он отправляется сразу
+            schedule: Планировщик отложенного вызова (delay, callback) -> handle с cancel();
+                      по умолчанию threading.Timer
+        """
+        self.flush = flush
+        self.window = window
+        self.max_items = max(1, max_items)
+        self.schedule = schedule or _thread_timer
+        self._pending: List[T] = []
+        self._timer: Any = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def add(self, item: T) -> None:
+        """Добавляет элемент; полный пакет отправляется сразу в текущем потоке"""
+        batch: Optional[List[T]] = None
+        with self._lock:
+            self._pending.append(item)
+            if len(self._pending) >= self.max_items:
+                batch = self._take_locked()
+            elif len(self._pending) == 1:
+                generation = self._generation
+                self._timer = self.schedule(self.window, lambda: self._on_timer(generation))
+        if batch:
+            self.flush(batch)
+
+    def flush_now(self) -> None:
+        """Отправляет накопленный пакет немедленно (например, при остановке)"""
+        with self._lock:
+            batch = self._take_locked()
+        if batch:
+            self.flush(batch)
+
+    def discard(self) -> List[T]:
+        """Забирает накопленный пакет без отправки (например, при остановке)"""
+        with self._lock:
+            return self._take_locked()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _on_timer(self, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return  # пакет уже ушёл по размеру
+            batch = self._take_locked()
+        if batch:
+            self.flush(batch)
+
+    def _take_locked(self) -> List[T]:
+        batch, self._pending = self._pending, []
+        self._generation += 1
+        timer, self._timer = self._timer, None
+        if timer is not None and hasattr(timer, "cancel"):
+            timer.cancel()
+        return batch
@@ -0,0 +1,230 @@
+"""
+🧩 Failure Clustering - группировка похожих падений CI (MinHash + LSH)
+
+Когда одна регрессия роняет сразу много тестов и джоб, нужен один анализ на
+первопричину, а не на каждый run. Выдержки из логов падений режутся на
+шинглы, сжимаются в MinHash-подпись, а LSH (banding) находит похожие
+открытые кластеры за сублинейное время — без сравнения со всеми
+сохранёнными падениями.
+"""
+
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .analysis_cache import FailureSignature
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+Signature = Tuple[int, ...]
+
+
+def failure_text(signature: FailureSignature) -> str:
+    """Текст для шинглирования: упавшие тесты, джобы и нормализованные строки ошибок"""
+    return "\n".join(signature.tests + signature.jobs + signature.errors)
+
+
+def shingles(text: str, k: int = 4) -> Set[int]:
+    """Множество хэшей словесных k-грамм текста"""
+    tokens = text.split()
+    if not tokens:
+        return set()
+    if len(tokens) <= k:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(tokens[i:i + k]).encode("utf-8"))
+        for i in range(len(tokens) - k + 1)
+    }
+
+
+class MinHasher:
+    """MinHash на семействе универсальных хэш-функций (a*x + b) mod p"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rnd = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rnd.randrange(1, _MERSENNE_PRIME), rnd.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, hashes: Iterable[int]) -> Signature:
+        values = list(hashes)
+        if not values:
+            return tuple([_MAX_HASH] * self.num_perm)
+        p = _MERSENNE_PRIME
+        return tuple(
+            min((a * h + b) % p for h in values) & _MAX_HASH
+            for a, b in self._perms
+        )
+
+
+def estimate_jaccard(a: Signature, b: Signature) -> float:
+    """Оценка сходства Жаккара по доле совпавших позиций подписи"""
+    if not a:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+@dataclass
+class FailureCluster:
+    """Группа падений с общей (предположительно) первопричиной"""
+    id: int
+    signature: Signature
+    leader: str
+    members: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    analysis: Optional[str] = None
+    open: bool = True
+
+
+class FailureClusterIndex:
+    """Инкрементальный LSH-индекс открытых кластеров падений"""
+
+    def __init__(self,
+                 threshold: float = 0.6,
+                 num_perm: int = 64,
+                 bands: int = 16,
+                 cluster_ttl: float = 6 * 3600,
+                 shingle_size: int = 4):
+        """
+        Args:
+            threshold: Минимальное оценённое сходство для присоединения к кластеру
+            num_perm: Длина MinHash-подписи
+            bands: Число LSH-полос (num_perm должно делиться на bands)
+            cluster_ttl: Через сколько секунд без новых падений кластер закрывается
+            shingle_size: Размер шингла в словах
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.cluster_ttl = cluster_ttl
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+
+        self.clusters: Dict[int, FailureCluster] = {}
+        self._member_of: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self._cluster_keys: Dict[int, Set[Tuple[int, int]]] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def signature_for(self, text: str) -> Signature:
+        return self.hasher.signature(shingles(text, self.shingle_size))
+
+    def _band_keys(self, signature: Signature) -> List[Tuple[int, int]]:
+        r = self.rows
+        return [(band, hash(signature[band * r:(band + 1) * r])) for band in range(self.bands)]
+
+    def assign(self, failure_id: str, text: str) -> Tuple[FailureCluster, bool]:
+        """
+        Присоединяет падение к похожему открытому кластеру или открывает новый
+
+        Повторное добавление того же failure_id идемпотентно: возвращается его
+        открытый кластер без нового участника (is_new=True только для лидера).
+
+        Returns:
+            Tuple[FailureCluster, bool]: (кластер, is_new) — is_new=True если падение первое в кластере
+        """
+        return self.add_signature(failure_id, self.signature_for(text))
+
+    def add_signature(self, failure_id: str, signature: Signature) -> Tuple[FailureCluster, bool]:
+        """То же, что assign, но с готовой MinHash-подписью"""
+        keys = self._band_keys(signature)
+        now = time.time()
+        with self._lock:
+            known = self.clusters.get(self._member_of.get(failure_id, -1))
+            if known is not None and known.open:
+                known.last_seen = now
+                return known, known.leader == failure_id
+            cluster = self._best_match(signature, keys, now)
+            if cluster is None:
+                cluster = FailureCluster(id=self._next_id, signature=signature, leader=failure_id,
+                                         members=[failure_id], created_at=now, last_seen=now)
+                self._next_id += 1
+                self.clusters[cluster.id] = cluster
+                self._cluster_keys[cluster.id] = set()
+                is_new = True
+            else:
+                cluster.members.append(failure_id)
+                cluster.last_seen = now
+                is_new = False
+            self._member_of[failure_id] = cluster.id
+            # Полосы каждого участника расширяют «зону притяжения» кластера
+            cluster_keys = self._cluster_keys[cluster.id]
+            for key in keys:
+                if key not in cluster_keys:
+                    cluster_keys.add(key)
+                    self._buckets.setdefault(key, set()).add(cluster.id)
+            return cluster, is_new
+
+    def query(self, signature: Signature) -> Optional[FailureCluster]:
+        """Ищет открытый кластер, похожий на подпись (без добавления)"""
+        with self._lock:
+            return self._best_match(signature, self._band_keys(signature), time.time())
+
+    def _best_match(self, signature: Signature, keys: List[Tuple[int, int]], now: float) -> Optional[FailureCluster]:
+        candidates: Set[int] = set()
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket:
+                candidates |= bucket
+        best, best_score = None, self.threshold
+        for cluster_id in candidates:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None or not cluster.open:
+                continue
+            if now - cluster.last_seen > self.cluster_ttl:
+                self._close_locked(cluster)
+                continue
+            score = estimate_jaccard(signature, cluster.signature)
+            if score >= best_score:
+                best, best_score = cluster, score
+        return best
+
+    def set_analysis(self, cluster_id: int, analysis: str) -> None:
+        with self._lock:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is not None:
+                cluster.analysis = analysis
+
+    def close(self, cluster_id: int) -> None:
+        """Закрывает кластер: новые падения к нему больше не присоединяются"""
+        with self._lock:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is not None:
+                self._close_locked(cluster)
+
+    def _close_locked(self, cluster: FailureCluster) -> None:
+        cluster.open = False
+        for key in self._cluster_keys.pop(cluster.id, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(cluster.id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def prune(self, keep_closed: int = 1000) -> None:
+        """Закрывает просроченные кластеры и забывает самые старые закрытые"""
+        now = time.time()
+        with self._lock:
+            for cluster in list(self.clusters.values()):
+                if cluster.open and now - cluster.last_seen > self.cluster_ttl:
+                    self._close_locked(cluster)
+            closed = sorted((c for c in self.clusters.values() if not c.open), key=lambda c: c.last_seen)
+            for cluster in closed[:max(0, len(closed) - keep_closed)]:
+                del self.clusters[cluster.id]
+                for member in cluster.members:
+                    if self._member_of.get(member) == cluster.id:
+                        del self._member_of[member]
+
+    def open_clusters(self) -> List[FailureCluster]:
+        with self._lock:
+            return [c for c in self.clusters.values() if c.open]
@@ -0,0 +1,317 @@
+"""
+🎲 Flaky Triage - отсев известных флейков до запуска cursor-agent
+
+Для каждого теста хранится история статусов и частота «переключений»
+(PASSED ↔ FAILED между соседними прогонами). Если в упавшем run падают
+только тесты, которые и раньше то проходили, то падали, — агент не
+вызывается: run перезапускается (опционально) или падение помечается
+как известный флейк. Агент запускается, если падение воспроизвелось на
+повторной попытке или среди упавших есть хотя бы один стабильный тест.
+
+Индекс живёт в памяти (решение — несколько словарных поисков) и
+периодически пересобирается в фоне из двух источников:
+- таблица test_results (PostgreSQL smart_gtest), если доступен psycopg;
+- локальная история ~/.cursor/ambient/test_history.jsonl, которую
+  пополняют сами решения триажа и успешные прогоны workflow.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from ..core.base_wizard import BaseWizard
+from .analysis_cache import FailureSignature
+
+if TYPE_CHECKING:
+    from .github_monitor import GitHubMonitor
+
+_FAILURE_CONCLUSIONS = ("failure", "failed", "cancelled")
+
+_TEST_RESULTS_QUERY = """
+    SELECT test_suite, test_name, status
+    FROM test_results
+    WHERE start_time >= NOW() - make_interval(days => %s)
+      AND status IN ('PASSED', 'FAILED')
+    ORDER BY start_time
+    LIMIT %s
+"""
+
+
+@dataclass
+class TestStats:
+    """История одного теста: сколько прогонов, падений и переключений статуса"""
+    runs: int = 0
+    failures: int = 0
+    flips: int = 0
+    last_status: Optional[str] = None
+
+    def add(self, status: str) -> None:
+        self.runs += 1
+        if status == "FAILED":
+            self.failures += 1
+        if self.last_status is not None and status != self.last_status:
+            self.flips += 1
+        self.last_status = status
+
+    @property
+    def flip_rate(self) -> float:
+        return self.flips / (self.runs - 1) if self.runs > 1 else 0.0
+
+
+@dataclass
+class TriageDecision:
+    """Решение триажа: analyze — звать агента, rerun — перезапущено, skip — известный флейк"""
+    action: str
+    reason: str = ""
+    flaky_tests: List[str] = field(default_factory=list)
+
+
+class FlakyIndex:
+    """In-memory индекс флейковости тестов (словарь заменяется целиком при обновлении)"""
+
+    def __init__(self,
+                 history_path: Optional[Path] = None,
+                 min_runs: int = 5,
+                 flip_threshold: float = 0.1,
+                 window_days: int = 30,
+                 max_history: int = 50000,
+                 db_rows: int = 200000):
+        """
+        Args:
+            history_path: Локальная история статусов (JSONL); None — только БД
+            min_runs: Минимум прогонов, чтобы судить о флейковости
+            flip_threshold: Доля переключений PASSED↔FAILED, начиная с которой тест флейковый
+            window_days: Глубина истории в test_results, дней
+            max_history: Сколько последних записей хранить в локальной истории
+            db_rows: Ограничение выборки из test_results
+        """
+        self.history_path = Path(history_path) if history_path else None
+        self.min_runs = min_runs
+        self.flip_threshold = flip_threshold
+        self.window_days = window_days
+        self.max_history = max_history
+        self.db_rows = db_rows
+        self._stats: Dict[str, TestStats] = {}
+        self._stats_lock = threading.Lock()
+        self._pending: Optional[List[Tuple[str, str]]] = None  # записи, пришедшие во время refresh
+        self._history_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.refreshed_at = 0.0
+
+    def stats(self, test: str) -> Optional[TestStats]:
+        return self._stats.get(test)
+
+    def is_flaky(self, test: str) -> bool:
+        """Флейк: достаточно истории, частые переключения и прошлый прогон был зелёным
+        (падение подряд — уже воспроизведение, а не случайность)"""
+        stats = self._stats.get(test)
+        return (
+            stats is not None
+            and stats.runs >= self.min_runs
+            and 0 < stats.failures < stats.runs
+            and stats.flip_rate >= self.flip_threshold
+            and stats.last_status != "FAILED"
+        )
+
+    def record(self, statuses: Iterable[Tuple[str, str]], run_id: Any = None) -> None:
+        """Дописывает статусы (тест, PASSED/FAILED) в локальную историю и в текущий индекс"""
+        entries = [(test, status) for test, status in statuses if test]
+        if not entries:
+            return
+        with self._stats_lock:
+            for test, status in entries:
+                self._stats.setdefault(test, TestStats()).add(status)
+            if self._pending is not None:
+                self._pending.extend(entries)
+            self._append_history(entries, run_id)
+
+    def _append_history(self, entries: List[Tuple[str, str]], run_id: Any) -> None:
+        if self.history_path is None:
+            return
+        now = time.time()
+        with self._history_lock:
+            try:
+                self.history_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.history_path, "a", encoding="utf-8") as f:
+                    for test, status in entries:
+                        f.write(json.dumps({"test": test, "status": status, "run_id": run_id, "ts": now},
+                                           ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+
+    def refresh(self) -> None:
+        """
+        Пересобирает индекс из test_results и локальной истории и подменяет его целиком
+
+        История читается под тем же замком, что и record(), и с этого момента
+        новые записи копятся в _pending; БД читается без замка, а перед
+        подменой накопленные записи доигрываются в новый словарь — так record()
+        во время обновления не теряется и не учитывается дважды.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # обновление уже идёт
+        try:
+            with self._stats_lock:
+                history = self._load_history()
+                self._pending = []
+            try:
+                database = self._load_database()
+            except BaseException:
+                with self._stats_lock:
+                    self._pending = None
+                raise
+            with self._stats_lock:
+                pending, self._pending = self._pending, None
+                stats: Dict[str, TestStats] = {}
+                for test, status in itertools.chain(database, history, pending):
+                    stats.setdefault(test, TestStats()).add(status)
+                self._stats = stats
+            self.refreshed_at = time.time()
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_async(self) -> None:
+        """Обновление в фоне: чтение БД не должно задерживать поток событий"""
+        threading.Thread(target=self.refresh, name="flaky-index-refresh", daemon=True).start()
+
+    def _load_database(self) -> List[Tuple[str, str]]:
+        """Статусы из test_results (пусто, если psycopg не установлен или БД недоступна)"""
+        if not os.environ.get("POSTGRES_PASSWORD"):
+            return []
+        try:
+            import psycopg
+        except ImportError:
+            return []
+        try:
+            with psycopg.connect(
+                host=os.environ.get("POSTGRES_HOST", "localhost"),
+                user=os.environ.get("POSTGRES_USER", "postgres"),
+                dbname=os.environ.get("POSTGRES_DB", "smart_tests"),
+                password=os.environ["POSTGRES_PASSWORD"],
+                connect_timeout=5,
+            ) as conn:
+                rows = conn.execute(_TEST_RESULTS_QUERY, (self.window_days, self.db_rows)).fetchall()
+        except Exception:
+            return []
+        return [(f"{suite}.{name}", status) for suite, name, status in rows]
+
+    def _load_history(self) -> List[Tuple[str, str]]:
+        """Статусы из локальной истории; слишком длинный файл ужимается до max_history записей"""
+        if self.history_path is None:
+            return []
+        with self._history_lock:
+            try:
+                with open(self.history_path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError:
+                return []
+            if len(lines) > self.max_history:
+                lines = lines[-self.max_history:]
+                try:
+                    tmp = self.history_path.with_suffix(self.history_path.suffix + ".tmp")
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        f.writelines(lines)
+                    os.replace(tmp, self.history_path)
+                except OSError:
+                    pass
+        entries = []
+        for line in lines:
+            try:
+                item = json.loads(line)
+                entries.append((str(item["test"]), str(item["status"])))
+            except (ValueError, KeyError, TypeError):
+                continue
+        return entries
+
+
+class FlakyTriage(BaseWizard):
+    """Решает, стоит ли звать агента на упавший workflow, по флейковости упавших тестов"""
+
+    def __init__(self,
+                 index: FlakyIndex,
+                 github: Optional["GitHubMonitor"] = None,
+                 rerun: bool = False,
+                 max_attempts: int = 2):
+        """
+        Args:
+            index: Индекс флейковости тестов
+            github: Монитор GitHub (нужен для перезапуска и наблюдения за run)
+            rerun: Перезапускать упавшие джобы, если падают только флейки
+            max_attempts: Сколько попыток run допускается до обязательного анализа
+        """
+        super().__init__()
+        self.index = index
+        self.github = github
+        self.rerun = rerun
+        self.max_attempts = max(1, max_attempts)
+        # workflow_id -> тесты, упавшие в его последнем упавшем run
+        self._recent_failures: Dict[Any, List[str]] = {}
+        # workflow_id -> тесты, которые когда-либо падали в нём (упорядоченное множество);
+        # успешный run этого workflow означает, что все они прошли
+        self._workflow_tests: Dict[Any, Dict[str, None]] = {}
+        self.max_tests_per_workflow = 500
+        self._lock = threading.Lock()
+
+    def decide(self, data: Dict[str, Any]) -> TriageDecision:
+        """Решение для данных события GITHUB_WORKFLOW_EVENT"""
+        if str(data.get("conclusion") or "").lower() not in _FAILURE_CONCLUSIONS:
+            return TriageDecision("analyze")
+        tests = FailureSignature.from_event_data(data).tests
+        if not tests:
+            return TriageDecision("analyze", "упавшие тесты не распознаны")
+
+        attempt = int(data.get("run_attempt") or 1)
+        workflow_id = data.get("workflow_id")
+        with self._lock:
+            previous = self._recent_failures.get(workflow_id) or []
+            self._recent_failures[workflow_id] = tests
+            known = self._workflow_tests.setdefault(workflow_id, {})
+            for test in tests:
+                known.pop(test, None)
+                known[test] = None
+            while len(known) > self.max_tests_per_workflow:
+                known.pop(next(iter(known)))
+        # Решение принимается по истории ДО этого падения
+        flaky = [t for t in tests if self.index.is_flaky(t)]
+        self.index.record(((t, "FAILED") for t in tests), run_id=data.get("run_id"))
+
+        if attempt > 1 and set(tests) & set(previous):
+            return TriageDecision("analyze", f"падение воспроизвелось на попытке {attempt}", flaky)
+        if len(flaky) < len(tests):
+            return TriageDecision("analyze", "есть стабильные упавшие тесты", flaky)
+        if self.rerun and attempt < self.max_attempts and self.github is not None:
+            if self.github.rerun_failed_jobs(data.get("run_id")):
+                return TriageDecision("rerun", "падают только известные флейки — упавшие джобы перезапущены", flaky)
+        return TriageDecision("skip", "падают только известные флейки", flaky)
+
+    def observe_run(self, run: Dict[str, Any]) -> None:
+        """
+        Завершение любого run: успешный засчитывается как PASSED всем тестам,
+        которые когда-либо падали в этом workflow
+
+        Статусы FAILED записывает decide() по логам упавших джоб; остальные
+        тесты упавшего run не засчитываются — джоба могла оборваться до них.
+        """
+        if str(run.get("conclusion") or "").lower() != "success":
+            return
+        workflow_id = run.get("workflow_id")
+        with self._lock:
+            self._recent_failures.pop(workflow_id, None)
+            tests = list(self._workflow_tests.get(workflow_id) or ())
+        if tests:
+            self.index.record(((t, "PASSED") for t in tests), run_id=run.get("id"))
+
+    def describe(self, decision: TriageDecision) -> str:
+        """Краткое описание решения для UI"""
+        stats = []
+        for test in decision.flaky_tests[:10]:
+            s = self.index.stats(test)
+            if s is not None:
+                stats.append(f"{test} (переключений {s.flip_rate:.0%}, падений {s.failures}/{s.runs})")
+        details = ("\n" + "\n".join(f"- {line}" for line in stats)) if stats else ""
+        return f"{decision.reason}{details}"
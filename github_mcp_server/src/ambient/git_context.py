@@ -0,0 +1,529 @@
+"""
+🌿 Git Context - локальный дифф между последним зелёным и упавшим коммитом
+
+Промпт о падении содержит только сообщение и короткий SHA коммита, и агенту
+приходится самому ходить за диффом. Этот модуль считает дифф локально в
+donut_dir:
+- все объекты читаются через один долгоживущий процесс `git cat-file --batch`
+  (без запуска git на каждый запрос);
+- деревья сравниваются рекурсивно только там, где отличаются хэши поддеревьев;
+- ханки ранжируются по близости к упавшим тестам и файлам/строкам из логов;
+- метаданные коммитов и diff stat кэшируются в персистентном индексе
+  коммит-графа.
+"""
+
+import difflib
+import heapq
+import json
+import os
+import re
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+_FILE_LINE_RE = re.compile(r"\b((?:[\w.-]+/)*[\w.-]+\.(?:cpp|cc|cxx|c|h|hpp|py|cmake|txt))(?::(\d+))?")
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+_EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+class GitObjectReader:
+    """Чтение объектов через один процесс `git cat-file --batch`"""
+
+    def __init__(self, repo_dir: Path, git_bin: str = "git"):
+        self.repo_dir = Path(repo_dir)
+        self.git_bin = git_bin
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                [self.git_bin, "cat-file", "--batch"],
+                cwd=str(self.repo_dir),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._proc
+
+    def read(self, rev: str) -> Optional[Tuple[str, str, bytes]]:
+        """
+        Читает объект по SHA/ревизии
+
+        Returns:
+            (sha, type, content) или None, если объекта нет в локальном репозитории
+        """
+        if not rev or "\n" in rev:
+            return None
+        with self._lock:
+            for attempt in range(2):
+                proc = self._ensure_process()
+                try:
+                    proc.stdin.write(rev.encode("utf-8") + b"\n")
+                    proc.stdin.flush()
+                    header = proc.stdout.readline()
+                    if not header:
+                        raise BrokenPipeError("git cat-file завершился")
+                    parts = header.decode("utf-8", errors="replace").split()
+                    if len(parts) < 3 or parts[-1] == "missing":
+                        return None
+                    sha, obj_type, size = parts[0], parts[1], int(parts[2])
+                    content = proc.stdout.read(size)
+                    proc.stdout.read(1)  # завершающий перевод строки
+                    return sha, obj_type, content
+                except (OSError, ValueError):
+                    self._kill_locked()
+                    if attempt:
+                        return None
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._kill_locked()
+
+    def _kill_locked(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+
+
+@dataclass
+class CommitInfo:
+    sha: str
+    tree: str
+    parents: List[str]
+    author: str
+    timestamp: int
+    subject: str
+
+
+@dataclass
+class DiffHunk:
+    """Ханк унифицированного диффа с оценкой релевантности"""
+    path: str
+    new_start: int
+    new_len: int
+    text: str
+    added: int = 0
+    removed: int = 0
+    score: float = 0.0
+
+
+@dataclass
+class GitDiffContext:
+    """Контекст для промпта: коммиты между зелёным и упавшим SHA, статистика и ханки"""
+    good_sha: str
+    bad_sha: str
+    commits: List[CommitInfo] = field(default_factory=list)
+    stats: List[Tuple[str, int, int]] = field(default_factory=list)
+    hunks: List[DiffHunk] = field(default_factory=list)
+    truncated: bool = False
+
+
+def parse_commit(sha: str, content: bytes) -> CommitInfo:
+    header, _, message = content.partition(b"\n\n")
+    tree, parents, author, timestamp = "", [], "", 0
+    for line in header.decode("utf-8", errors="replace").splitlines():
+        key, _, value = line.partition(" ")
+        if key == "tree":
+            tree = value
+        elif key == "parent":
+            parents.append(value)
+        elif key == "author":
+            # "Name <email> 1700000000 +0100"
+            name, _, rest = value.partition(" <")
+            author = name
+            fields = rest.split()
+            if len(fields) >= 2 and fields[-2].isdigit():
+                timestamp = int(fields[-2])
+    subject = message.decode("utf-8", errors="replace").strip().split("\n", 1)[0]
+    return CommitInfo(sha=sha, tree=tree, parents=parents, author=author, timestamp=timestamp, subject=subject)
+
+
+def parse_tree(content: bytes) -> Dict[str, Tuple[str, str]]:
+    """Бинарный объект дерева → {имя: (mode, sha)}"""
+    entries = {}
+    pos, size = 0, len(content)
+    while pos < size:
+        space = content.index(b" ", pos)
+        nul = content.index(b"\0", space)
+        mode = content[pos:space].decode("ascii")
+        name = content[space + 1:nul].decode("utf-8", errors="replace")
+        sha = content[nul + 1:nul + 21].hex()
+        entries[name] = (mode, sha)
+        pos = nul + 21
+    return entries
+
+
+class CommitGraphCache:
+    """Персистентный индекс коммит-графа: метаданные коммитов и diff stat пар SHA"""
+
+    def __init__(self, path: Optional[Path] = None, max_commits: int = 5000, max_stats: int = 500):
+        self.path = Path(path) if path else None
+        self.max_commits = max_commits
+        self.max_stats = max_stats
+        self.commits: Dict[str, Dict[str, Any]] = {}
+        self.stats: Dict[str, List[List[Any]]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def get_commit(self, sha: str) -> Optional[CommitInfo]:
+        entry = self.commits.get(sha)
+        return CommitInfo(sha=sha, **entry) if entry else None
+
+    def put_commit(self, info: CommitInfo) -> None:
+        with self._lock:
+            self.commits[info.sha] = {
+                "tree": info.tree, "parents": info.parents, "author": info.author,
+                "timestamp": info.timestamp, "subject": info.subject,
+            }
+            self._dirty = True
+
+    def get_stats(self, good: str, bad: str) -> Optional[List[Tuple[str, int, int]]]:
+        entry = self.stats.get(f"{good}..{bad}")
+        return [tuple(item) for item in entry] if entry is not None else None
+
+    def put_stats(self, good: str, bad: str, stats: List[Tuple[str, int, int]]) -> None:
+        with self._lock:
+            self.stats[f"{good}..{bad}"] = [list(item) for item in stats]
+            self._dirty = True
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            # Коммиты неизменяемы; при переполнении отбрасываем самые старые по времени
+            if len(self.commits) > self.max_commits:
+                keep = sorted(self.commits.items(), key=lambda kv: kv[1].get("timestamp", 0))[-self.max_commits:]
+                self.commits = dict(keep)
+            while len(self.stats) > self.max_stats:
+                self.stats.pop(next(iter(self.stats)))
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"commits": self.commits, "stats": self.stats}, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError:
+                pass
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.commits = dict(data.get("commits") or {})
+            self.stats = dict(data.get("stats") or {})
+        except (OSError, ValueError):
+            pass
+
+
+def log_references(texts: Iterable[str]) -> Tuple[Set[str], Dict[str, Set[int]]]:
+    """Файлы и номера строк, упомянутые в логах: ({файлы}, {файл: {строки}})"""
+    files: Set[str] = set()
+    lines: Dict[str, Set[int]] = {}
+    for text in texts:
+        for path, line in _FILE_LINE_RE.findall(text):
+            files.add(path)
+            if line:
+                lines.setdefault(path, set()).add(int(line))
+    return files, lines
+
+
+def _path_matches(path: str, mentioned: str) -> bool:
+    return path == mentioned or path.endswith("/" + mentioned) or mentioned.endswith("/" + path)
+
+
+def rank_hunks(hunks: Sequence[DiffHunk],
+               mentioned_files: Iterable[str] = (),
+               mentioned_lines: Optional[Dict[str, Set[int]]] = None,
+               failed_tests: Sequence[str] = (),
+               line_slack: int = 5) -> List[DiffHunk]:
+    """
+    Ранжирует ханки: строка из лога внутри ханка > файл из лога > имя упавшего
+    теста/набора в тексте ханка. Порядок детерминирован (score, путь, строка).
+    """
+    mentioned_files = list(mentioned_files)
+    mentioned_lines = mentioned_lines or {}
+    names: Set[str] = set()
+    for test in failed_tests:
+        names.update(part for part in re.split(r"[./]", test) if len(part) > 3)
+    for hunk in hunks:
+        score = 1.0
+        if any(_path_matches(hunk.path, f) for f in mentioned_files):
+            score += 3.0
+        for path, lines in mentioned_lines.items():
+            if _path_matches(hunk.path, path) and any(
+                hunk.new_start - line_slack <= line <= hunk.new_start + hunk.new_len + line_slack for line in lines
+            ):
+                score += 5.0
+                break
+        if names and any(name in hunk.text for name in names):
+            score += 2.0
+        if "/test" in "/" + hunk.path or hunk.path.startswith("tests"):
+            score += 0.5
+        hunk.score = score
+    return sorted(hunks, key=lambda h: (-h.score, h.path, h.new_start))
+
+
+class GitContextProvider:
+    """Дифф «последний зелёный → упавший» из локального репозитория"""
+
+    def __init__(self,
+                 repo_dir: Path,
+                 cache_path: Optional[Path] = None,
+                 max_commits: int = 200,
+                 max_files: int = 200,
+                 max_blob_bytes: int = 512 * 1024,
+                 context_lines: int = 3):
+        """
+        Args:
+            repo_dir: Корень git-репозитория (donut_dir)
+            cache_path: JSON индекса коммит-графа (None — только в памяти)
+            max_commits: Сколько коммитов между SHA перечислять максимум
+            max_files: Сколько изменённых файлов разбирать на ханки
+            max_blob_bytes: Файлы крупнее не диффаются построчно
+            context_lines: Строк контекста в ханках
+        """
+        self.repo_dir = Path(repo_dir)
+        self.reader = GitObjectReader(self.repo_dir)
+        self.cache = CommitGraphCache(cache_path)
+        self.max_commits = max_commits
+        self.max_files = max_files
+        self.max_blob_bytes = max_blob_bytes
+        self.context_lines = context_lines
+
+    @classmethod
+    def for_repo(cls, repo_dir: Path, cache_path: Optional[Path] = None) -> Optional["GitContextProvider"]:
+        """Провайдер, если repo_dir — git-репозиторий, иначе None"""
+        if not (Path(repo_dir) / ".git").exists():
+            return None
+        return cls(repo_dir, cache_path)
+
+    def close(self) -> None:
+        self.cache.save()
+        self.reader.close()
+
+    # --- коммиты ---
+
+    def commit(self, sha: str) -> Optional[CommitInfo]:
+        info = self.cache.get_commit(sha)
+        if info is not None:
+            return info
+        obj = self.reader.read(sha)
+        if obj is None or obj[1] != "commit":
+            return None
+        info = parse_commit(obj[0], obj[2])
+        # Кэшируем только по полному SHA: ссылки вроде HEAD двигаются
+        self.cache.put_commit(info)
+        return info
+
+    def commits_between(self, good: str, bad: str) -> Tuple[List[CommitInfo], bool]:
+        """
+        Коммиты `bad ^good`: достижимые из bad, но не из good (новые первыми); (список, обрезан ли)
+
+        Как в git rev-list, обход идёт от обоих концов по убыванию времени коммита:
+        предки good помечаются «неинтересными», и пометка протекает вниз по
+        родителям. Обход заканчивается, когда в очереди не осталось интересных
+        коммитов, так что общая с good история не читается целиком.
+        """
+        if good == bad:
+            return [], False
+        uninteresting: Dict[str, bool] = {}
+        heap: List[Tuple[int, str]] = []
+        pending: Set[str] = set()
+        interesting_pending = 0
+        result: List[CommitInfo] = []
+
+        def push(sha: str, excluded: bool) -> None:
+            nonlocal interesting_pending
+            if sha in uninteresting:
+                if excluded and not uninteresting[sha]:
+                    # Коммит оказался и предком good; если он ещё в очереди,
+                    # дальше он понесёт пометку своим родителям
+                    uninteresting[sha] = True
+                    if sha in pending:
+                        interesting_pending -= 1
+                return
+            info = self.commit(sha)
+            if info is None:
+                return
+            uninteresting[sha] = excluded
+            pending.add(sha)
+            if not excluded:
+                interesting_pending += 1
+            heapq.heappush(heap, (-info.timestamp, sha))
+
+        push(good, True)
+        push(bad, False)
+        truncated = False
+        while heap and interesting_pending:
+            _, sha = heapq.heappop(heap)
+            pending.discard(sha)
+            excluded = uninteresting[sha]
+            info = self.commit(sha)
+            if not excluded:
+                interesting_pending -= 1
+                if len(result) >= self.max_commits:
+                    truncated = True
+                    break
+                result.append(info)
+            for parent in info.parents:
+                push(parent, excluded)
+        # Коммиты, помеченные уже после выдачи (перекос часов), отбрасываем
+        result = [c for c in result if not uninteresting[c.sha]]
+        result.sort(key=lambda c: (-c.timestamp, c.sha))
+        return result, truncated
+
+    # --- деревья и блобы ---
+
+    def _tree(self, sha: str) -> Dict[str, Tuple[str, str]]:
+        if sha == _EMPTY_TREE:
+            return {}
+        obj = self.reader.read(sha)
+        return parse_tree(obj[2]) if obj and obj[1] == "tree" else {}
+
+    def changed_files(self, old_tree: str, new_tree: str, prefix: str = "") -> List[Tuple[str, str, str]]:
+        """(путь, старый blob, новый blob) — спускаемся только в отличающиеся поддеревья"""
+        if old_tree == new_tree:
+            return []
+        old, new = self._tree(old_tree), self._tree(new_tree)
+        changes: List[Tuple[str, str, str]] = []
+        for name in sorted(set(old) | set(new)):
+            old_mode, old_sha = old.get(name, ("", ""))
+            new_mode, new_sha = new.get(name, ("", ""))
+            if old_sha == new_sha:
+                continue
+            path = prefix + name
+            old_is_tree, new_is_tree = old_mode == "40000", new_mode == "40000"
+            if old_is_tree or new_is_tree:
+                changes.extend(self.changed_files(old_sha if old_is_tree else _EMPTY_TREE,
+                                                  new_sha if new_is_tree else _EMPTY_TREE, path + "/"))
+                if old_sha and not old_is_tree:
+                    changes.append((path, old_sha, ""))
+                if new_sha and not new_is_tree:
+                    changes.append((path, "", new_sha))
+            else:
+                changes.append((path, old_sha, new_sha))
+        return changes
+
+    def _blob_lines(self, sha: str) -> Optional[List[str]]:
+        if not sha:
+            return []
+        obj = self.reader.read(sha)
+        if obj is None or len(obj[2]) > self.max_blob_bytes or b"\0" in obj[2][:8000]:
+            return None
+        return obj[2].decode("utf-8", errors="replace").splitlines()
+
+    def _blob_lines_at(self, commit_sha: str, path: str) -> Optional[List[str]]:
+        """Строки файла в коммите через `<sha>:<путь>` ([] если файла там нет)"""
+        obj = self.reader.read(f"{commit_sha}:{path}")
+        if obj is None:
+            return []
+        if obj[1] != "blob" or len(obj[2]) > self.max_blob_bytes or b"\0" in obj[2][:8000]:
+            return None
+        return obj[2].decode("utf-8", errors="replace").splitlines()
+
+    def file_hunks(self, path: str, old_sha: str, new_sha: str) -> Tuple[List[DiffHunk], int, int]:
+        return self.lines_hunks(path, self._blob_lines(old_sha), self._blob_lines(new_sha))
+
+    def lines_hunks(self, path: str,
+                    old_lines: Optional[List[str]],
+                    new_lines: Optional[List[str]]) -> Tuple[List[DiffHunk], int, int]:
+        if old_lines is None or new_lines is None:
+            return [], 0, 0
+        hunks: List[DiffHunk] = []
+        added = removed = 0
+        current: Optional[DiffHunk] = None
+        body: List[str] = []
+        for line in difflib.unified_diff(old_lines, new_lines, lineterm="", n=self.context_lines):
+            if line.startswith(("---", "+++")) and current is None and not body:
+                continue
+            match = _HUNK_HEADER_RE.match(line)
+            if match:
+                if current is not None:
+                    current.text = "\n".join(body)
+                    hunks.append(current)
+                current = DiffHunk(path=path, new_start=int(match.group(3)),
+                                   new_len=int(match.group(4) or 1), text="")
+                body = [line]
+                continue
+            body.append(line)
+            if current is not None:
+                if line.startswith("+"):
+                    current.added += 1
+                elif line.startswith("-"):
+                    current.removed += 1
+        if current is not None:
+            current.text = "\n".join(body)
+            hunks.append(current)
+        for hunk in hunks:
+            added += hunk.added
+            removed += hunk.removed
+        return hunks, added, removed
+
+    # --- основной вход ---
+
+    def diff_stats(self, good_sha: str, bad_sha: str) -> Optional[List[Tuple[str, int, int]]]:
+        """Diff stat пары коммитов: из индекса коммит-графа или посчитанный заново"""
+        good, bad = self.commit(good_sha), self.commit(bad_sha)
+        if good is None or bad is None:
+            return None
+        cached = self.cache.get_stats(good.sha, bad.sha)
+        if cached is not None:
+            return cached
+        context = self.diff_context(good.sha, bad.sha)
+        return context.stats if context else None
+
+    def diff_context(self,
+                     good_sha: str,
+                     bad_sha: str,
+                     log_texts: Iterable[str] = (),
+                     failed_tests: Sequence[str] = ()) -> Optional[GitDiffContext]:
+        """
+        Дифф между последним зелёным и упавшим коммитом с ранжированными ханками
+
+        Returns:
+            None если какого-то из коммитов нет локально (репозиторий не подтянут)
+        """
+        good, bad = self.commit(good_sha), self.commit(bad_sha)
+        if good is None or bad is None:
+            return None
+        context = GitDiffContext(good_sha=good.sha, bad_sha=bad.sha)
+        context.commits, truncated = self.commits_between(good.sha, bad.sha)
+
+        hunks: List[DiffHunk] = []
+        cached = self.cache.get_stats(good.sha, bad.sha)
+        if cached is not None:
+            # Список изменённых файлов уже известен: деревья не обходим, а файлы
+            # без построчного диффа (бинарные, слишком большие) не читаем вовсе
+            context.stats = cached
+            context.truncated = truncated or len(cached) >= self.max_files
+            for path, added, removed in cached:
+                if added or removed:
+                    hunks.extend(self.lines_hunks(path, self._blob_lines_at(good.sha, path),
+                                                  self._blob_lines_at(bad.sha, path))[0])
+        else:
+            changes = self.changed_files(good.tree, bad.tree)
+            context.truncated = truncated or len(changes) > self.max_files
+            for path, old_sha, new_sha in changes[:self.max_files]:
+                file_hunks, added, removed = self.file_hunks(path, old_sha, new_sha)
+                hunks.extend(file_hunks)
+                context.stats.append((path, added, removed))
+            self.cache.put_stats(good.sha, bad.sha, context.stats)
+
+        files, lines = log_references(log_texts)
+        context.hunks = rank_hunks(hunks, files, lines, failed_tests)
+        self.cache.save()
+        return context
@@ -7,7 +7,7 @@
 import requests
 import time
 import threading
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import sys
 from pathlib import Path
 
@@ -29,13 +29,24 @@ class GitHubMonitor(BaseWizard):
         # Состояние мониторинга
         self.monitoring = False
         self.monitor_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
         self.last_check_time = time.time()
         self.seen_runs: Set[str] = set()
-        self.seen_failures: Set[str] = set()
+        self.seen_failures: Set[str] = set()  # ключи "<run_id>:<run_attempt>"
+        self.seen_completed: Set[str] = set()
+        # Подписчики на завершение каждой попытки run (например, история для триажа флейков)
+        self.run_listeners: List[Callable[[Dict], None]] = []
+        # Зелёные коммиты по (workflow_id, ветка): [(run_number, head_sha)] по возрастанию номера
+        self.last_green: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        # Текущий head SHA каждого открытого PR (новый пуш = смена head)
+        self.pr_heads: Dict[int, str] = {}
         self.start_time = time.time()
         
         # Настройки
         self.check_interval = 10  # быстрее реагируем
+        self.error_backoff_max = 300  # верхняя граница паузы при ошибках
+        self.max_log_bytes = 2 * 1024 * 1024  # храним только хвост лога упавшей джобы
+        self.max_green_history = 32  # сколько зелёных run помнить на workflow/ветку
         
     def detect_repo_name(self) -> Optional[str]:
         """Определяет имя GitHub репозитория"""
@@ -77,6 +88,7 @@ class GitHubMonitor(BaseWizard):
             return True
             
         self.monitoring = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(
             target=self.monitoring_loop,
             daemon=True
@@ -96,12 +108,18 @@ class GitHubMonitor(BaseWizard):
     def stop_monitoring(self) -> None:
         """Останавливает мониторинг"""
         self.monitoring = False
+        self._stop_event.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=10)
         self.print_info("GitHub мониторинг: остановлен")
     
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт остановки мониторинга до timeout секунд; True, если мониторинг остановлен"""
+        return self._stop_event.wait(timeout) or not self.monitoring
+    
     def monitoring_loop(self) -> None:
         """Основной цикл мониторинга"""
+        errors = 0
         while self.monitoring:
             try:
                 # Проверяем workflow runs (GitHub Actions)
@@ -112,13 +130,16 @@ class GitHubMonitor(BaseWizard):
                 
                 # Обновляем время последней проверки
                 self.last_check_time = time.time()
+                errors = 0
                 
-                # Ожидаем до следующей проверки
-                time.sleep(self.check_interval)
+                # Ожидаем до следующей проверки (stop_monitoring прерывает ожидание)
+                self._stop_event.wait(self.check_interval)
                 
             except Exception as e:
                 self.print_error(f"Ошибка в цикле мониторинга: {e}")
-                time.sleep(30)  # Пауза при ошибке
+                # Экспоненциальная пауза при повторяющихся ошибках
+                errors += 1
+                self._stop_event.wait(min(self.error_backoff_max, 30 * (2 ** (errors - 1))))
     
     def check_workflow_runs(self) -> None:
         """Проверяет workflow runs на наличие изменений"""
@@ -149,20 +170,50 @@ class GitHubMonitor(BaseWizard):
                     continue
                 status = run.get("status")
                 conclusion = run.get("conclusion")
+                self.record_green(run)
                 # Новые ранны: queued/in_progress — считаем стартом
                 if run_id not in self.seen_runs:
                     if status in ("queued", "in_progress") and not conclusion:
                         self.handle_workflow_event(run)
                     # Помечаем как увиденный, чтобы не слать историю
                     self.seen_runs.add(run_id)
-                # Детект завершения с ошибкой (emit один раз на факт фейла)
-                if str(conclusion).lower() in ("failure", "failed", "cancelled") and run_id not in self.seen_failures:
+                # Ключ попытки: rerun того же run — новая попытка с тем же id
+                attempt_key = self.run_attempt_key(run)
+                if conclusion and attempt_key not in self.seen_completed:
+                    self.seen_completed.add(attempt_key)
+                    self.notify_run_completed(run)
+                # Детект завершения с ошибкой (emit один раз на факт фейла каждой попытки)
+                if str(conclusion).lower() in ("failure", "failed", "cancelled") and attempt_key not in self.seen_failures:
                     self.handle_workflow_event(run)
-                    self.seen_failures.add(run_id)
+                    self.seen_failures.add(attempt_key)
                     
         except Exception as e:
             self.print_warning(f"Ошибка проверки workflow runs: {e}")
     
+    @staticmethod
+    def run_attempt_key(run: Dict) -> str:
+        """Ключ попытки run вида <run_id>:<run_attempt>"""
+        return f"{run.get('id')}:{run.get('run_attempt') or 1}"
+    
+    def notify_run_completed(self, run: Dict) -> None:
+        """Сообщает подписчикам о завершении попытки run (любой conclusion)"""
+        for listener in list(self.run_listeners):
+            try:
+                listener(run)
+            except Exception as e:
+                self.print_warning(f"Ошибка обработчика завершения run: {e}")
+    
+    def rerun_failed_jobs(self, run_id) -> bool:
+        """Перезапускает упавшие джобы run через GitHub API"""
+        if not self.repo_name:
+            return False
+        url = f"https://api.github.com/repos/{self.repo_name}/actions/runs/{run_id}/rerun-failed-jobs"
+        try:
+            response = requests.post(url, headers=self.get_headers(), timeout=10)
+            return response.status_code in (201, 204)
+        except Exception:
+            return False
+    
     def handle_workflow_event(self, run: Dict) -> None:
         """Обрабатывает событие workflow run"""
         status = run.get("status")
@@ -180,13 +231,25 @@ class GitHubMonitor(BaseWizard):
             "run_id": run["id"],
             "run_number": run["run_number"], 
             "workflow_name": run["name"],
+            "workflow_id": run.get("workflow_id"),
             "status": status,
             "conclusion": conclusion,
             "event_type": event_type,
             "html_url": run["html_url"],
-            "head_commit": run.get("head_commit", {})
+            "head_sha": run.get("head_sha"),
+            "head_commit": run.get("head_commit", {}),
+            "run_attempt": run.get("run_attempt") or 1,
         }
         
+        # Для упавших run подтягиваем упавшие джобы/шаги и хвосты их логов
+        if str(conclusion).lower() in ("failure", "failed"):
+            try:
+                event_data["failed_jobs"] = self.fetch_failed_jobs(run["id"])
+            except Exception as e:
+                self.print_warning(f"Не удалось получить джобы run #{run['run_number']}: {e}")
+            # База для локального диффа: последний успешный коммит того же workflow/ветки
+            event_data["last_green_sha"] = self.find_last_green_sha(run)
+        
         # Генерируем событие
         self.event_system.emit_simple(
             event_type=EventType.GITHUB_WORKFLOW_EVENT,
@@ -197,8 +260,101 @@ class GitHubMonitor(BaseWizard):
         # no debug prints on emit
 
     
+    @staticmethod
+    def green_key(run: Dict) -> Tuple[str, str]:
+        return str(run.get("workflow_id", run.get("name"))), str(run.get("head_branch") or "")
+
+    def record_green(self, run: Dict) -> None:
+        """Запоминает head_sha успешного run среди зелёных его workflow/ветки"""
+        if str(run.get("conclusion") or "").lower() != "success" or not run.get("head_sha"):
+            return
+        greens = self.last_green.setdefault(self.green_key(run), [])
+        entry = (int(run.get("run_number") or 0), run["head_sha"])
+        if entry not in greens:
+            greens.append(entry)
+            greens.sort()
+            del greens[:-self.max_green_history]
+
+    def _green_before(self, run: Dict) -> Optional[str]:
+        number = int(run.get("run_number") or 0)
+        older = [sha for green_number, sha in self.last_green.get(self.green_key(run), []) if green_number < number]
+        return older[-1] if older else None
+
+    def find_last_green_sha(self, run: Dict) -> Optional[str]:
+        """
+        Последний зелёный SHA того же workflow/ветки среди run старше упавшего
+
+        Более новый зелёный run (например, пуш после падения) базой диффа не
+        годится: он уже содержит исправление или вовсе другую историю.
+        """
+        known = self._green_before(run)
+        if known is not None:
+            return known
+        if not self.repo_name or not run.get("workflow_id"):
+            return None
+        url = f"https://api.github.com/repos/{self.repo_name}/actions/workflows/{run['workflow_id']}/runs"
+        params = {"status": "success", "per_page": 20}
+        if run.get("head_branch"):
+            params["branch"] = run["head_branch"]
+        try:
+            response = requests.get(url, headers=self.get_headers(), params=params, timeout=10)
+            if response.status_code != 200:
+                return None
+            for green in response.json().get("workflow_runs", []):
+                self.record_green(green)
+        except Exception:
+            return None
+        return self._green_before(run)
+    
+    def fetch_failed_jobs(self, run_id) -> List[Dict]:
+        """
+        Возвращает упавшие джобы run: имя, упавшие шаги и хвост лога
+        
+        Returns:
+            List[Dict]: [{"id", "name", "failed_steps": [...], "log": str}]
+        """
+        if not self.repo_name:
+            return []
+        url = f"https://api.github.com/repos/{self.repo_name}/actions/runs/{run_id}/jobs"
+        response = requests.get(url, headers=self.get_headers(), params={"per_page": 50}, timeout=10)
+        if response.status_code != 200:
+            return []
+        
+        failed = []
+        for job in response.json().get("jobs", []):
+            if str(job.get("conclusion")).lower() not in ("failure", "failed"):
+                continue
+            failed.append({
+                "id": job.get("id"),
+                "name": job.get("name", ""),
+                "failed_steps": [
+                    step.get("name", "") for step in job.get("steps", [])
+                    if str(step.get("conclusion")).lower() in ("failure", "failed")
+                ],
+                "log": self.fetch_job_log(job.get("id")),
+            })
+        return failed
+    
+    def fetch_job_log(self, job_id) -> str:
+        """Скачивает лог джобы, оставляя последние max_log_bytes байт"""
+        if not self.repo_name or not job_id:
+            return ""
+        url = f"https://api.github.com/repos/{self.repo_name}/actions/jobs/{job_id}/logs"
+        try:
+            with requests.get(url, headers=self.get_headers(), timeout=30, stream=True) as response:
+                if response.status_code != 200:
+                    return ""
+                tail = bytearray()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    tail += chunk
+                    if len(tail) > 2 * self.max_log_bytes:
+                        del tail[:-self.max_log_bytes]
+                return bytes(tail[-self.max_log_bytes:]).decode("utf-8", errors="replace")
+        except Exception:
+            return ""
+    
     def check_pull_requests(self) -> None:
-        """Проверяет новые pull requests"""
+        """Проверяет новые pull requests и новые пуши в открытые PR"""
         if not self.repo_name:
             return
             
@@ -208,9 +364,9 @@ class GitHubMonitor(BaseWizard):
             url = f"https://api.github.com/repos/{self.repo_name}/pulls"
             params = {
                 "state": "open",
-                "sort": "created",
+                "sort": "updated",
                 "direction": "desc",
-                "per_page": 5
+                "per_page": 10
             }
             
             response = requests.get(url, headers=headers, params=params, timeout=10)
@@ -220,29 +376,90 @@ class GitHubMonitor(BaseWizard):
             data = response.json()
             
             for pr in data:
-                pr_created = pr["created_at"]
+                pr_number = pr["number"]
+                head_sha = (pr.get("head") or {}).get("sha", "")
+                known_head = self.pr_heads.get(pr_number)
+                self.pr_heads[pr_number] = head_sha
                 
-                # Проверяем только недавно созданные PR
-                # (простая проверка по времени)
-                if self.is_recent_pr(pr_created):
-                    event_data = {
-                        "pr_number": pr["number"],
-                        "pr_title": pr["title"],
-                        "pr_url": pr["html_url"],
-                        "author": pr["user"]["login"],
-                        "created_at": pr_created
-                    }
-                    
-                    self.event_system.emit_simple(
-                        event_type=EventType.GITHUB_PR_CREATED,
-                        data=event_data,
-                        source="github_monitor",
-                        priority=2
-                    )
+                if known_head is None:
+                    # Впервые видим PR: событие только для недавно созданных (не шлём историю)
+                    if not self.is_recent_pr(pr["created_at"]):
+                        continue
+                    event_type = EventType.GITHUB_PR_CREATED
+                elif known_head != head_sha:
+                    # Новый пуш в уже известный PR
+                    event_type = EventType.GITHUB_PR_UPDATED
+                else:
+                    continue
+                
+                event_data = {
+                    "pr_number": pr_number,
+                    "pr_title": pr["title"],
+                    "pr_url": pr["html_url"],
+                    "author": pr["user"]["login"],
+                    "created_at": pr["created_at"],
+                    "head_sha": head_sha,
+                    "previous_head_sha": known_head,
+                    "base_ref": (pr.get("base") or {}).get("ref", ""),
+                    "base_sha": (pr.get("base") or {}).get("sha", ""),
+                    "body": pr.get("body") or "",
+                }
+                
+                self.event_system.emit_simple(
+                    event_type=event_type,
+                    data=event_data,
+                    source="github_monitor",
+                    priority=2
+                )
                     
         except Exception as e:
             self.print_warning(f"Ошибка проверки PR: {e}")
     
+    def fetch_pr_files(self, pr_number: int, max_pages: int = 10) -> Optional[List[Dict]]:
+        """
+        Все изменённые файлы PR с патчами (полный дифф относительно базы)
+        
+        Returns:
+            List[Dict]: [{"filename", "status", "additions", "deletions", "patch"}] или None при ошибке
+        """
+        if not self.repo_name:
+            return None
+        url = f"https://api.github.com/repos/{self.repo_name}/pulls/{pr_number}/files"
+        files: List[Dict] = []
+        for page in range(1, max_pages + 1):
+            response = requests.get(url, headers=self.get_headers(),
+                                    params={"per_page": 100, "page": page}, timeout=15)
+            if response.status_code != 200:
+                return files or None
+            batch = response.json()
+            files.extend(batch)
+            if len(batch) < 100:
+                break
+        return files
+    
+    def fetch_compare(self, base_sha: str, head_sha: str) -> Optional[Dict]:
+        """
+        Дифф между двумя коммитами (compare API)
+        
+        Returns:
+            Dict: {"status": ahead|behind|diverged|identical, "files": [...], "commits": [...]} или None
+        """
+        if not self.repo_name or not base_sha or not head_sha:
+            return None
+        url = f"https://api.github.com/repos/{self.repo_name}/compare/{base_sha}...{head_sha}"
+        response = requests.get(url, headers=self.get_headers(), timeout=20)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        return {
+            "status": data.get("status", ""),
+            "files": data.get("files") or [],
+            "commits": [
+                {"sha": c.get("sha", ""), "message": ((c.get("commit") or {}).get("message") or "").split("\n", 1)[0]}
+                for c in data.get("commits") or []
+            ],
+        }
+    
     def is_recent_pr(self, created_at: str) -> bool:
         """Проверяет, является ли PR недавно созданным"""
         try:
@@ -406,7 +623,10 @@ class GitHubMonitor(BaseWizard):
             run_id = str(run.get("id"))
             if run_id:
                 self.seen_runs.add(run_id)
+                self.record_green(run)
                 conclusion = str(run.get("conclusion") or "").lower()
+                if conclusion:
+                    self.seen_completed.add(self.run_attempt_key(run))
                 if conclusion in ("failure", "failed", "cancelled"):
                     # Не слать событий на старые фейлы
-                    self.seen_failures.add(run_id)
\ No newline at end of file
+                    self.seen_failures.add(self.run_attempt_key(run))
\ No newline at end of file
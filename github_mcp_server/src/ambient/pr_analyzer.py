@@ -0,0 +1,205 @@
+"""
+📋 PR Analyzer - инкрементальное ревью pull request
+
+Для каждого PR запоминается head SHA последнего ревью и краткое резюме.
+При новом пуше анализируется только дифф с прошлого ревью (compare API) —
+вместе с резюме, а не весь PR заново. Большие диффы режутся по файлам на
+части, части ревьюятся параллельно в отдельных диалогах cursor-agent
+(ограниченный пул), а итог сводится одним запросом в общую сессию.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from ..core.base_wizard import BaseWizard
+from ..core.session_manager import AMBIENT_PR
+from .event_system import Event
+from .prompt_budget import estimate_tokens
+from .single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from .agent_injector import AgentInjector
+    from .github_monitor import GitHubMonitor
+    from .prompt_generator import PromptGenerator
+
+_SUMMARY_MARKERS = ("РЕЗЮМЕ:", "Резюме:", "SUMMARY:", "Summary:")
+
+
+def extract_pr_summary(answer: str, max_chars: int = 1500) -> str:
+    """Раздел `РЕЗЮМЕ:` из ответа агента (или начало ответа, если раздела нет)"""
+    text = answer or ""
+    for marker in _SUMMARY_MARKERS:
+        pos = text.rfind(marker)
+        if pos >= 0:
+            return text[pos + len(marker):].strip(" *`\n")[:max_chars]
+    return text.strip()[:max_chars]
+
+
+class PRReviewStore:
+    """Персистентное состояние ревью: PR → head SHA последнего ревью и резюме"""
+
+    def __init__(self, path: Path, max_entries: int = 500):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(self, pr_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(str(pr_number))
+            return dict(entry) if entry else None
+
+    def put(self, pr_number: int, head_sha: str, summary: str) -> None:
+        with self._lock:
+            self._entries[str(pr_number)] = {
+                "head_sha": head_sha,
+                "summary": summary,
+                "updated_at": time.time(),
+            }
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries.items(), key=lambda kv: kv[1].get("updated_at", 0))
+                for key, _ in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[key]
+            self._save()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = dict(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+class PRAnalyzer(BaseWizard):
+    """Инкрементальный анализ PR: дифф с прошлого ревью, параллельные части, итоговая сводка"""
+
+    def __init__(self,
+                 github: "GitHubMonitor",
+                 prompt_generator: "PromptGenerator",
+                 agent_injector: "AgentInjector",
+                 store: PRReviewStore,
+                 max_workers: int = 3,
+                 chunk_tokens: int = 4000):
+        """
+        Args:
+            github: Монитор GitHub (запросы к API PR/compare)
+            prompt_generator: Генератор промптов
+            agent_injector: Инжектор промптов в cursor-agent
+            store: Хранилище состояния ревью
+            max_workers: Сколько частей большого диффа анализировать одновременно
+            chunk_tokens: Бюджет одной части диффа (по оценке токенов)
+        """
+        super().__init__()
+        self.github = github
+        self.prompt_generator = prompt_generator
+        self.agent_injector = agent_injector
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.chunk_tokens = chunk_tokens
+        self.single_flight = SingleFlight(result_ttl=0)
+
+    def analyze(self, event: Event) -> str:
+        """Ревью PR из события GITHUB_PR_CREATED/GITHUB_PR_UPDATED; возвращает ответ ('' если нечего делать)"""
+        pr_number = event.data.get("pr_number")
+        head_sha = event.data.get("head_sha") or ""
+        if pr_number is None or not head_sha:
+            return ""
+        answer, shared = self.single_flight.do((pr_number, head_sha), lambda: self._analyze(event))
+        return "" if shared else answer
+
+    def _analyze(self, event: Event) -> str:
+        data = dict(event.data)
+        pr_number, head_sha = data["pr_number"], data["head_sha"]
+        previous = self.store.get(pr_number)
+        if previous and previous.get("head_sha") == head_sha:
+            self.print_info(f"📋 PR #{pr_number} уже проанализирован на {head_sha[:7]}")
+            return ""
+
+        files = self._collect_diff(data, previous)
+        if not files:
+            self.print_info(f"📋 PR #{pr_number}: новых изменений в файлах нет")
+            if previous:
+                self.store.put(pr_number, head_sha, previous.get("summary", ""))
+            return ""
+        data["pr_files"] = files
+
+        chunks = self.split_files(files)
+        if len(chunks) <= 1:
+            prompt = self.prompt_generator.generate_pr_analysis_prompt(replace(event, data=data))
+        else:
+            self.print_info(f"📋 PR #{pr_number}: дифф разбит на {len(chunks)} частей")
+            reviews = self._review_chunks(data, chunks)
+            prompt = self.prompt_generator.generate_pr_synthesis_prompt(data, reviews)
+
+        answer = self.agent_injector.send_prompt(prompt, session=AMBIENT_PR)
+        if answer:
+            self.store.put(pr_number, head_sha, extract_pr_summary(answer))
+        return answer
+
+    def _collect_diff(self, data: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Файлы для ревью: дифф с прошлого ревью или весь PR (первое ревью / force-push)"""
+        since = (previous or {}).get("head_sha")
+        if previous and previous.get("summary"):
+            data["previous_summary"] = previous["summary"]
+        if since:
+            compare = self.github.fetch_compare(since, data["head_sha"])
+            if compare is not None and compare["status"] in ("ahead", "identical"):
+                data["since_sha"] = since
+                data["new_commits"] = compare["commits"]
+                return compare["files"]
+            # Прошлый head недостижим или ветка переписана — смотрим весь PR
+            data["force_pushed"] = True
+        return self.github.fetch_pr_files(data["pr_number"]) or []
+
+    def split_files(self, files: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Режет файлы на части по бюджету токенов (порядок файлов сохраняется)"""
+        total = sum(estimate_tokens(f.get("patch") or "") for f in files)
+        if total <= self.prompt_generator.token_budget * 3 // 4:
+            return [files]
+        chunks: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        size = 0
+        for f in files:
+            cost = estimate_tokens(f.get("patch") or "") + 30
+            if current and size + cost > self.chunk_tokens:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(f)
+            size += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _review_chunks(self, data: Dict[str, Any], chunks: List[List[Dict[str, Any]]]) -> List[str]:
+        """
+        Параллельное ревью частей в отдельных диалогах (общая сессия не затрагивается)
+
+        Каждая часть — отдельный вызов класса AMBIENT: N частей тратят N токенов
+        его бюджета (по умолчанию 30 в минуту, подряд не больше 5), части сверх
+        этого ждут в планировщике. Для больших PR поднимите
+        CURSOR_AGENT_BURST_AMBIENT.
+        """
+        total = len(chunks)
+        prompts = [
+            self.prompt_generator.generate_pr_chunk_prompt(data, chunk, i, total, budget=self.chunk_tokens + 500)
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, total), thread_name_prefix="pr-review") as pool:
+            return list(pool.map(self.agent_injector.send_prompt_detached, prompts))
@@ -0,0 +1,270 @@
+"""
+📏 Prompt Budget - сборка промпта в пределах бюджета токенов
+
+Логи CI могут быть огромными, а промпт cursor-agent — нет. Модуль:
+- быстро оценивает число токенов без токенизатора;
+- за один потоковый проход по логу вырезает окна вокруг маркеров ошибок
+  (gtest `[  FAILED  ]`, компилятор `error:`, отчёты санитайзеров) плюс
+  ограниченный хвост лога;
+- ранжирует секции по релевантности и жадно укладывает их в бюджет.
+
+Результат детерминирован (одинаковый вход → одинаковый промпт), чтобы не
+ломать кэширование анализов.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, List, Optional, Sequence, Set, Tuple
+
+_GH_TIMESTAMP_RE = re.compile(r"^(?:\ufeff)?\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?Z ?")
+
+# Маркеры ошибок и их вес в ранжировании (один проход одним регулярным выражением)
+_MARKER_WEIGHTS = {
+    "sanitizer": 5,
+    "gtest_failed": 4,
+    "compiler": 3,
+    "crash": 3,
+    "assertion": 2,
+}
+_MARKER_RE = re.compile(
+    r"(?P<sanitizer>==\d+==\s*(?:ERROR|WARNING): \w*Sanitizer|WARNING: ThreadSanitizer|"
+    r"SUMMARY: \w*Sanitizer|runtime error:)"
+    r"|(?P<gtest_failed>\[\s*FAILED\s*\])"
+    r"|(?P<compiler>\b(?:fatal )?error:|undefined reference to|ld returned \d+ exit status)"
+    r"|(?P<crash>Segmentation fault|terminate called|Aborted \(core dumped\)|\bSIGSEGV\b|\bSIGABRT\b)"
+    r"|(?P<assertion>: Failure$|Assertion [`'].*failed|Expected equality of these values)"
+)
+_FAILED_TEST_RE = re.compile(r"\[\s*FAILED\s*\] ([\w/]+\.[\w/]+)")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Быстрая локальная оценка числа токенов
+
+    ~4 символа ASCII на токен и ~2 символа на токен для не-ASCII (кириллица,
+    эмодзи). Считается через длину UTF-8 представления — один проход в C.
+    """
+    if not text:
+        return 0
+    chars = len(text)
+    extra_bytes = len(text.encode("utf-8")) - chars
+    non_ascii = min(chars, extra_bytes)
+    return (chars - non_ascii + 3) // 4 + (non_ascii + 1) // 2
+
+
+@dataclass
+class LogExcerpt:
+    """Окно строк лога вокруг одного или нескольких маркеров ошибок"""
+    start: int
+    end: int
+    lines: List[str] = field(default_factory=list)
+    kinds: Set[str] = field(default_factory=set)
+    markers: int = 0
+    score: float = 0.0
+
+    def append(self, lineno: int, line: str) -> None:
+        self.lines.append(line)
+        self.end = lineno
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+@dataclass
+class LogDigest:
+    """Результат разбора лога: выдержки вокруг ошибок, хвост и упавшие тесты"""
+    excerpts: List[LogExcerpt]
+    tail: List[str]
+    tail_start: int
+    failed_tests: List[str]
+    total_lines: int
+
+
+def extract_log_excerpts(lines: Iterable[str],
+                         before: int = 3,
+                         after: int = 8,
+                         tail_lines: int = 40,
+                         max_excerpts: int = 64,
+                         max_excerpt_lines: int = 80) -> LogDigest:
+    """
+    Вырезает окна вокруг маркеров ошибок за один проход по строкам
+
+    Args:
+        lines: Строки лога (можно генератор/файл — читается потоково)
+        before: Строк контекста до маркера
+        after: Строк контекста после маркера (пересекающиеся окна сливаются)
+        tail_lines: Сколько последних строк лога сохранить отдельно
+        max_excerpts: Максимум выдержек (остальные маркеры только учитываются в тестах)
+        max_excerpt_lines: Ограничение длины одной выдержки
+    """
+    previous: Deque[Tuple[int, str]] = deque(maxlen=before)
+    tail: Deque[Tuple[int, str]] = deque(maxlen=tail_lines)
+    excerpts: List[LogExcerpt] = []
+    failed_tests: List[str] = []
+    seen_tests: Set[str] = set()
+    current: Optional[LogExcerpt] = None
+    remaining = 0
+    lineno = 0
+
+    for raw in lines:
+        lineno += 1
+        line = _GH_TIMESTAMP_RE.sub("", raw.rstrip("\r\n"))
+        tail.append((lineno, line))
+        match = _MARKER_RE.search(line)
+
+        if match:
+            kind = match.lastgroup or "assertion"
+            if kind == "gtest_failed":
+                test = _FAILED_TEST_RE.search(line)
+                if test and test.group(1) not in seen_tests:
+                    seen_tests.add(test.group(1))
+                    failed_tests.append(test.group(1))
+            if current is not None and lineno - current.end <= before + 1:
+                # Окна пересекаются или соприкасаются — сливаем
+                for n, prev in previous:
+                    if n > current.end:
+                        current.append(n, prev)
+                current.append(lineno, line)
+            elif len(excerpts) < max_excerpts:
+                last_end = excerpts[-1].end if excerpts else 0
+                context = [(n, prev) for n, prev in previous if n > last_end]
+                current = LogExcerpt(start=context[0][0] if context else lineno, end=lineno,
+                                     lines=[prev for _, prev in context] + [line])
+                excerpts.append(current)
+            else:
+                current = None
+            if current is not None:
+                current.kinds.add(kind)
+                current.markers += 1
+                remaining = after
+                if len(current.lines) >= max_excerpt_lines:
+                    current, remaining = None, 0
+        elif current is not None and remaining > 0:
+            current.append(lineno, line)
+            remaining -= 1
+            if len(current.lines) >= max_excerpt_lines:
+                remaining = 0
+        previous.append((lineno, line))
+
+    # Хвост без строк, уже попавших в выдержки
+    last_covered = excerpts[-1].end if excerpts else 0
+    tail_items = [(n, l) for n, l in tail if n > last_covered]
+    digest = LogDigest(
+        excerpts=excerpts,
+        tail=[l for _, l in tail_items],
+        tail_start=tail_items[0][0] if tail_items else lineno + 1,
+        failed_tests=failed_tests,
+        total_lines=lineno,
+    )
+    rank_excerpts(digest.excerpts, failed_tests)
+    return digest
+
+
+def rank_excerpts(excerpts: Sequence[LogExcerpt], failed_tests: Sequence[str] = (),
+                  mentioned_files: Sequence[str] = ()) -> None:
+    """
+    Проставляет score выдержкам: вес самого серьёзного маркера, число маркеров,
+    упоминания упавших тестов и файлов из диффа
+    """
+    test_names = [t.split(".")[-1] for t in failed_tests]
+    for excerpt in excerpts:
+        text = excerpt.text
+        score = float(max((_MARKER_WEIGHTS.get(k, 1) for k in excerpt.kinds), default=0))
+        score += min(3.0, 0.5 * (excerpt.markers - 1))
+        if any(name and name in text for name in test_names):
+            score += 1.0
+        if any(path and path in text for path in mentioned_files):
+            score += 1.5
+        excerpt.score = score
+
+
+@dataclass
+class PromptSection:
+    """Секция промпта"""
+    title: str
+    body: str
+    score: float = 0.0
+    required: bool = False
+    order: int = 0
+    code: bool = False
+
+    def render(self, body: Optional[str] = None) -> str:
+        body = self.body if body is None else body
+        if not self.title:
+            return body
+        if not body:
+            return self.title
+        if self.code:
+            return f"{self.title}\n```\n{body}\n```"
+        return f"{self.title}\n{body}"
+
+
+class PromptAssembler:
+    """Жадная сборка промпта из секций в пределах бюджета токенов"""
+
+    truncation_note = "… (обрезано по бюджету)"
+
+    def __init__(self, budget_tokens: int = 6000, min_section_tokens: int = 60):
+        """
+        Args:
+            budget_tokens: Максимальный размер промпта в токенах (оценка)
+            min_section_tokens: Не вставлять обрезанную секцию меньше этого размера
+        """
+        self.budget_tokens = budget_tokens
+        self.min_section_tokens = min_section_tokens
+        self.sections: List[PromptSection] = []
+
+    def add(self, title: str, body: str, score: float = 0.0, required: bool = False, code: bool = False) -> None:
+        if not body and not title:
+            return
+        self.sections.append(PromptSection(title=title, body=body, score=score, required=required,
+                                           order=len(self.sections), code=code))
+
+    def build(self) -> str:
+        """Собирает промпт: обязательные секции + лучшие по score, в исходном порядке"""
+        separator_tokens = 1
+        chosen: List[Tuple[int, str]] = []
+        used = 0
+        for section in self.sections:
+            if section.required:
+                text = section.render()
+                chosen.append((section.order, text))
+                used += estimate_tokens(text) + separator_tokens
+
+        optional = sorted((s for s in self.sections if not s.required), key=lambda s: (-s.score, s.order))
+        for section in optional:
+            left = self.budget_tokens - used
+            if left < self.min_section_tokens:
+                break
+            text = section.render()
+            cost = estimate_tokens(text) + separator_tokens
+            if cost > left:
+                text = self._truncate(section, left - separator_tokens)
+                if text is None:
+                    continue
+                cost = estimate_tokens(text) + separator_tokens
+            chosen.append((section.order, text))
+            used += cost
+
+        chosen.sort(key=lambda item: item[0])
+        return "\n\n".join(text for _, text in chosen)
+
+    def _truncate(self, section: PromptSection, tokens: int) -> Optional[str]:
+        """Оставляет начало секции построчно, пока помещается в tokens"""
+        if tokens < self.min_section_tokens:
+            return None
+        overhead = estimate_tokens(section.render("")) + estimate_tokens(self.truncation_note) + 1
+        kept: List[str] = []
+        size = overhead
+        for line in section.body.split("\n"):
+            cost = estimate_tokens(line) + 1
+            if size + cost > tokens:
+                break
+            kept.append(line)
+            size += cost
+        if not kept:
+            return None
+        kept.append(self.truncation_note)
+        return section.render("\n".join(kept))
@@ -5,8 +5,9 @@
 Все остальные типы событий возвращают пустую строку.
 """
 
+import re
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import sys
 from pathlib import Path
 
@@ -14,45 +15,274 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from ..core.base_wizard import BaseWizard
 from .event_system import Event, EventType
+from .prompt_budget import LogDigest, PromptAssembler, extract_log_excerpts, rank_excerpts
+from .git_context import GitContextProvider, GitDiffContext
+
+_BATCH_MARKER_RE = re.compile(r"^\s*[#*`]*\s*=+\s*RUN\s+#?([\w.-]+)\s*=+\s*[*`]*\s*$")
 
 class PromptGenerator(BaseWizard):
     """Генератор промптов: только для упавших workflow."""
+
+    def __init__(self, token_budget: int = 6000, tail_lines: int = 40,
+                 git_context: Optional[GitContextProvider] = None):
+        """
+        Args:
+            token_budget: Бюджет промпта в токенах (оценка), логи режутся под него
+            tail_lines: Сколько последних строк лога каждой джобы предлагать в промпт
+            git_context: Провайдер локального диффа (None — без диффа в промпте)
+        """
+        self.token_budget = token_budget
+        self.tail_lines = tail_lines
+        self.git_context = git_context
     
     def generate_prompt(self, event: Event) -> str:
         """Возвращает текст промпта или пустую строку, если промпт не нужен."""
+        if event.type in (EventType.GITHUB_PR_CREATED, EventType.GITHUB_PR_UPDATED):
+            return self.generate_pr_analysis_prompt(event)
         if event.type != EventType.GITHUB_WORKFLOW_EVENT:
             return ""
         return self.generate_workflow_event_prompt(event)
     
+    @staticmethod
+    def needs_analysis(event: Event) -> bool:
+        """Нужен ли анализ: только упавший workflow (дёшево, без сборки промпта)."""
+        if event.type != EventType.GITHUB_WORKFLOW_EVENT:
+            return False
+        conclusion = str(event.data.get("conclusion") or "").lower()
+        return conclusion in ("failure", "failed", "cancelled")
+
     def generate_workflow_event_prompt(self, event: Event) -> str:
         """Промпт ТОЛЬКО для упавших workflow (conclusion == failure)."""
+        if not self.needs_analysis(event):
+            return ""
         data = event.data
-        conclusion = str(data.get("conclusion") or "").lower()
-        if conclusion not in ("failure", "failed", "cancelled"):
+
+        assembler = PromptAssembler(self.token_budget)
+        self.add_workflow_sections(assembler, data)
+        assembler.add("", "Задача: определи причину падения и предложи исправления.", required=True)
+        return assembler.build()
+
+    def generate_batch_prompt(self, events: List[Event]) -> str:
+        """
+        Один промпт для нескольких упавших workflow
+
+        Каждое падение получает свою секцию и равную долю бюджета токенов.
+        Ответ просим разметить маркерами `=== RUN <run_id> ===`, чтобы
+        разделить его обратно по run (см. split_batch_answer).
+        """
+        if not events:
             return ""
+        share = max(self.token_budget // len(events), 200)
+        sections = []
+        for event in events:
+            assembler = PromptAssembler(share)
+            self.add_workflow_sections(assembler, event.data)
+            sections.append(f"=== RUN {self.batch_run_id(event.data)} ===\n{assembler.build()}")
+        run_ids = ", ".join(self.batch_run_id(e.data) for e in events)
+        return (
+            f"🛠️ Несколько сборок упали почти одновременно ({len(events)}): {run_ids}\n\n"
+            + "\n\n".join(sections)
+            + "\n\nЗадача: для КАЖДОГО run определи причину падения и предложи исправления. "
+            "Если причина общая — скажи об этом. Начни ответ по каждому run отдельной строкой "
+            "`=== RUN <run_id> ===` (в том же порядке), без других вариантов разметки."
+        )
+
+    @staticmethod
+    def batch_run_id(data: Dict[str, Any]) -> str:
+        """Идентификатор run в пакетном промпте"""
+        return str(data.get("run_id") or data.get("run_number") or "?")
+
+    @staticmethod
+    def split_batch_answer(answer: str, run_ids: List[str]) -> Dict[str, str]:
+        """
+        Делит ответ на пакетный промпт по маркерам `=== RUN <run_id> ===`
+
+        Returns:
+            Dict[str, str]: run_id -> ответ; пустой словарь, если разметка не найдена
+        """
+        wanted = set(run_ids)
+        parts: Dict[str, List[str]] = {}
+        current = None
+        for line in (answer or "").splitlines():
+            match = _BATCH_MARKER_RE.match(line)
+            if match and match.group(1) in wanted:
+                current = match.group(1)
+                parts.setdefault(current, [])
+                continue
+            if current is not None:
+                parts[current].append(line)
+        return {run_id: "\n".join(lines).strip() for run_id, lines in parts.items() if "\n".join(lines).strip()}
 
+    def add_workflow_sections(self, assembler: PromptAssembler, data: Dict[str, Any]) -> None:
+        """Заголовок упавшего workflow и выдержки из логов его джоб"""
         workflow_name = data.get("workflow_name", "Unknown")
         run_number = data.get("run_number", "?")
         html_url = data.get("html_url", "")
         head = data.get("head_commit", {}) or {}
         commit_author = (head.get("author") or {}).get("name") or head.get("author", "?")
         commit_message = head.get("message", "")
-        commit_sha = head.get("id", "")[:7]
+        commit_sha = (head.get("id") or data.get("head_sha") or "")[:7]
 
-        return (
+        assembler.add("", (
             "🛠️ Сборка/тесты упали\n\n"
             f"Workflow: {workflow_name} (Run #{run_number})\n"
             f"URL: {html_url}\n\n"
             "Последний коммит:\n"
             f"- Автор: {commit_author}\n"
             f"- Сообщение: {commit_message}\n"
-            f"- SHA: {commit_sha}\n\n"
-            "Задача: определи причину падения и предложи исправления."
-        )
+            f"- SHA: {commit_sha}"
+        ), required=True)
+        digests = [
+            (job, extract_log_excerpts(job["log"].splitlines(), tail_lines=self.tail_lines))
+            for job in data.get("failed_jobs") or [] if job.get("log")
+        ]
+        git_context = self.load_git_context(data, digests)
+        changed_files = [path for path, _, _ in git_context.stats] if git_context else []
+        self.add_failed_job_sections(assembler, digests, changed_files)
+        if git_context is not None:
+            self.add_git_sections(assembler, git_context)
+
+    def add_failed_job_sections(self, assembler: PromptAssembler, digests: List[Tuple[Dict[str, Any], LogDigest]],
+                                changed_files: List[str] = ()) -> None:
+        """Добавляет выдержки из логов упавших джоб как секции с приоритетом по релевантности"""
+        for job, digest in digests:
+            name = job.get("name", "?")
+            steps = ", ".join(job.get("failed_steps") or [])
+            if changed_files:
+                # Выдержки, где упомянуты изменённые файлы, поднимаются выше
+                rank_excerpts(digest.excerpts, digest.failed_tests, changed_files)
+            header = f"Джоба: {name}" + (f" (шаги: {steps})" if steps else "")
+            if digest.failed_tests:
+                header += "\nУпавшие тесты: " + ", ".join(digest.failed_tests[:20])
+            assembler.add(header, "", score=100.0)
+            for excerpt in digest.excerpts:
+                assembler.add(f"Фрагмент лога {name}, строки {excerpt.start}-{excerpt.end}:",
+                              excerpt.text, score=excerpt.score, code=True)
+            if digest.tail:
+                # Хвост полезен, если маркеров не нашлось, иначе уступает выдержкам
+                tail_score = 0.5 if digest.excerpts else 10.0
+                assembler.add(f"Конец лога {name} (с строки {digest.tail_start} из {digest.total_lines}):",
+                              "\n".join(digest.tail), score=tail_score, code=True)
+
+    def load_git_context(self, data: Dict[str, Any],
+                         digests: List[Tuple[Dict[str, Any], LogDigest]]) -> Optional[GitDiffContext]:
+        """Локальный дифф «последний зелёный → упавший» (None без git_context или SHA)"""
+        head = data.get("head_commit") or {}
+        bad_sha = data.get("head_sha") or head.get("id")
+        good_sha = data.get("last_green_sha")
+        if self.git_context is None or not bad_sha or not good_sha or good_sha == bad_sha:
+            return None
+        texts = [excerpt.text for _, digest in digests for excerpt in digest.excerpts]
+        tests = [test for _, digest in digests for test in digest.failed_tests]
+        try:
+            return self.git_context.diff_context(good_sha, bad_sha, texts, tests)
+        except Exception as e:
+            self.print_warning(f"Не удалось построить дифф {good_sha[:7]}..{bad_sha[:7]}: {e}")
+            return None
+
+    def add_git_sections(self, assembler: PromptAssembler, context: GitDiffContext) -> None:
+        """Коммиты, diff stat и ранжированные ханки между последним зелёным и упавшим коммитом"""
+        commits = "\n".join(f"- {c.sha[:7]} {c.author}: {c.subject}" for c in context.commits[:30])
+        if len(context.commits) > 30 or context.truncated:
+            commits += "\n- …"
+        assembler.add(f"Коммиты после последнего зелёного ({context.good_sha[:7]}..{context.bad_sha[:7]}):",
+                      commits or "- (нет)", score=20.0)
+        stats = "\n".join(f"{path} | +{added} -{removed}" for path, added, removed in context.stats[:50])
+        if stats:
+            assembler.add("Изменённые файлы:", stats, score=15.0, code=True)
+        for hunk in context.hunks:
+            assembler.add(f"Дифф {hunk.path} (строка {hunk.new_start}):", hunk.text, score=hunk.score, code=True)
     
-    # Остальные генераторы больше не используются. Возвращаем пустые строки.
     def generate_pr_analysis_prompt(self, event: Event) -> str:
-        return ""
+        """
+        Промпт ревью PR: только дифф с прошлого анализа плюс сохранённое резюме
+
+        Ожидает в event.data поле pr_files (файлы с патчами); без него — пустая строка.
+        """
+        data = event.data
+        files = data.get("pr_files")
+        if not files:
+            return ""
+        assembler = PromptAssembler(self.token_budget)
+        self.add_pr_header(assembler, data)
+        self.add_pr_file_sections(assembler, files)
+        assembler.add("", self.pr_task(data), required=True)
+        return assembler.build()
+
+    def generate_pr_chunk_prompt(self, data: Dict[str, Any], files: List[Dict[str, Any]],
+                                 index: int, total: int, budget: Optional[int] = None) -> str:
+        """Промпт ревью одной части большого диффа PR (анализируется в отдельном диалоге)"""
+        assembler = PromptAssembler(budget or self.token_budget)
+        assembler.add("", (
+            f"📋 Ревью PR #{data.get('pr_number', '?')}: {data.get('pr_title', '')}\n"
+            f"Часть {index} из {total} диффа (только перечисленные файлы)."
+        ), required=True)
+        self.add_pr_file_sections(assembler, files)
+        assembler.add("", (
+            "Задача: кратко перечисли проблемы в этих файлах (баги, гонки, UB, утечки, "
+            "регрессии производительности, недостающие тесты) со ссылками на файл и строку. "
+            "Если проблем нет — так и напиши."
+        ), required=True)
+        return assembler.build()
+
+    def generate_pr_synthesis_prompt(self, data: Dict[str, Any], reviews: List[str]) -> str:
+        """Итоговый промпт: сводит ревью частей диффа и прошлое резюме в один ответ"""
+        assembler = PromptAssembler(self.token_budget)
+        self.add_pr_header(assembler, data)
+        for i, review in enumerate(reviews, 1):
+            assembler.add(f"Ревью части {i} из {len(reviews)}:", review or "(нет ответа)", score=float(len(reviews) - i + 1))
+        assembler.add("", self.pr_task(data), required=True)
+        return assembler.build()
+
+    def add_pr_header(self, assembler: PromptAssembler, data: Dict[str, Any]) -> None:
+        """Заголовок PR, новые коммиты и резюме прошлого ревью"""
+        since = data.get("since_sha") or ""
+        scope = (f"Изменения с прошлого ревью ({since[:7]}..{str(data.get('head_sha', ''))[:7]})"
+                 if since else "Полный дифф PR")
+        header = (
+            f"📋 Pull Request #{data.get('pr_number', '?')}: {data.get('pr_title', '')}\n"
+            f"Автор: {data.get('author', '?')}\n"
+            f"URL: {data.get('pr_url', '')}\n"
+            f"Ветка: → {data.get('base_ref', '')}\n"
+            f"{scope}"
+        )
+        if data.get("force_pushed"):
+            header += "\n⚠️ История ветки переписана (force-push) — дифф взят целиком"
+        assembler.add("", header, required=True)
+        commits = data.get("new_commits") or []
+        if commits:
+            assembler.add("Новые коммиты:", "\n".join(f"- {c['sha'][:7]} {c['message']}" for c in commits[:30]),
+                          score=50.0)
+        if data.get("previous_summary"):
+            assembler.add("Резюме прошлого ревью:", data["previous_summary"], score=60.0)
+        elif data.get("body"):
+            assembler.add("Описание PR:", data["body"][:3000], score=40.0)
+
+    def add_pr_file_sections(self, assembler: PromptAssembler, files: List[Dict[str, Any]]) -> None:
+        """Патчи файлов PR; исходники важнее тестов, тесты важнее прочего"""
+        for f in files:
+            name = f.get("filename", "?")
+            title = f"Файл {name} ({f.get('status', 'modified')}, +{f.get('additions', 0)} -{f.get('deletions', 0)}):"
+            patch = f.get("patch")
+            if not patch:
+                assembler.add(title, "(патч недоступен: бинарный или слишком большой файл)", score=0.5)
+                continue
+            if name.endswith((".cpp", ".cc", ".h", ".hpp", ".py")):
+                score = 2.0 if not name.startswith("tests") else 1.5
+            else:
+                score = 1.0
+            assembler.add(title, patch, score=score, code=True)
+
+    @staticmethod
+    def pr_task(data: Dict[str, Any]) -> str:
+        incremental = "только новые изменения (с учётом резюме прошлого ревью)" if data.get("since_sha") else "изменения"
+        return (
+            f"Задача: проведи ревью PR — оцени {incremental}, найди баги, гонки, UB и "
+            "регрессии производительности, предложи исправления. В конце добавь раздел "
+            "`РЕЗЮМЕ:` (3–6 строк) — он будет использован при ревью следующих пушей."
+        )
+
+    # Остальные генераторы больше не используются. Возвращаем пустые строки.
     
     def generate_manual_analysis_prompt(self, event: Event) -> str:
         return ""
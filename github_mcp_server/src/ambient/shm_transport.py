@@ -0,0 +1,330 @@
+"""
+🚚 Shared-memory Transport - доставка событий и сообщений UI между процессами
+
+Связывает процессы Ambient Agent через ShmRingBuffer вместо списков с
+блокировками внутри одного процесса:
+
+    GitHubMonitor (процесс мониторинга)
+        → ShmEventEmitter → [ring событий] → bridge_to_event_system → EventSystem
+    EventHandlers (процесс диспетчера)
+        → ShmUIPublisher → [ring UI] → bridge_to_ui_bus → UIEventBus (процесс UI)
+
+ShmEventEmitter и ShmUIPublisher повторяют интерфейсы EventSystem.emit_simple и
+UIEventBus.publish_assistant_message, поэтому подставляются без изменений в
+GitHubMonitor и обработчиках.
+
+События больше слота (например, с логами джобов) режутся на фрагменты и
+собираются мостом обратно; сообщения больше max_message_size отклоняются с
+ошибкой. Потери (таймауты записи, недособранные и битые сообщения, ошибки
+доставки) считаются в счётчиках и печатаются через print_error.
+
+В AmbientAgent транспорт включается через AMBIENT_SHM_TRANSPORT=1: GitHubMonitor
+работает в отдельном процессе (run_monitor_process), размеры кольца задают
+AMBIENT_SHM_CAPACITY и AMBIENT_SHM_SLOT_SIZE. Кольцо UI подключается там, где UI
+живёт в другом процессе; wizard запускает агента в процессе UI, и там оно не нужно.
+"""
+
+import itertools
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from ..core.base_wizard import BaseWizard
+from ..core.shm_ring_buffer import ShmRingBuffer
+from .event_system import Event, EventSystem, EventType
+
+_KIND_EVENT = ord("E")
+_KIND_UI_TEXT = ord("T")
+_KIND_FRAGMENT = ord("F")
+# Фрагмент: id сообщения, номер фрагмента, всего фрагментов
+_FRAGMENT_HEADER = struct.Struct("<QII")
+
+# Предел размера события по умолчанию (2 МБ логов джобов плюс JSON-обвязка)
+DEFAULT_MAX_MESSAGE_SIZE = 8 * 1024 * 1024
+
+
+def encode_event(event: Event) -> bytes:
+    """Сериализует событие в компактный JSON с байтом-меткой типа сообщения"""
+    body = json.dumps({
+        "type": event.type.value,
+        "data": event.data,
+        "timestamp": event.timestamp,
+        "source": event.source,
+        "priority": event.priority,
+    }, ensure_ascii=False, separators=(",", ":"), default=str)
+    return bytes((_KIND_EVENT,)) + body.encode("utf-8")
+
+
+def decode_message(payload: Union[bytes, memoryview]) -> Union[Event, str]:
+    """Разбирает сообщение из кольца: Event или текст для UI"""
+    kind = payload[0]
+    body = bytes(payload[1:]).decode("utf-8")
+    if kind == _KIND_UI_TEXT:
+        return body
+    if kind != _KIND_EVENT:
+        raise ValueError(f"Неизвестный тип сообщения: {kind}")
+    obj = json.loads(body)
+    return Event(
+        type=EventType(obj["type"]),
+        data=obj["data"],
+        timestamp=obj["timestamp"],
+        source=obj["source"],
+        priority=obj["priority"],
+    )
+
+
+def split_message(payload: bytes, slot_size: int, message_id: int) -> List[bytes]:
+    """Режет сообщение на фрагменты, каждый из которых помещается в слот"""
+    room = slot_size - 1 - _FRAGMENT_HEADER.size
+    if room <= 0:
+        raise ValueError(f"Слот {slot_size} байт слишком мал для фрагментов")
+    count = (len(payload) + room - 1) // room
+    return [
+        bytes((_KIND_FRAGMENT,)) + _FRAGMENT_HEADER.pack(message_id, index, count)
+        + payload[index * room:(index + 1) * room]
+        for index in range(count)
+    ]
+
+
+class Reassembler:
+    """Собирает фрагментированные сообщения; недособранные вытесняются по лимиту"""
+
+    def __init__(self, max_pending: int = 64):
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[int, List[Optional[bytes]]]" = OrderedDict()
+        self.evicted = 0
+
+    def add(self, fragment: Union[bytes, memoryview]) -> Optional[bytes]:
+        """Принимает фрагмент (с байтом-меткой); возвращает сообщение целиком, когда оно собрано"""
+        message_id, index, count = _FRAGMENT_HEADER.unpack_from(fragment, 1)
+        if count == 0 or index >= count:
+            raise ValueError(f"Битый фрагмент {index}/{count}")
+        parts = self._pending.get(message_id)
+        if parts is None:
+            parts = self._pending[message_id] = [None] * count
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.evicted += 1
+        parts[index] = bytes(fragment[1 + _FRAGMENT_HEADER.size:])
+        if any(part is None for part in parts):
+            return None
+        del self._pending[message_id]
+        return b"".join(parts)
+
+
+class ShmEventEmitter(BaseWizard):
+    """Продюсер событий: совместим с EventSystem.emit/emit_simple"""
+
+    def __init__(self, ring: ShmRingBuffer, timeout: float = 1.0,
+                 max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE):
+        """
+        Args:
+            ring: Кольцо событий
+            timeout: Сколько ждать свободный слот на каждую запись
+            max_message_size: Больше этого события отклоняются (ошибка и счётчик rejected)
+        """
+        self.ring = ring
+        self.timeout = timeout
+        self.max_message_size = max_message_size
+        self.dropped = 0
+        self.rejected = 0
+        self.fragmented = 0
+        # id фрагментированных сообщений уникальны между процессами-продюсерами
+        self._ids = itertools.count((os.getpid() & 0xFFFFFFFF) << 32)
+
+    def emit(self, event: Event) -> bool:
+        payload = encode_event(event)
+        if len(payload) > self.max_message_size:
+            self.rejected += 1
+            self.print_error(f"Событие {event.type.value} ({len(payload)} байт) больше "
+                             f"{self.max_message_size} байт — не отправлено")
+            return False
+        if len(payload) <= self.ring.slot_size:
+            messages = [payload]
+        else:
+            messages = split_message(payload, self.ring.slot_size, next(self._ids))
+            self.fragmented += 1
+        for message in messages:
+            if not self.ring.produce(message, timeout=self.timeout):
+                self.dropped += 1
+                self.print_error(f"Кольцо событий переполнено: {event.type.value} потеряно "
+                                 f"(всего потерь: {self.dropped})")
+                return False
+        return True
+
+    def emit_simple(self,
+                    event_type: EventType,
+                    data: Dict[str, Any],
+                    source: str = "unknown",
+                    priority: int = 1) -> bool:
+        return self.emit(Event(type=event_type, data=data, timestamp=time.time(),
+                               source=source, priority=priority))
+
+
+class ShmUIPublisher(BaseWizard):
+    """Продюсер сообщений ассистента: совместим с UIEventBus.publish_assistant_message"""
+
+    def __init__(self, ring: ShmRingBuffer, timeout: float = 1.0):
+        self.ring = ring
+        self.timeout = timeout
+        self.dropped = 0
+
+    def publish_assistant_message(self, text: str) -> None:
+        if not isinstance(text, str) or text == "":
+            return
+        data = text.encode("utf-8")
+        # Длинные ответы режем по границе слота (по байтам, без разрыва UTF-8 символов)
+        limit = self.ring.slot_size - 1
+        while data:
+            cut = min(len(data), limit)
+            while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+                cut -= 1
+            if not self.ring.produce(bytes((_KIND_UI_TEXT,)) + data[:cut], timeout=self.timeout):
+                # Остаток ответа не дойдёт: сообщаем, а не теряем молча
+                self.dropped += 1
+                self.print_error(f"Кольцо UI переполнено: потеряно {len(data)} байт ответа "
+                                 f"(всего потерь: {self.dropped})")
+                return
+            data = data[cut:]
+
+
+@dataclass
+class BridgeStats:
+    """Счётчики моста кольцо → получатель"""
+    delivered: int = 0
+    malformed: int = 0       # битые сообщения и фрагменты
+    failed: int = 0          # исключения получателя
+    incomplete: int = 0      # фрагментированные сообщения, вытесненные недособранными
+
+
+_reporter = BaseWizard()
+
+
+def _bridge_loop(ring: ShmRingBuffer, stop: threading.Event, deliver, stats: BridgeStats,
+                 close_ring: bool = False) -> None:
+    try:
+        _bridge_messages(ring, stop, deliver, stats)
+    finally:
+        if close_ring:
+            ring.close()
+
+
+def _bridge_messages(ring: ShmRingBuffer, stop: threading.Event, deliver, stats: BridgeStats) -> None:
+    idle = 0.0
+    reassembler = Reassembler()
+    while not stop.is_set():
+        with ring.read_view() as view:
+            empty = view is None
+            message = None
+            if not empty:
+                try:
+                    if view[0] == _KIND_FRAGMENT:
+                        payload = reassembler.add(view)
+                        message = None if payload is None else decode_message(payload)
+                    else:
+                        message = decode_message(view)
+                except (ValueError, KeyError, struct.error) as e:
+                    # Битое сообщение пропускаем, слот всё равно освобождается
+                    stats.malformed += 1
+                    _reporter.print_error(f"Битое сообщение в кольце {ring.name}: {e}")
+        if empty:
+            # Нет данных: короткая нарастающая пауза, чтобы не крутить CPU
+            idle = min(0.005, idle * 2 or 0.0001)
+            stop.wait(idle)
+            continue
+        idle = 0.0
+        if reassembler.evicted != stats.incomplete:
+            stats.incomplete = reassembler.evicted
+            _reporter.print_error(f"Недособранные сообщения в кольце {ring.name}: {stats.incomplete}")
+        if message is None:
+            continue
+        try:
+            deliver(message)
+            stats.delivered += 1
+        except Exception as e:
+            stats.failed += 1
+            _reporter.print_error(f"Ошибка доставки из кольца {ring.name}: {e}")
+
+
+def bridge_to_event_system(ring: ShmRingBuffer, event_system: EventSystem,
+                           stop: Optional[threading.Event] = None,
+                           stats: Optional[BridgeStats] = None,
+                           close_ring: bool = False) -> threading.Event:
+    """
+    Запускает поток, перекладывающий события из кольца в EventSystem
+
+    Args:
+        stats: Счётчики доставки и потерь (заполняются потоком моста)
+        close_ring: Закрыть кольцо в потоке моста после остановки (пока поток
+            читает слот, закрывать кольцо снаружи нельзя)
+
+    Returns:
+        threading.Event: установите его, чтобы остановить мост
+    """
+    stop = stop or threading.Event()
+
+    def deliver(message: Union[Event, str]) -> None:
+        if isinstance(message, Event):
+            event_system.emit(message)
+
+    threading.Thread(target=_bridge_loop, args=(ring, stop, deliver, stats or BridgeStats(), close_ring),
+                     daemon=True).start()
+    return stop
+
+
+def bridge_to_ui_bus(ring: ShmRingBuffer, bus=None, stop: Optional[threading.Event] = None,
+                     stats: Optional[BridgeStats] = None) -> threading.Event:
+    """Запускает поток, доставляющий текст из кольца в UIEventBus процесса UI"""
+    if bus is None:
+        from ..ui.message_bus import UIEventBus
+        bus = UIEventBus.instance()
+    stop = stop or threading.Event()
+
+    def deliver(message: Union[Event, str]) -> None:
+        if isinstance(message, str):
+            bus.publish_assistant_message(message)
+
+    threading.Thread(target=_bridge_loop, args=(ring, stop, deliver, stats or BridgeStats()),
+                     daemon=True).start()
+    return stop
+
+
+def run_monitor_process(ring_name: str, donut_dir: Path, lock=None, stop=None) -> None:
+    """
+    Точка входа процесса мониторинга: GitHubMonitor пишет события в кольцо
+
+    Завершения run (для триажа флейков) уходят в то же кольцо событиями
+    GITHUB_RUN_COMPLETED. Процесс работает, пока не установлен stop
+    (multiprocessing.Event) или мониторинг не остановится сам.
+
+    Запуск: multiprocessing.Process(target=run_monitor_process, args=(ring.name, donut_dir, lock, stop))
+    """
+    from ..core.env_manager import EnvManager
+    from .github_monitor import GitHubMonitor
+
+    ring = ShmRingBuffer.attach(ring_name, lock=lock)
+    env_manager = EnvManager(donut_dir)
+    env_manager.load_env_file()
+    emitter = ShmEventEmitter(ring)
+    monitor = GitHubMonitor(emitter, env_manager)
+    monitor.run_listeners.append(
+        lambda run: emitter.emit_simple(EventType.GITHUB_RUN_COMPLETED, run, source="github_monitor", priority=2)
+    )
+    if not monitor.start_monitoring():
+        ring.close()
+        return
+    try:
+        while not monitor.wait(0.5):
+            if stop is not None and stop.is_set():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop_monitoring()
+        ring.close()
@@ -0,0 +1,143 @@
+"""
+🛫 Single Flight - дедупликация одинаковых анализов cursor-agent
+
+Если один и тот же упавший run приходит повторно (rerun, пересекающиеся
+опросы, ручной триггер), второй вызов не запускает новый процесс
+cursor-agent: он ждёт первый и получает его результат. Готовый результат
+переиспользуется в течение настраиваемого окна.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """Один выполняющийся (или завершённый) вызов"""
+
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished_at = 0.0
+
+
+class SingleFlight:
+    """Группа вызовов, где на каждый ключ одновременно выполняется не более одного"""
+
+    def __init__(self,
+                 result_ttl: float = 600.0,
+                 cache_if: Callable[[Any], bool] = bool,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            result_ttl: Сколько секунд готовый результат отдаётся повторным запросам (0 — не хранить)
+            cache_if: Какие результаты можно переиспользовать (по умолчанию — непустые)
+            clock: Источник монотонного времени
+        """
+        self.result_ttl = result_ttl
+        self.cache_if = cache_if
+        self.clock = clock
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Выполняет fn() для ключа или присоединяется к уже идущему вызову
+
+        Returns:
+            Tuple[Any, bool]: (результат, shared) — shared=True если результат
+            получен от другого вызова (в полёте или из окна переиспользования)
+        """
+        with self._lock:
+            self._evict_expired()
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.finished_at = self.clock()
+            with self._lock:
+                keep = call.error is None and self.result_ttl > 0 and self.cache_if(call.result)
+                if not keep and self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def put(self, key: Hashable, result: Any) -> None:
+        """
+        Сохраняет результат, полученный вне do() (например, из пакетного анализа)
+
+        Повторы в окне переиспользования получат его как shared. Вызов в полёте
+        не перезаписывается; результаты, не прошедшие cache_if, не сохраняются.
+        """
+        if self.result_ttl <= 0 or not self.cache_if(result):
+            return
+        call = _Call()
+        call.result = result
+        call.finished_at = self.clock()
+        call.done.set()
+        with self._lock:
+            current = self._calls.get(key)
+            if current is None or current.done.is_set():
+                self._calls[key] = call
+
+    def contains(self, key: Hashable) -> bool:
+        """Есть ли для ключа вызов в полёте или результат в окне переиспользования"""
+        with self._lock:
+            self._evict_expired()
+            return key in self._calls
+
+    def forget(self, key: Hashable) -> None:
+        """Забывает сохранённый результат (следующий вызов выполнится заново)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set():
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """Количество вызовов, которые выполняются прямо сейчас"""
+        with self._lock:
+            return sum(1 for call in self._calls.values() if not call.done.is_set())
+
+    def _evict_expired(self) -> None:
+        now = self.clock()
+        expired = [
+            key for key, call in self._calls.items()
+            if call.done.is_set() and now - call.finished_at > self.result_ttl
+        ]
+        for key in expired:
+            del self._calls[key]
+
+
+def workflow_request_key(data: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+    """
+    Нормализованный ключ анализа упавшего workflow: (run_id, head_sha, workflow)
+
+    Returns:
+        None если данных недостаточно для надёжной дедупликации
+    """
+    run_id = data.get("run_id")
+    if run_id in (None, ""):
+        return None
+    head = data.get("head_commit") or {}
+    head_sha = str(data.get("head_sha") or head.get("id") or "").strip().lower()
+    workflow = str(data.get("workflow_name") or "").strip().lower()
+    return str(run_id).strip(), head_sha, workflow
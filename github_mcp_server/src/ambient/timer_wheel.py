@@ -0,0 +1,191 @@
+"""
+⏱️ Timer Wheel - Иерархическое колесо таймеров для Ambient Agent
+
+Хранит отложенные и периодические задачи EventSystem (emit_after, emit_every,
+повторы упавших обработчиков). Вставка и отмена — O(1), продвижение времени —
+амортизированно O(1) на тик, поэтому десятки тысяч ожидающих таймеров не
+влияют на стоимость emit.
+
+Колесо не потокобезопасно: синхронизацией занимается владелец (EventSystem).
+"""
+
+import math
+import time
+from typing import Callable, List, Optional
+
+# Допуск на погрешность деления секунд на тики: 0.3 / 0.01 == 29.999999999999996
+_EPS = 1e-9
+
+
+class Timer:
+    """Дескриптор запланированного таймера (можно отменить через cancel())."""
+
+    __slots__ = ("expires_tick", "callback", "interval", "cancelled")
+
+    def __init__(self, expires_tick: int, callback: Callable[[], None], interval: Optional[float] = None):
+        self.expires_tick = expires_tick
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Отменяет таймер (ленивое удаление при следующем проходе слота)."""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Иерархическое колесо таймеров (Varghese & Lauck).
+
+    Уровень 0 хранит таймеры ближайших `slots` тиков, каждый следующий уровень
+    покрывает в `slots` раз больший диапазон. При обороте нижнего уровня слот
+    верхнего уровня «каскадирует» вниз. Таймеры дальше горизонта всех уровней
+    держатся в overflow-списке и перераспределяются при обороте верхнего уровня.
+    """
+
+    def __init__(self, tick: float = 0.05, slot_bits: int = 8, levels: int = 4,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            tick: Длительность одного тика в секундах (точность таймеров)
+            slot_bits: log2 числа слотов на уровне
+            levels: Количество уровней колеса
+            clock: Источник монотонного времени
+        """
+        self.tick = tick
+        self.slot_bits = slot_bits
+        self.slots = 1 << slot_bits
+        self.mask = self.slots - 1
+        self.levels = levels
+        self.clock = clock
+
+        self._wheels: List[List[List[Timer]]] = [
+            [[] for _ in range(self.slots)] for _ in range(levels)
+        ]
+        self._overflow: List[Timer] = []
+        self._origin = clock()
+        self._current_tick = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _now_tick(self) -> int:
+        return self._to_tick(self.clock())
+
+    def _to_tick(self, now: float) -> int:
+        return int((now - self._origin) / self.tick + _EPS)
+
+    def _ticks(self, seconds: float) -> int:
+        """Число тиков для задержки (вверх, но не меньше одного)."""
+        return max(1, math.ceil(max(0.0, seconds) / self.tick - _EPS))
+
+    def schedule(self, delay: float, callback: Callable[[], None],
+                 interval: Optional[float] = None) -> Timer:
+        """
+        Планирует вызов callback через delay секунд
+
+        Args:
+            delay: Задержка в секундах
+            callback: Вызываемая функция без аргументов
+            interval: Период повтора в секундах (None — одноразовый таймер)
+
+        Returns:
+            Timer: Дескриптор для отмены
+        """
+        timer = Timer(self._now_tick() + self._ticks(delay), callback, interval)
+        self._place(timer)
+        self._count += 1
+        return timer
+
+    def _place(self, timer: Timer) -> None:
+        delta = timer.expires_tick - self._current_tick
+        if delta < 0:
+            # Уже просрочен — в ближайший слот нижнего уровня
+            timer.expires_tick = self._current_tick + 1
+            delta = 1
+        for level in range(self.levels):
+            if delta < (1 << (self.slot_bits * (level + 1))):
+                index = (timer.expires_tick >> (self.slot_bits * level)) & self.mask
+                self._wheels[level][index].append(timer)
+                return
+        self._overflow.append(timer)
+
+    def advance(self, now: Optional[float] = None) -> List[Timer]:
+        """
+        Продвигает колесо до текущего момента
+
+        Returns:
+            List[Timer]: Сработавшие (неотменённые) таймеры в порядке срабатывания.
+            Периодические таймеры перепланируются автоматически.
+        """
+        target = self._now_tick() if now is None else self._to_tick(now)
+        expired: List[Timer] = []
+
+        if self._count == 0:
+            self._current_tick = max(self._current_tick, target)
+            return expired
+
+        while self._current_tick < target:
+            self._current_tick += 1
+            tick = self._current_tick
+            # Каскад верхних уровней при обороте нижних (сверху вниз, чтобы
+            # таймеры верхнего уровня успели попасть в каскадируемые слоты ниже)
+            top = 0
+            while top < self.levels and not tick & ((1 << (self.slot_bits * (top + 1))) - 1):
+                top += 1
+            if top == self.levels and self._overflow:
+                pending, self._overflow = self._overflow, []
+                for timer in pending:
+                    self._place(timer)
+            for level in range(min(top, self.levels - 1), 0, -1):
+                index = (tick >> (self.slot_bits * level)) & self.mask
+                self._cascade(self._wheels[level], index)
+
+            bucket = self._wheels[0][tick & self.mask]
+            if bucket:
+                self._wheels[0][tick & self.mask] = []
+                for timer in bucket:
+                    self._count -= 1
+                    if not timer.cancelled:
+                        expired.append(timer)
+
+            if self._count == 0:
+                self._current_tick = target
+                break
+
+        for timer in expired:
+            if timer.interval:
+                timer.expires_tick = self._current_tick + self._ticks(timer.interval)
+                self._place(timer)
+                self._count += 1
+        return expired
+
+    def _cascade(self, wheel: List[List[Timer]], index: int) -> None:
+        bucket = wheel[index]
+        if not bucket:
+            return
+        wheel[index] = []
+        for timer in bucket:
+            if timer.cancelled:
+                self._count -= 1
+            else:
+                self._place(timer)
+
+    def time_until_next(self, limit: float) -> float:
+        """
+        Оценивает время до следующего срабатывания (не больше limit)
+
+        Сканирует только нижний уровень; если он пуст, возвращает время до
+        ближайшего каскада, после которого оценка уточняется.
+        """
+        if self._count == 0:
+            return limit
+        if self._now_tick() > self._current_tick:
+            return 0.0
+        for step in range(1, self.slots + 1):
+            tick = self._current_tick + step
+            if self._wheels[0][tick & self.mask] or not tick & self.mask:
+                wait = self._origin + tick * self.tick - self.clock()
+                return max(0.0, min(limit, wait))
+        return limit
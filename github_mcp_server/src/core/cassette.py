@@ -0,0 +1,172 @@
+"""
+Record/replay store for cursor-agent conversations.
+
+A cassette is the raw stream-json output of one `cursor-agent` call plus
+the time offset of every line. Cassettes are content-addressed: the key is
+a SHA-256 of the prompt and the conversation context (the chain of keys of
+the earlier prompts in the same client), so replaying a recorded
+conversation needs neither the network nor the original session ids.
+
+Modes (CURSOR_AGENT_CASSETTE_MODE):
+- off     — no recording, no replay (default);
+- record  — always call cursor-agent and (re)record successful calls;
+- replay  — replay recorded calls, call and record on a miss;
+- strict  — replay only; a miss raises CassetteMissError.
+
+CURSOR_AGENT_CASSETTE_DIR sets the store directory and
+CURSOR_AGENT_REPLAY_SPEED the timing: 0 replays instantly (default),
+1 with the original timing, N times faster for N > 1.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+STRICT = "strict"
+MODES = (OFF, RECORD, REPLAY, STRICT)
+
+FORMAT_VERSION = 1
+
+
+class CassetteMissError(LookupError):
+    """Strict replay found no recording for the prompt."""
+
+
+@dataclass
+class Recording:
+    """Recorded output of one call: (offset seconds, raw line) pairs and the exit code."""
+    key: str
+    prompt: str
+    lines: List[Tuple[float, bytes]] = field(default_factory=list)
+    returncode: int = 0
+
+    def timed_lines(self, speed: float) -> Iterator[Tuple[float, bytes]]:
+        """(delay before the line, line) with the timing scaled by `speed` (0 — no delays)."""
+        previous = 0.0
+        for offset, line in self.lines:
+            delay = (offset - previous) / speed if speed > 0 else 0.0
+            previous = offset
+            yield delay, line
+
+
+class Recorder:
+    """Collects the lines of a live call; `save()` stores them if the call succeeded."""
+
+    def __init__(self, store: "CassetteStore", key: str, prompt: str) -> None:
+        self.store = store
+        self.recording = Recording(key, prompt)
+        self._started = time.monotonic()
+
+    def add(self, line: bytes) -> None:
+        self.recording.lines.append((time.monotonic() - self._started, bytes(line)))
+
+    def save(self, returncode: int) -> None:
+        self.recording.returncode = returncode
+        if returncode == 0 and self.recording.lines:
+            self.store.save(self.recording)
+
+
+class CassetteStore:
+    """Directory of cassettes addressed by sha256(context, prompt)."""
+
+    def __init__(self, directory: Path, mode: str = REPLAY, speed: float = 0.0) -> None:
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.speed = speed
+
+    @classmethod
+    def from_env(cls) -> Optional["CassetteStore"]:
+        """Store configured by CURSOR_AGENT_CASSETTE_* (None when the mode is off)."""
+        mode = (os.environ.get("CURSOR_AGENT_CASSETTE_MODE") or OFF).strip().lower()
+        if mode == OFF:
+            return None
+        directory = os.environ.get("CURSOR_AGENT_CASSETTE_DIR") or str(Path.home() / ".cursor" / "cassettes")
+        try:
+            speed = float(os.environ.get("CURSOR_AGENT_REPLAY_SPEED", "0") or 0)
+        except ValueError:
+            speed = 0.0
+        return cls(Path(directory), mode, speed)
+
+    @property
+    def replays(self) -> bool:
+        return self.mode in (REPLAY, STRICT)
+
+    @property
+    def records(self) -> bool:
+        return self.mode in (RECORD, REPLAY)
+
+    @staticmethod
+    def key(context: str, prompt: str) -> str:
+        payload = json.dumps({"v": FORMAT_VERSION, "context": context, "prompt": prompt}, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.jsonl"
+
+    def load(self, key: str) -> Optional[Recording]:
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                recording = Recording(key, header.get("prompt", ""), returncode=int(header.get("returncode", 0)))
+                for raw in f:
+                    item = json.loads(raw)
+                    recording.lines.append((float(item["t"]), item["line"].encode("utf-8")))
+            return recording
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def lookup(self, context: str, prompt: str) -> Tuple[str, Optional[Recording]]:
+        """Key of the call and its recording (None on a miss or when not replaying).
+
+        Raises:
+            CassetteMissError: strict mode and nothing recorded for this call
+        """
+        key = self.key(context, prompt)
+        recording = self.load(key) if self.replays else None
+        if recording is None and self.mode == STRICT:
+            raise CassetteMissError(f"no cassette for prompt {prompt[:60]!r} (key {key[:12]}) in {self.directory}")
+        return key, recording
+
+    def recorder(self, key: str, prompt: str) -> Optional[Recorder]:
+        return Recorder(self, key, prompt) if self.records else None
+
+    def save(self, recording: Recording) -> None:
+        path = self.path(recording.key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                header = {"v": FORMAT_VERSION, "prompt": recording.prompt,
+                          "returncode": recording.returncode, "recorded_at": time.time()}
+                f.write(json.dumps(header, ensure_ascii=False) + "\n")
+                for offset, line in recording.lines:
+                    f.write(json.dumps({"t": round(offset, 6),
+                                        "line": line.decode("utf-8", errors="replace")},
+                                       ensure_ascii=False) + "\n")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+__all__ = [
+    "MODES",
+    "OFF",
+    "RECORD",
+    "REPLAY",
+    "STRICT",
+    "CassetteMissError",
+    "CassetteStore",
+    "Recorder",
+    "Recording",
+]
@@ -9,31 +9,491 @@ Note: Because cursor-agent CLI does not expose a documented persistent stdin
 interface, we maintain session continuity via `cursor-agent resume` after the
 first successful prompt. If a true persistent mode becomes available, the
 implementation can be swapped here without touching UI or ambient layers.
+
+To hide process start-up latency, an optional warm pool
+(CURSOR_AGENT_WARM_POOL=N) keeps `cursor-agent --print` processes already
+started and waiting for the prompt on stdin.
+
+Every live call first takes a slot from the invocation scheduler
+(scheduler.py) under the client's priority class, so interactive prompts
+are not starved by ambient or batch work.
+
+For tests and benchmarks, CURSOR_AGENT_CASSETTE_MODE records the raw
+stream-json of every call and replays it later without starting
+cursor-agent (see cassette.py).
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
+import atexit
+import os
+import signal
 import subprocess
-import sys
-from typing import Optional, Callable, Any
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Callable, Deque, List, Tuple, Union
+
+from .cassette import CassetteMissError, CassetteStore, Recorder, Recording
+from .scheduler import AMBIENT, InvocationScheduler, OnWait, get_scheduler
+from .stream_decoder import ASSISTANT, RESULT, USER, ChunkCoalescer, StreamEvent, decode_line
 
 
 OnText = Callable[[str], None]
 
 
-class CursorAgentClient:
+DEFAULT_AGENT_BIN = "cursor-agent"
+_STREAM_FLAGS = ["--print", "--output-format", "stream-json"]
+
+
+def agent_bin() -> str:
+    """cursor-agent executable (override with CURSOR_AGENT_BIN)."""
+    return os.environ.get("CURSOR_AGENT_BIN") or DEFAULT_AGENT_BIN
+
+
+class WarmProcessPool:
+    """Pre-spawned `cursor-agent --print` processes waiting for a prompt on stdin.
+
+    Process start, runtime init and session resume happen before the prompt
+    is known, so a request only pays for the model round trip. A `--print`
+    process answers exactly one prompt, so every warm process is used once and
+    the pool refills itself in the background. Processes are keyed by the
+    session they resume ("" for a new conversation); only the most recently
+    used `max_sessions` keys are kept warm.
+
+    Health: a process that exited or has been waiting longer than `max_age`
+    seconds is recycled instead of used. After `max_failures` consecutive
+    warm requests that fail without producing any output, the pool disables
+    itself and callers fall back to spawning per call.
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        max_age: float = 600.0,
+        max_sessions: int = 4,
+        max_failures: int = 2,
+        spawn: Optional[Callable[[List[str]], subprocess.Popen]] = None,
+    ) -> None:
+        self.size = max(1, size)
+        self.max_age = max_age
+        self.max_sessions = max(1, max_sessions)
+        self.max_failures = max(1, max_failures)
+        self.disabled = False
+        self._spawn = spawn or _spawn_waiting
+        self._slots: "OrderedDict[str, List[Tuple[float, subprocess.Popen]]]" = OrderedDict()
+        self._filling: set = set()
+        self._failures = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "recycled": 0, "spawned": 0}
+
+    @staticmethod
+    def command(session_id: Optional[str]) -> List[str]:
+        resume = ["--resume", session_id] if session_id else []
+        return [agent_bin(), *resume, *_STREAM_FLAGS]
+
+    def acquire(self, session_id: Optional[str]) -> Optional[subprocess.Popen]:
+        """Take a healthy warm process for the session (None on miss) and refill in the background."""
+        if self.disabled:
+            return None
+        key = session_id or ""
+        proc = None
+        stale: List[subprocess.Popen] = []
+        with self._lock:
+            slot = self._slots.get(key, [])
+            now = time.monotonic()
+            while slot and proc is None:
+                spawned_at, candidate = slot.pop(0)
+                if candidate.poll() is None and now - spawned_at < self.max_age:
+                    proc = candidate
+                else:
+                    stale.append(candidate)
+            self.stats["recycled"] += len(stale)
+            self.stats["hits" if proc is not None else "misses"] += 1
+        crashed = sum(1 for candidate in stale if candidate.poll())
+        for candidate in stale:
+            _kill(candidate)
+        for _ in range(crashed):
+            self.report(False)  # exited with an error while waiting: not a usable warm process
+        self.prewarm(session_id)
+        return proc
+
+    def prewarm(self, session_id: Optional[str]) -> None:
+        """Spawn processes for the session in the background until `size` are waiting."""
+        if self.disabled:
+            return
+        key = session_id or ""
+        evicted: List[subprocess.Popen] = []
+        with self._lock:
+            self._slots.setdefault(key, [])
+            self._slots.move_to_end(key)
+            while len(self._slots) > self.max_sessions:
+                _, procs = self._slots.popitem(last=False)
+                evicted.extend(p for _, p in procs)
+            if key in self._filling or len(self._slots[key]) >= self.size:
+                key = None
+            else:
+                self._filling.add(key)
+        for proc in evicted:
+            _kill(proc)
+        if key is not None:
+            threading.Thread(target=self._fill, args=(key,), name="cursor-agent-warm", daemon=True).start()
+
+    def _fill(self, key: str) -> None:
+        try:
+            while not self.disabled:
+                with self._lock:
+                    slot = self._slots.get(key)
+                    if slot is None or len(slot) >= self.size:
+                        return
+                try:
+                    proc = self._spawn(self.command(key or None))
+                except Exception:
+                    self.report(False)
+                    return
+                with self._lock:
+                    self.stats["spawned"] += 1
+                    slot = self._slots.get(key)
+                    if slot is not None and not self.disabled:
+                        slot.append((time.monotonic(), proc))
+                        continue
+                _kill(proc)  # the session was evicted meanwhile
+                return
+        finally:
+            with self._lock:
+                self._filling.discard(key)
+
+    def report(self, ok: bool) -> None:
+        """Record the outcome of a warm request; repeated failures disable the pool."""
+        with self._lock:
+            self._failures = 0 if ok else self._failures + 1
+            if self._failures >= self.max_failures:
+                self.disabled = True
+        if self.disabled:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            procs = [p for slot in self._slots.values() for _, p in slot]
+            self._slots.clear()
+        for proc in procs:
+            _kill(proc)
+
+
+def _spawn_waiting(cmd: List[str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+        start_new_session=True,
+    )
+
+
+def _kill_process_group(proc: subprocess.Popen) -> None:
+    """Kill the process and everything it spawned (it leads its own session)."""
+    if proc.poll() is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+def _kill_group_of_exited(proc: subprocess.Popen) -> None:
+    """Kill children left in the group of a process that already exited."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _kill_async_process(proc: "asyncio.subprocess.Process") -> None:
+    """Kill an asyncio child together with its process group (also after it exited)."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+def _kill(proc: subprocess.Popen) -> None:
+    try:
+        _kill_process_group(proc)
+        proc.wait(timeout=1)
+    except Exception:
+        pass
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        try:
+            if stream is not None:
+                stream.close()
+        except Exception:
+            pass
+
+
+@dataclass(frozen=True)
+class UserEvent:
+    """The prompt as echoed by cursor-agent (first user event only)."""
+    text: str
+
+
+@dataclass(frozen=True)
+class AssistantChunk:
+    """A piece of the assistant answer."""
+    text: str
+
+
+@dataclass(frozen=True)
+class ResultEvent:
+    """Final result event of the turn."""
+    text: str
+
+
+@dataclass(frozen=True)
+class StreamError:
+    """The stream ended abnormally (timeout, non-zero exit, spawn failure)."""
+    message: str
+    returncode: Optional[int] = None
+    stderr: Tuple[str, ...] = ()
+
+
+AgentEvent = Union[UserEvent, AssistantChunk, ResultEvent, StreamError]
+
+
+class _TurnState:
+    """Per-call state shared by the callback and async APIs."""
+    __slots__ = ("printed_user", "events")
+
+    def __init__(self) -> None:
+        self.printed_user = False
+        self.events = 0
+
+
+class CancellationToken:
+    """Cancels in-flight `send_stream` calls from another thread (UI key, shutdown)."""
+
     def __init__(self) -> None:
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Run callback on cancel (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class _StreamWatch:
+    """Watchdog for one running process: deadline, idle timeout, cancellation, stderr drain.
+
+    Any of the three conditions kills the whole process group, which closes
+    its stdout and ends the reader loop. Leftover children that keep stdout
+    open after cursor-agent itself exited are killed after `exit_grace`
+    seconds. stderr is read concurrently into a bounded deque so a chatty
+    process cannot block on a full pipe.
+    """
+
+    exit_grace = 1.0
+
+    def __init__(
+        self,
+        proc: subprocess.Popen,
+        expires_at: Optional[float],
+        idle_timeout: Optional[float],
+        cancel: Optional[CancellationToken],
+        stderr_lines: int = 200,
+    ) -> None:
+        self.proc = proc
+        self.expires_at = expires_at
+        self.idle_timeout = idle_timeout if idle_timeout and idle_timeout > 0 else None
+        self.cancel = cancel
+        self.reason: Optional[str] = None
+        self.stderr: Deque[str] = deque(maxlen=stderr_lines)
+        self.last_activity = time.monotonic()
+        self._done = threading.Event()
+        self._threads = [threading.Thread(target=self._watch, name="cursor-agent-watchdog", daemon=True)]
+        if proc.stderr is not None:
+            self._threads.append(threading.Thread(target=self._drain_stderr, name="cursor-agent-stderr", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        if cancel is not None:
+            cancel.add_callback(self._on_cancel)
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    def abort(self, reason: str) -> None:
+        if self.reason is None:
+            self.reason = reason
+        _kill_process_group(self.proc)
+        self._done.set()
+
+    def stop(self) -> None:
+        self._done.set()
+        if self.cancel is not None:
+            self.cancel.remove_callback(self._on_cancel)
+
+    def _on_cancel(self) -> None:
+        self.abort("cancelled")
+
+    def _watch(self) -> None:
+        exited_at: Optional[float] = None
+        while not self._done.wait(self._next_check()):
+            now = time.monotonic()
+            if exited_at is None and self.proc.poll() is not None:
+                exited_at = now
+            if exited_at is not None and now - exited_at >= self.exit_grace:
+                _kill_group_of_exited(self.proc)
+                return
+            if self.expires_at is not None and now >= self.expires_at:
+                self.abort("deadline exceeded")
+            elif self.idle_timeout is not None and now - self.last_activity >= self.idle_timeout:
+                self.abort(f"no output for {self.idle_timeout:g}s")
+
+    def _next_check(self) -> float:
+        now = time.monotonic()
+        wait = 0.25
+        if self.expires_at is not None:
+            wait = min(wait, self.expires_at - now)
+        if self.idle_timeout is not None:
+            wait = min(wait, self.last_activity + self.idle_timeout - now)
+        return max(0.01, wait)
+
+    def _drain_stderr(self) -> None:
+        try:
+            for line in self.proc.stderr:
+                self.touch()
+                self.stderr.append(line.decode("utf-8", errors="replace").rstrip())
+        except (OSError, ValueError):
+            pass
+
+
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+_WARM_POOL: Optional[WarmProcessPool] = None
+_WARM_POOL_LOCK = threading.Lock()
+
+
+def get_warm_pool() -> Optional[WarmProcessPool]:
+    """Shared warm pool sized by CURSOR_AGENT_WARM_POOL (unset or 0 disables it)."""
+    global _WARM_POOL
+    try:
+        size = int(os.environ.get("CURSOR_AGENT_WARM_POOL", "0") or 0)
+    except ValueError:
+        size = 0
+    if size <= 0:
+        return None
+    with _WARM_POOL_LOCK:
+        if _WARM_POOL is None:
+            _WARM_POOL = WarmProcessPool(size=size)
+            atexit.register(_WARM_POOL.close)
+        return _WARM_POOL
+
+
+class CursorAgentClient:
+    AVAILABLE_TTL = 60.0
+
+    def __init__(
+        self,
+        warm_pool: Optional[WarmProcessPool] = None,
+        chunk_delay: float = 0.03,
+        chunk_max_chars: int = 4096,
+        deadline: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        cassette: Optional[CassetteStore] = None,
+        priority: int = AMBIENT,
+        scheduler: Optional[InvocationScheduler] = None,
+    ) -> None:
+        """
+        Args:
+            warm_pool: Pre-spawned processes (defaults to the CURSOR_AGENT_WARM_POOL pool)
+            chunk_delay: Max seconds assistant text is held to coalesce chunks (0 disables)
+            chunk_max_chars: Batch size that triggers an immediate on_chunk call
+            deadline: Default wall-clock limit per call, seconds (CURSOR_AGENT_DEADLINE, 900)
+            idle_timeout: Default limit without any output, seconds (CURSOR_AGENT_IDLE_TIMEOUT, 180)
+            cassette: Record/replay store (defaults to CURSOR_AGENT_CASSETTE_MODE, off)
+            priority: Scheduler class of this client's calls (scheduler.INTERACTIVE/AMBIENT/BATCH)
+            scheduler: Invocation scheduler (defaults to the process-wide one)
+        """
         self._session_id: Optional[str] = None
+        # Key of the last completed turn: cassette keys chain over the conversation
+        self._context = ""
+        self.cassette = cassette if cassette is not None else CassetteStore.from_env()
+        self.deadline = deadline if deadline is not None else _env_seconds("CURSOR_AGENT_DEADLINE", 900.0)
+        self.idle_timeout = (
+            idle_timeout if idle_timeout is not None else _env_seconds("CURSOR_AGENT_IDLE_TIMEOUT", 180.0)
+        )
+        self.priority = priority
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        self.last_error: Optional[str] = None
+        self.last_stderr: List[str] = []
+        self.last_queue_wait = 0.0
+        self.chunk_delay = chunk_delay
+        self.chunk_max_chars = chunk_max_chars
+        self._warm_pool = warm_pool if warm_pool is not None else get_warm_pool()
+        self._available: Optional[Tuple[float, bool]] = None
+        if self._warm_pool is not None:
+            self._warm_pool.prewarm(None)
 
     def available(self) -> bool:
+        """Whether cursor-agent can be started (cached for AVAILABLE_TTL seconds)."""
+        cached = self._available
+        if cached is not None and time.monotonic() - cached[0] < self.AVAILABLE_TTL:
+            return cached[1]
         try:
             result = subprocess.run(
-                ["cursor-agent", "--help"], capture_output=True, timeout=5
+                [agent_bin(), "--help"], capture_output=True, timeout=5
             )
-            return result.returncode == 0
+            ok = result.returncode == 0
         except Exception:
-            return False
+            ok = False
+        self._available = (time.monotonic(), ok)
+        return ok
 
     def send_stream(
         self,
@@ -41,81 +501,427 @@ class CursorAgentClient:
         on_user: Optional[OnText] = None,
         on_chunk: Optional[OnText] = None,
         on_result: Optional[OnText] = None,
+        deadline: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        cancel: Optional[CancellationToken] = None,
+        on_queue: Optional[OnWait] = None,
     ) -> bool:
         """Send a prompt and stream the assistant response.
 
         - The first call uses a fresh conversation.
         - Subsequent calls use `resume` to keep context.
+        - With a warm pool the prompt goes to a pre-spawned process via stdin;
+          if that process fails before producing output, the call falls back
+          to spawning a new process.
+        - The call returns within `deadline` seconds; `idle_timeout` seconds
+          without output or `cancel.cancel()` end it early. The process group
+          is killed, False is returned and `last_error` says why.
+        - With a cassette in replay/strict mode a recorded answer is replayed
+          without starting cursor-agent; a strict-mode miss returns False.
+        - Live calls wait for a scheduler slot first; `on_queue(position,
+          waited)` reports the queue position while waiting and
+          `last_queue_wait` the final wait. A preempted call returns False.
         """
-        cmd = (
-            ["cursor-agent", prompt, "--print", "--output-format", "stream-json"]
-            if not self._session_id
-            else [
-                "cursor-agent",
-                "--resume",
-                self._session_id,
-                prompt,
-                "--print",
-                "--output-format",
-                "stream-json",
-            ]
-        )
+        self.last_error = None
+        self.last_stderr = []
+        self.last_queue_wait = 0.0
+        if cancel is not None and cancel.cancelled:
+            self.last_error = "cancelled"
+            return False
+        recorder: Optional[Recorder] = None
+        if self.cassette is not None:
+            try:
+                key, recording = self.cassette.lookup(self._context, prompt)
+            except CassetteMissError as e:
+                self.last_error = str(e)
+                return False
+            if recording is not None:
+                return self._replay(recording, on_user, on_chunk, on_result, cancel)
+            recorder = self.cassette.recorder(key, prompt)
+
+        # The scheduler preempts through this token; the caller's token cancels it too
+        token = CancellationToken()
+        if cancel is not None:
+            cancel.add_callback(token.cancel)
+        ticket = self.scheduler.submit(self.priority, token)
+        try:
+            if not self.scheduler.wait(ticket, on_wait=on_queue):
+                self.last_error = "cancelled"
+                return False
+            self.last_queue_wait = ticket.waited
+            deadline = self.deadline if deadline is None else deadline
+            limits = (
+                time.monotonic() + deadline if deadline and deadline > 0 else None,
+                self.idle_timeout if idle_timeout is None else idle_timeout,
+                token,
+            )
+            return self._send_live(prompt, on_user, on_chunk, on_result, limits, recorder)
+        finally:
+            self.scheduler.release(ticket)
+            if cancel is not None:
+                cancel.remove_callback(token.cancel)
+            if ticket.preempted:
+                self.last_error = "preempted by a higher-priority cursor-agent call"
+
+    def _send_live(
+        self,
+        prompt: str,
+        on_user: Optional[OnText],
+        on_chunk: Optional[OnText],
+        on_result: Optional[OnText],
+        limits: tuple,
+        recorder: Optional[Recorder],
+    ) -> bool:
+        pool = self._warm_pool
+        if pool is not None:
+            proc = pool.acquire(self._session_id)
+            if proc is not None:
+                ok = self._send_warm(pool, proc, prompt, on_user, on_chunk, on_result, limits, recorder)
+                if ok is not None:
+                    return ok
+
         try:
             with subprocess.Popen(
-                cmd,
+                self._command(prompt),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
+                start_new_session=True,
             ) as proc:
+                ok, _, _ = self._consume(proc, on_user, on_chunk, on_result, limits, recorder)
+                return ok
+        except Exception as e:
+            self.last_error = self.last_error or f"{type(e).__name__}: {e}"
+            return False
+
+    async def astream(
+        self,
+        prompt: str,
+        deadline: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        line_limit: int = 1024 * 1024,
+        on_queue: Optional[OnWait] = None,
+    ) -> AsyncIterator[AgentEvent]:
+        """Stream typed events: `async for event in client.astream(prompt)`.
+
+        The next line is read from the pipe only when the consumer asks for
+        the next event, so a slow consumer throttles cursor-agent through the
+        pipe instead of buffering the answer in memory (at most about
+        2 * line_limit bytes are buffered; longer lines are skipped). Cancelling the
+        consuming task (or leaving the loop early) kills the process group.
+        Timeouts, preemption by the scheduler and failures end the stream
+        with a StreamError event.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = self.deadline if deadline is None else deadline
+        idle = self.idle_timeout if idle_timeout is None else idle_timeout
+        self.last_error = None
+        self.last_stderr = []
+        self.last_queue_wait = 0.0
+        recorder: Optional[Recorder] = None
+        if self.cassette is not None:
+            try:
+                key, recording = self.cassette.lookup(self._context, prompt)
+            except CassetteMissError as e:
+                self.last_error = str(e)
+                yield StreamError(self.last_error)
+                return
+            if recording is not None:
+                async for event in self._areplay(recording):
+                    yield event
+                return
+            recorder = self.cassette.recorder(key, prompt)
+        # Preemption by the scheduler ends the stream with a StreamError
+        token = CancellationToken()
+        ticket = self.scheduler.submit(self.priority, token)
+        try:
+            if not await self.scheduler.wait_async(ticket, on_wait=on_queue):
+                self.last_error = "cancelled"
+                yield StreamError(self.last_error)
+                return
+            self.last_queue_wait = ticket.waited
+            expires_at = loop.time() + deadline if deadline and deadline > 0 else None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *self._command(prompt),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    limit=line_limit,
+                    start_new_session=True,
+                )
+            except OSError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                yield StreamError(self.last_error)
+                return
+
+            stderr: Deque[str] = deque(maxlen=200)
+
+            async def _drain_stderr() -> None:
+                assert proc.stderr is not None
+                async for raw in proc.stderr:
+                    stderr.append(raw.decode("utf-8", errors="replace").rstrip())
+
+            drain = asyncio.ensure_future(_drain_stderr())
+            state = _TurnState()
+            error: Optional[str] = None
+            read: Optional[asyncio.Future] = None
+            try:
                 assert proc.stdout is not None
-                printed_user = False
-                for line in proc.stdout:
-                    line = line.strip()
-                    if not line:
+                last_activity = loop.time()
+                exited_at: Optional[float] = None
+                while True:
+                    # One pending readline at a time: nothing is read ahead of the consumer
+                    if read is None:
+                        read = asyncio.ensure_future(proc.stdout.readline())
+                    # Poll so exit, idle and deadline are noticed while the read is pending.
+                    # (Process.wait() would also wait for pipes held open by leftover children.)
+                    await asyncio.wait({read}, timeout=0.25)
+                    now = loop.time()
+                    if token.cancelled:
+                        error = "preempted by a higher-priority cursor-agent call"
+                        break
+                    if not read.done():
+                        if proc.returncode is not None:
+                            exited_at = exited_at if exited_at is not None else now
+                            if now - exited_at >= _StreamWatch.exit_grace:
+                                break
+                        elif expires_at is not None and now >= expires_at:
+                            error = "deadline exceeded"
+                            break
+                        elif idle and idle > 0 and now - last_activity >= idle:
+                            error = f"no output for {idle:g}s"
+                            break
                         continue
-                    obj: Any
+                    done, read = read, None
                     try:
-                        obj = json.loads(line)
-                    except Exception:
-                        continue
-
-                    # Capture/verify session id
-                    event_sid = obj.get("session_id") if isinstance(obj, dict) else None
-                    if self._session_id is None and event_sid:
-                        self._session_id = event_sid
-                    if self._session_id is not None and event_sid and event_sid != self._session_id:
-                        # Ignore events from other sessions
-                        continue
-
-                    if not printed_user and _is_user_event(obj):
-                        content = _extract_text(obj)
-                        if content and on_user:
-                            on_user(content)
-                        printed_user = True
-                        continue
-
-                    if _is_assistant_event(obj):
-                        chunk = _extract_text(obj)
-                        if chunk and on_chunk:
-                            # debug chunk size
-                            # sys.stderr.write(f"[cursor] chunk {len(chunk)}\n"); sys.stderr.flush()
-                            on_chunk(chunk)
+                        line = done.result()
+                    except ValueError:
+                        # Longer than line_limit: StreamReader already dropped it, keep reading
+                        stderr.append(f"[astream] skipped stream-json line longer than {line_limit} bytes")
                         continue
-
-                    if isinstance(obj, dict) and obj.get("type") == "result":
-                        if on_result:
-                            on_result(obj.get("result") or "")
-                        continue
-
-                ok = proc.wait() == 0
-                return ok
-        except Exception:
+                    if not line:
+                        break
+                    last_activity = now
+                    if recorder is not None:
+                        recorder.add(line)
+                    event = self._translate(decode_line(line), state)
+                    if event is not None:
+                        yield event
+                    if expires_at is not None and loop.time() >= expires_at:
+                        error = "deadline exceeded"
+                        break
+                if error is None:
+                    grace_until = loop.time() + _StreamWatch.exit_grace
+                    while proc.returncode is None and loop.time() < grace_until:
+                        await asyncio.sleep(0.01)
+                    if proc.returncode is None:
+                        error = "cursor-agent did not exit after closing its output"
+                    elif proc.returncode != 0:
+                        error = f"cursor-agent exited with code {proc.returncode}"
+                if error is None:
+                    self._turn_completed(recorder, 0)
+                else:
+                    _kill_async_process(proc)
+                    self.last_error = error
+                    self.last_stderr = list(stderr)
+                    yield StreamError(error, proc.returncode, tuple(stderr))
+            finally:
+                if read is not None:
+                    read.cancel()
+                _kill_async_process(proc)
+                drain.cancel()
+                try:
+                    await asyncio.wait_for(proc.wait(), 1.0)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    pass
+                self.last_stderr = self.last_stderr or list(stderr)
+        finally:
+            self.scheduler.release(ticket)
+
+    def _replay(
+        self,
+        recording: Recording,
+        on_user: Optional[OnText],
+        on_chunk: Optional[OnText],
+        on_result: Optional[OnText],
+        cancel: Optional[CancellationToken],
+    ) -> bool:
+        """Feed a recorded call through the same dispatch as a live one."""
+        state = _TurnState()
+        coalescer = (ChunkCoalescer(on_chunk, self.chunk_delay, self.chunk_max_chars, flush_on_stall=True)
+                     if on_chunk else None)
+        try:
+            for delay, line in recording.timed_lines(self.cassette.speed):
+                if delay > 0:
+                    time.sleep(delay)
+                if cancel is not None and cancel.cancelled:
+                    self.last_error = "cancelled"
+                    return False
+                self._dispatch(self._translate(decode_line(line), state), coalescer, on_user, on_result)
+        finally:
+            if coalescer is not None:
+                coalescer.close()
+        if recording.returncode != 0:
+            self.last_error = f"cursor-agent exited with code {recording.returncode}"
             return False
+        self._context = recording.key
+        return True
+
+    async def _areplay(self, recording: Recording) -> AsyncIterator[AgentEvent]:
+        state = _TurnState()
+        for delay, line in recording.timed_lines(self.cassette.speed):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            event = self._translate(decode_line(line), state)
+            if event is not None:
+                yield event
+        if recording.returncode != 0:
+            self.last_error = f"cursor-agent exited with code {recording.returncode}"
+            yield StreamError(self.last_error, recording.returncode)
+            return
+        self._context = recording.key
+
+    def _turn_completed(self, recorder: Optional[Recorder], returncode: int) -> None:
+        """Advance the cassette context after a successful live call (and store its recording)."""
+        if recorder is not None:
+            recorder.save(returncode)
+            self._context = recorder.recording.key
+
+    def _command(self, prompt: str) -> List[str]:
+        if not self._session_id:
+            return [agent_bin(), prompt, *_STREAM_FLAGS]
+        return [agent_bin(), "--resume", self._session_id, prompt, *_STREAM_FLAGS]
+
+    def _translate(self, event: Optional[StreamEvent], state: _TurnState) -> Optional[AgentEvent]:
+        """Decoded line -> typed event (tracks the session id; None for lines callers never see)."""
+        if event is None:
+            return None
+        state.events += 1
+
+        # Capture/verify session id
+        event_sid = event.session_id
+        if self._session_id is None and event_sid:
+            self._session_id = event_sid
+        if self._session_id is not None and event_sid and event_sid != self._session_id:
+            # Ignore events from other sessions
+            return None
+
+        kind = event.kind
+        if kind == ASSISTANT:
+            return AssistantChunk(event.text) if event.text else None
+        if kind == USER:
+            if state.printed_user:
+                return None
+            state.printed_user = True
+            return UserEvent(event.text)
+        if kind == RESULT:
+            return ResultEvent(event.text)
+        return None
+
+    def _send_warm(
+        self,
+        pool: WarmProcessPool,
+        proc: subprocess.Popen,
+        prompt: str,
+        on_user: Optional[OnText],
+        on_chunk: Optional[OnText],
+        on_result: Optional[OnText],
+        limits: tuple,
+        recorder: Optional[Recorder] = None,
+    ) -> Optional[bool]:
+        """Run the prompt on a warm process; None means "nothing happened, retry cold"."""
+        had_session = self._session_id is not None
+        try:
+            with proc:
+                assert proc.stdin is not None
+                proc.stdin.write(prompt.encode("utf-8"))
+                proc.stdin.close()
+                ok, events, aborted = self._consume(proc, on_user, on_chunk, on_result, limits, recorder)
+        except Exception:
+            _kill(proc)
+            ok, events, aborted = False, 0, None
+        # Deadline/idle/cancel/preemption is not the pool's fault and is not retried;
+        # a warm process that exits with an error before any output is counted
+        # against the pool and retried cold
+        pool.report(ok or events > 0 or aborted is not None)
+        if not ok and events == 0 and aborted is None:
+            self.last_error = None
+            self.last_stderr = []
+            return None
+        if not had_session and self._session_id is not None:
+            pool.prewarm(self._session_id)
+        return ok
+
+    def _consume(
+        self,
+        proc: subprocess.Popen,
+        on_user: Optional[OnText],
+        on_chunk: Optional[OnText],
+        on_result: Optional[OnText],
+        limits: tuple,
+        recorder: Optional[Recorder] = None,
+    ) -> Tuple[bool, int, Optional[str]]:
+        """Read stream-json events until the process exits.
+
+        Returns (ok, events seen, watchdog abort reason or None).
+
+        Callbacks are a thin dispatch over the same typed events `astream` yields.
+        """
+        assert proc.stdout is not None
+        state = _TurnState()
+        coalescer = (ChunkCoalescer(on_chunk, self.chunk_delay, self.chunk_max_chars, flush_on_stall=True)
+                     if on_chunk else None)
+        watch = _StreamWatch(proc, *limits)
+        try:
+            for line in proc.stdout:
+                watch.touch()
+                if recorder is not None:
+                    recorder.add(line)
+                self._dispatch(self._translate(decode_line(line), state), coalescer, on_user, on_result)
+            # stdout closed; the watchdog still bounds a process that lingers after that
+            returncode = proc.wait()
+        finally:
+            watch.stop()
+            if coalescer is not None:
+                coalescer.close()
+            self.last_stderr = list(watch.stderr)
+        events = state.events
+
+        if watch.reason is not None:
+            self.last_error = watch.reason
+            return False, events, watch.reason
+        if returncode != 0:
+            self.last_error = f"cursor-agent exited with code {returncode}"
+            return False, events, None
+        self._turn_completed(recorder, returncode)
+        return True, events, None
+
+    @staticmethod
+    def _dispatch(
+        event: Optional[AgentEvent],
+        coalescer: Optional[ChunkCoalescer],
+        on_user: Optional[OnText],
+        on_result: Optional[OnText],
+    ) -> None:
+        if event is None:
+            return
+        if isinstance(event, AssistantChunk):
+            if coalescer is not None:
+                coalescer.push(event.text)
+        elif isinstance(event, UserEvent):
+            if event.text and on_user:
+                on_user(event.text)
+        elif isinstance(event, ResultEvent):
+            if coalescer is not None:
+                coalescer.flush()
+            if on_result:
+                on_result(event.text)
 
     def attach_session(self, session_id: str) -> None:
         """Attach to an existing cursor-agent session by id for future resumes."""
         self._session_id = session_id
+        self._context = f"session:{session_id}"
+        if self._warm_pool is not None:
+            self._warm_pool.prewarm(session_id)
 
     def get_session_id(self) -> Optional[str]:
         """Return the currently attached/learned session_id, if any."""
@@ -137,63 +943,28 @@ class CursorAgentClient:
         return self._session_id
 
 
-def _extract_text(obj: Any) -> str:
-    if isinstance(obj, dict):
-        if isinstance(obj.get("message"), dict):
-            return _extract_text(obj["message"])
-        if isinstance(obj.get("content"), str):
-            return obj.get("content")
-        if isinstance(obj.get("content"), list):
-            parts = []
-            for it in obj.get("content"):
-                t = _extract_text(it)
-                if t:
-                    parts.append(t)
-            return "".join(parts)
-        for key in ("text", "message", "data"):
-            v = obj.get(key)
-            t = _extract_text(v)
-            if t:
-                return t
-    elif isinstance(obj, list):
-        parts = [_extract_text(it) for it in obj]
-        parts = [p for p in parts if p]
-        return "\n".join(parts)
-    elif isinstance(obj, str):
-        return obj
-    return ""
-
-
-def _is_user_event(obj: Any) -> bool:
-    if isinstance(obj, dict):
-        if obj.get("type") == "user":
-            return True
-        msg = obj.get("message")
-        if isinstance(msg, dict) and msg.get("role") == "user":
-            return True
-    return False
-
-
-def _is_assistant_event(obj: Any) -> bool:
-    if isinstance(obj, dict):
-        if obj.get("type") == "assistant":
-            return True
-        msg = obj.get("message")
-        if isinstance(msg, dict) and msg.get("role") == "assistant":
-            return True
-    return False
-
-
-_GLOBAL_CLIENT: Optional[CursorAgentClient] = None
-
-
 def get_global_cursor_client() -> CursorAgentClient:
-    global _GLOBAL_CLIENT
-    if _GLOBAL_CLIENT is None:
-        _GLOBAL_CLIENT = CursorAgentClient()
-    return _GLOBAL_CLIENT
-
-
-__all__ = ["CursorAgentClient", "get_global_cursor_client"]
+    """Client of the interactive conversation.
+
+    Concurrent callers should go through `session_manager.get_session_manager()`
+    leases instead, which serialize requests per conversation.
+    """
+    from .session_manager import INTERACTIVE, get_session_manager
+    return get_session_manager().session(INTERACTIVE).client
+
+
+__all__ = [
+    "AgentEvent",
+    "AssistantChunk",
+    "CancellationToken",
+    "CursorAgentClient",
+    "ResultEvent",
+    "StreamError",
+    "UserEvent",
+    "WarmProcessPool",
+    "agent_bin",
+    "get_global_cursor_client",
+    "get_warm_pool",
+]
 
 
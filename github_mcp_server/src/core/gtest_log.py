@@ -0,0 +1,218 @@
+"""
+🧾 GTest Log Scanner - быстрый разбор больших логов gtest/buffer_runner
+
+Логи `make all-tests` и `buffer_runner` бывают многогигабайтными. Файл
+отображается в память (mmap) и сканируется заранее скомпилированными
+байтовыми регулярными выражениями; записи отдаются генератором, поэтому
+память не зависит от размера лога (в памяти только текущий тест и
+ограниченный хвост его вывода).
+
+Оба выражения начинаются с литерала (`\\n[` и ` items/sec`), поэтому re
+ищет кандидатов быстрым поиском подстроки, а не пробует совпадение с
+каждой позиции — на порядок быстрее одного общего выражения с
+альтернативами.
+
+Распознаются:
+- блоки gtest `[ RUN      ]` … `[       OK ]` / `[  FAILED  ]` / `[  SKIPPED ]`
+  (тест без завершающей строки — "INCOMPLETE", например при падении процесса);
+- строки `[SMART] ...` из simple_smart_gtest (включая `Test completed: ... - STATUS (N ms)`);
+- строки пропускной способности `... N items/sec`.
+
+Модуль не зависит от остальных частей пакета и используется инструментами
+tests/smart_gtest (LogScanTool). Ambient агент разбирает логи джоб GitHub
+Actions через prompt_budget: они приходят уже обрезанными до max_log_bytes
+и с префиксом времени в каждой строке, так что mmap-сканер там не нужен.
+"""
+
+import heapq
+import mmap
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+_BRACKET_BODY = (
+    rb"\[(?: *(?P<tag>RUN|OK|FAILED|SKIPPED) *\] (?P<test>[\w/.]+)(?:[^\n(]*\((?P<ms>\d+) ms\))?[^\n]*"
+    rb"|SMART\] (?P<smart>[^\n]*))"
+)
+_FIRST_LINE_RE = re.compile(_BRACKET_BODY)
+_BRACKET_RE = re.compile(rb"\n" + _BRACKET_BODY)
+_RATE_MARK_RE = re.compile(rb" items/sec")
+_RATE_VALUE_RE = re.compile(rb"(\d+(?:\.\d+)?(?:[eE][+-]?\d+)?) items/sec")
+_SMART_COMPLETED_RE = re.compile(r"Test completed: ([\w/.]+) - (\w+) \((\d+)\s*ms\)")
+
+_STATUS_BY_TAG = {b"OK": "PASSED", b"FAILED": "FAILED", b"SKIPPED": "SKIPPED"}
+
+
+@dataclass
+class LogRecord:
+    """Структурированная запись лога"""
+    kind: str                      # "test" | "smart" | "throughput"
+    offset: int                    # смещение начала строки в файле
+    test: Optional[str] = None
+    status: Optional[str] = None   # PASSED / FAILED / SKIPPED / INCOMPLETE
+    duration_ms: Optional[int] = None
+    text: str = ""                 # вывод упавшего теста, текст [SMART] или строка с items/sec
+    value: Optional[float] = None  # items/sec для throughput
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _iter_matches(buf, with_rates: bool) -> Iterator[Tuple[int, Optional["re.Match"]]]:
+    """
+    Совпадения строк с тегами в порядке следования: (начало строки, match)
+
+    Строки с items/sec отдаются как (начало строки, None); оба поиска идут
+    лениво и сливаются по смещению, так что файл читается последовательно.
+    """
+    def brackets():
+        first = _FIRST_LINE_RE.match(buf)
+        if first is not None:
+            yield 0, first
+        for match in _BRACKET_RE.finditer(buf):
+            yield match.start() + 1, match
+
+    def rates():
+        last_line = -1
+        for match in _RATE_MARK_RE.finditer(buf):
+            line_start = buf.rfind(b"\n", 0, match.start()) + 1
+            if line_start != last_line:  # одна запись на строку
+                last_line = line_start
+                yield line_start, None
+
+    if not with_rates:
+        yield from brackets()
+        return
+    yield from heapq.merge(brackets(), rates(), key=lambda item: item[0])
+
+
+def scan_buffer(buf: Union[bytes, mmap.mmap],
+                kinds: Optional[Sequence[str]] = None,
+                max_failure_bytes: int = 16 * 1024,
+                progress: Optional[Callable[[int], None]] = None) -> Iterator[LogRecord]:
+    """
+    Сканирует буфер (bytes или mmap) и отдаёт записи по мере нахождения
+
+    Args:
+        buf: Содержимое лога
+        kinds: Какие виды записей отдавать (None — все)
+        max_failure_bytes: Сколько последних байт вывода упавшего теста сохранять
+        progress: Вызывается со смещением текущей строки (байты до
+                  offset - max_failure_bytes больше не читаются)
+    """
+    wanted = set(kinds) if kinds else {"test", "smart", "throughput"}
+    current: Optional[bytes] = None  # имя открытого теста
+    current_body = 0                 # смещение начала его вывода
+    current_offset = 0
+
+    def _body(end: int) -> str:
+        start = max(current_body, end - max_failure_bytes)
+        return _decode(bytes(buf[start:end])).replace("\r\n", "\n").strip("\r\n")
+
+    for line_start, match in _iter_matches(buf, "throughput" in wanted):
+        if progress is not None:
+            progress(line_start)
+        if match is None:
+            line_end = buf.find(b"\n", line_start)
+            line = bytes(buf[line_start:len(buf) if line_end < 0 else line_end])
+            for rate in _RATE_VALUE_RE.finditer(line):
+                yield LogRecord(kind="throughput", offset=line_start, text=_decode(line).strip(),
+                                value=float(rate.group(1)))
+            continue
+        tag = match.group("tag")
+        if tag is not None:
+            test = match.group("test")
+            if tag == b"RUN":
+                if current is not None and "test" in wanted:
+                    yield LogRecord(kind="test", offset=current_offset, test=_decode(current),
+                                    status="INCOMPLETE", text=_body(line_start))
+                current, current_body, current_offset = test, match.end() + 1, line_start
+                continue
+            if current is None or test != current:
+                # Строки итоговой сводки gtest ("[  FAILED  ] Suite.Test" после прогона)
+                continue
+            if "test" in wanted:
+                status = _STATUS_BY_TAG[tag]
+                ms = match.group("ms")
+                yield LogRecord(kind="test", offset=current_offset, test=_decode(test), status=status,
+                                duration_ms=int(ms) if ms is not None else None,
+                                text=_body(line_start) if status == "FAILED" else "")
+            current = None
+        elif "smart" in wanted:
+            text = _decode(match.group("smart")).strip()
+            record = LogRecord(kind="smart", offset=line_start, text=text)
+            completed = _SMART_COMPLETED_RE.search(text)
+            if completed:
+                record.test, record.status, record.duration_ms = completed.group(1), completed.group(2), int(completed.group(3))
+            yield record
+
+    if current is not None and "test" in wanted:
+        yield LogRecord(kind="test", offset=current_offset, test=_decode(current),
+                        status="INCOMPLETE", text=_body(len(buf)))
+
+
+def iter_log_records(path: Union[str, Path],
+                     kinds: Optional[Sequence[str]] = None,
+                     max_failure_bytes: int = 16 * 1024,
+                     release_every: int = 64 * 1024 * 1024) -> Iterator[LogRecord]:
+    """
+    Отображает файл лога в память и отдаёт записи генератором
+
+    Уже просмотренные страницы периодически отдаются ядру (MADV_DONTNEED),
+    так что резидентная память не растёт с размером файла.
+
+    Args:
+        path: Путь к логу
+        kinds: Какие виды записей отдавать ("test", "smart", "throughput"; None — все)
+        max_failure_bytes: Сколько последних байт вывода упавшего теста сохранять
+        release_every: Шаг (байт), с которым освобождаются просмотренные страницы
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # пустой файл нельзя отобразить в память
+        released = 0
+        can_release = hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+
+        def _release(offset: int) -> None:
+            nonlocal released
+            limit = offset - max_failure_bytes - release_every
+            if limit > released:
+                end = limit - limit % mmap.PAGESIZE
+                mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+                released = end
+
+        try:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield from scan_buffer(mm, kinds, max_failure_bytes, _release if can_release else None)
+        finally:
+            mm.close()
+
+
+def summarize_log(path: Union[str, Path], max_failures: int = 50) -> Dict[str, object]:
+    """
+    Сводка по логу за один проход: счётчики статусов, упавшие тесты и items/sec
+
+    Returns:
+        Dict: {"statuses": {...}, "failures": [LogRecord], "throughput": {"count", "min", "max", "avg"}}
+    """
+    statuses: Dict[str, int] = {}
+    failures: List[LogRecord] = []
+    count, total = 0, 0.0
+    low = high = None
+    for record in iter_log_records(path, kinds=("test", "throughput")):
+        if record.kind == "test":
+            statuses[record.status] = statuses.get(record.status, 0) + 1
+            if record.status in ("FAILED", "INCOMPLETE") and len(failures) < max_failures:
+                failures.append(record)
+        else:
+            count += 1
+            total += record.value
+            low = record.value if low is None else min(low, record.value)
+            high = record.value if high is None else max(high, record.value)
+    throughput = {"count": count, "min": low, "max": high, "avg": (total / count) if count else None}
+    return {"statuses": statuses, "failures": failures, "throughput": throughput}
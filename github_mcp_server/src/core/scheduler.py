@@ -0,0 +1,341 @@
+"""
+Invocation scheduler for cursor-agent processes.
+
+Every live cursor-agent call (interactive prompts, ambient analyses, batch
+queries such as check_cicd.py, preflight pings) takes a slot here first:
+
+- a global cap limits how many cursor-agent processes run at once;
+- waiting calls are served by priority class (interactive, then ambient,
+  then batch) and FIFO within a class;
+- each class may have a token-bucket budget (calls per minute with a burst),
+  so a CI storm defers ambient work instead of saturating the machine;
+- when an interactive or ambient call waits on a full cap, a running
+  preemptible call (batch by default) is cancelled through its cancellation
+  token; its caller sees the call fail with `Ticket.preempted` set.
+
+Callers get their queue position and wait time through `on_wait(position,
+waited)` and `Ticket.waited`.
+
+Configuration: CURSOR_AGENT_MAX_CONCURRENT (default 2),
+CURSOR_AGENT_RATE_AMBIENT and CURSOR_AGENT_RATE_BATCH (calls per minute,
+0 means unlimited; defaults 30 and 10), CURSOR_AGENT_BURST_AMBIENT and
+CURSOR_AGENT_BURST_BATCH (back-to-back calls; default rate / 6, i.e. 5 and 1).
+
+Every call takes one token, including each part of a fanned-out request: a PR
+review split into N parts spends N ambient tokens, so parts beyond the burst
+wait 60 / rate seconds each and CI analyses queued behind them wait as well.
+Raise the ambient burst for large PRs, or give benchmarks and tests their own
+`InvocationScheduler()` (no budgets) instead of the process-wide one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+INTERACTIVE = 0
+AMBIENT = 1
+BATCH = 2
+CLASS_NAMES = {INTERACTIVE: "interactive", AMBIENT: "ambient", BATCH: "batch"}
+
+OnWait = Callable[[int, float], None]
+
+WAITING = "waiting"
+RUNNING = "running"
+DONE = "done"
+
+
+class TokenBucket:
+    """`rate` calls per minute on average, at most `burst` back to back."""
+
+    def __init__(self, rate_per_min: float, burst: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def ready(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= 1.0
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1.0
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until the next token (0 if one is available)."""
+        self._refill(now)
+        if self._tokens >= 1.0:
+            return 0.0
+        return (1.0 - self._tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class Ticket:
+    """One call's place in the scheduler."""
+
+    def __init__(self, priority: int, seq: int, cancel: Any, now: float) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.cancel = cancel            # CancellationToken-like: cancel(), cancelled
+        self.state = WAITING
+        self.enqueued_at = now
+        self.granted_at: Optional[float] = None
+        self.preempted = False
+
+    @property
+    def granted(self) -> bool:
+        return self.state == RUNNING
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent in the queue (so far, if still waiting)."""
+        end = self.granted_at if self.granted_at is not None else time.monotonic()
+        return max(0.0, end - self.enqueued_at)
+
+    def sort_key(self) -> Tuple[int, int]:
+        return self.priority, self.seq
+
+
+class InvocationScheduler:
+    """Priority queue with a global concurrency cap and per-class budgets."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        budgets: Optional[Dict[int, Tuple[float, int]]] = None,
+        preemptible: Tuple[int, ...] = (BATCH,),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            max_concurrent: Maximum number of cursor-agent calls running at once
+            budgets: {class: (calls per minute, burst)}; classes without a budget are unlimited
+            preemptible: Classes whose running calls may be cancelled for higher classes
+            clock: Time source (monotonic seconds)
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.preemptible = set(preemptible)
+        self._clock = clock
+        self._buckets = {cls: TokenBucket(rate, burst, clock) for cls, (rate, burst) in (budgets or {}).items()
+                         if rate > 0}
+        self._waiting: List[Ticket] = []
+        self._running: List[Ticket] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"granted": 0, "preempted": 0, "abandoned": 0, "wait_total": 0.0}
+
+    def submit(self, priority: int, cancel: Any = None) -> Ticket:
+        """Queue a call; it may be granted immediately."""
+        with self._cond:
+            ticket = Ticket(priority, next(self._seq), cancel, self._clock())
+            self._waiting.append(ticket)
+            self._waiting.sort(key=Ticket.sort_key)
+            self._schedule_locked()
+            return ticket
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None, on_wait: Optional[OnWait] = None) -> bool:
+        """Block until the ticket runs; False on timeout or when its cancel token fires.
+
+        On False the ticket is withdrawn; on True the caller must `release()` it.
+        """
+        expires = None if timeout is None else self._clock() + timeout
+        cancel = ticket.cancel
+        wake = self._notify
+        if cancel is not None:
+            cancel.add_callback(wake)
+        try:
+            with self._cond:
+                reported = 0
+                while True:
+                    self._schedule_locked()
+                    if ticket.state == RUNNING:
+                        return True
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    now = self._clock()
+                    if expires is not None and now >= expires:
+                        break
+                    position = self._position_locked(ticket)
+                    if on_wait is not None and position != reported:
+                        reported = position
+                        on_wait(position, now - ticket.enqueued_at)
+                    pause = self._next_refill_locked(now)
+                    if expires is not None:
+                        pause = min(pause, expires - now)
+                    self._cond.wait(timeout=pause)
+                self._withdraw_locked(ticket)
+                return False
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(wake)
+
+    async def wait_async(
+        self,
+        ticket: Ticket,
+        timeout: Optional[float] = None,
+        on_wait: Optional[OnWait] = None,
+        poll: float = 0.05,
+    ) -> bool:
+        """`wait` for asyncio code; polls so cancelling the task never leaks a slot."""
+        expires = None if timeout is None else self._clock() + timeout
+        reported = 0
+        try:
+            while True:
+                with self._cond:
+                    self._schedule_locked()
+                    if ticket.state == RUNNING:
+                        return True
+                    now = self._clock()
+                    if (ticket.cancel is not None and ticket.cancel.cancelled) or (
+                            expires is not None and now >= expires):
+                        self._withdraw_locked(ticket)
+                        return False
+                    position = self._position_locked(ticket)
+                if on_wait is not None and position != reported:
+                    reported = position
+                    on_wait(position, now - ticket.enqueued_at)
+                await asyncio.sleep(poll)
+        except asyncio.CancelledError:
+            self.release(ticket)
+            raise
+
+    def release(self, ticket: Ticket) -> None:
+        """Free the ticket's slot (or withdraw it if it is still waiting)."""
+        with self._cond:
+            if ticket.state == RUNNING:
+                self._running.remove(ticket)
+                ticket.state = DONE
+            elif ticket.state == WAITING:
+                self._withdraw_locked(ticket)
+            self._schedule_locked()
+            self._cond.notify_all()
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place among waiting calls (0 once running)."""
+        with self._cond:
+            return self._position_locked(ticket)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "running": dict(Counter(CLASS_NAMES.get(t.priority, str(t.priority)) for t in self._running)),
+                "waiting": dict(Counter(CLASS_NAMES.get(t.priority, str(t.priority)) for t in self._waiting)),
+                **self.stats,
+            }
+
+    def _notify(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _withdraw_locked(self, ticket: Ticket) -> None:
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            ticket.state = DONE
+            self.stats["abandoned"] += 1
+            self._cond.notify_all()
+
+    def _position_locked(self, ticket: Ticket) -> int:
+        if ticket.state != WAITING:
+            return 0
+        return 1 + sum(1 for w in self._waiting if w.sort_key() < ticket.sort_key())
+
+    def _next_refill_locked(self, now: float) -> float:
+        """How long a waiter may sleep before a budget refill could change the schedule."""
+        pause = 1.0
+        for w in self._waiting:
+            bucket = self._buckets.get(w.priority)
+            if bucket is not None:
+                pause = min(pause, max(0.01, bucket.wait_time(now)))
+        return pause
+
+    def _schedule_locked(self) -> None:
+        now = self._clock()
+        granted = False
+        while len(self._running) < self.max_concurrent:
+            ticket = next((w for w in self._waiting if self._ready(w, now)), None)
+            if ticket is None:
+                break
+            bucket = self._buckets.get(ticket.priority)
+            if bucket is not None:
+                bucket.take(now)
+            self._waiting.remove(ticket)
+            ticket.state = RUNNING
+            ticket.granted_at = now
+            self._running.append(ticket)
+            self.stats["granted"] += 1
+            self.stats["wait_total"] += now - ticket.enqueued_at
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        self._preempt_locked(now)
+
+    def _ready(self, ticket: Ticket, now: float) -> bool:
+        bucket = self._buckets.get(ticket.priority)
+        return bucket is None or bucket.ready(now)
+
+    def _preempt_locked(self, now: float) -> None:
+        """Cancel one running low-priority call for the best ready waiter on a full cap."""
+        if len(self._running) < self.max_concurrent:
+            return
+        top = next((w for w in self._waiting if self._ready(w, now)), None)
+        if top is None or any(r.preempted for r in self._running):
+            return  # nothing to make room for, or a preempted call is still shutting down
+        victims = [r for r in self._running
+                   if r.priority in self.preemptible and r.priority > top.priority and r.cancel is not None]
+        if not victims:
+            return
+        victim = max(victims, key=lambda r: (r.priority, r.granted_at or 0.0))
+        victim.preempted = True
+        self.stats["preempted"] += 1
+        victim.cancel.cancel()
+
+
+def _env_rate(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+_SCHEDULER: Optional[InvocationScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> InvocationScheduler:
+    """Process-wide scheduler configured from CURSOR_AGENT_MAX_CONCURRENT / CURSOR_AGENT_RATE_*."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            try:
+                cap = int(os.environ.get("CURSOR_AGENT_MAX_CONCURRENT", "2") or 2)
+            except ValueError:
+                cap = 2
+            budgets = {}
+            for cls, name, default in ((AMBIENT, "AMBIENT", 30.0), (BATCH, "BATCH", 10.0)):
+                rate = _env_rate(f"CURSOR_AGENT_RATE_{name}", default)
+                burst = _env_rate(f"CURSOR_AGENT_BURST_{name}", rate // 6)
+                budgets[cls] = (rate, max(1, int(burst)))
+            _SCHEDULER = InvocationScheduler(max_concurrent=cap, budgets=budgets)
+        return _SCHEDULER
+
+
+__all__ = [
+    "AMBIENT",
+    "BATCH",
+    "CLASS_NAMES",
+    "INTERACTIVE",
+    "InvocationScheduler",
+    "Ticket",
+    "TokenBucket",
+    "get_scheduler",
+]
@@ -0,0 +1,221 @@
+"""
+Session manager that leases separate cursor-agent conversations per logical
+consumer (interactive UI, ambient CI analysis, ambient PR review).
+
+Each session owns its own CursorAgentClient and therefore its own
+`session_id`. Requests to the same session are serialized (resumes of one
+conversation must not interleave), while different sessions run in
+parallel. The number of live sessions is capped; idle, unpinned sessions
+are reaped so long-running ambient conversations do not grow forever.
+The interactive session's calls run in the scheduler's interactive class,
+all other sessions in the ambient class.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from . import scheduler
+from .cursor_client import CursorAgentClient, OnText
+
+
+INTERACTIVE = "interactive"
+AMBIENT_CI = "ambient-ci"
+AMBIENT_PR = "ambient-pr"
+
+# Scheduler class per session name; unnamed sessions are ambient
+SESSION_PRIORITY = {INTERACTIVE: scheduler.INTERACTIVE}
+
+
+class AgentSession:
+    """One logical conversation: a client plus the lock that serializes its requests."""
+
+    def __init__(self, name: str, client: CursorAgentClient) -> None:
+        self.name = name
+        self.client = client
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.leases = 0  # active + waiting leases; guarded by the manager lock
+
+    def send_stream(
+        self,
+        prompt: str,
+        on_user: Optional[OnText] = None,
+        on_chunk: Optional[OnText] = None,
+        on_result: Optional[OnText] = None,
+        **options: Any,
+    ) -> bool:
+        """Send on this session's client; callers must hold a lease.
+
+        `options` are passed to CursorAgentClient.send_stream (deadline, idle_timeout, cancel, on_queue).
+        """
+        return self.client.send_stream(prompt, on_user=on_user, on_chunk=on_chunk, on_result=on_result, **options)
+
+    def get_session_id(self) -> Optional[str]:
+        return self.client.get_session_id()
+
+
+class SessionManager:
+    """Leases per-conversation sessions with a cap and idle reaping."""
+
+    def __init__(
+        self,
+        max_sessions: int = 8,
+        idle_ttl: float = 1800.0,
+        pinned: tuple = (INTERACTIVE,),
+        client_factory: Callable[[], CursorAgentClient] = CursorAgentClient,
+    ) -> None:
+        """
+        Args:
+            max_sessions: Maximum number of live sessions; new ones wait for a free slot
+            idle_ttl: Seconds of inactivity after which an unpinned session is reaped
+            pinned: Session names that are never reaped or evicted
+            client_factory: Creates the client of a new session
+        """
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self.pinned = set(pinned)
+        self._client_factory = client_factory
+        self._sessions: Dict[str, AgentSession] = {}
+        self._cond = threading.Condition()
+
+    def session(self, name: str) -> AgentSession:
+        """Return (creating if needed) the session without leasing it."""
+        with self._cond:
+            return self._get_or_create_locked(name)
+
+    @contextmanager
+    def lease(self, name: str, timeout: Optional[float] = None) -> Iterator[AgentSession]:
+        """Exclusive use of a session; other sessions stay usable meanwhile.
+
+        Raises:
+            TimeoutError: The session was not free within `timeout` seconds
+        """
+        with self._cond:
+            session = self._get_or_create_locked(name)
+            session.leases += 1
+        try:
+            if not session.lock.acquire(timeout=-1 if timeout is None else timeout):
+                raise TimeoutError(f"cursor-agent session '{name}' is busy")
+            try:
+                yield session
+            finally:
+                session.last_used = time.monotonic()
+                session.lock.release()
+        finally:
+            with self._cond:
+                session.leases -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def alease(self, name: str, poll: float = 0.05) -> AsyncIterator[AgentSession]:
+        """`lease` for asyncio code: waits for the session without blocking the event loop.
+
+        The lock is polled rather than acquired in an executor thread, so
+        cancelling the waiting task can never leave the lock held.
+        """
+        with self._cond:
+            session = self._get_or_create_locked(name)
+            session.leases += 1
+        try:
+            while not session.lock.acquire(blocking=False):
+                await asyncio.sleep(poll)
+            try:
+                yield session
+            finally:
+                session.last_used = time.monotonic()
+                session.lock.release()
+        finally:
+            with self._cond:
+                session.leases -= 1
+                self._cond.notify_all()
+
+    def send_stream(
+        self,
+        name: str,
+        prompt: str,
+        on_user: Optional[OnText] = None,
+        on_chunk: Optional[OnText] = None,
+        on_result: Optional[OnText] = None,
+        **options: Any,
+    ) -> bool:
+        """Send a prompt into the named conversation (serialized per session)."""
+        cancel = options.get("cancel")
+        if cancel is not None and cancel.cancelled:
+            return False
+        with self.lease(name) as session:
+            return session.send_stream(prompt, on_user=on_user, on_chunk=on_chunk, on_result=on_result, **options)
+
+    def attach(self, name: str, session_id: str) -> None:
+        """Bind the named conversation to an existing cursor-agent session id."""
+        with self.lease(name) as session:
+            session.client.attach_session(session_id)
+
+    def reap_idle(self, now: Optional[float] = None) -> int:
+        """Drop unpinned sessions idle for longer than idle_ttl; returns how many were dropped."""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            stale = [
+                name for name, s in self._sessions.items()
+                if name not in self.pinned and s.leases == 0 and now - s.last_used > self.idle_ttl
+            ]
+            for name in stale:
+                del self._sessions[name]
+            if stale:
+                self._cond.notify_all()
+        return len(stale)
+
+    def names(self) -> list:
+        with self._cond:
+            return list(self._sessions)
+
+    def _get_or_create_locked(self, name: str) -> AgentSession:
+        while True:
+            session = self._sessions.get(name)
+            if session is not None:
+                return session
+            if len(self._sessions) < self.max_sessions or self._evict_one_locked():
+                client = self._client_factory()
+                client.priority = SESSION_PRIORITY.get(name, scheduler.AMBIENT)
+                session = AgentSession(name, client)
+                self._sessions[name] = session
+                return session
+            # Every slot is pinned or in use: wait until a lease ends or a session is reaped
+            self._cond.wait()
+
+    def _evict_one_locked(self) -> bool:
+        idle = [
+            (s.last_used, name) for name, s in self._sessions.items()
+            if name not in self.pinned and s.leases == 0
+        ]
+        if not idle:
+            return False
+        del self._sessions[min(idle)[1]]
+        return True
+
+
+_MANAGER: Optional[SessionManager] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_session_manager() -> SessionManager:
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = SessionManager()
+        return _MANAGER
+
+
+__all__ = [
+    "AMBIENT_CI",
+    "AMBIENT_PR",
+    "INTERACTIVE",
+    "SESSION_PRIORITY",
+    "AgentSession",
+    "SessionManager",
+    "get_session_manager",
+]
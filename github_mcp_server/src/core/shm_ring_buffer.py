@@ -0,0 +1,242 @@
+"""
+🍩 Shared-memory Ring Buffer - кольцевой буфер между Python-процессами
+
+Python-аналог LockFreeRingBuffer из src/ringbuffer: слоты фиксированного
+размера в multiprocessing.shared_memory и публикация через sequence-номер
+слота (seq == pos — слот свободен для записи, seq == pos + 1 — данные
+опубликованы, после чтения seq = pos + capacity).
+
+Режимы:
+- "spsc": один продюсер и один потребитель, без блокировок вообще;
+- "mpmc": захват позиции (head/tail) сериализуется межпроцессным Lock
+  (в Python нет CAS над разделяемой памятью), а копирование данных и
+  публикация идут без блокировки — как в C++ версии после compare_exchange.
+
+Чтение возможно без копирования через read_view() (memoryview на слот).
+
+Примечание: порядок записей «данные → seq» полагается на то, что CPython
+выполняет записи в память в программном порядке; на x86 (TSO) этого
+достаточно, на слабых моделях памяти используйте режим "mpmc".
+"""
+
+import struct
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, Optional
+
+_MAGIC = 0x44524231  # "DRB1"
+_META = struct.Struct("<IIQQI")  # magic, version, capacity, slot_size, mode
+_U64 = struct.Struct("<Q")
+_SLOT_HEADER = struct.Struct("<QI")  # sequence, payload length
+_U32 = struct.Struct("<I")
+
+_TAIL_OFFSET = 64
+_HEAD_OFFSET = 128
+_SLOTS_OFFSET = 192
+_CACHE_LINE = 64
+
+_MODES = {"spsc": 0, "mpmc": 1}
+
+
+class ShmRingBuffer:
+    """Кольцевой буфер сообщений bytes в разделяемой памяти"""
+
+    def __init__(self, name: Optional[str] = None, capacity: int = 1024, slot_size: int = 4096,
+                 mode: str = "spsc", create: bool = True, lock=None):
+        """
+        Args:
+            name: Имя сегмента shared memory (None — сгенерировать)
+            capacity: Число слотов (степень двойки)
+            slot_size: Максимальный размер сообщения в байтах
+            mode: "spsc" или "mpmc"
+            create: Создать сегмент (True) или подключиться к существующему
+            lock: multiprocessing.Lock, общий для всех процессов (обязателен для "mpmc")
+        """
+        if create:
+            if capacity <= 0 or capacity & (capacity - 1):
+                raise ValueError("capacity должна быть степенью двойки")
+            if mode not in _MODES:
+                raise ValueError(f"Неизвестный режим: {mode}")
+            stride = _align(_SLOT_HEADER.size + slot_size)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=_SLOTS_OFFSET + stride * capacity)
+            buf = self._shm.buf
+            _META.pack_into(buf, 0, _MAGIC, 1, capacity, slot_size, _MODES[mode])
+            _U64.pack_into(buf, _TAIL_OFFSET, 0)
+            _U64.pack_into(buf, _HEAD_OFFSET, 0)
+            for i in range(capacity):
+                _SLOT_HEADER.pack_into(buf, _SLOTS_OFFSET + i * stride, i, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name, create=False)
+            magic, _version, capacity, slot_size, mode_id = _META.unpack_from(self._shm.buf, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Сегмент {name} не является ShmRingBuffer")
+            mode = next(k for k, v in _MODES.items() if v == mode_id)
+
+        if mode == "mpmc" and lock is None:
+            raise ValueError('Режиму "mpmc" нужен общий multiprocessing.Lock')
+
+        self.name = self._shm.name
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.mode = mode
+        self._mask = capacity - 1
+        self._stride = _align(_SLOT_HEADER.size + slot_size)
+        self._lock = lock
+        self._buf: Optional[memoryview] = self._shm.buf
+        self._owner = create
+
+    @classmethod
+    def attach(cls, name: str, lock=None) -> "ShmRingBuffer":
+        """Подключается к буферу, созданному другим процессом"""
+        return cls(name=name, create=False, lock=lock)
+
+    # --- внутренние помощники ---
+
+    def _slot_offset(self, pos: int) -> int:
+        return _SLOTS_OFFSET + (pos & self._mask) * self._stride
+
+    def _load(self, offset: int) -> int:
+        return _U64.unpack_from(self._buf, offset)[0]
+
+    def _store(self, offset: int, value: int) -> None:
+        _U64.pack_into(self._buf, offset, value)
+
+    def _claim_produce(self) -> Optional[int]:
+        pos = self._load(_TAIL_OFFSET)
+        if self._load(self._slot_offset(pos)) != pos:
+            return None  # буфер полон
+        self._store(_TAIL_OFFSET, pos + 1)
+        return pos
+
+    def _claim_consume(self) -> Optional[int]:
+        pos = self._load(_HEAD_OFFSET)
+        if self._load(self._slot_offset(pos)) != pos + 1:
+            return None  # пусто (или продюсер ещё не опубликовал слот)
+        self._store(_HEAD_OFFSET, pos + 1)
+        return pos
+
+    # --- публичный API ---
+
+    def try_produce(self, payload) -> bool:
+        """
+        Пишет сообщение, не блокируясь
+
+        Returns:
+            bool: False если буфер полон
+        """
+        size = len(payload)
+        if size > self.slot_size:
+            raise ValueError(f"Сообщение {size} байт больше слота {self.slot_size}")
+        if self._lock is not None:
+            with self._lock:
+                pos = self._claim_produce()
+        else:
+            pos = self._claim_produce()
+        if pos is None:
+            return False
+        offset = self._slot_offset(pos)
+        data_at = offset + _SLOT_HEADER.size
+        self._buf[data_at:data_at + size] = payload
+        _U32.pack_into(self._buf, offset + _U64.size, size)
+        # Публикация: seq = pos + 1 после записи данных
+        self._store(offset, pos + 1)
+        return True
+
+    @contextmanager
+    def read_view(self) -> Iterator[Optional[memoryview]]:
+        """
+        Zero-copy чтение: отдаёт memoryview на данные слота (или None если пусто)
+
+        Слот освобождается для продюсеров при выходе из контекста, поэтому
+        view нельзя использовать за его пределами.
+        """
+        if self._lock is not None:
+            with self._lock:
+                pos = self._claim_consume()
+        else:
+            pos = self._claim_consume()
+        if pos is None:
+            yield None
+            return
+        offset = self._slot_offset(pos)
+        size = _SLOT_HEADER.unpack_from(self._buf, offset)[1]
+        data_at = offset + _SLOT_HEADER.size
+        view = self._buf[data_at:data_at + size]
+        try:
+            yield view
+        finally:
+            view.release()
+            self._store(offset, pos + self.capacity)
+
+    def try_consume(self) -> Optional[bytes]:
+        """Читает сообщение с копированием; None если буфер пуст"""
+        with self.read_view() as view:
+            return None if view is None else bytes(view)
+
+    def produce(self, payload, timeout: Optional[float] = None) -> bool:
+        """Пишет сообщение, ожидая место не дольше timeout секунд"""
+        backoff = _Backoff(timeout)
+        while not self.try_produce(payload):
+            if not backoff.wait():
+                return False
+        return True
+
+    def consume(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Читает сообщение, ожидая данные не дольше timeout секунд"""
+        backoff = _Backoff(timeout)
+        while True:
+            item = self.try_consume()
+            if item is not None or not backoff.wait():
+                return item
+
+    def __len__(self) -> int:
+        tail = self._load(_TAIL_OFFSET)
+        head = self._load(_HEAD_OFFSET)
+        return tail - head if tail >= head else 0
+
+    def close(self) -> None:
+        """Отключается от сегмента (данные остаются у других процессов)"""
+        if self._buf is not None:
+            self._buf.release()
+            self._buf = None
+            self._shm.close()
+
+    def unlink(self) -> None:
+        """Удаляет сегмент (вызывать в процессе-создателе после close)"""
+        self._shm.unlink()
+
+    def __enter__(self) -> "ShmRingBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        if self._owner:
+            try:
+                self.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _Backoff:
+    """Ожидание с нарастающей паузой: spin → sleep до 1 мс"""
+
+    __slots__ = ("deadline", "delay")
+
+    def __init__(self, timeout: Optional[float]):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.delay = 0.0
+
+    def wait(self) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return False
+        time.sleep(self.delay)
+        self.delay = min(0.001, self.delay * 2 or 0.00001)
+        return True
+
+
+def _align(size: int) -> int:
+    return (size + _CACHE_LINE - 1) // _CACHE_LINE * _CACHE_LINE
+
+
+__all__ = ["ShmRingBuffer"]
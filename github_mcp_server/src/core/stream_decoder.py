@@ -0,0 +1,232 @@
+"""
+Decoder for cursor-agent `--output-format stream-json` output.
+
+Each line is parsed once (with orjson when it is installed) and classified
+with a single look at `type` / `message.role`. Text is taken directly from
+the known shapes (`message.content` as a string or a list of text parts,
+`result`); only unknown shapes fall back to the generic recursive walk.
+
+ChunkCoalescer batches the many tiny assistant chunks into time- and
+size-bounded pieces, so downstream UI work happens per batch, not per token.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Union
+
+try:  # optional faster JSON backend
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    _orjson = None
+
+
+USER = "user"
+ASSISTANT = "assistant"
+RESULT = "result"
+OTHER = "other"
+
+JSON_BACKEND = "orjson" if _orjson is not None else "json"
+
+
+def loads(line: Union[str, bytes]) -> Any:
+    """Parse one JSON document with the fastest available backend."""
+    if _orjson is not None:
+        return _orjson.loads(line)
+    return json.loads(line)
+
+
+@dataclass
+class StreamEvent:
+    """One decoded stream-json line."""
+    kind: str                         # user | assistant | result | other
+    text: str = ""
+    session_id: Optional[str] = None
+    raw: Any = None
+
+
+def decode_line(line: Union[str, bytes]) -> Optional[StreamEvent]:
+    """Decode one stream-json line; None for blank or malformed lines."""
+    if not line or not line.strip():
+        return None
+    try:
+        obj = loads(line)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return StreamEvent(OTHER, raw=obj)
+
+    session_id = obj.get("session_id")
+    etype = obj.get("type")
+    message = obj.get("message")
+    role = message.get("role") if isinstance(message, dict) else None
+
+    if etype == USER or role == USER:
+        kind = USER
+    elif etype == ASSISTANT or role == ASSISTANT:
+        kind = ASSISTANT
+    elif etype == RESULT:
+        return StreamEvent(RESULT, obj.get("result") or "", session_id, obj)
+    else:
+        return StreamEvent(OTHER, session_id=session_id, raw=obj)
+    return StreamEvent(kind, _message_text(obj, message), session_id, obj)
+
+
+def _message_text(obj: dict, message: Any) -> str:
+    if isinstance(message, dict):
+        content = message.get("content")
+    else:
+        content = obj.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if isinstance(item, dict):
+                text = item.get("text")
+                if isinstance(text, str):
+                    if text:
+                        parts.append(text)
+                    continue
+            text = extract_text(item)
+            if text:
+                parts.append(text)
+        return "".join(parts)
+    return extract_text(obj)
+
+
+def extract_text(obj: Any) -> str:
+    """Generic recursive text extraction for shapes the fast path does not know."""
+    if isinstance(obj, dict):
+        if isinstance(obj.get("message"), dict):
+            return extract_text(obj["message"])
+        if isinstance(obj.get("content"), str):
+            return obj.get("content")
+        if isinstance(obj.get("content"), list):
+            parts = []
+            for it in obj.get("content"):
+                t = extract_text(it)
+                if t:
+                    parts.append(t)
+            return "".join(parts)
+        for key in ("text", "message", "data"):
+            v = obj.get(key)
+            t = extract_text(v)
+            if t:
+                return t
+    elif isinstance(obj, list):
+        parts = [extract_text(it) for it in obj]
+        parts = [p for p in parts if p]
+        return "\n".join(parts)
+    elif isinstance(obj, str):
+        return obj
+    return ""
+
+
+class ChunkCoalescer:
+    """Batches text chunks: at most one emission per `max_delay` seconds unless `max_chars` is reached.
+
+    Emission is driven by the reader loop: a chunk arriving after a quiet
+    period is emitted at once (no added latency for the first token), chunks
+    arriving faster are buffered and go out with the first push after the
+    interval ends. `close()` (or `flush()`) must be called at the end of the
+    stream. With `flush_on_stall` one long-lived daemon thread per coalescer
+    also emits buffered text once the interval ends while no new chunk
+    arrives, so text never waits longer than `max_delay` on a stalled stream.
+    Emission is serialized and ordered.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str], None],
+        max_delay: float = 0.03,
+        max_chars: int = 4096,
+        clock: Callable[[], float] = time.monotonic,
+        flush_on_stall: bool = False,
+    ) -> None:
+        self._emit = emit
+        self.max_delay = max_delay
+        self.max_chars = max_chars
+        self.flush_on_stall = flush_on_stall
+        self._clock = clock
+        self._parts: List[str] = []
+        self._size = 0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._last_emit = float("-inf")
+        self.batches = 0
+
+    def push(self, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            if self.max_delay <= 0:
+                self._deliver(text)
+                return
+            self._parts.append(text)
+            self._size += len(text)
+            if self._size >= self.max_chars or self._clock() >= self._last_emit + self.max_delay:
+                self._flush_locked()
+            elif self.flush_on_stall and not self._closed:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_stalled, name="chunk-coalescer", daemon=True)
+                    self._flusher.start()
+                self._wakeup.notify()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        """Flush buffered text and stop the stall flusher thread (if one was started)."""
+        with self._lock:
+            self._flush_locked()
+            self._closed = True
+            self._wakeup.notify()
+            flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+
+    def _flush_stalled(self) -> None:
+        with self._lock:
+            while not self._closed:
+                if not self._parts:
+                    self._wakeup.wait()
+                    continue
+                wait = self._last_emit + self.max_delay - self._clock()
+                if wait > 0:
+                    self._wakeup.wait(wait)
+                    continue
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        self._deliver(text)
+
+    def _deliver(self, text: str) -> None:
+        self.batches += 1
+        self._last_emit = self._clock()
+        self._emit(text)
+
+
+__all__ = [
+    "ASSISTANT",
+    "JSON_BACKEND",
+    "OTHER",
+    "RESULT",
+    "USER",
+    "ChunkCoalescer",
+    "StreamEvent",
+    "decode_line",
+    "extract_text",
+    "loads",
+]
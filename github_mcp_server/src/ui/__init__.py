@@ -1,13 +1,11 @@
 from .constants import PLACEHOLDER, DEFAULT_STYLE_DICT
 from .prompt_ui import DynamicPromptUI
-from .agent_stream import stream_agent_response
 from .interactive_runner import run_interactive
 
 __all__ = [
     "PLACEHOLDER",
     "DEFAULT_STYLE_DICT",
     "DynamicPromptUI",
-    "stream_agent_response",
     "run_interactive",
 ]
 
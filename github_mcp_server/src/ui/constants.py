@@ -4,6 +4,15 @@ Shared constants and style configuration for the interactive UI.
 
 PLACEHOLDER: str = "Plan, search, build anything"
 
+# Target redraw rate while the assistant streams (adapts down when frames are slow)
+FRAME_RATE: float = 30.0
+
+# Scrollback: messages and characters kept in memory (older ones are spilled to disk)
+# and rows materialized above the visible history window
+HISTORY_MAX_MESSAGES: int = 200
+HISTORY_MAX_CHARS: int = 1_000_000
+HISTORY_MARGIN: int = 20
+
 # prompt_toolkit style mapping used by the UI
 DEFAULT_STYLE_DICT = {
     "prompt": "bold",
@@ -13,5 +22,9 @@ DEFAULT_STYLE_DICT = {
 __all__ = [
     "PLACEHOLDER",
     "DEFAULT_STYLE_DICT",
+    "FRAME_RATE",
+    "HISTORY_MAX_MESSAGES",
+    "HISTORY_MAX_CHARS",
+    "HISTORY_MARGIN",
 ]
 
@@ -0,0 +1,114 @@
+"""
+Frame-rate-limited batching of streamed assistant text for the prompt UI.
+
+Producers (the UI event bus, possibly on other threads, and the streaming
+task on the event loop) only append to a deque, which is safe without a
+lock. At most once per frame the event loop drains the deque, applies the
+joined text and runs a single layout recompute and invalidate.
+
+The frame interval adapts to the measured frame cost: batching work plus
+the following render. It stays at the configured frame rate while frames
+are cheap and stretches up to `max_interval` when rendering gets
+expensive, so rendering never takes more than about half the loop's time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+
+class FrameScheduler:
+    """Collects text from any thread and hands it to the UI once per frame."""
+
+    def __init__(
+        self,
+        apply: Callable[[str], None],
+        on_frame: Callable[[], None],
+        frame_rate: float = 30.0,
+        max_interval: float = 0.25,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            apply: Receives the text batched during one frame (runs on the event loop)
+            on_frame: Called once per frame after `apply` (recompute layout, invalidate)
+            frame_rate: Target frames per second while frames are cheap
+            max_interval: Upper bound of the adaptive frame interval, seconds
+            clock: Time source (monotonic seconds)
+        """
+        self._apply = apply
+        self._on_frame = on_frame
+        self.min_interval = 1.0 / max(1.0, frame_rate)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.interval = self.min_interval
+        self._clock = clock
+        self._pending: Deque[str] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._armed = False
+        self._last_frame = float("-inf")
+        self._frame_cost = 0.0  # moving average of batching + render time, seconds
+        self._flush_cost = 0.0  # batching time of the frame awaiting its render
+        self.frames = 0
+        self.chunks = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Bind to the UI loop; text pushed before that is shown in the first frame."""
+        self._loop = loop
+        if self._pending:
+            self._arm_threadsafe()
+
+    def push(self, text: str) -> None:
+        """Queue text for the next frame (any thread)."""
+        if not text:
+            return
+        self._pending.append(text)
+        if not self._armed:
+            self._arm_threadsafe()
+
+    def record_render(self, seconds: float) -> None:
+        """Account a render (plus the batching work before it) in the adaptive frame interval."""
+        cost = self._flush_cost + seconds
+        self._flush_cost = 0.0
+        self._frame_cost = 0.8 * self._frame_cost + 0.2 * cost
+        self.interval = min(self.max_interval, max(self.min_interval, 2.0 * self._frame_cost))
+
+    def flush(self) -> None:
+        """Apply everything queued right now (on the event loop)."""
+        self._armed = False
+        parts = []
+        pending = self._pending
+        while pending:
+            parts.append(pending.popleft())
+        if not parts:
+            return
+        started = self._clock()
+        self.chunks += len(parts)
+        self.frames += 1
+        self._apply("".join(parts))
+        self._on_frame()
+        self._last_frame = self._clock()
+        self._flush_cost += self._last_frame - started
+
+    def _arm_threadsafe(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        self._armed = True
+        try:
+            loop.call_soon_threadsafe(self._arm)
+        except RuntimeError:  # loop closed between the check and the call
+            self._armed = False
+
+    def _arm(self) -> None:
+        delay = self._last_frame + self.interval - self._clock()
+        if delay <= 0:
+            self.flush()
+        else:
+            assert self._loop is not None
+            self._loop.call_later(delay, self.flush)
+
+
+__all__ = ["FrameScheduler"]
@@ -0,0 +1,135 @@
+"""
+Incrementally rendered message history for the prompt UI.
+
+Messages are stored as lists of chunks, so streaming text is appended to the
+last message without re-joining the history. Wrapped row counts are cached
+per message for the current terminal width: finished messages keep their
+count, and for the message being streamed only the text after its last
+newline is re-wrapped. A width change triggers the only full reflow.
+"""
+
+from __future__ import annotations
+
+import textwrap
+from typing import List, Optional, Tuple
+
+
+def wrapped_rows(line: str, width: int) -> int:
+    """Rows one logical line occupies when wrapped to `width` columns (at least 1)."""
+    if len(line) <= width:
+        return 1
+    return max(1, len(textwrap.wrap(line, width=width)))
+
+
+class _Message:
+    __slots__ = ("role", "parts", "_text", "rows_done", "done_upto")
+
+    def __init__(self, role: str, text: str) -> None:
+        self.role = role
+        self.parts: List[str] = [text]
+        self._text: Optional[str] = text
+        # Wrap cache for the current width: rows of the text before `done_upto`
+        # (which always ends after a newline); the tail after it is re-wrapped on demand
+        self.rows_done = 0
+        self.done_upto = 0
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self.parts)
+            self.parts = [self._text]
+        return self._text
+
+    def append(self, text: str) -> None:
+        self.parts.append(text)
+        self._text = None
+
+    def reset_wrap(self) -> None:
+        self.rows_done = 0
+        self.done_upto = 0
+
+    def rows(self, width: int) -> int:
+        """Wrapped rows of the message; only text after the last cached newline is wrapped again."""
+        text = self.text
+        last_newline = text.rfind("\n")
+        if last_newline + 1 > self.done_upto:
+            for line in text[self.done_upto:last_newline].split("\n"):
+                self.rows_done += wrapped_rows(line, width)
+            self.done_upto = last_newline + 1
+        tail = text[self.done_upto:]
+        return max(1, self.rows_done + (wrapped_rows(tail, width) if tail else 0))
+
+
+class MessageHistory:
+    """Chat history with cached wrapping; `fragments()` feeds a FormattedTextControl."""
+
+    def __init__(self) -> None:
+        self._messages: List[_Message] = []
+        self._width: Optional[int] = None
+        self._rows_before_last = 0
+        self.reflows = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def width(self) -> Optional[int]:
+        """Width the cached row counts are for (None before the first `rows()` call)."""
+        return self._width
+
+    def append(self, role: str, text: str) -> None:
+        """Start a new message."""
+        if self._messages and self._width is not None:
+            self._rows_before_last += self._messages[-1].rows(self._width)
+        self._messages.append(_Message(role, text))
+
+    def extend(self, role: str, text: str) -> None:
+        """Append streamed text to the last message of `role` (or start one)."""
+        if self._messages and self._messages[-1].role == role:
+            self._messages[-1].append(text)
+        else:
+            self.append(role, text)
+
+    def messages(self) -> List[Tuple[str, str]]:
+        return [(m.role, m.text) for m in self._messages]
+
+    def message(self, index: int) -> Tuple[str, str]:
+        message = self._messages[index]
+        return message.role, message.text
+
+    def message_rows(self, index: int, width: int) -> int:
+        """Wrapped rows of one message (cached while the width stays the same)."""
+        self.rows(width)
+        return self._messages[index].rows(width)
+
+    def pop_oldest(self) -> Tuple[str, str]:
+        """Remove the oldest message (never the only one) and return it."""
+        message = self._messages.pop(0)
+        if self._width is not None and self._messages:
+            self._rows_before_last -= message.rows(self._width)
+        return message.role, message.text
+
+    def rows(self, width: int) -> int:
+        """Total wrapped rows at `width`; a new width reflows everything once."""
+        if not self._messages:
+            return 0
+        if width != self._width:
+            self._width = width
+            self.reflows += 1
+            self._rows_before_last = 0
+            for message in self._messages:
+                message.reset_wrap()
+            for message in self._messages[:-1]:
+                self._rows_before_last += message.rows(width)
+        return self._rows_before_last + self._messages[-1].rows(width)
+
+    def fragments(self) -> List[Tuple[str, str]]:
+        """One fragment per message, each ending with a newline."""
+        fragments = []
+        for message in self._messages:
+            text = message.text
+            fragments.append(("", text if text.endswith("\n") else text + "\n"))
+        return fragments
+
+
+__all__ = ["MessageHistory", "wrapped_rows"]
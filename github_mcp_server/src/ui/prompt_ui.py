@@ -1,29 +1,47 @@
 """
 Prompt Toolkit based single-frame multi-line input UI with dynamic placeholder
 and automatic height adjustment on text changes and terminal resize.
+
+There are no periodic wakeups: prompt_toolkit redraws on input, on
+invalidate() (streamed text) and on SIGWINCH, and resizes are detected in
+the `before_render` hook, so an idle prompt uses no CPU.
+
+One Application serves the whole session: submitted text goes through the
+buffer's accept handler, and inline/fullscreen switches toggle the running
+Application and its renderer instead of rebuilding the UI.
 """
 
 from __future__ import annotations
 
 import asyncio
-import textwrap
-from typing import List, Optional
-import threading
+import time
+from typing import Optional, Tuple
 
 from prompt_toolkit.application import Application
-from prompt_toolkit.application.current import get_app
 from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.filters import Condition
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.layout import HSplit, Layout, Window
 from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl
-from prompt_toolkit.layout.containers import VSplit
+from prompt_toolkit.layout.containers import ConditionalContainer, VSplit
 from prompt_toolkit.layout.dimension import Dimension as D
 from prompt_toolkit.layout.processors import BeforeInput
 from prompt_toolkit.styles import Style
 
-from .constants import PLACEHOLDER, DEFAULT_STYLE_DICT
+from .constants import (
+    PLACEHOLDER,
+    DEFAULT_STYLE_DICT,
+    FRAME_RATE,
+    HISTORY_MARGIN,
+    HISTORY_MAX_CHARS,
+    HISTORY_MAX_MESSAGES,
+)
+from .frame_scheduler import FrameScheduler
+from .history import wrapped_rows
+from .scrollback import Scrollback
 from .message_bus import UIEventBus
-from ..core.cursor_client import get_global_cursor_client
+from ..core.cursor_client import AssistantChunk, StreamError
+from ..core.session_manager import INTERACTIVE, get_session_manager
 
 
 class DynamicPromptUI:
@@ -33,26 +51,41 @@ class DynamicPromptUI:
         history_text: str = "",
         initial_text: str = "",
         initial_cursor: Optional[int] = None,
+        frame_rate: float = FRAME_RATE,
+        preface_text: str = "",
     ) -> None:
         self.placeholder_active = True
         self._full_screen = full_screen
         self._history_text = history_text
-        self._start_cols: Optional[int] = None
-        self._start_rows: Optional[int] = None
-        self._messages: List[tuple[str, str]] = []
+        # Текст над историей только в полноэкранном режиме (inline он уже есть в терминале)
+        self._preface_text = preface_text
+        self._preface_rows_key: Optional[int] = None
+        self._preface_rows = 0
+        # Размер терминала на прошлой отрисовке (ресайз замечается в before_render)
+        self._last_size: Optional[Tuple[int, int]] = None
+        # История рендерится инкрементально: перенос строк кешируется по сообщениям и ширине.
+        # В памяти — только последние сообщения, старые уходят в файл и читаются страницами;
+        # в окно попадают лишь видимые строки плюс запас
+        self._history = Scrollback(
+            max_messages=HISTORY_MAX_MESSAGES,
+            max_chars=HISTORY_MAX_CHARS,
+            margin=HISTORY_MARGIN,
+        )
+        # Размер окна истории с прошлого пересчёта (columns, rows)
+        self._history_size = (80, 0)
         if self._history_text:
-            self._messages.append(("system", self._history_text))
+            self._history.append("system", self._history_text)
+        self._input_rows_key: Optional[Tuple[str, int]] = None
+        self._input_rows = 1
+        # Текст ответа копится между кадрами: один пересчёт и одна перерисовка на кадр
+        self._frames = FrameScheduler(self._append_assistant_chunk, self._recompute_height, frame_rate=frame_rate)
+        self._render_started = 0.0
 
-        self.buffer = Buffer(multiline=True)
+        # Текущий ответ агента (Ctrl+C во время ответа отменяет задачу)
+        self._reply_task: Optional[asyncio.Task] = None
+
+        self.buffer = Buffer(multiline=True, accept_handler=self._accept_input)
         self.buffer.on_text_changed += self._on_text_changed
-        # Restore initial text and cursor if provided
-        if initial_text:
-            self.buffer.text = initial_text
-            if isinstance(initial_cursor, int):
-                try:
-                    self.buffer.cursor_position = max(0, min(len(self.buffer.text), initial_cursor))
-                except Exception:
-                    pass
 
         self.input_window = Window(
             content=BufferControl(
@@ -74,8 +107,16 @@ class DynamicPromptUI:
         self.left_border = Window(width=1, char="│", dont_extend_height=True)
         self.right_border = Window(width=1, char="│", dont_extend_height=True)
 
+        self._preface_ctrl = FormattedTextControl(text=self._preface_fragments)
+        self.preface_window = Window(
+            content=self._preface_ctrl,
+            wrap_lines=True,
+            dont_extend_height=True,
+            height=D.exact(0),
+        )
+
         # History area: shows assistant/user/system messages
-        self._history_ctrl = FormattedTextControl(text="")
+        self._history_ctrl = FormattedTextControl(text=self._history_fragments)
         self.history_window = Window(
             content=self._history_ctrl,
             wrap_lines=True,
@@ -87,6 +128,11 @@ class DynamicPromptUI:
 
         @self.kb.add("c-c")
         def _(event) -> None:
+            # Первый Ctrl+C прерывает текущий ответ агента, следующий — выходит
+            task = self._reply_task
+            if task is not None and not task.done():
+                task.cancel()
+                return
             event.app.exit(result=None)
 
         @self.kb.add("c-d")
@@ -97,40 +143,32 @@ class DynamicPromptUI:
         def _(event) -> None:
             event.current_buffer.insert_text("\n")
 
+        @self.kb.add("pageup")
+        def _(event) -> None:
+            self._scroll_history(1)
+
+        @self.kb.add("pagedown")
+        def _(event) -> None:
+            self._scroll_history(-1)
+
         @self.kb.add("enter")
         def _(event) -> None:
-            user_text = self.buffer.text.rstrip("\n")
-            if not user_text:
-                return
-            self._append_user_message(user_text)
-            self.buffer.text = ""
-            self._recompute_height()
-            client = get_global_cursor_client()
-            def _on_chunk(t: str) -> None:
-                self._apply_assistant_text(t)
-            def _on_result(_t: str) -> None:
-                pass
-            th = threading.Thread(target=lambda: client.send_stream(user_text, on_chunk=_on_chunk, on_result=_on_result), daemon=True)
-            th.start()
+            event.current_buffer.validate_and_handle()
+            # Buffer.reset() не вызывает on_text_changed: плейсхолдер и высоту обновляем сами
+            self._on_text_changed(None)
 
         self.style = Style.from_dict(DEFAULT_STYLE_DICT)
 
-        # Root layout always shows history on top; fullscreen adds filler
-        if self._full_screen:
-            root = HSplit([
-                self.history_window,
-                self.frame_top,
-                VSplit([self.left_border, self.input_window, self.right_border]),
-                self.frame_bottom,
-                Window(height=D(weight=1)),
-            ])
-        else:
-            root = HSplit([
-                self.history_window,
-                self.frame_top,
-                VSplit([self.left_border, self.input_window, self.right_border]),
-                self.frame_bottom,
-            ])
+        # Root layout always shows history on top; fullscreen adds the preface and a filler
+        is_full_screen = Condition(lambda: self._full_screen)
+        root = HSplit([
+            ConditionalContainer(self.preface_window, filter=is_full_screen),
+            self.history_window,
+            self.frame_top,
+            VSplit([self.left_border, self.input_window, self.right_border]),
+            self.frame_bottom,
+            ConditionalContainer(Window(height=D(weight=1)), filter=is_full_screen),
+        ])
 
         self.app = Application(
             layout=Layout(root),
@@ -138,12 +176,21 @@ class DynamicPromptUI:
             mouse_support=False,
             full_screen=self._full_screen,
             style=self.style,
-            refresh_interval=0.2,
         )
+        self.app.before_render += self._on_before_render
+        self.app.after_render += self._on_after_render
+
+        # Restore initial text and cursor if provided (after the layout exists: it triggers a recompute)
+        if initial_text:
+            self.buffer.text = initial_text
+            if isinstance(initial_cursor, int):
+                try:
+                    self.buffer.cursor_position = max(0, min(len(self.buffer.text), initial_cursor))
+                except Exception:
+                    pass
 
-        # Background tasks must be created when an event loop is running.
-        # We schedule the watcher in run(pre_run=...) instead of here.
         self._invalidate()
+        # Потребитель шины регистрируется один раз на всё приложение
         UIEventBus.instance().set_consumer(self._apply_assistant_text)
 
     def _before_input(self):
@@ -156,36 +203,62 @@ class DynamicPromptUI:
         self._recompute_height()
 
     def _invalidate(self) -> None:
-        get_app().invalidate()
+        # Своё приложение, а не get_app(): кадры с текстом из других потоков
+        # выполняются в контексте издателя, где текущего приложения нет
+        self.app.invalidate()
 
-    def _recompute_height(self) -> None:
-        app = get_app()
+    def _recompute_height(self, invalidate: bool = True) -> None:
+        app = self.app
         size = app.output.get_size()
         columns = max(10, size.columns)
         # Inner width excludes vertical borders; BufferControl accounts for prompt prefix
         # Subtract 2 for vertical borders and 2 for the "→ " prompt prefix
         inner_width = max(1, columns - 2 - 2)
-        text = self.buffer.text
-        lines = text.split("\n") if text != "" else [""]
-        needed = 0
-        for line in lines:
-            wraps = textwrap.wrap(line, width=inner_width) or [""]
-            needed += max(1, len(wraps))
-        box_height = max(1, needed)
+        box_height = self._input_height(inner_width)
         self.input_window.height = D.exact(box_height)
         self.left_border.height = D.exact(box_height)
         self.right_border.height = D.exact(box_height)
-        # History height based on rendered text and available space (both modes)
-        # Update history view text from messages
-        self._update_history_view(columns)
-        h_lines = 0
-        for hl in (self._history_ctrl.text or "").splitlines() or [""]:
-            h_lines += max(1, len(textwrap.wrap(hl, width=columns)) or 1)
+        # History height from cached per-message row counts (full reflow only on width change)
+        h_lines = self._history.rows(columns)
         rows = max(3, size.rows)
         max_hist = max(0, rows - (3 + box_height))
-        self.history_window.height = D.exact(min(h_lines, max_hist))
+        self._history_size = (columns, min(h_lines, max_hist))
+        self.history_window.height = D.exact(self._history_size[1])
+        # Preface takes what the history leaves and is pushed off the top as the history grows
+        if self._full_screen and self._preface_text:
+            free = max_hist - self._history_size[1]
+            self.preface_window.height = D.exact(min(self._preface_height(columns), free))
         # Redraw top/bottom borders to current width
         self._draw_borders(columns)
+        if invalidate:
+            self._invalidate()
+
+    def _input_height(self, inner_width: int) -> int:
+        """Rows of the input box; re-wrapped only when the text or the width changed."""
+        key = (self.buffer.text, inner_width)
+        if key != self._input_rows_key:
+            self._input_rows_key = key
+            self._input_rows = max(1, sum(wrapped_rows(line, inner_width) for line in key[0].split("\n")))
+        return self._input_rows
+
+    def _preface_height(self, columns: int) -> int:
+        if columns != self._preface_rows_key:
+            self._preface_rows_key = columns
+            self._preface_rows = sum(wrapped_rows(line, columns) for line in self._preface_text.split("\n"))
+        return self._preface_rows
+
+    def _preface_fragments(self):
+        # Курсор в конце: при нехватке места видны последние строки
+        return [("", self._preface_text), ("[SetCursorPosition]", "")]
+
+    def _history_fragments(self):
+        columns, height = self._history_size
+        return self._history.fragments(columns, height)
+
+    def _scroll_history(self, pages: int) -> None:
+        # Прокрутка на высоту окна истории (минус строка, чтобы не терять контекст)
+        columns, height = self._history_size
+        self._history.scroll(pages * max(1, height - 1), columns, height)
         self._invalidate()
 
     def _draw_borders(self, columns: int) -> None:
@@ -195,64 +268,81 @@ class DynamicPromptUI:
         self._top_ctrl.text = top
         self._bottom_ctrl.text = bottom
 
-    def _update_history_view(self, columns: int) -> None:
-        parts: List[str] = []
-        for _role, text in self._messages:
-            parts.append(text)
-            if not text.endswith("\n"):
-                parts.append("\n")
-        self._history_ctrl.text = "".join(parts)
+    def _accept_input(self, buffer: Buffer) -> bool:
+        """Accept handler: send the text to the agent; False lets the buffer reset itself"""
+        user_text = buffer.text.rstrip("\n")
+        if not user_text:
+            return True
+        self._history.scroll_to_bottom()
+        self._append_user_message(user_text)
+        # Ответ читается прямо в цикле событий приложения (без потока и call_from_executor)
+        self._reply_task = self.app.create_background_task(self._stream_reply(user_text))
+        return False
 
     def _append_user_message(self, text: str) -> None:
-        self._messages.append(("user", text))
-        self._update_history_view(get_app().output.get_size().columns)
+        self._history.append("user", text)
 
     def _append_assistant_chunk(self, text: str) -> None:
-        if not self._messages or self._messages[-1][0] != "assistant":
-            self._messages.append(("assistant", text))
-        else:
-            role, cur = self._messages[-1]
-            self._messages[-1] = (role, cur + text)
-        self._update_history_view(get_app().output.get_size().columns)
+        self._history.extend("assistant", text)
+
+    async def _stream_reply(self, user_text: str) -> None:
+        """Стримит ответ агента в историю; сообщения одной беседы уходят по очереди"""
+        async with get_session_manager().alease(INTERACTIVE) as session:
+            async for event in session.client.astream(user_text):
+                if isinstance(event, AssistantChunk):
+                    self._frames.push(event.text)
+                elif isinstance(event, StreamError):
+                    self._frames.push(f"\n⚠️ cursor-agent: {event.message}\n")
 
     def _apply_assistant_text(self, text: str) -> None:
-        def _do():
-            self._append_assistant_chunk(text)
-            self._recompute_height()
-        get_app().call_from_executor(_do)
+        # Может вызываться из любого потока; отрисовка — не чаще раза за кадр
+        self._frames.push(text)
 
-    async def _resize_watcher(self) -> None:
+    def _on_before_render(self, app) -> None:
+        self._render_started = time.perf_counter()
+        size = app.output.get_size()
+        current = (size.columns, size.rows)
+        if current != self._last_size:
+            resized = self._last_size is not None
+            self._last_size = current
+            if resized:
+                self._on_resize(app)
+
+    def _on_resize(self, app) -> None:
+        if not self._full_screen:
+            # Первый ресайз переключает в полноэкранный режим — в этом же приложении и этом же кадре
+            self.set_full_screen(True, invalidate=False)
+            return
+        # Раскладка пересчитывается до отрисовки этого же кадра, без лишнего invalidate
+        self._recompute_height(invalidate=False)
+
+    def set_full_screen(self, full_screen: bool, invalidate: bool = True) -> None:
+        """Switch between inline and fullscreen without tearing the Application down."""
+        if full_screen == self._full_screen:
+            return
         app = self.app
-        # capture initial size
-        if self._start_cols is None or self._start_rows is None:
-            s = app.output.get_size()
-            self._start_cols, self._start_rows = s.columns, s.rows
-        last_size = app.output.get_size()
-        while True:
-            await asyncio.sleep(0.2)
-            size = app.output.get_size()
-            if size.columns != last_size.columns or size.rows != last_size.rows:
-                last_size = size
-                # If we are not fullscreen yet, request switch to fullscreen
-                if not self._full_screen:
-                    # return current text and cursor position to restore
-                    try:
-                        cur_pos = self.buffer.cursor_position
-                    except Exception:
-                        cur_pos = None
-                    app.exit(result=("__RESIZE_FULL__", self.buffer.text, cur_pos))
-                    return
-                self._recompute_height()
+        if app.is_running:
+            # Стираем inline-кадр (или покидаем альтернативный экран); следующая отрисовка — с нуля
+            app.renderer.erase()
+        self._full_screen = full_screen
+        app.full_screen = full_screen
+        app.renderer.full_screen = full_screen
+        self._recompute_height(invalidate=invalidate)
+
+    def _on_after_render(self, _app) -> None:
+        self._frames.record_render(time.perf_counter() - self._render_started)
 
     def run(self) -> str | None:
         self._recompute_height()
-        # Create the background task after the event loop is running
+
         def _pre_run() -> None:
-            # initialize size and schedule watcher
-            s = self.app.output.get_size()
-            self._start_cols, self._start_rows = s.columns, s.rows
-            self.app.create_background_task(self._resize_watcher())
-        return self.app.run(pre_run=_pre_run)
+            self._frames.start(asyncio.get_running_loop())
+        try:
+            return self.app.run(pre_run=_pre_run)
+        finally:
+            # После выхода цикл событий закрыт: сообщения шины копятся в её буфере
+            UIEventBus.instance().set_consumer(None)
+            self._history.close()
 
 
 __all__ = ["DynamicPromptUI"]
@@ -0,0 +1,265 @@
+"""
+Virtualized, bounded scrollback for the prompt UI.
+
+Recent messages stay in memory (a MessageHistory capped by message count
+and characters); older ones are spilled to an append-only JSONL file whose
+byte offsets are kept in an in-memory index. The history window only gets
+the rows it can show plus a margin: fragments are built from the newest
+line backwards, and spilled messages are read back one page at a time, only
+when the view is scrolled that far.
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+
+from .history import MessageHistory, wrapped_rows
+
+PAGE_SIZE = 64
+
+Fragments = List[Tuple[str, str]]
+
+
+def _lines_backward(text: str) -> Iterator[str]:
+    """Logical lines of a message from the last one up (a trailing newline ends the last line)."""
+    end = len(text) - 1 if text.endswith("\n") else len(text)
+    while True:
+        start = text.rfind("\n", 0, end) + 1
+        yield text[start:end]
+        if start == 0:
+            return
+        end = start - 1
+
+
+class SpillFile:
+    """Append-only JSONL of spilled messages with an in-memory offset index."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """
+        Args:
+            path: Spill file (truncated); by default an anonymous temporary file
+        """
+        self._file: IO[bytes] = (
+            open(path, "w+b") if path is not None else tempfile.TemporaryFile(prefix="scrollback-", suffix=".jsonl")
+        )
+        self._offsets: List[int] = []
+        self._end = 0
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, role: str, text: str) -> None:
+        line = json.dumps({"role": role, "text": text}, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._file.seek(self._end)
+        self._file.write(line)
+        self._offsets.append(self._end)
+        self._end += len(line)
+
+    def read_page(self, page: int) -> List[Tuple[str, str]]:
+        """Messages [page * PAGE_SIZE, (page + 1) * PAGE_SIZE) in one read."""
+        start = page * PAGE_SIZE
+        stop = min(len(self._offsets), start + PAGE_SIZE)
+        if start >= stop:
+            return []
+        end = self._offsets[stop] if stop < len(self._offsets) else self._end
+        self._file.flush()
+        self._file.seek(self._offsets[start])
+        data = self._file.read(end - self._offsets[start])
+        items = [json.loads(raw) for raw in data.splitlines()]
+        return [(item["role"], item["text"]) for item in items]
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Scrollback:
+    """History that keeps recent messages in memory and pages older ones from disk."""
+
+    def __init__(
+        self,
+        max_messages: int = 200,
+        max_chars: int = 1_000_000,
+        margin: int = 20,
+        spill_path: Optional[Path] = None,
+        cached_pages: int = 8,
+    ) -> None:
+        """
+        Args:
+            max_messages: Messages kept in memory; older ones are spilled to disk
+            max_chars: Characters kept in memory (the newest message is never spilled)
+            margin: Rows materialized above the visible window
+            spill_path: Spill file (default: anonymous temporary file, created on first spill)
+            cached_pages: Spilled pages kept in memory while scrolling back
+        """
+        self.max_messages = max(1, max_messages)
+        self.max_chars = max_chars
+        self.margin = margin
+        self.cached_pages = max(1, cached_pages)
+        self.recent = MessageHistory()
+        self._recent_chars = 0
+        self._spill_path = spill_path
+        self._spill: Optional[SpillFile] = None
+        self._spilled_rows = 0
+        self._spilled_width: Optional[int] = None
+        self._page_rows: List[int] = []  # rows per spilled page at _spilled_width
+        # page -> (width, [(role, text, rows)]) for spilled pages read back from disk
+        self._pages: "OrderedDict[int, Tuple[int, List[Tuple[str, str, int]]]]" = OrderedDict()
+        self.scroll_rows = 0  # rows between the bottom of the view and the newest line
+        self._last_total: Optional[int] = None
+        self.page_loads = 0
+
+    def __len__(self) -> int:
+        return len(self.recent) + (len(self._spill) if self._spill is not None else 0)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._spill) if self._spill is not None else 0
+
+    def append(self, role: str, text: str) -> None:
+        """Start a new message."""
+        self.recent.append(role, text)
+        self._recent_chars += len(text)
+        self._enforce_cap()
+
+    def extend(self, role: str, text: str) -> None:
+        """Append streamed text to the last message of `role` (or start one)."""
+        self.recent.extend(role, text)
+        self._recent_chars += len(text)
+        self._enforce_cap()
+
+    def messages(self) -> List[Tuple[str, str]]:
+        """Messages held in memory (spilled ones are not loaded)."""
+        return self.recent.messages()
+
+    def rows(self, width: int) -> int:
+        """Total wrapped rows; rows of spilled messages are from the width they were spilled at."""
+        return self.recent.rows(width) + self._spilled_rows
+
+    def scroll(self, delta: int, width: int, height: int) -> None:
+        """Move the view by `delta` rows (positive is back in time), clamped to the history."""
+        if delta > 0 and self._spill is not None and self._spilled_width != width:
+            self._recount_spilled(width)
+        total = self.rows(width)
+        self.scroll_rows = max(0, min(self.scroll_rows + delta, max(0, total - height)))
+        self._last_total = total
+
+    def scroll_to_bottom(self) -> None:
+        self.scroll_rows = 0
+
+    def fragments(self, width: int, height: int) -> Fragments:
+        """Text for a `height`-row window: the visible rows plus `margin`, cursor at the bottom."""
+        total = self.rows(width)
+        if self.scroll_rows and self._last_total is not None and total > self._last_total:
+            # Scrolled back: keep the viewed text in place while new text arrives
+            self.scroll_rows = min(self.scroll_rows + total - self._last_total, max(0, total - height))
+        self._last_total = total
+
+        if self.scroll_rows and self._spill is not None and self._spilled_width != width:
+            self._recount_spilled(width)
+        need = height + self.margin
+        skip = self.scroll_rows
+        lines: List[str] = []
+        rows = 0
+        for text, message_rows in self._backward(width, skip):
+            if skip >= message_rows:
+                skip -= message_rows
+                continue
+            for line in _lines_backward(text):
+                line_rows = wrapped_rows(line, width)
+                if skip > 0:
+                    skip -= line_rows
+                    continue
+                lines.append(line)
+                rows += line_rows
+                if rows >= need:
+                    break
+            if rows >= need:
+                break
+        if not lines:
+            return []
+        lines.reverse()
+        # The window scrolls to the cursor, so the newest materialized row is at the bottom
+        return [("", "\n".join(lines)), ("[SetCursorPosition]", "")]
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._pages.clear()
+
+    def _enforce_cap(self) -> None:
+        recent = self.recent
+        while len(recent) > 1 and (len(recent) > self.max_messages or self._recent_chars > self.max_chars):
+            width = recent.width
+            rows = recent.message_rows(0, width) if width is not None else 0
+            role, text = recent.pop_oldest()
+            self._recent_chars -= len(text)
+            if self._spill is None:
+                self._spill = SpillFile(self._spill_path)
+                self._spilled_width = width
+            elif self._spilled_width != width:
+                self._spilled_width = None  # mixed widths: recounted on the next scroll back
+            page = len(self._spill) // PAGE_SIZE
+            self._pages.pop(page, None)  # the last page grows
+            if page == len(self._page_rows):
+                self._page_rows.append(0)
+            self._page_rows[page] += rows
+            self._spill.append(role, text)
+            self._spilled_rows += rows
+
+    def _backward(self, width: int, skip: int) -> Iterator[Tuple[str, int]]:
+        """(text, wrapped rows) from the newest message to the oldest, loading spilled pages lazily.
+
+        Spilled pages lying entirely within the first `skip` rows are passed
+        as one (empty text, page rows) item without being read.
+        """
+        recent = self.recent
+        for index in range(len(recent) - 1, -1, -1):
+            text, rows = recent.message(index)[1], recent.message_rows(index, width)
+            skip -= rows
+            yield text, rows
+        if self._spill is None:
+            return
+        counted = self._spilled_width == width
+        for page in range((len(self._spill) - 1) // PAGE_SIZE, -1, -1):
+            if counted and skip >= self._page_rows[page] > 0:
+                skip -= self._page_rows[page]
+                yield "", self._page_rows[page]
+                continue
+            for _role, text, rows in reversed(self._page(page, width)):
+                skip -= rows
+                yield text, rows
+
+    def _page(self, page: int, width: int) -> List[Tuple[str, str, int]]:
+        cached = self._pages.get(page)
+        if cached is not None and cached[0] == width:
+            self._pages.move_to_end(page)
+            return cached[1]
+        assert self._spill is not None
+        entries = [
+            (role, text, max(1, sum(wrapped_rows(line, width) for line in _lines_backward(text))))
+            for role, text in self._spill.read_page(page)
+        ]
+        self.page_loads += 1
+        self._pages[page] = (width, entries)
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.cached_pages:
+            self._pages.popitem(last=False)
+        return entries
+
+    def _recount_spilled(self, width: int) -> None:
+        """Row count of spilled messages at a new width (pages are read once)."""
+        assert self._spill is not None
+        self._page_rows = [
+            sum(rows for _role, _text, rows in self._page(page, width))
+            for page in range((len(self._spill) + PAGE_SIZE - 1) // PAGE_SIZE)
+        ]
+        self._spilled_rows = sum(self._page_rows)
+        self._spilled_width = width
+
+
+__all__ = ["PAGE_SIZE", "Scrollback", "SpillFile"]
@@ -0,0 +1,181 @@
+"""
+📊 cursor-agent streaming benchmark - пропускная способность send_stream и стоимость обновлений UI
+
+На фейковом cursor-agent (tests/fake_cursor_agent.py) при высоких темпах токенов замеряет:
+- время до первого чанка и до конца ответа;
+- пропускную способность (токенов и событий в секунду);
+- накладные расходы на колбэки: CPU клиента без on_chunk, с on_chunk без склейки
+  (chunk_delay=0) и со склейкой ChunkCoalescer;
+- стоимость обновления UI: те же батчи текста, применённые к DynamicPromptUI
+  (добавление в историю, пересчёт высоты и отрисовка кадра в /dev/null).
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_agent_stream --tokens 20000 --rates 0,20000,5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.core.cursor_client import CursorAgentClient
+from src.core.scheduler import InvocationScheduler
+from tests import fake_cursor_agent
+
+
+def run_stream(rate: float, tokens: int, chunk_delay: float, with_callback: bool, repeat: int) -> Dict:
+    """Одна конфигурация: лучший из repeat прогонов send_stream на новой сессии"""
+    os.environ["FAKE_AGENT_TOKEN_RATE"] = str(rate)
+    os.environ["FAKE_AGENT_TOKENS"] = str(tokens)
+    best: Optional[Dict] = None
+    for _ in range(repeat):
+        # Свой планировщик без бюджетов: ожидание токена общего AMBIENT-бюджета не часть замера
+        client = CursorAgentClient(chunk_delay=chunk_delay, idle_timeout=30, scheduler=InvocationScheduler())
+        batches: List[str] = []
+        marks: List[float] = []
+        callback_time = [0.0]
+
+        def on_chunk(text: str) -> None:
+            t = time.perf_counter()
+            if not marks:
+                marks.append(t)
+            batches.append(text)
+            callback_time[0] += time.perf_counter() - t
+
+        cpu = time.process_time()
+        started = time.perf_counter()
+        ok = client.send_stream("benchmark", on_chunk=on_chunk if with_callback else None)
+        finished = time.perf_counter()
+        cpu = time.process_time() - cpu
+        total = finished - started
+        result = {
+            "rate": rate,
+            "tokens": tokens,
+            "chunk_delay_ms": chunk_delay * 1e3,
+            "callback": with_callback,
+            "ok": ok,
+            "first_chunk_ms": (marks[0] - started) * 1e3 if marks else None,
+            "total_ms": total * 1e3,
+            "queue_wait_ms": client.last_queue_wait * 1e3,
+            "tokens_per_sec": tokens / total if total > 0 else 0.0,
+            "client_cpu_ms": cpu * 1e3,
+            "callbacks": len(batches),
+            "callback_ms": callback_time[0] * 1e3,
+            "batches": batches,
+        }
+        if best is None or result["total_ms"] < best["total_ms"]:
+            best = result
+    assert best is not None
+    return best
+
+
+def ui_update_cost(batches: List[str], rows: int, columns: int) -> Dict:
+    """Применяет батчи к DynamicPromptUI так же, как _stream_reply, и рисует кадр после каждого"""
+    from prompt_toolkit.application import create_app_session
+    from prompt_toolkit.application.current import set_app
+    from prompt_toolkit.data_structures import Size
+    from prompt_toolkit.input import create_pipe_input
+    from prompt_toolkit.output.vt100 import Vt100_Output
+
+    from src.ui.prompt_ui import DynamicPromptUI
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull, create_pipe_input() as pipe:
+        output = Vt100_Output(devnull, lambda: Size(rows=rows, columns=columns), term="xterm")
+        with create_app_session(input=pipe, output=output):
+            ui = DynamicPromptUI()
+            app = ui.app
+
+            async def _apply() -> tuple:
+                # Отрисовка запускает фоновые задачи буфера, поэтому нужен работающий цикл событий
+                with set_app(app):
+                    ui._append_user_message("benchmark")
+                    ui._recompute_height()
+                    app.renderer.render(app, app.layout)
+                    update = render = 0.0
+                    for text in batches:
+                        t0 = time.perf_counter()
+                        ui._append_assistant_chunk(text)
+                        ui._recompute_height()
+                        t1 = time.perf_counter()
+                        app.renderer.render(app, app.layout)
+                        t2 = time.perf_counter()
+                        update += t1 - t0
+                        render += t2 - t1
+                    return update, render
+
+            update, render = asyncio.run(_apply())
+    n = max(1, len(batches))
+    return {
+        "updates": len(batches),
+        "update_ms": update * 1e3,
+        "render_ms": render * 1e3,
+        "us_per_update": (update + render) / n * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="send_stream throughput and UI update cost on a fake cursor-agent")
+    parser.add_argument("--tokens", type=int, default=20000, help="Длина ответа в токенах")
+    parser.add_argument("--rates", default="0,20000,5000", help="Темпы токенов/с через запятую (0 — без ограничения)")
+    parser.add_argument("--chunk-tokens", default="1-4", help="Токенов в чанке: N или MIN-MAX")
+    parser.add_argument("--coalesce-ms", type=float, default=30.0)
+    parser.add_argument("--startup-ms", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ui-tokens", type=int, default=3000,
+                        help="Длина ответа для замера UI (история растёт квадратично, поэтому короче)")
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--columns", type=int, default=120)
+    parser.add_argument("--output", default="", help="JSONL-файл для результатов (опционально)")
+    args = parser.parse_args()
+
+    os.environ.pop("CURSOR_AGENT_WARM_POOL", None)
+    os.environ.pop("CURSOR_AGENT_CASSETTE_MODE", None)
+    rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    results: List[Dict] = []
+    ui_results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CURSOR_AGENT_BIN"] = str(fake_cursor_agent.install(Path(tmp)))
+        os.environ["FAKE_AGENT_STARTUP_MS"] = str(args.startup_ms)
+        os.environ["FAKE_AGENT_CHUNK_TOKENS"] = args.chunk_tokens
+        configs = [
+            ("no callback", 0.0, False),
+            ("callback, no coalescing", 0.0, True),
+            (f"callback, {args.coalesce_ms:g} ms coalescing", args.coalesce_ms / 1000, True),
+        ]
+        for rate in rates:
+            for name, delay, with_callback in configs:
+                r = run_stream(rate, args.tokens, delay, with_callback, args.repeat)
+                r["config"] = name
+                results.append(r)
+                first = "      -" if r["first_chunk_ms"] is None else f"{r['first_chunk_ms']:7.1f}"
+                print(f"rate {rate or float('inf'):>8g} tok/s  {name:28s} "
+                      f"first {first} ms  total {r['total_ms']:8.1f} ms  "
+                      f"{r['tokens_per_sec']:9.0f} tok/s  cpu {r['client_cpu_ms']:7.1f} ms  "
+                      f"callbacks {r['callbacks']:6d} ({r['callback_ms']:.1f} ms)  ok={r['ok']}")
+
+        # Стоимость UI: одни и те же ответы, батчи без склейки и со склейкой
+        ui_rate = next((r for r in rates if r > 0), 0.0)
+        for name, delay in (("no coalescing", 0.0), (f"{args.coalesce_ms:g} ms coalescing", args.coalesce_ms / 1000)):
+            stream = run_stream(ui_rate, args.ui_tokens, delay, True, 1)
+            cost = ui_update_cost(stream["batches"], args.rows, args.columns)
+            cost.update({"config": name, "rate": ui_rate, "tokens": args.ui_tokens})
+            ui_results.append(cost)
+            print(f"UI {name:22s} {cost['updates']:6d} updates  update {cost['update_ms']:8.1f} ms  "
+                  f"render {cost['render_ms']:8.1f} ms  {cost['us_per_update']:8.1f} us/update")
+
+    for r in results:
+        r.pop("batches", None)
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "tokens": args.tokens, "chunk_tokens": args.chunk_tokens,
+                                "stream": results, "ui": ui_results}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
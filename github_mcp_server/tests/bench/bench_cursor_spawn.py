@@ -0,0 +1,123 @@
+"""
+📊 cursor-agent spawn benchmark - задержка запроса: процесс на вызов vs тёплый пул
+
+Сравнивает время до первого чанка и до конца ответа для
+CursorAgentClient.send_stream без пула (новый процесс на каждый промпт) и с
+WarmProcessPool (процесс уже запущен и ждёт промпт в stdin).
+
+По умолчанию используется фейковый cursor-agent (tests/fake_cursor_agent.py)
+с настраиваемой задержкой старта (--startup-ms), чтобы сравнение было
+воспроизводимым без сети. С --real замеряется настоящий cursor-agent
+(или CURSOR_AGENT_BIN).
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_cursor_spawn --requests 20 --startup-ms 400
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.core import cursor_client
+from src.core.cursor_client import CursorAgentClient, WarmProcessPool
+from src.core.scheduler import InvocationScheduler
+from tests import fake_cursor_agent
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_mode(name: str, requests: int, pool: Optional[WarmProcessPool], think_ms: float) -> Dict:
+    """Последовательные запросы в одну сессию; возвращает задержки в мс"""
+    # Свой планировщик без бюджетов: общий ограничивает AMBIENT до 30 вызовов в минуту,
+    # и замер включал бы ожидание токена
+    client = CursorAgentClient(warm_pool=pool, scheduler=InvocationScheduler())
+    time.sleep(think_ms / 1000)  # пул успевает прогреться, как между сообщениями пользователя
+    first_chunk: List[float] = []
+    total: List[float] = []
+    failures = 0
+    queue_wait = 0.0
+    for i in range(requests):
+        started = time.perf_counter()
+        marks: List[float] = []
+
+        def on_chunk(_text: str) -> None:
+            if not marks:
+                marks.append(time.perf_counter())
+
+        ok = client.send_stream(f"prompt {i}", on_chunk=on_chunk)
+        finished = time.perf_counter()
+        queue_wait = max(queue_wait, client.last_queue_wait)
+        if not ok:
+            failures += 1
+        total.append((finished - started) * 1e3)
+        first_chunk.append(((marks[0] if marks else finished) - started) * 1e3)
+        time.sleep(think_ms / 1000)
+    first_chunk.sort()
+    total.sort()
+    result = {
+        "mode": name,
+        "requests": requests,
+        "failures": failures,
+        "first_chunk_p50_ms": _percentile(first_chunk, 0.5),
+        "first_chunk_p90_ms": _percentile(first_chunk, 0.9),
+        "total_p50_ms": _percentile(total, 0.5),
+        "total_p90_ms": _percentile(total, 0.9),
+        "queue_wait_max_ms": queue_wait * 1e3,
+    }
+    if pool is not None:
+        result["pool"] = dict(pool.stats)
+        pool.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="cursor-agent spawn-per-call vs warm pool latency")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--startup-ms", type=float, default=300.0,
+                        help="Задержка старта фейкового агента (инициализация runtime + resume)")
+    parser.add_argument("--chunk-ms", type=float, default=5.0, help="Пауза фейкового агента между чанками")
+    parser.add_argument("--think-ms", type=float, default=500.0,
+                        help="Пауза между запросами (время, за которое пул успевает прогреться)")
+    parser.add_argument("--pool-size", type=int, default=1)
+    parser.add_argument("--real", action="store_true", help="Замерять настоящий cursor-agent")
+    parser.add_argument("--output", default="", help="JSONL-файл для результатов (опционально)")
+    args = parser.parse_args()
+
+    # Пул задаётся явно; общий пул из окружения исказил бы режим spawn-per-call
+    os.environ.pop("CURSOR_AGENT_WARM_POOL", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.real:
+            os.environ["CURSOR_AGENT_BIN"] = str(fake_cursor_agent.install(Path(tmp)))
+            os.environ["FAKE_AGENT_STARTUP_MS"] = str(args.startup_ms)
+            os.environ["FAKE_AGENT_TOKENS"] = "3"
+            os.environ["FAKE_AGENT_TOKEN_RATE"] = str(1000 / args.chunk_ms if args.chunk_ms > 0 else 0)
+        print(f"agent: {cursor_client.agent_bin()}")
+        results = [
+            run_mode("spawn-per-call", args.requests, None, args.think_ms),
+            run_mode(f"warm-pool-{args.pool_size}", args.requests,
+                     WarmProcessPool(size=args.pool_size), args.think_ms),
+        ]
+    for r in results:
+        print(f"{r['mode']:16s} first chunk p50 {r['first_chunk_p50_ms']:8.1f} ms  "
+              f"p90 {r['first_chunk_p90_ms']:8.1f} ms  total p50 {r['total_p50_ms']:8.1f} ms  "
+              f"failures {r['failures']}")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "real": args.real,
+                                "startup_ms": args.startup_ms, "results": results}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
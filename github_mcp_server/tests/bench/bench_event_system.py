@@ -0,0 +1,269 @@
+"""
+📊 EventSystem benchmark - пропускная способность и задержки очереди событий
+
+Гоняет EventSystem синтетическими продюсерами с разной частотой, приоритетами
+и стоимостью обработчиков. Для каждого сценария считает events/s, p50/p99
+задержки emit → dispatch (общие и по приоритетам), память на событие в очереди
+и справедливость между приоритетами: доли диспетчеризации каждого приоритета,
+пока продюсеры ещё шлют события, а очередь не пуста (после дренажа очереди
+все приоритеты обслужены полностью, и такая метрика ничего не говорит). Результаты дописываются в JSONL-файл,
+чтобы сравнивать реализации очереди между коммитами.
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_event_system --output bench_results/event_system.jsonl
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.ambient.event_system import EventSystem, EventType
+
+
+@dataclass
+class Scenario:
+    """Параметры одного прогона"""
+    name: str
+    producers: int
+    events_per_producer: int
+    rate: float  # событий/с на продюсера, 0 — без ограничения
+    priorities: Tuple[int, ...] = (1, 2, 3, 4, 5)
+    handler_cost_us: float = 0.0
+
+
+DEFAULT_SCENARIOS: List[Scenario] = [
+    Scenario("burst-noop", producers=4, events_per_producer=1000, rate=0),
+    Scenario("burst-50us", producers=4, events_per_producer=500, rate=0, handler_cost_us=50),
+    Scenario("steady-1k", producers=2, events_per_producer=1000, rate=500),
+    Scenario("steady-overload", producers=4, events_per_producer=500, rate=1000, handler_cost_us=500),
+    Scenario("single-priority", producers=4, events_per_producer=1000, rate=0, priorities=(3,)),
+]
+
+
+@dataclass
+class _Collector:
+    latencies: Dict[int, List[float]] = field(default_factory=dict)
+    emitted: Dict[int, int] = field(default_factory=dict)
+    # Диспетчеризации при непустой очереди, пока продюсеры ещё шлют (окно перегрузки)
+    backlogged: Dict[int, int] = field(default_factory=dict)
+    producing: threading.Event = field(default_factory=threading.Event)
+    first_emit: Optional[float] = None
+    last_dispatch: float = 0.0
+    dispatched: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _spin(us: float) -> None:
+    if us <= 0:
+        return
+    end = time.perf_counter() + us / 1e6
+    while time.perf_counter() < end:
+        pass
+
+
+def _jain_index(values: List[float]) -> float:
+    """Индекс справедливости Джейна: 1.0 — идеально ровно"""
+    if not values or not any(values):
+        return 1.0
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+
+def _backlog_fairness(collector: _Collector) -> Optional[float]:
+    """
+    Джейн по долям диспетчеризации приоритетов в окне перегрузки
+
+    Доля каждого приоритета среди событий, обслуженных при непустой очереди,
+    нормируется на его долю среди отправленных: 1.0 — очередь делит
+    пропускную способность пропорционально нагрузке, меньше — кто-то голодает.
+    None, если очередь ни разу не копилась.
+    """
+    window = sum(collector.backlogged.values())
+    emitted = sum(collector.emitted.values())
+    if not window or not emitted:
+        return None
+    shares = [
+        (collector.backlogged.get(priority, 0) / window) / (count / emitted)
+        for priority, count in collector.emitted.items() if count
+    ]
+    return _jain_index(shares)
+
+
+def run_scenario(scenario: Scenario, seed: int = 0) -> Dict:
+    """Прогоняет сценарий и возвращает метрики"""
+    es = EventSystem()
+    es.print_info = lambda *a, **k: None  # не шумим в выводе бенчмарка
+    collector = _Collector()
+    total = scenario.producers * scenario.events_per_producer
+
+    def handler(event) -> None:
+        now = time.perf_counter()
+        priority = event.priority
+        backlogged = collector.producing.is_set() and es.get_pending_events_count() > 0
+        with collector.lock:
+            collector.latencies.setdefault(priority, []).append(now - event.data["emit_ts"])
+            if backlogged:
+                collector.backlogged[priority] = collector.backlogged.get(priority, 0) + 1
+            collector.dispatched += 1
+            collector.last_dispatch = now
+        _spin(scenario.handler_cost_us)
+
+    es.register_handler(EventType.SYSTEM_TEST, handler)
+    es.start_processing()
+
+    def producer(index: int) -> None:
+        rnd = random.Random(seed * 1000 + index)
+        interval = 1.0 / scenario.rate if scenario.rate > 0 else 0.0
+        next_at = time.perf_counter()
+        for _ in range(scenario.events_per_producer):
+            if interval:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at += interval
+            priority = rnd.choice(scenario.priorities)
+            now = time.perf_counter()
+            with collector.lock:
+                if collector.first_emit is None:
+                    collector.first_emit = now
+                collector.emitted[priority] = collector.emitted.get(priority, 0) + 1
+            es.emit_simple(EventType.SYSTEM_TEST, {"emit_ts": now}, source="bench", priority=priority)
+
+    threads = [threading.Thread(target=producer, args=(i,), daemon=True) for i in range(scenario.producers)]
+    collector.producing.set()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    collector.producing.clear()
+
+    deadline = time.perf_counter() + 120
+    while collector.dispatched < total and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    es.stop_processing()
+
+    all_latencies = sorted(l for values in collector.latencies.values() for l in values)
+    elapsed = max(1e-9, collector.last_dispatch - (collector.first_emit or collector.last_dispatch))
+    per_priority = {}
+    for priority in sorted(collector.emitted):
+        values = sorted(collector.latencies.get(priority, []))
+        emitted = collector.emitted[priority]
+        per_priority[str(priority)] = {
+            "emitted": emitted,
+            "dispatched": len(values),
+            "p50_ms": _percentile(values, 0.50) * 1e3,
+            "p99_ms": _percentile(values, 0.99) * 1e3,
+            "mean_ms": (sum(values) / len(values) * 1e3) if values else 0.0,
+            "backlogged": collector.backlogged.get(priority, 0),
+        }
+
+    return {
+        "scenario": asdict(scenario),
+        "dispatched": collector.dispatched,
+        "expected": total,
+        "events_per_sec": collector.dispatched / elapsed,
+        "p50_ms": _percentile(all_latencies, 0.50) * 1e3,
+        "p99_ms": _percentile(all_latencies, 0.99) * 1e3,
+        "per_priority": per_priority,
+        # Справедливость долей в окне перегрузки (None — очередь не копилась)
+        "backlog_dispatched": sum(collector.backlogged.values()),
+        "fairness_jain": _backlog_fairness(collector),
+        # Во сколько раз младший приоритет ждёт дольше старшего (в среднем)
+        "priority_latency_ratio": _latency_ratio(per_priority),
+    }
+
+
+def _latency_ratio(per_priority: Dict[str, Dict]) -> float:
+    if len(per_priority) < 2:
+        return 1.0
+    keys = sorted(per_priority, key=int)
+    low, high = per_priority[keys[0]]["mean_ms"], per_priority[keys[-1]]["mean_ms"]
+    return low / high if high > 0 else 0.0
+
+
+def measure_queue_memory(count: int = 2000) -> Dict:
+    """Оценивает память на одно событие в очереди (без запуска обработки)"""
+    es = EventSystem()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(count):
+        es.emit_simple(EventType.SYSTEM_TEST, {"emit_ts": 0.0, "seq": i}, source="bench", priority=1 + i % 5)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "queued": count,
+        "bytes_per_event": (after - before) / count,
+        "peak_bytes": peak - before,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() if result.returncode == 0 else ""
+    except Exception:
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EventSystem throughput/latency benchmark")
+    parser.add_argument("--output", default="bench_results/event_system.jsonl",
+                        help="JSONL-файл, в который дописывается результат прогона")
+    parser.add_argument("--label", default="", help="Метка прогона (например, имя реализации очереди)")
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="Запустить только указанные сценарии (можно несколько раз)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Множитель числа событий")
+    parser.add_argument("--memory-events", type=int, default=2000,
+                        help="Сколько событий поставить в очередь для оценки памяти")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scenarios = [s for s in DEFAULT_SCENARIOS if not args.scenario or s.name in args.scenario]
+    results = []
+    for scenario in scenarios:
+        scenario.events_per_producer = max(1, int(scenario.events_per_producer * args.scale))
+        metrics = run_scenario(scenario, seed=args.seed)
+        results.append(metrics)
+        fairness = metrics["fairness_jain"]
+        print(
+            f"{scenario.name:18s} {metrics['events_per_sec']:>10.0f} ev/s  "
+            f"p50 {metrics['p50_ms']:8.3f} ms  p99 {metrics['p99_ms']:8.3f} ms  "
+            f"fairness {'n/a' if fairness is None else format(fairness, '.3f')} "
+            f"({metrics['backlog_dispatched']} backlogged)"
+        )
+
+    memory = measure_queue_memory(args.memory_events)
+    print(f"memory: {memory['bytes_per_event']:.0f} bytes/queued event")
+
+    record = {
+        "timestamp": time.time(),
+        "label": args.label,
+        "git_rev": _git_revision(),
+        "python": platform.python_version(),
+        "queue_impl": type(EventSystem().event_queue).__name__,
+        "scenarios": results,
+        "memory": memory,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"results appended to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+📊 FailureClusterIndex benchmark - стоимость поиска в LSH-индексе
+
+Заполняет индекс N сохранёнными падениями (по умолчанию 100k), сгруппированными
+вокруг набора «первопричин», и измеряет:
+- стоимость MinHash-подписи для реалистичной выдержки лога;
+- стоимость поиска в индексе (LSH) при N сохранённых падениях;
+- для сравнения — линейный перебор всех открытых кластеров.
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_failure_clustering --stored 100000
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import List
+
+from src.ambient.failure_clustering import FailureClusterIndex, Signature, estimate_jaccard
+
+_SUITES = ["RingBufferTests", "ConcurrentTests", "PerformanceTests", "E2EBufferTests", "SmartRingBufferTest"]
+_ERRORS = [
+    "Expected equality of these values: consumed produced",
+    "Value of: buffer.empty() Actual: false Expected: true",
+    "ThreadSanitizer: data race on 0x<addr>",
+    "AddressSanitizer: heap-use-after-free on address 0x<addr>",
+    "error: 'memory_order_acq_rel' was not declared in this scope",
+    "Timeout: test exceeded 30 s",
+]
+
+
+def _synthetic_log(rnd: random.Random, cause: int) -> str:
+    crnd = random.Random(cause)
+    suite = crnd.choice(_SUITES)
+    lines = [f"[ FAILED ] {suite}.Case{crnd.randrange(200)}" for _ in range(crnd.randrange(1, 4))]
+    lines += [f"tests/ringbuffer_tests.cpp:{crnd.randrange(1000)}: Failure", crnd.choice(_ERRORS)]
+    lines += [f"cause-{cause} detail {crnd.randrange(10 ** 6)}" for _ in range(3)]
+    # Немного шума конкретного run
+    lines.append(f"note {rnd.randrange(10)}")
+    return "\n".join(lines)
+
+
+def _perturb(rnd: random.Random, signature: Signature, fraction: float) -> Signature:
+    values = list(signature)
+    for i in rnd.sample(range(len(values)), int(len(values) * fraction)):
+        values[i] = rnd.getrandbits(32)
+    return tuple(values)
+
+
+def _timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FailureClusterIndex lookup benchmark")
+    parser.add_argument("--stored", type=int, default=100000, help="Сколько падений сохранить в индексе")
+    parser.add_argument("--causes", type=int, default=5000, help="Число различных первопричин")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="", help="JSONL-файл для результатов (опционально)")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    index = FailureClusterIndex()
+
+    base: List[Signature] = [index.signature_for(_synthetic_log(rnd, cause)) for cause in range(args.causes)]
+
+    start = time.perf_counter()
+    for i in range(args.stored):
+        cause = rnd.randrange(args.causes)
+        index.add_signature(f"run-{i}", _perturb(rnd, base[cause], 0.15))
+    fill_seconds = time.perf_counter() - start
+    clusters = len(index.clusters)
+
+    log = _synthetic_log(rnd, rnd.randrange(args.causes))
+    minhash_seconds = _timed(lambda: index.signature_for(log), 200)
+
+    queries = [_perturb(rnd, base[rnd.randrange(args.causes)], 0.15) for _ in range(args.queries)]
+    hits = 0
+    start = time.perf_counter()
+    for q in queries:
+        if index.query(q) is not None:
+            hits += 1
+    lookup_seconds = (time.perf_counter() - start) / len(queries)
+
+    open_signatures = [c.signature for c in index.open_clusters()]
+    sample = queries[:50]
+    start = time.perf_counter()
+    for q in sample:
+        max(open_signatures, key=lambda s: estimate_jaccard(q, s))
+    linear_seconds = (time.perf_counter() - start) / len(sample)
+
+    result = {
+        "timestamp": time.time(),
+        "stored_failures": args.stored,
+        "clusters": clusters,
+        "fill_us_per_failure": fill_seconds / args.stored * 1e6,
+        "minhash_us": minhash_seconds * 1e6,
+        "lookup_us": lookup_seconds * 1e6,
+        "linear_scan_us": linear_seconds * 1e6,
+        "recall": hits / len(queries),
+    }
+    print(f"stored failures:   {args.stored} in {clusters} clusters")
+    print(f"insert:            {result['fill_us_per_failure']:.1f} us/failure")
+    print(f"minhash signature: {result['minhash_us']:.1f} us")
+    print(f"LSH lookup:        {result['lookup_us']:.1f} us  (recall {result['recall']:.3f})")
+    print(f"linear scan:       {result['linear_scan_us']:.1f} us")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+📊 Prompt readiness benchmark - время до готового приглашения в run_interactive
+
+run_interactive запускается в отдельном потоке на виртуальном терминале
+(pipe-ввод, вывод в /dev/null с управляемым размером). Замеряется:
+- холодный старт: от вызова run_interactive до первой отрисовки приглашения;
+- переход в полноэкранный режим по ресайзу: от смены размера до первого
+  полноэкранного кадра с восстановленным текстом ввода;
+- сколько Application создано и сколько раз регистрировался потребитель UIEventBus.
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_prompt_ready --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.data_structures import Size
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output.vt100 import Vt100_Output
+
+from src.ui import interactive_runner, prompt_ui
+from src.ui.message_bus import UIEventBus
+
+
+class _Probe:
+    """Перехватывает отрисовки DynamicPromptUI и регистрации потребителя шины"""
+
+    def __init__(self) -> None:
+        self.renders: List[tuple] = []   # (время, полноэкранный ли кадр, текст ввода)
+        self.uis: List[prompt_ui.DynamicPromptUI] = []
+        self.consumers = 0
+        self.event = threading.Condition()
+
+    def install(self):
+        probe = self
+        orig_init = prompt_ui.DynamicPromptUI.__init__
+        orig_after = prompt_ui.DynamicPromptUI._on_after_render
+        orig_set_consumer = UIEventBus.set_consumer
+
+        def init(self, *args, **kwargs):
+            orig_init(self, *args, **kwargs)
+            probe.uis.append(self)
+
+        def after(self, app):
+            orig_after(self, app)
+            with probe.event:
+                probe.renders.append((time.perf_counter(), bool(app.full_screen), self.buffer.text))
+                probe.event.notify_all()
+
+        def set_consumer(self, consumer):
+            if consumer is not None:
+                probe.consumers += 1
+            orig_set_consumer(self, consumer)
+
+        prompt_ui.DynamicPromptUI.__init__ = init
+        prompt_ui.DynamicPromptUI._on_after_render = after
+        UIEventBus.set_consumer = set_consumer
+
+        def restore() -> None:
+            prompt_ui.DynamicPromptUI.__init__ = orig_init
+            prompt_ui.DynamicPromptUI._on_after_render = orig_after
+            UIEventBus.set_consumer = orig_set_consumer
+        return restore
+
+    def wait_for(self, predicate, timeout: float = 10.0) -> float:
+        """Время первой отрисовки, удовлетворяющей условию"""
+        deadline = time.monotonic() + timeout
+        with self.event:
+            while True:
+                for stamp, full, text in self.renders:
+                    if predicate(full, text):
+                        return stamp
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError("prompt was not rendered")
+                self.event.wait(left)
+
+
+def run_once(preface: str) -> Dict:
+    probe = _Probe()
+    restore = probe.install()
+    size = [Size(rows=24, columns=80)]
+    devnull = open(os.devnull, "w")
+    try:
+        with create_pipe_input() as inp:
+            output = Vt100_Output(devnull, lambda: size[0], term="xterm")
+
+            def runner() -> None:
+                with create_app_session(input=inp, output=output):
+                    interactive_runner.run_interactive(preface)
+
+            started = time.perf_counter()
+            thread = threading.Thread(target=runner, daemon=True)
+            thread.start()
+            cold = probe.wait_for(lambda full, text: True) - started
+
+            inp.send_text("draft text")
+            probe.wait_for(lambda full, text: text == "draft text")
+            size[0] = Size(rows=30, columns=100)
+            resized = time.perf_counter()
+            # SIGWINCH доходит только до главного потока: перерисовку запрашиваем сами
+            probe.uis[-1].app.invalidate()
+            full = probe.wait_for(lambda full, text: full and text == "draft text") - resized
+            apps = len({id(ui.app) for ui in probe.uis})
+            # До выхода: сколько раз регистрировался потребитель шины
+            consumers = probe.consumers
+
+            inp.send_text("\x04")  # Ctrl+D
+            thread.join(timeout=10)
+    finally:
+        restore()
+        devnull.close()
+    return {"cold_ms": cold * 1e3, "fullscreen_ms": full * 1e3, "apps": apps, "consumers": consumers}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="time-to-ready-prompt of run_interactive")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--preface-lines", type=int, default=200)
+    args = parser.parse_args()
+
+    preface = "\n".join(f"preflight line {i}: ok" for i in range(args.preface_lines))
+    runs = [run_once(preface) for _ in range(args.repeat)]
+    for key in ("cold_ms", "fullscreen_ms"):
+        values = [r[key] for r in runs]
+        print(f"{key:14s} median {statistics.median(values):8.2f}  min {min(values):8.2f}  max {max(values):8.2f}")
+    print(f"applications per session: {runs[-1]['apps']}  bus consumer registrations: {runs[-1]['consumers']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+📊 ShmRingBuffer vs multiprocessing.Queue - межпроцессная пропускная способность
+
+Продюсеры в отдельных процессах пишут N сообщений заданного размера,
+потребитель в главном процессе читает их. Сравниваются ShmRingBuffer
+(spsc / mpmc, чтение с копированием и zero-copy) и multiprocessing.Queue.
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_shm_ring --messages 200000 --size 256
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import time
+from pathlib import Path
+from typing import Dict
+
+from src.core.shm_ring_buffer import ShmRingBuffer
+
+_STOP = b"\x00STOP"
+
+
+def _ring_producer(name: str, lock, count: int, size: int) -> None:
+    ring = ShmRingBuffer.attach(name, lock=lock)
+    payload = b"x" * size
+    for _ in range(count):
+        ring.produce(payload)
+    ring.produce(_STOP)
+    ring.close()
+
+
+def _queue_producer(queue, count: int, size: int) -> None:
+    payload = b"x" * size
+    for _ in range(count):
+        queue.put(payload)
+    queue.put(_STOP)
+
+
+def bench_ring(mode: str, producers: int, count: int, size: int, zero_copy: bool) -> Dict:
+    lock = mp.Lock() if mode == "mpmc" else None
+    with ShmRingBuffer(capacity=4096, slot_size=max(size, len(_STOP)), mode=mode, lock=lock) as ring:
+        procs = [mp.Process(target=_ring_producer, args=(ring.name, lock, count, size)) for _ in range(producers)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        received = 0
+        stops = 0
+        nbytes = 0
+        while stops < producers:
+            if zero_copy:
+                with ring.read_view() as view:
+                    if view is None:
+                        continue
+                    if view.nbytes == len(_STOP) and view == _STOP:
+                        stops += 1
+                        continue
+                    nbytes += view.nbytes
+            else:
+                item = ring.consume()
+                if item == _STOP:
+                    stops += 1
+                    continue
+                nbytes += len(item)
+            received += 1
+        elapsed = time.perf_counter() - start
+        for p in procs:
+            p.join()
+    return _result(f"shm-{mode}{'-zerocopy' if zero_copy else ''}", producers, received, nbytes, elapsed)
+
+
+def bench_queue(producers: int, count: int, size: int) -> Dict:
+    queue = mp.Queue(maxsize=4096)
+    procs = [mp.Process(target=_queue_producer, args=(queue, count, size)) for _ in range(producers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    received = 0
+    stops = 0
+    nbytes = 0
+    while stops < producers:
+        item = queue.get()
+        if item == _STOP:
+            stops += 1
+            continue
+        received += 1
+        nbytes += len(item)
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.join()
+    return _result("mp.Queue", producers, received, nbytes, elapsed)
+
+
+def _result(name: str, producers: int, received: int, nbytes: int, elapsed: float) -> Dict:
+    return {
+        "transport": name,
+        "producers": producers,
+        "messages": received,
+        "msgs_per_sec": received / elapsed,
+        "mb_per_sec": nbytes / elapsed / 1e6,
+        "seconds": elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ShmRingBuffer vs multiprocessing.Queue")
+    parser.add_argument("--messages", type=int, default=100000, help="Сообщений на продюсера")
+    parser.add_argument("--size", type=int, default=256, help="Размер сообщения в байтах")
+    parser.add_argument("--producers", type=int, default=2, help="Продюсеров для MPMC/Queue")
+    parser.add_argument("--output", default="", help="JSONL-файл для результатов (опционально)")
+    args = parser.parse_args()
+
+    results = [
+        bench_ring("spsc", 1, args.messages, args.size, zero_copy=False),
+        bench_ring("spsc", 1, args.messages, args.size, zero_copy=True),
+        bench_queue(1, args.messages, args.size),
+        bench_ring("mpmc", args.producers, args.messages, args.size, zero_copy=False),
+        bench_queue(args.producers, args.messages, args.size),
+    ]
+    for r in results:
+        print(f"{r['transport']:20s} producers={r['producers']}  "
+              f"{r['msgs_per_sec']:>12.0f} msg/s  {r['mb_per_sec']:8.1f} MB/s")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "size": args.size, "results": results}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+📊 stream-json decoder benchmark - разбор потока cursor-agent и число колбэков
+
+Сравнивает на записанном потоке (`cursor-agent ... --output-format stream-json > stream.jsonl`)
+или на синтетическом потоке той же формы:
+- прежний путь: json.loads строки + рекурсивный обход объекта для типа и текста;
+- stream_decoder.decode_line с json и с orjson (если установлен);
+- число вызовов on_chunk без склейки и с ChunkCoalescer при заданном темпе чанков.
+
+Запуск (из github_mcp_server/):
+    python -m tests.bench.bench_stream_decoder --stream recorded.jsonl
+    python -m tests.bench.bench_stream_decoder --chunks 20000
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from src.core import stream_decoder
+from src.core.stream_decoder import ChunkCoalescer, decode_line, extract_text
+
+
+def synthetic_stream(chunks: int, seed: int = 0) -> List[bytes]:
+    """Поток формы cursor-agent: init, user, много мелких assistant-чанков, tool calls, result"""
+    rnd = random.Random(seed)
+    sid = "0b7f6c1e-5d1c-4a55-9d7e-2a1f3c4b5d6e"
+    words = ["buffer", "mutex", "lock-free", "producer", "consumer", "ring", "::", "std", "\n", "`", "тест"]
+    lines = [
+        {"type": "system", "subtype": "init", "session_id": sid, "model": "auto", "cwd": "/repo"},
+        {"type": "user", "message": {"role": "user", "content": [{"type": "text", "text": "analyze the failure"}]},
+         "session_id": sid},
+    ]
+    for i in range(chunks):
+        if i % 500 == 499:
+            lines.append({"type": "tool_call", "subtype": "started", "session_id": sid,
+                          "tool_call": {"readToolCall": {"args": {"path": "src/ring_buffer.cpp"}}}})
+        text = " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 4)))
+        lines.append({"type": "assistant", "message": {"role": "assistant",
+                                                       "content": [{"type": "text", "text": text}]},
+                      "session_id": sid})
+    lines.append({"type": "result", "subtype": "success", "result": "done", "session_id": sid,
+                  "duration_ms": 1234})
+    return [json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n" for line in lines]
+
+
+def legacy_decode(line: bytes) -> Any:
+    """Прежний разбор: json.loads по строке и рекурсивные проверки одного и того же объекта"""
+    text_line = line.decode("utf-8").strip()
+    if not text_line:
+        return None
+    try:
+        obj = json.loads(text_line)
+    except Exception:
+        return None
+    sid = obj.get("session_id") if isinstance(obj, dict) else None
+
+    def is_role(role: str) -> bool:
+        if isinstance(obj, dict):
+            if obj.get("type") == role:
+                return True
+            msg = obj.get("message")
+            if isinstance(msg, dict) and msg.get("role") == role:
+                return True
+        return False
+
+    if is_role("user"):
+        return ("user", extract_text(obj), sid)
+    if is_role("assistant"):
+        return ("assistant", extract_text(obj), sid)
+    if isinstance(obj, dict) and obj.get("type") == "result":
+        return ("result", obj.get("result") or "", sid)
+    return None
+
+
+def _time_decoder(name: str, decode: Callable[[bytes], Any], lines: List[bytes], repeat: int) -> Dict:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in lines:
+            decode(line)
+        best = min(best, time.perf_counter() - started)
+    nbytes = sum(len(line) for line in lines)
+    return {
+        "decoder": name,
+        "lines": len(lines),
+        "us_per_line": best / len(lines) * 1e6,
+        "mb_per_sec": nbytes / best / 1e6,
+    }
+
+
+def count_callbacks(lines: List[bytes], chunk_interval_ms: float, max_delay: float) -> Dict:
+    """Сколько раз вызывается on_chunk при чанке каждые chunk_interval_ms (время моделируется)"""
+    now = [0.0]
+    calls = [0]
+
+    def emit(_text: str) -> None:
+        calls[0] += 1
+
+    coalescer = ChunkCoalescer(emit, max_delay=max_delay, clock=lambda: now[0])
+    chunks = 0
+    for line in lines:
+        event = decode_line(line)
+        if event is not None and event.kind == stream_decoder.ASSISTANT:
+            chunks += 1
+            now[0] += chunk_interval_ms / 1000
+            coalescer.push(event.text)
+            # таймер склейки в реальном времени не успевает сработать — моделируем его здесь
+            if coalescer._timer is not None and now[0] - coalescer._last_emit >= max_delay:
+                coalescer.flush()
+    coalescer.flush()
+    return {"chunks": chunks, "callbacks": calls[0], "max_delay_ms": max_delay * 1e3,
+            "chunk_interval_ms": chunk_interval_ms}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="stream-json decoder micro-benchmark")
+    parser.add_argument("--stream", default="", help="Записанный поток stream-json (JSONL)")
+    parser.add_argument("--chunks", type=int, default=20000, help="Размер синтетического потока")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--chunk-interval-ms", type=float, default=2.0,
+                        help="Темп чанков для подсчёта колбэков")
+    parser.add_argument("--coalesce-ms", type=float, default=30.0)
+    parser.add_argument("--output", default="", help="JSONL-файл для результатов (опционально)")
+    args = parser.parse_args()
+
+    if args.stream:
+        with open(args.stream, "rb") as f:
+            lines = f.readlines()
+    else:
+        lines = synthetic_stream(args.chunks)
+
+    results = [_time_decoder("legacy json+recursive", legacy_decode, lines, args.repeat)]
+    saved_backend = stream_decoder._orjson
+    try:
+        stream_decoder._orjson = None
+        results.append(_time_decoder("decode_line json", decode_line, lines, args.repeat))
+    finally:
+        stream_decoder._orjson = saved_backend
+    if saved_backend is not None:
+        results.append(_time_decoder("decode_line orjson", decode_line, lines, args.repeat))
+    for r in results:
+        print(f"{r['decoder']:24s} {r['us_per_line']:7.2f} us/line  {r['mb_per_sec']:7.1f} MB/s")
+
+    callbacks = count_callbacks(lines, args.chunk_interval_ms, args.coalesce_ms / 1000)
+    print(f"on_chunk calls: {callbacks['chunks']} without coalescing, "
+          f"{callbacks['callbacks']} with {args.coalesce_ms:.0f} ms coalescing "
+          f"(chunk every {args.chunk_interval_ms} ms)")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), "stream": args.stream or "synthetic",
+                                "decoders": results, "callbacks": callbacks}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+🤖 Fake cursor-agent - локальная замена cursor-agent для тестов и бенчмарков
+
+Понимает тот же интерфейс, что использует CursorAgentClient:
+    cursor-agent [--resume SESSION] PROMPT --print --output-format stream-json
+    cursor-agent --resume SESSION --print --output-format stream-json < prompt   (тёплый пул)
+    cursor-agent --help
+
+и пишет в stdout поток stream-json той же формы: system/init, user,
+assistant-чанки (и tool_call между ними), result.
+
+Поведение настраивается переменными окружения:
+    FAKE_AGENT_STARTUP_MS    задержка старта процесса (0)
+    FAKE_AGENT_TOKENS        длина ответа в токенах (200)
+    FAKE_AGENT_TOKEN_RATE    токенов в секунду, 0 — без ограничения (0)
+    FAKE_AGENT_CHUNK_TOKENS  токенов в одном assistant-чанке: "N" или "MIN-MAX" (1)
+    FAKE_AGENT_TOOL_EVERY    tool_call-событие каждые N чанков, 0 — без них (0)
+    FAKE_AGENT_SESSION_ID    id новой сессии (случайный uuid); --resume продолжает переданную
+    FAKE_AGENT_FAIL          режим отказа (см. ниже)
+    FAKE_AGENT_EXIT_CODE     код выхода для режимов отказа (1)
+    FAKE_AGENT_STDERR        текст, который пишется в stderr перед ответом
+    FAKE_AGENT_SEED          seed генератора текста (0)
+    FAKE_AGENT_LOG           JSONL-файл, куда дописывается каждый вызов (argv, prompt, session)
+
+Режимы FAKE_AGENT_FAIL:
+    exit       — выход с FAKE_AGENT_EXIT_CODE до любого вывода
+    crash      — выход с FAKE_AGENT_EXIT_CODE на середине ответа
+    hang       — вывод останавливается на середине ответа, процесс не завершается
+    malformed  — между событиями идут строки, которые не являются JSON
+    no-result  — поток заканчивается без result-события
+    foreign    — половина чанков приходит с чужим session_id
+
+Бенчмарки подключают его через CURSOR_AGENT_BIN (см. install()).
+"""
+
+import json
+import os
+import random
+import stat
+import sys
+import time
+import uuid
+from pathlib import Path
+
+WORDS = ["buffer", "mutex", "lock-free", "producer", "consumer", "ring", "std::atomic", "`", "тест",
+         "\n", "- ", "push", "pop", "capacity", "race", "CI", "failed", "assert"]
+
+
+def install(directory: Path) -> Path:
+    """Создаёт в directory исполняемый `cursor-agent`, запускающий этот скрипт текущим интерпретатором"""
+    path = Path(directory) / "cursor-agent"
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" "$@"\n', encoding="utf-8")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _chunk_range() -> tuple:
+    spec = os.environ.get("FAKE_AGENT_CHUNK_TOKENS", "1") or "1"
+    low, _, high = spec.partition("-")
+    try:
+        low_n = max(1, int(low))
+        high_n = max(low_n, int(high)) if high else low_n
+    except ValueError:
+        return 1, 1
+    return low_n, high_n
+
+
+def _parse_args(args: list) -> tuple:
+    """(prompt или None, session для resume или None, формат вывода)"""
+    session = None
+    output_format = "text"
+    positional = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--resume" and i + 1 < len(args):
+            session = args[i + 1]
+            i += 2
+            continue
+        if arg == "--output-format" and i + 1 < len(args):
+            output_format = args[i + 1]
+            i += 2
+            continue
+        if not arg.startswith("--"):
+            positional.append(arg)
+        i += 1
+    return (positional[0] if positional else None), session, output_format
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    if "--help" in args:
+        sys.stdout.write("Usage: cursor-agent [--resume <id>] [prompt] --print --output-format stream-json\n")
+        return 0
+
+    time.sleep(_env_float("FAKE_AGENT_STARTUP_MS", 0.0) / 1000)
+    prompt, resumed, output_format = _parse_args(args)
+    if output_format != "stream-json":
+        sys.stderr.write(f"fake cursor-agent: unsupported --output-format {output_format}\n")
+        return 2
+    if prompt is None:
+        prompt = sys.stdin.read()
+
+    session = resumed or os.environ.get("FAKE_AGENT_SESSION_ID") or str(uuid.uuid4())
+    fail = os.environ.get("FAKE_AGENT_FAIL", "").strip().lower()
+    exit_code = _env_int("FAKE_AGENT_EXIT_CODE", 1)
+    log_path = os.environ.get("FAKE_AGENT_LOG")
+    if log_path:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"argv": args, "prompt": prompt, "session_id": session, "resumed": bool(resumed),
+                                "pid": os.getpid(), "time": time.time()}, ensure_ascii=False) + "\n")
+
+    stderr_text = os.environ.get("FAKE_AGENT_STDERR")
+    if stderr_text:
+        sys.stderr.write(stderr_text + "\n")
+        sys.stderr.flush()
+    if fail == "exit":
+        return exit_code
+
+    out = sys.stdout.buffer
+
+    def emit(obj: dict) -> None:
+        out.write(json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n")
+        out.flush()
+
+    emit({"type": "system", "subtype": "init", "session_id": session, "model": "fake", "cwd": os.getcwd()})
+    emit({"type": "user", "message": {"role": "user", "content": [{"type": "text", "text": prompt}]},
+          "session_id": session})
+
+    rnd = random.Random(_env_int("FAKE_AGENT_SEED", 0))
+    tokens = max(0, _env_int("FAKE_AGENT_TOKENS", 200))
+    rate = _env_float("FAKE_AGENT_TOKEN_RATE", 0.0)
+    low, high = _chunk_range()
+    tool_every = _env_int("FAKE_AGENT_TOOL_EVERY", 0)
+    started = time.monotonic()
+    sent = 0
+    chunk_index = 0
+    while sent < tokens:
+        if fail in ("crash", "hang") and sent >= tokens // 2:
+            if fail == "crash":
+                return exit_code
+            while True:
+                time.sleep(3600)
+        count = min(tokens - sent, rnd.randint(low, high))
+        if rate > 0:
+            # Темп считается от старта ответа, чтобы паузы не накапливали погрешность
+            wait = started + (sent + count) / rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        text = "".join(rnd.choice(WORDS) + " " for _ in range(count))
+        chunk_session = session
+        if fail == "foreign" and chunk_index % 2 == 1:
+            chunk_session = "foreign-" + session
+        emit({"type": "assistant", "message": {"role": "assistant", "content": [{"type": "text", "text": text}]},
+              "session_id": chunk_session})
+        if fail == "malformed":
+            out.write(b"{not json\n")
+        sent += count
+        chunk_index += 1
+        if tool_every > 0 and chunk_index % tool_every == 0:
+            emit({"type": "tool_call", "subtype": "started", "session_id": session,
+                  "tool_call": {"readToolCall": {"args": {"path": "src/ring_buffer.cpp"}}}})
+
+    if fail != "no-result":
+        emit({"type": "result", "subtype": "success", "result": "done", "session_id": session,
+              "duration_ms": int((time.monotonic() - started) * 1000)})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
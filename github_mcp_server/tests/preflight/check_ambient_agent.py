@@ -20,9 +20,9 @@ def run_ambient_agent_check(donut_dir: Path) -> tuple[bool, str]:
 
         # 2) Убеждаемся, что есть session_id и агент отвечает на ping
         injector = AgentInjector()
-        from src.core.cursor_client import get_global_cursor_client
-        client = get_global_cursor_client()
-        session_id = client.ensure_session()
+        from src.core.session_manager import get_session_manager
+        with get_session_manager().lease(injector.session) as session:
+            session_id = session.client.ensure_session()
         if not session_id:
             printer.print_error("❌ Ambient: не удалось инициализировать session_id")
             return False, "ambient_agent: fail"
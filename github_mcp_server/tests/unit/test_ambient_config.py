@@ -0,0 +1,20 @@
+"""
+Юнит-тесты разбора числовых настроек Ambient Agent из окружения
+"""
+
+from src.ambient.ambient_agent import _env_number
+
+
+def test_valid_values_are_parsed(monkeypatch):
+    monkeypatch.setenv("AMBIENT_PROMPT_TOKEN_BUDGET", " 8000 ")
+    monkeypatch.setenv("AMBIENT_FLAKY_THRESHOLD", "0.25")
+    assert _env_number("AMBIENT_PROMPT_TOKEN_BUDGET", 6000, int) == 8000
+    assert _env_number("AMBIENT_FLAKY_THRESHOLD", 0.1, float) == 0.25
+
+
+def test_missing_empty_or_invalid_values_fall_back(monkeypatch):
+    monkeypatch.delenv("AMBIENT_PROMPT_TOKEN_BUDGET", raising=False)
+    assert _env_number("AMBIENT_PROMPT_TOKEN_BUDGET", 6000, int) == 6000
+    for raw in ("", "  ", "6k", "1.5"):
+        monkeypatch.setenv("AMBIENT_PROMPT_TOKEN_BUDGET", raw)
+        assert _env_number("AMBIENT_PROMPT_TOKEN_BUDGET", 6000, int) == 6000
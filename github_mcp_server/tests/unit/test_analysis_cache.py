@@ -0,0 +1,70 @@
+"""
+Юнит-тесты FailureSignature и AnalysisCache: нормализация, LRU, инвалидация, персистентность
+"""
+
+from src.ambient.analysis_cache import AnalysisCache, FailureSignature, normalize_log_line
+
+LOG_A = """2024-05-01T12:34:56.1234567Z [  FAILED  ] RingBufferTests.TestOverflow (12 ms)
+2024-05-01T12:34:56.2Z src/ringbuffer/ring.cpp:42: error: Expected 3, got 0x7ffd1234
+"""
+LOG_B = """2024-06-02T01:02:03.5Z [  FAILED  ] RingBufferTests.TestOverflow (40 ms)
+2024-06-02T01:02:03.6Z src/ringbuffer/ring.cpp:42: error: Expected 3, got 0x55aa0000
+"""
+
+
+def event_data(log: str) -> dict:
+    return {"failed_jobs": [{"name": "build", "failed_steps": ["test"], "log": log}]}
+
+
+def test_normalization_strips_run_specific_details():
+    line = normalize_log_line("2024-05-01T12:34:56.1Z /home/runner/work/repo/repo/src/a.cpp at 0xdeadbeef (12 ms)")
+    assert line == "src/a.cpp at 0x<addr>"
+
+
+def test_signature_is_stable_across_runs():
+    a = FailureSignature.from_event_data(event_data(LOG_A))
+    b = FailureSignature.from_event_data(event_data(LOG_B))
+    assert a.tests == ["RingBufferTests.TestOverflow"]
+    assert a.files == ["src/ringbuffer/ring.cpp"]
+    assert a.key == b.key
+    assert FailureSignature.from_event_data({"failed_jobs": []}).is_empty()
+
+
+def make_cache(tmp_path, **kwargs):
+    donut = tmp_path / "donut"
+    (donut / "src" / "ringbuffer").mkdir(parents=True)
+    (donut / "src" / "ringbuffer" / "ring.cpp").write_text("int x = 1;\n")
+    return AnalysisCache(tmp_path / "cache.json", donut_dir=donut, **kwargs), donut
+
+
+def test_hit_after_put_and_persisted(tmp_path):
+    cache, donut = make_cache(tmp_path)
+    signature = FailureSignature.from_event_data(event_data(LOG_A))
+    assert cache.get(signature) is None
+    cache.put(signature, "analysis A")
+    assert cache.get(signature) == "analysis A"
+    reloaded = AnalysisCache(tmp_path / "cache.json", donut_dir=donut)
+    assert reloaded.get(FailureSignature.from_event_data(event_data(LOG_B))) == "analysis A"
+
+
+def test_source_change_invalidates_entry(tmp_path):
+    cache, donut = make_cache(tmp_path)
+    signature = FailureSignature.from_event_data(event_data(LOG_A))
+    cache.put(signature, "analysis A")
+    (donut / "src" / "ringbuffer" / "ring.cpp").write_text("int x = 2;\n")
+    assert cache.get(signature) is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction(tmp_path):
+    cache, _ = make_cache(tmp_path, max_entries=2)
+    signatures = [
+        FailureSignature.from_event_data(event_data(f"[  FAILED  ] Suite.Test{i} (1 ms)\nerror: boom {i}\n"))
+        for i in range(3)
+    ]
+    cache.put(signatures[0], "zero")
+    cache.put(signatures[1], "one")
+    assert cache.get(signatures[0]) == "zero"   # 0 становится самым свежим
+    cache.put(signatures[2], "two")
+    assert cache.get(signatures[1]) is None
+    assert cache.get(signatures[0]) == "zero"
@@ -0,0 +1,64 @@
+"""
+Unit tests for cassette keys, storage and record/replay through CursorAgentClient.
+"""
+
+import pytest
+
+from src.core.cassette import RECORD, REPLAY, STRICT, CassetteMissError, CassetteStore, Recording
+from src.core.cursor_client import CursorAgentClient
+from src.core.scheduler import InvocationScheduler
+from tests import fake_cursor_agent
+
+
+def test_key_depends_on_prompt_and_context():
+    key = CassetteStore.key("", "hello")
+    assert key == CassetteStore.key("", "hello")
+    assert key != CassetteStore.key("", "hello!")
+    assert key != CassetteStore.key(key, "hello")
+
+
+def test_save_load_round_trip(tmp_path):
+    store = CassetteStore(tmp_path, REPLAY)
+    recording = Recording("ab" * 32, "hello", [(0.0, b'{"type":"user"}\n'), (0.25, "привет\n".encode())], 0)
+    store.save(recording)
+    loaded = store.load(recording.key)
+    assert loaded.prompt == "hello" and loaded.lines == recording.lines
+    assert list(loaded.timed_lines(speed=2)) == [(0.0, recording.lines[0][1]), (0.125, recording.lines[1][1])]
+    assert list(loaded.timed_lines(speed=0))[1][0] == 0.0
+
+
+def test_modes(tmp_path):
+    assert CassetteStore(tmp_path, RECORD).lookup("", "p")[1] is None   # record never replays
+    assert CassetteStore(tmp_path, REPLAY).recorder("k", "p") is not None
+    assert CassetteStore(tmp_path, STRICT).recorder("k", "p") is None
+    with pytest.raises(CassetteMissError):
+        CassetteStore(tmp_path, STRICT).lookup("", "p")
+    with pytest.raises(ValueError):
+        CassetteStore(tmp_path, "bogus")
+
+
+def converse(client: CursorAgentClient, prompts) -> list:
+    answers = []
+    for prompt in prompts:
+        chunks = []
+        assert client.send_stream(prompt, on_chunk=chunks.append), client.last_error
+        answers.append("".join(chunks))
+    return answers
+
+
+def test_recorded_conversation_replays_without_agent(tmp_path, monkeypatch):
+    monkeypatch.setenv("CURSOR_AGENT_BIN", str(fake_cursor_agent.install(tmp_path)))
+    monkeypatch.setenv("FAKE_AGENT_TOKENS", "5")
+    prompts = ["first", "second"]
+
+    def client(mode: str) -> CursorAgentClient:
+        return CursorAgentClient(warm_pool=None, chunk_delay=0, scheduler=InvocationScheduler(),
+                                 cassette=CassetteStore(tmp_path / "cassettes", mode))
+
+    recorded = converse(client(RECORD), prompts)
+    monkeypatch.setenv("CURSOR_AGENT_BIN", str(tmp_path / "missing-agent"))
+    assert converse(client(STRICT), prompts) == recorded
+    # The same prompt in a different place of the conversation is a different cassette
+    with_gap = client(STRICT)
+    assert not with_gap.send_stream("second")
+    assert "no cassette" in with_gap.last_error
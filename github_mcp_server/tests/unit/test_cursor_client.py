@@ -0,0 +1,129 @@
+"""
+Unit tests for CursorAgentClient warm-pool fallback and watchdog aborts, run against the fake cursor-agent.
+"""
+
+import json
+import os
+import subprocess
+import time
+
+import pytest
+
+from src.core.cursor_client import CancellationToken, CursorAgentClient, WarmProcessPool
+from src.core.scheduler import InvocationScheduler
+from tests import fake_cursor_agent
+
+
+@pytest.fixture
+def agent_log(tmp_path, monkeypatch):
+    monkeypatch.setenv("CURSOR_AGENT_BIN", str(fake_cursor_agent.install(tmp_path)))
+    monkeypatch.setenv("FAKE_AGENT_TOKENS", "3")
+    monkeypatch.delenv("FAKE_AGENT_FAIL", raising=False)
+    log = tmp_path / "calls.jsonl"
+    monkeypatch.setenv("FAKE_AGENT_LOG", str(log))
+    return log
+
+
+def calls(log) -> list:
+    return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def failing_pool(mode: str, **kwargs) -> WarmProcessPool:
+    """A pool whose pre-spawned processes fail in `mode`; cold spawns stay healthy."""
+    def spawn(cmd):
+        env = dict(os.environ, FAKE_AGENT_FAIL=mode)
+        return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                bufsize=0, start_new_session=True, env=env)
+    return WarmProcessPool(spawn=spawn, **kwargs)
+
+
+def make_client(pool: WarmProcessPool, **kwargs) -> CursorAgentClient:
+    client = CursorAgentClient(warm_pool=pool, scheduler=InvocationScheduler(), chunk_delay=0, **kwargs)
+    deadline = time.monotonic() + 10
+    while not pool._slots.get("") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return client
+
+
+def test_warm_exit_falls_back_to_cold_and_counts_against_pool(agent_log):
+    pool = failing_pool("exit", max_failures=2)
+    client = make_client(pool)
+    chunks = []
+    try:
+        assert client.send_stream("hello", on_chunk=chunks.append)
+        assert client.last_error is None
+        assert chunks and pool._failures == 1 and not pool.disabled
+        # Prompt went to the warm process first, then to a cold one with the prompt in argv
+        assert [c["prompt"] for c in calls(agent_log)] == ["hello", "hello"]
+    finally:
+        pool.close()
+
+
+def test_repeated_warm_failures_disable_pool(agent_log):
+    pool = failing_pool("exit", max_failures=2)
+    client = make_client(pool)
+    try:
+        assert client.send_stream("one")
+        pool.prewarm(client.get_session_id())
+        deadline = time.monotonic() + 10
+        while not pool._slots.get(client.get_session_id()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert client.send_stream("two")
+        assert pool.disabled
+    finally:
+        pool.close()
+
+
+def test_watchdog_abort_is_not_retried_cold(agent_log):
+    pool = failing_pool("hang", max_failures=1)
+    client = make_client(pool, idle_timeout=0.3)
+    try:
+        assert not client.send_stream("hello")
+        assert client.last_error == "no output for 0.3s"
+        assert len(calls(agent_log)) == 1
+        assert pool._failures == 0 and not pool.disabled
+    finally:
+        pool.close()
+
+
+def cold_client(**kwargs) -> CursorAgentClient:
+    return CursorAgentClient(warm_pool=None, scheduler=InvocationScheduler(), chunk_delay=0, **kwargs)
+
+
+@pytest.fixture
+def hanging_agent(agent_log, monkeypatch):
+    """The fake agent stops halfway through its answer and never exits."""
+    monkeypatch.setenv("FAKE_AGENT_FAIL", "hang")
+    monkeypatch.setenv("FAKE_AGENT_TOKENS", "4")
+    return agent_log
+
+
+def test_cold_idle_timeout_kills_the_call(hanging_agent):
+    client = cold_client(idle_timeout=0.3, deadline=30)
+    started = time.monotonic()
+    assert not client.send_stream("hello")
+    assert client.last_error == "no output for 0.3s"
+    assert time.monotonic() - started < 5
+    assert len(calls(hanging_agent)) == 1
+
+
+def test_cold_deadline_kills_the_call(hanging_agent):
+    client = cold_client(idle_timeout=0)
+    started = time.monotonic()
+    assert not client.send_stream("hello", deadline=0.3)
+    assert client.last_error == "deadline exceeded"
+    assert time.monotonic() - started < 5
+
+
+def test_cold_cancel_kills_the_call(hanging_agent):
+    client = cold_client(idle_timeout=0, deadline=30)
+    token = CancellationToken()
+    chunks = []
+
+    def on_chunk(text):
+        chunks.append(text)
+        token.cancel()
+
+    assert not client.send_stream("hello", on_chunk=on_chunk, cancel=token)
+    assert chunks and client.last_error == "cancelled"
+    assert len(calls(hanging_agent)) == 1
@@ -0,0 +1,142 @@
+"""
+Юнит-тесты EventHandlers.handle_workflow_event: кэш, дедупликация повторов, кластеры
+"""
+
+import pytest
+
+from src.ambient.analysis_cache import AnalysisCache, FailureSignature
+from src.ambient.event_handlers import EventHandlers
+from src.ambient.event_system import Event, EventType
+from src.ambient.failure_clustering import FailureClusterIndex
+from src.ambient.prompt_generator import PromptGenerator
+
+LOG = "[  FAILED  ] RingBufferTests.TestOverflow (12 ms)\nsrc/ringbuffer/ring.cpp:42: error: Expected 3\n"
+
+
+class CountingPromptGenerator(PromptGenerator):
+    def __init__(self) -> None:
+        super().__init__()
+        self.prompts = 0
+
+    def generate_prompt(self, event: Event) -> str:
+        self.prompts += 1
+        return super().generate_prompt(event)
+
+
+class FakeInjector:
+    def __init__(self, answer: str = "analysis") -> None:
+        self.answer = answer
+        self.prompts = []
+
+    def send_prompt(self, prompt: str, **kwargs) -> str:
+        self.prompts.append(prompt)
+        return self.answer
+
+
+def workflow_event(run_id: int = 1, log: str = LOG, conclusion: str = "failure") -> Event:
+    return Event(type=EventType.GITHUB_WORKFLOW_EVENT, timestamp=1.0, source="test", data={
+        "run_id": run_id,
+        "run_number": run_id,
+        "workflow_name": "CI",
+        "head_sha": "abc",
+        "conclusion": conclusion,
+        "failed_jobs": [{"name": "build", "failed_steps": ["test"], "log": log}],
+    })
+
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+    monkeypatch.setattr(EventHandlers, "_publish", lambda self, text: messages.append(text))
+    monkeypatch.setattr(EventHandlers, "print_info", lambda self, message: None)
+    return messages
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(tmp_path / "cache.json", donut_dir=tmp_path)
+
+
+def test_cache_hit_skips_prompt_build(published, cache):
+    cache.put(FailureSignature.from_event_data(workflow_event().data), "cached analysis")
+    generator, injector = CountingPromptGenerator(), FakeInjector()
+    handlers = EventHandlers(generator, injector, analysis_cache=cache)
+    handlers.handle_workflow_event(workflow_event())
+    assert generator.prompts == 0
+    assert injector.prompts == []
+    assert "cached analysis" in published[0]
+
+
+def test_cache_miss_builds_prompt_and_stores_answer(published, cache):
+    generator, injector = CountingPromptGenerator(), FakeInjector("fresh analysis")
+    handlers = EventHandlers(generator, injector, analysis_cache=cache)
+    handlers.handle_workflow_event(workflow_event())
+    assert generator.prompts == 1
+    assert published == ["fresh analysis"]
+    assert cache.get(FailureSignature.from_event_data(workflow_event().data)) == "fresh analysis"
+
+
+def test_successful_run_is_ignored(published, cache):
+    generator, injector = CountingPromptGenerator(), FakeInjector()
+    handlers = EventHandlers(generator, injector, analysis_cache=cache)
+    handlers.handle_workflow_event(workflow_event(conclusion="success"))
+    assert generator.prompts == 0 and injector.prompts == [] and published == []
+
+
+def cluster_handlers(injector: FakeInjector) -> EventHandlers:
+    return EventHandlers(CountingPromptGenerator(), injector, cluster_index=FailureClusterIndex())
+
+
+def test_redelivered_run_is_not_clustered_or_published_twice(published):
+    injector = FakeInjector("leader analysis")
+    handlers = cluster_handlers(injector)
+    handlers.handle_workflow_event(workflow_event(run_id=1))
+    handlers.handle_workflow_event(workflow_event(run_id=1))
+    cluster = handlers.cluster_index.open_clusters()[0]
+    assert cluster.members == ["1"]
+    assert published == ["leader analysis"]
+    assert len(injector.prompts) == 1
+
+
+def test_cluster_joiner_gets_leader_analysis_once(published):
+    injector = FakeInjector("leader analysis")
+    handlers = cluster_handlers(injector)
+    handlers.handle_workflow_event(workflow_event(run_id=1))
+    handlers.handle_workflow_event(workflow_event(run_id=2))
+    handlers.handle_workflow_event(workflow_event(run_id=2))
+    assert len(injector.prompts) == 1
+    assert len(published) == 2
+    assert "run 1" in published[1] and "leader analysis" in published[1]
+    assert handlers.cluster_index.open_clusters()[0].members == ["1", "2"]
+
+
+def batch_handlers(injector: FakeInjector) -> EventHandlers:
+    return EventHandlers(CountingPromptGenerator(), injector, batch_window=60.0, batch_max=5,
+                         batch_schedule=lambda delay, callback: None,
+                         cluster_index=FailureClusterIndex(threshold=1.01))
+
+
+def test_batched_run_redelivered_after_flush_is_not_reanalysed(published):
+    injector = FakeInjector("=== RUN 1 ===\nfirst\n=== RUN 2 ===\nsecond")
+    handlers = batch_handlers(injector)
+    handlers.handle_workflow_event(workflow_event(run_id=1))
+    handlers.handle_workflow_event(workflow_event(run_id=2))
+    handlers.handle_workflow_event(workflow_event(run_id=1))   # повтор до отправки пакета
+    handlers.batcher.flush_now()
+    assert len(injector.prompts) == 1
+    handlers.handle_workflow_event(workflow_event(run_id=2))   # повтор после отправки пакета
+    assert handlers.batcher.pending() == 0
+    assert len(injector.prompts) == 1
+    assert len(published) == 2
+
+
+def test_drop_pending_releases_runs_without_analysis(published):
+    injector = FakeInjector("analysis")
+    handlers = batch_handlers(injector)
+    handlers.handle_workflow_event(workflow_event(run_id=1))
+    assert handlers.drop_pending() == 1
+    assert injector.prompts == [] and published == []
+    assert handlers.cluster_index.open_clusters() == []
+    # После отбрасывания тот же run снова можно проанализировать
+    handlers.handle_workflow_event(workflow_event(run_id=1))
+    assert handlers.batcher.pending() == 1
@@ -0,0 +1,75 @@
+"""
+Юнит-тесты FailureBatcher: отправка по размеру, по окну, сброс и отбрасывание
+"""
+
+from src.ambient.failure_batcher import FailureBatcher
+
+
+class ManualSchedule:
+    """Планировщик, который срабатывает только по команде теста"""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __call__(self, delay, callback):
+        handle = _Handle(callback)
+        self.calls.append((delay, handle))
+        return handle
+
+
+class _Handle:
+    def __init__(self, callback) -> None:
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def fire(self) -> None:
+        if not self.cancelled:
+            self.callback()
+
+
+def make_batcher(max_items: int = 3):
+    batches, schedule = [], ManualSchedule()
+    return FailureBatcher(batches.append, window=5.0, max_items=max_items, schedule=schedule), batches, schedule
+
+
+def test_full_batch_is_flushed_immediately_and_timer_cancelled():
+    batcher, batches, schedule = make_batcher()
+    for item in "abc":
+        batcher.add(item)
+    assert batches == [["a", "b", "c"]]
+    assert len(schedule.calls) == 1 and schedule.calls[0][1].cancelled
+    assert batcher.pending() == 0
+
+
+def test_window_expiry_flushes_partial_batch():
+    batcher, batches, schedule = make_batcher()
+    batcher.add("a")
+    batcher.add("b")
+    assert schedule.calls[0][0] == 5.0
+    schedule.calls[0][1].fire()
+    assert batches == [["a", "b"]]
+
+
+def test_stale_timer_does_not_flush_next_batch():
+    batcher, batches, schedule = make_batcher(max_items=2)
+    batcher.add("a")
+    stale = schedule.calls[0][1]
+    batcher.add("b")            # пакет ушёл по размеру
+    batcher.add("c")            # новый пакет со своим таймером
+    stale.callback()            # запоздалый вызов старого таймера
+    assert batches == [["a", "b"]]
+    schedule.calls[-1][1].fire()
+    assert batches == [["a", "b"], ["c"]]
+
+
+def test_flush_now_and_discard():
+    batcher, batches, _ = make_batcher()
+    batcher.add("a")
+    batcher.flush_now()
+    batcher.add("b")
+    assert batcher.discard() == ["b"]
+    batcher.flush_now()
+    assert batches == [["a"]]
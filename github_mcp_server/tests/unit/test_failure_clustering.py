@@ -0,0 +1,60 @@
+"""
+Юнит-тесты MinHash/LSH-кластеризации падений
+"""
+
+from src.ambient.failure_clustering import FailureClusterIndex, MinHasher, estimate_jaccard, shingles
+
+BASE = " ".join(f"RingBufferTests.TestOverflow failed at step {i} expected {i} got 0" for i in range(40))
+SIMILAR = BASE + " extra trailing line"
+OTHER = " ".join(f"NetworkTests.TestTimeout socket {i} refused by peer host" for i in range(40))
+
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=128)
+    a, b = shingles(BASE), shingles(SIMILAR)
+    exact = len(a & b) / len(a | b)
+    estimate = estimate_jaccard(hasher.signature(a), hasher.signature(b))
+    assert abs(estimate - exact) < 0.15
+    assert estimate_jaccard(hasher.signature(a), hasher.signature(shingles(OTHER))) < 0.2
+
+
+def test_similar_failures_join_one_cluster():
+    index = FailureClusterIndex()
+    first, is_new = index.assign("run-1", BASE)
+    second, joined_new = index.assign("run-2", SIMILAR)
+    third, other_new = index.assign("run-3", OTHER)
+    assert is_new and not joined_new and other_new
+    assert second is first and third is not first
+    assert first.members == ["run-1", "run-2"]
+    assert first.leader == "run-1"
+
+
+def test_assign_is_idempotent_per_member():
+    index = FailureClusterIndex()
+    cluster, _ = index.assign("run-1", BASE)
+    index.assign("run-2", SIMILAR)
+    again, is_new = index.assign("run-2", SIMILAR)
+    leader_again, leader_new = index.assign("run-1", BASE)
+    assert again is cluster and not is_new
+    assert leader_again is cluster and leader_new
+    assert cluster.members == ["run-1", "run-2"]
+
+
+def test_closed_cluster_is_not_joined():
+    index = FailureClusterIndex()
+    cluster, _ = index.assign("run-1", BASE)
+    index.close(cluster.id)
+    fresh, is_new = index.assign("run-2", SIMILAR)
+    assert is_new and fresh is not cluster
+    # Участник закрытого кластера при повторе попадает в новый
+    again, _ = index.assign("run-1", BASE)
+    assert again is fresh
+
+
+def test_prune_closes_expired_and_forgets_old_closed():
+    index = FailureClusterIndex(cluster_ttl=0.0)
+    cluster, _ = index.assign("run-1", BASE)
+    cluster.last_seen -= 1
+    index.prune(keep_closed=0)
+    assert index.open_clusters() == []
+    assert cluster.id not in index.clusters
@@ -0,0 +1,96 @@
+"""
+Юнит-тесты FlakyTriage: история статусов по workflow и решение о флейке
+"""
+
+import threading
+
+import pytest
+
+from src.ambient import flaky_triage
+from src.ambient.flaky_triage import FlakyIndex, FlakyTriage
+
+TEST = "RingBufferTests.TestOverflow"
+LOG = f"[  FAILED  ] {TEST} (12 ms)\n"
+
+
+def failed(run_id: int, attempt: int = 1) -> dict:
+    return {"run_id": run_id, "workflow_id": 7, "conclusion": "failure", "run_attempt": attempt,
+            "failed_jobs": [{"name": "build", "failed_steps": ["test"], "log": LOG}]}
+
+
+def completed(run_id: int, conclusion: str) -> dict:
+    return {"id": run_id, "workflow_id": 7, "conclusion": conclusion}
+
+
+def make_triage(**kwargs) -> FlakyTriage:
+    return FlakyTriage(FlakyIndex(min_runs=3, flip_threshold=0.5, **kwargs))
+
+
+def test_stats_count_flips():
+    stats = flaky_triage.TestStats()
+    for status in ("FAILED", "PASSED", "PASSED", "FAILED"):
+        stats.add(status)
+    assert (stats.runs, stats.failures, stats.flips) == (4, 2, 2)
+    assert stats.flip_rate == 2 / 3
+
+
+def test_fail_pass_fail_becomes_known_flake():
+    triage = make_triage()
+    assert triage.decide(failed(1)).action == "analyze"
+    triage.observe_run(completed(1, "failure"))   # упавший run сам по себе статусов не добавляет
+    triage.observe_run(completed(2, "success"))
+    assert triage.decide(failed(3)).action == "analyze"    # истории ещё мало: FAILED, PASSED
+    triage.observe_run(completed(4, "success"))
+    decision = triage.decide(failed(5))
+    assert decision.action == "skip" and decision.flaky_tests == [TEST]
+    stats = triage.index.stats(TEST)
+    assert (stats.runs, stats.failures) == (5, 3)
+
+
+def test_every_green_run_is_recorded_not_only_first_after_failure():
+    triage = make_triage()
+    triage.decide(failed(1))
+    for run_id in (2, 3, 4):
+        triage.observe_run(completed(run_id, "success"))
+    assert triage.index.stats(TEST).runs == 4
+
+
+def test_failure_repeated_on_retry_is_analysed():
+    triage = make_triage()
+    for run_id in (1, 2, 3, 4):
+        triage.decide(failed(run_id))
+        triage.observe_run(completed(run_id + 100, "success"))
+    assert triage.decide(failed(5)).action == "skip"
+    # Повтор на второй попытке того же run — уже воспроизведение
+    assert triage.decide(failed(5, attempt=2)).action == "analyze"
+
+
+@pytest.mark.parametrize("with_history", [False, True])
+def test_records_during_refresh_are_not_lost(tmp_path, monkeypatch, with_history):
+    index = FlakyIndex(history_path=tmp_path / "history.jsonl" if with_history else None)
+    index.record([(TEST, "FAILED")])
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_database():
+        loading.set()
+        assert release.wait(5)
+        return [(TEST, "PASSED")]
+
+    monkeypatch.setattr(index, "_load_database", slow_database)
+    refresher = threading.Thread(target=index.refresh)
+    refresher.start()
+    assert loading.wait(5)
+    index.record([(TEST, "FAILED"), ("Other.Test", "PASSED")])  # БД ещё читается
+    release.set()
+    refresher.join(5)
+
+    stats = index.stats(TEST)
+    # БД, затем история до обновления, затем записи во время обновления — каждая ровно один раз
+    expected = (3, 2) if with_history else (2, 1)
+    assert (stats.runs, stats.failures) == expected
+    assert index.stats("Other.Test").runs == 1
+    assert index._pending is None
+
+    if with_history:
+        index.refresh()  # повторное чтение истории не удваивает записи
+        assert (index.stats(TEST).runs, index.stats(TEST).failures) == (3, 2)
@@ -0,0 +1,159 @@
+"""
+Unit tests for the adaptive FrameScheduler of the prompt UI.
+"""
+
+import asyncio
+import threading
+
+from src.ui.frame_scheduler import FrameScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeLoop:
+    """Records scheduled callbacks; `run()` executes what is due."""
+
+    def __init__(self, clock: FakeClock) -> None:
+        self.clock = clock
+        self.soon = []
+        self.later = []
+
+    def is_closed(self) -> bool:
+        return False
+
+    def call_soon_threadsafe(self, callback) -> None:
+        self.soon.append(callback)
+
+    def call_later(self, delay: float, callback) -> None:
+        self.later.append((self.clock.now + delay, callback))
+
+    def run(self) -> None:
+        while self.soon:
+            self.soon.pop(0)()
+        due = [entry for entry in self.later if entry[0] <= self.clock.now]
+        self.later = [entry for entry in self.later if entry[0] > self.clock.now]
+        for _, callback in due:
+            callback()
+
+
+def make_scheduler(**kwargs):
+    clock = FakeClock()
+    loop = FakeLoop(clock)
+    applied, frames = [], []
+    scheduler = FrameScheduler(applied.append, lambda: frames.append(clock.now), clock=clock, **kwargs)
+    return scheduler, loop, clock, applied, frames
+
+
+def test_many_pushes_in_one_frame_give_one_apply():
+    scheduler, loop, clock, applied, frames = make_scheduler(frame_rate=10)
+    scheduler.start(loop)
+    for i in range(50):
+        scheduler.push(f"{i} ")
+    scheduler.push("")
+    assert len(loop.soon) == 1  # armed once, not per push
+    loop.run()
+    assert applied == ["".join(f"{i} " for i in range(50))]
+    assert frames == [0.0]
+    assert (scheduler.frames, scheduler.chunks) == (1, 50)
+
+
+def test_push_inside_the_interval_waits_for_the_next_frame():
+    scheduler, loop, clock, applied, frames = make_scheduler(frame_rate=10)
+    scheduler.start(loop)
+    scheduler.push("a")
+    loop.run()
+    clock.now = 0.04
+    scheduler.push("b")
+    scheduler.push("c")
+    loop.run()
+    assert applied == ["a"]
+    assert [round(due, 6) for due, _ in loop.later] == [0.1]
+    clock.now = 0.1
+    loop.run()
+    assert applied == ["a", "bc"]
+    assert frames == [0.0, 0.1]
+
+
+def test_text_pushed_before_start_is_flushed():
+    scheduler, loop, clock, applied, frames = make_scheduler()
+    scheduler.push("early ")
+    scheduler.push("text")
+    assert loop.soon == [] and applied == []
+    scheduler.start(loop)
+    loop.run()
+    assert applied == ["early text"]
+    assert len(frames) == 1
+
+
+def test_start_without_pending_text_does_not_schedule():
+    scheduler, loop, *_ = make_scheduler()
+    scheduler.start(loop)
+    assert loop.soon == [] and loop.later == []
+
+
+def test_interval_stretches_under_slow_renders_and_recovers():
+    scheduler, loop, clock, applied, frames = make_scheduler(frame_rate=30, max_interval=0.25)
+    assert scheduler.interval == scheduler.min_interval
+    for _ in range(30):
+        scheduler.record_render(0.5)
+    assert scheduler.interval == scheduler.max_interval == 0.25
+
+    previous = scheduler.interval
+    for _ in range(60):
+        scheduler.record_render(0.0)
+        assert scheduler.interval <= previous
+        previous = scheduler.interval
+    assert scheduler.interval == scheduler.min_interval
+
+
+def test_batching_time_counts_towards_frame_cost():
+    clock = FakeClock()
+    loop = FakeLoop(clock)
+
+    def slow_apply(text: str) -> None:
+        clock.now += 0.2
+
+    scheduler = FrameScheduler(slow_apply, lambda: None, frame_rate=30, max_interval=1.0, clock=clock)
+    scheduler.start(loop)
+    for _ in range(20):
+        scheduler.push("x")
+        clock.now += 10
+        loop.run()
+        scheduler.record_render(0.0)
+    assert scheduler.interval > 0.35  # ~2 x 0.2 s batching, although renders were free
+
+
+def test_pushes_from_other_threads():
+    applied, frames = [], []
+
+    async def main() -> None:
+        scheduler = FrameScheduler(applied.append, lambda: frames.append(1), frame_rate=100)
+        scheduler.start(asyncio.get_running_loop())
+
+        def produce(name: str) -> None:
+            for i in range(200):
+                scheduler.push(f"{name}{i};")
+
+        threads = [threading.Thread(target=produce, args=(name,)) for name in "abcd"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        for _ in range(100):
+            if scheduler.chunks == 800:
+                break
+            await asyncio.sleep(0.02)
+
+    asyncio.run(main())
+    parts = "".join(applied).split(";")[:-1]
+    assert sorted(parts) == sorted(f"{name}{i}" for name in "abcd" for i in range(200))
+    for name in "abcd":
+        # Text of one producer keeps its order
+        assert [p for p in parts if p[0] == name] == [f"{name}{i}" for i in range(200)]
+    assert len(frames) == len(applied) < 800
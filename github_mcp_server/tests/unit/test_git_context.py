@@ -0,0 +1,104 @@
+"""
+Юнит-тесты GitContextProvider: `bad ^good`, индекс коммит-графа, выбор последнего зелёного
+"""
+
+import subprocess
+
+import pytest
+
+from src.ambient.git_context import GitContextProvider
+from src.ambient.github_monitor import GitHubMonitor
+
+
+def git(repo, *args, when: int = 0) -> str:
+    env = {
+        "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@example.com",
+        "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@example.com",
+        "GIT_AUTHOR_DATE": f"{1700000000 + when} +0000", "GIT_COMMITTER_DATE": f"{1700000000 + when} +0000",
+        "PATH": "/usr/bin:/bin:/usr/local/bin",
+    }
+    return subprocess.run(["git", *args], cwd=repo, env=env, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def commit(repo, name: str, text: str, when: int) -> str:
+    (repo / name).write_text(text)
+    git(repo, "add", name)
+    git(repo, "commit", "-q", "-m", f"{name}: {text.strip()}", when=when)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """
+    base ─ good ─────── merge (bad)
+       └─ side ───────┘
+    """
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    shas = {"base": commit(repo, "a.cpp", "int a = 1;\n", 1)}
+    git(repo, "checkout", "-q", "-b", "side")
+    shas["side"] = commit(repo, "b.cpp", "int b = 1;\n", 2)
+    git(repo, "checkout", "-q", "main")
+    shas["good"] = commit(repo, "a.cpp", "int a = 2;\n", 3)
+    git(repo, "merge", "-q", "--no-ff", "-m", "merge side", "side", when=4)
+    shas["bad"] = git(repo, "rev-parse", "HEAD")
+    return repo, shas
+
+
+@pytest.fixture
+def provider(repo):
+    provider = GitContextProvider(repo[0])
+    yield provider
+    provider.close()
+
+
+def test_commits_between_excludes_all_ancestors_of_good(repo, provider):
+    _, shas = repo
+    commits, truncated = provider.commits_between(shas["good"], shas["bad"])
+    assert [c.sha for c in commits] == [shas["bad"], shas["side"]]
+    assert not truncated
+
+
+def test_commits_between_is_empty_when_bad_is_ancestor(repo, provider):
+    _, shas = repo
+    assert provider.commits_between(shas["bad"], shas["good"]) == ([], False)
+    assert provider.commits_between(shas["good"], shas["good"]) == ([], False)
+
+
+def test_commits_between_truncates(repo, provider):
+    _, shas = repo
+    provider.max_commits = 1
+    commits, truncated = provider.commits_between(shas["base"], shas["bad"])
+    assert len(commits) == 1 and truncated
+
+
+def test_diff_context_reuses_cached_stats(repo, provider, monkeypatch):
+    _, shas = repo
+    first = provider.diff_context(shas["base"], shas["bad"])
+    assert sorted(first.stats) == [("a.cpp", 1, 1), ("b.cpp", 1, 0)]
+    monkeypatch.setattr(provider, "changed_files", lambda *args: pytest.fail("дерево обходится повторно"))
+    second = provider.diff_context(shas["base"], shas["bad"])
+    assert second.stats == first.stats
+    assert [(h.path, h.text) for h in second.hunks] == [(h.path, h.text) for h in first.hunks]
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monkeypatch.setattr(GitHubMonitor, "detect_repo_name", lambda self: None)
+    env = type("Env", (), {"get_env_var": lambda self, name: None})()
+    return GitHubMonitor(event_system=None, env_manager=env)
+
+
+def run(number: int, sha: str, conclusion: str = "success") -> dict:
+    return {"workflow_id": 7, "head_branch": "main", "run_number": number,
+            "head_sha": sha, "conclusion": conclusion}
+
+
+def test_last_green_is_older_than_failing_run(monitor):
+    for number, sha in ((3, "c3"), (5, "c5"), (8, "c8")):
+        monitor.record_green(run(number, sha))
+    assert monitor.find_last_green_sha(run(6, "bad", "failure")) == "c5"
+    assert monitor.find_last_green_sha(run(9, "bad", "failure")) == "c8"
+    assert monitor.find_last_green_sha(run(2, "bad", "failure")) is None
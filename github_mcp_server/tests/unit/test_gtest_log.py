@@ -0,0 +1,120 @@
+"""
+Unit tests for the mmap gtest/buffer_runner log scanner.
+"""
+
+from src.core.gtest_log import iter_log_records, scan_buffer, summarize_log
+
+LOG = (
+    b"Running main() from gtest_main.cc\n"
+    b"[ RUN      ] Ring.Push\n"
+    b"[       OK ] Ring.Push (3 ms)\n"
+    b"[ RUN      ] Ring.Pop\n"
+    b"ring_test.cc:42: Failure\n"
+    b"Expected: 1\n"
+    b"[  FAILED  ] Ring.Pop (7 ms)\n"
+    b"[ RUN      ] Ring.Skip\n"
+    b"[  SKIPPED ] Ring.Skip (0 ms)\n"
+    b"[  FAILED  ] Ring.Pop\n"
+)
+
+
+def write(tmp_path, data: bytes):
+    path = tmp_path / "run.log"
+    path.write_bytes(data)
+    return path
+
+
+def test_run_ok_failed_blocks():
+    records = list(scan_buffer(LOG))
+    assert [(r.test, r.status, r.duration_ms) for r in records] == [
+        ("Ring.Push", "PASSED", 3),
+        ("Ring.Pop", "FAILED", 7),
+        ("Ring.Skip", "SKIPPED", 0),
+    ]
+    # Only failed tests keep their output; the trailing summary line is not a record
+    assert records[0].text == ""
+    assert records[1].text == "ring_test.cc:42: Failure\nExpected: 1"
+    assert records[1].offset == LOG.index(b"[ RUN      ] Ring.Pop")
+
+
+def test_truncated_final_block_is_incomplete():
+    data = LOG + b"[ RUN      ] Ring.Crash\npartial output\n"
+    last = list(scan_buffer(data))[-1]
+    assert (last.test, last.status, last.duration_ms) == ("Ring.Crash", "INCOMPLETE", None)
+    assert last.text == "partial output"
+
+
+def test_run_without_result_before_next_run_is_incomplete():
+    data = b"[ RUN      ] A.first\ncrashed\n[ RUN      ] A.second\n[       OK ] A.second (1 ms)\n"
+    records = list(scan_buffer(data))
+    assert [(r.test, r.status) for r in records] == [("A.first", "INCOMPLETE"), ("A.second", "PASSED")]
+    assert records[0].text == "crashed"
+
+
+def test_failure_text_keeps_only_the_tail():
+    body = b"".join(b"line %d\n" % i for i in range(100))
+    data = b"[ RUN      ] A.big\n" + body + b"[  FAILED  ] A.big (1 ms)\n"
+    record = next(scan_buffer(data, max_failure_bytes=16))
+    assert record.text.endswith("line 99")
+    assert len(record.text) <= 16
+
+
+def test_smart_lines():
+    data = (
+        b"[SMART] Starting suite\n"
+        b"[SMART] Test completed: Ring.Push - PASSED (12 ms)\n"
+    )
+    records = list(scan_buffer(data, kinds=("smart",)))
+    assert [r.text for r in records] == ["Starting suite", "Test completed: Ring.Push - PASSED (12 ms)"]
+    assert records[0].test is None
+    assert (records[1].test, records[1].status, records[1].duration_ms) == ("Ring.Push", "PASSED", 12)
+
+
+def test_items_per_sec_lines():
+    data = (
+        b"BM_Push/64    1200 ns   1.5e+06 items/sec\n"
+        b"BM_Pop  2.5 items/sec and 3 items/sec\n"
+        b"[ RUN      ] A.b\n"
+        b"[       OK ] A.b (1 ms)\n"
+    )
+    records = list(scan_buffer(data, kinds=("throughput",)))
+    assert [r.value for r in records] == [1.5e6, 2.5, 3.0]
+    assert records[0].text == "BM_Push/64    1200 ns   1.5e+06 items/sec"
+    assert records[1].offset == records[2].offset == data.index(b"BM_Pop")
+
+    # Without "throughput" in kinds the items/sec lines are not searched at all
+    assert all(r.kind == "test" for r in scan_buffer(data, kinds=("test",)))
+
+
+def test_records_are_in_file_order_across_kinds():
+    data = b"1 items/sec\n[SMART] x\n[ RUN      ] A.b\n2 items/sec\n[       OK ] A.b (1 ms)\n"
+    assert [r.kind for r in scan_buffer(data)] == ["throughput", "smart", "throughput", "test"]
+
+
+def test_crlf_line_endings(tmp_path):
+    path = write(tmp_path, LOG.replace(b"\n", b"\r\n") + b"[SMART] done\r\n4 items/sec\r\n")
+    records = list(iter_log_records(path))
+    tests = [(r.test, r.status) for r in records if r.kind == "test"]
+    assert tests == [("Ring.Push", "PASSED"), ("Ring.Pop", "FAILED"), ("Ring.Skip", "SKIPPED")]
+    failed = next(r for r in records if r.status == "FAILED")
+    assert failed.text == "ring_test.cc:42: Failure\nExpected: 1"
+    assert [r.text for r in records if r.kind == "smart"] == ["done"]
+    assert [r.value for r in records if r.kind == "throughput"] == [4.0]
+
+
+def test_empty_file(tmp_path):
+    path = write(tmp_path, b"")
+    assert list(iter_log_records(path)) == []
+    assert summarize_log(path) == {
+        "statuses": {},
+        "failures": [],
+        "throughput": {"count": 0, "min": None, "max": None, "avg": None},
+    }
+
+
+def test_summarize_log(tmp_path):
+    path = write(tmp_path, LOG + b"10 items/sec\n30 items/sec\n[ RUN      ] Ring.Crash\n")
+    summary = summarize_log(path)
+    assert summary["statuses"] == {"PASSED": 1, "FAILED": 1, "SKIPPED": 1, "INCOMPLETE": 1}
+    assert [r.test for r in summary["failures"]] == ["Ring.Pop", "Ring.Crash"]
+    assert summary["throughput"] == {"count": 2, "min": 10.0, "max": 30.0, "avg": 20.0}
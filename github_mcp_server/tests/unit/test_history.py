@@ -0,0 +1,110 @@
+"""
+Unit tests for MessageHistory: cached row counts against a full textwrap recount.
+"""
+
+import random
+import textwrap
+
+from src.ui.history import MessageHistory, wrapped_rows
+
+WORDS = ["ring", "buffer", "x" * 37, "lock-free", "", "данные", "producer", "consumer", "seq"]
+
+
+def recount(history: MessageHistory, width: int) -> int:
+    """Rows of the rendered fragments, wrapped from scratch."""
+    total = 0
+    for _, text in history.fragments():
+        for line in text[:-1].split("\n"):
+            total += max(1, len(textwrap.wrap(line, width=width)))
+    return total
+
+
+def recount_single(history: MessageHistory, index: int, width: int) -> int:
+    text = history.fragments()[index][1]
+    return sum(max(1, len(textwrap.wrap(line, width=width))) for line in text[:-1].split("\n"))
+
+
+def stream_text(rng: random.Random, words: int) -> list:
+    """Chunks of a random text, cut at arbitrary positions (mid-word, across newlines)."""
+    text = "".join(rng.choice(WORDS) + rng.choice([" ", " ", " ", "\n", "\n\n"]) for _ in range(words))
+    chunks, pos = [], 0
+    while pos < len(text):
+        step = rng.randint(1, 12)
+        chunks.append(text[pos:pos + step])
+        pos += step
+    return chunks
+
+
+def test_wrapped_rows():
+    assert wrapped_rows("", 10) == 1
+    assert wrapped_rows("x" * 10, 10) == 1
+    assert wrapped_rows("aaaa bbbb cccc", 10) == 2
+
+
+def test_streaming_appends_match_recount():
+    rng = random.Random(1)
+    history = MessageHistory()
+    history.append("user", "question")
+    for chunk in stream_text(rng, 200):
+        history.extend("assistant", chunk)
+        assert history.rows(30) == recount(history, 30)
+    assert history.reflows == 1
+
+
+def test_role_switches_match_recount():
+    rng = random.Random(2)
+    history = MessageHistory()
+    for turn in range(12):
+        role = ("user", "assistant", "system")[turn % 3]
+        for chunk in stream_text(rng, 20):
+            history.extend(role, chunk)
+            assert history.rows(25) == recount(history, 25)
+    assert len(history) == 12
+    assert [role for role, _ in history.messages()][:3] == ["user", "assistant", "system"]
+
+
+def test_width_change_reflows_once():
+    rng = random.Random(3)
+    history = MessageHistory()
+    for turn in range(6):
+        for chunk in stream_text(rng, 30):
+            history.extend("user" if turn % 2 else "assistant", chunk)
+    for width in (40, 40, 12, 80, 12):
+        assert history.rows(width) == recount(history, width)
+        assert history.message_rows(0, width) == recount_single(history, 0, width)
+    assert history.width == 12
+    assert history.reflows == 4  # the repeated width is served from the cache
+
+    # Streaming after a reflow keeps using the new width
+    for chunk in stream_text(rng, 30):
+        history.extend("assistant", chunk)
+        assert history.rows(12) == recount(history, 12)
+
+
+def test_pop_oldest_matches_recount():
+    rng = random.Random(4)
+    history = MessageHistory()
+    for turn in range(10):
+        history.append("user", f"message {turn} " + " ".join(rng.choice(WORDS) for _ in range(15)))
+        history.rows(20)
+    while len(history) > 1:
+        history.pop_oldest()
+        assert history.rows(20) == recount(history, 20)
+        history.extend("assistant", " tail\nmore")
+        assert history.rows(20) == recount(history, 20)
+    assert history.reflows == 1
+
+
+def test_pop_oldest_before_first_render():
+    history = MessageHistory()
+    history.append("user", "a\nb")
+    history.append("assistant", "c")
+    assert history.pop_oldest() == ("user", "a\nb")
+    assert history.rows(10) == recount(history, 10) == 1
+
+
+def test_empty_history():
+    history = MessageHistory()
+    assert history.rows(10) == 0
+    assert history.width is None
+    assert history.fragments() == []
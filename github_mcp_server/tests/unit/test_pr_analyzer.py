@@ -0,0 +1,203 @@
+"""
+Юнит-тесты PRAnalyzer: первое ревью, инкрементальный дифф, force-push, параллельные части
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.ambient.event_system import Event, EventType
+from src.ambient.pr_analyzer import PRAnalyzer, PRReviewStore, extract_pr_summary
+from src.ambient.prompt_generator import PromptGenerator
+from src.core.session_manager import AMBIENT_PR
+
+
+def pr_file(name: str, patch: str = "@@ -1 +1 @@\n-old\n+new") -> dict:
+    return {"filename": name, "status": "modified", "additions": 1, "deletions": 1, "patch": patch}
+
+
+class FakeGitHub:
+    """Ответы GitHubMonitor.fetch_pr_files / fetch_compare без сети"""
+
+    def __init__(self, pr_files, compare=None) -> None:
+        self.pr_files = pr_files
+        self.compare = compare
+        self.calls = []
+
+    def fetch_pr_files(self, pr_number):
+        self.calls.append(("files", pr_number))
+        return self.pr_files
+
+    def fetch_compare(self, base, head):
+        self.calls.append(("compare", base, head))
+        return self.compare
+
+
+class FakeInjector:
+    def __init__(self, answer: str = "Проблем нет.\nРЕЗЮМЕ: всё хорошо") -> None:
+        self.answer = answer
+        self.prompts = []
+        self.detached = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def send_prompt(self, prompt: str, session=None, **kwargs) -> str:
+        assert session == AMBIENT_PR
+        self.prompts.append(prompt)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer
+
+    def send_prompt_detached(self, prompt: str) -> str:
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.detached.append(prompt)
+        time.sleep(0.02)
+        with self._lock:
+            self.active -= 1
+        return f"review of part {prompt.split('Часть ')[1].split(' ')[0]}"
+
+
+def pr_event(head_sha: str = "b" * 40, pr_number: int = 7) -> Event:
+    return Event(type=EventType.GITHUB_PR_UPDATED, timestamp=1.0, source="test", data={
+        "pr_number": pr_number,
+        "pr_title": "Ring buffer",
+        "head_sha": head_sha,
+        "base_ref": "main",
+        "body": "Описание PR",
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PRReviewStore(tmp_path / "pr_reviews.json")
+
+
+def make_analyzer(github, injector, store, **kwargs) -> PRAnalyzer:
+    analyzer = PRAnalyzer(github, PromptGenerator(token_budget=kwargs.pop("token_budget", 6000)),
+                          injector, store, **kwargs)
+    analyzer.print_info = lambda *args, **kw: None
+    return analyzer
+
+
+def test_first_review_sends_full_diff_and_stores_summary(store):
+    github = FakeGitHub([pr_file("src/ring.cpp"), pr_file("tests/ring_test.cpp")])
+    injector = FakeInjector()
+    analyzer = make_analyzer(github, injector, store)
+
+    assert analyzer.analyze(pr_event()) == injector.answer
+    assert github.calls == [("files", 7)]
+    (prompt,) = injector.prompts
+    assert "Полный дифф PR" in prompt and "src/ring.cpp" in prompt and "tests/ring_test.cpp" in prompt
+    assert store.get(7)["head_sha"] == "b" * 40
+    assert store.get(7)["summary"] == "всё хорошо"
+
+    # Повтор того же head SHA ничего не отправляет
+    assert analyzer.analyze(pr_event()) == ""
+    assert len(injector.prompts) == 1
+
+
+def test_incremental_push_sends_compare_diff_and_summary(store):
+    store.put(7, "a" * 40, "прошлое резюме")
+    github = FakeGitHub([pr_file("src/ring.cpp"), pr_file("src/old.cpp")], compare={
+        "status": "ahead",
+        "commits": [{"sha": "c" * 40, "message": "fix overflow"}],
+        "files": [pr_file("src/ring.cpp", "@@ -5 +5 @@\n-a\n+b")],
+    })
+    injector = FakeInjector()
+    make_analyzer(github, injector, store).analyze(pr_event())
+
+    assert github.calls == [("compare", "a" * 40, "b" * 40)]
+    (prompt,) = injector.prompts
+    assert "Изменения с прошлого ревью (aaaaaaa..bbbbbbb)" in prompt
+    assert "прошлое резюме" in prompt and "fix overflow" in prompt
+    assert "src/ring.cpp" in prompt and "src/old.cpp" not in prompt
+    assert "Описание PR" not in prompt  # резюме заменяет описание PR
+    assert store.get(7)["head_sha"] == "b" * 40
+
+
+@pytest.mark.parametrize("compare", [
+    None,  # прошлый head удалён: compare API вернул ошибку
+    {"status": "diverged", "commits": [], "files": [pr_file("src/partial.cpp")]},
+])
+def test_force_push_falls_back_to_full_diff(store, compare):
+    store.put(7, "a" * 40, "прошлое резюме")
+    github = FakeGitHub([pr_file("src/ring.cpp")], compare=compare)
+    injector = FakeInjector()
+    make_analyzer(github, injector, store).analyze(pr_event())
+
+    assert github.calls == [("compare", "a" * 40, "b" * 40), ("files", 7)]
+    (prompt,) = injector.prompts
+    assert "Полный дифф PR" in prompt and "force-push" in prompt
+    assert "прошлое резюме" in prompt
+    assert "src/partial.cpp" not in prompt
+
+
+def test_empty_compare_advances_head_without_prompt(store):
+    store.put(7, "a" * 40, "прошлое резюме")
+    github = FakeGitHub([], compare={"status": "identical", "commits": [], "files": []})
+    injector = FakeInjector()
+    assert make_analyzer(github, injector, store).analyze(pr_event()) == ""
+    assert injector.prompts == []
+    assert store.get(7)["head_sha"] == "b" * 40
+    assert store.get(7)["summary"] == "прошлое резюме"
+
+
+def test_large_diff_is_split_and_reviewed_under_pool_bound(store):
+    files = [pr_file(f"src/file{i}.cpp", "+" + "x" * 2000) for i in range(8)]
+    injector = FakeInjector()
+    analyzer = make_analyzer(FakeGitHub(files), injector, store, token_budget=1000, max_workers=2, chunk_tokens=600)
+
+    chunks = analyzer.split_files(files)
+    assert [f for chunk in chunks for f in chunk] == files
+    assert len(chunks) == 8
+
+    analyzer.analyze(pr_event())
+    assert len(injector.detached) == 8
+    assert injector.max_active == 2
+    # Итоговый запрос — сводка ревью частей в общую сессию
+    (synthesis,) = injector.prompts
+    assert "Ревью части 1 из 8:" in synthesis and "review of part 1" in synthesis
+    assert store.get(7)["head_sha"] == "b" * 40
+
+
+def test_small_diff_is_not_split(store):
+    files = [pr_file("src/a.cpp"), pr_file("src/b.cpp")]
+    analyzer = make_analyzer(FakeGitHub(files), FakeInjector(), store)
+    assert analyzer.split_files(files) == [files]
+
+
+@pytest.mark.parametrize("answer", ["", RuntimeError("agent crashed")])
+def test_state_is_persisted_only_after_success(store, answer):
+    store.put(7, "a" * 40, "прошлое резюме")
+    github = FakeGitHub([], compare={"status": "ahead", "commits": [], "files": [pr_file("src/ring.cpp")]})
+    injector = FakeInjector(answer)
+    analyzer = make_analyzer(github, injector, store)
+
+    if isinstance(answer, Exception):
+        with pytest.raises(RuntimeError):
+            analyzer.analyze(pr_event())
+    else:
+        assert analyzer.analyze(pr_event()) == ""
+    assert store.get(7)["head_sha"] == "a" * 40
+    assert store.get(7)["summary"] == "прошлое резюме"
+
+    # Следующая попытка снова берёт дифф от последнего успешного ревью
+    injector.answer = "ok\nРЕЗЮМЕ: новое"
+    analyzer.analyze(pr_event())
+    assert github.calls[-1] == ("compare", "a" * 40, "b" * 40)
+    assert store.get(7)["summary"] == "новое"
+
+
+def test_store_survives_reload(tmp_path):
+    path = tmp_path / "pr_reviews.json"
+    PRReviewStore(path).put(7, "a" * 40, "резюме")
+    assert PRReviewStore(path).get(7)["summary"] == "резюме"
+
+
+def test_extract_pr_summary():
+    assert extract_pr_summary("ревью\n**РЕЗЮМЕ:** кратко") == "кратко"
+    assert extract_pr_summary("ответ без раздела", max_chars=5) == "ответ"
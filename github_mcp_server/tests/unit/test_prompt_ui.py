@@ -0,0 +1,238 @@
+"""
+Headless tests for DynamicPromptUI: the UI runs in a thread on a pipe input
+and a DummyOutput whose size the test changes.
+"""
+
+import threading
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.data_structures import Size
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from src.core.cursor_client import AssistantChunk
+from src.core.session_manager import INTERACTIVE
+from src.ui import prompt_ui
+from src.ui.message_bus import UIEventBus
+from src.ui.prompt_ui import DynamicPromptUI
+
+
+class SizedOutput(DummyOutput):
+    def __init__(self, size: Size) -> None:
+        super().__init__()
+        self.size = size
+
+    def get_size(self) -> Size:
+        return self.size
+
+
+class HeadlessUI:
+    """Runs DynamicPromptUI.run() in a thread and records every rendered frame."""
+
+    def __init__(self, inp, rows: int = 24, columns: int = 80, **kwargs) -> None:
+        self.inp = inp
+        self.output = SizedOutput(Size(rows=rows, columns=columns))
+        self.frames = []
+        self.invalidates = 0
+        self.resizes = 0
+        self._cond = threading.Condition()
+        created = threading.Event()
+
+        def runner() -> None:
+            with create_app_session(input=inp, output=self.output):
+                self.ui = DynamicPromptUI(**kwargs)
+                self._instrument()
+                created.set()
+                self.result = self.ui.run()
+
+        self.thread = threading.Thread(target=runner, daemon=True)
+        self.thread.start()
+        assert created.wait(10)
+
+    def _instrument(self) -> None:
+        ui = self.ui
+        invalidate, on_resize = ui._invalidate, ui._on_resize
+
+        def counting_invalidate() -> None:
+            self.invalidates += 1
+            invalidate()
+
+        def counting_resize(app) -> None:
+            self.resizes += 1
+            on_resize(app)
+
+        ui._invalidate = counting_invalidate
+        ui._on_resize = counting_resize
+        ui.app.after_render += self._rendered
+
+    def _rendered(self, app) -> None:
+        ui = self.ui
+        with self._cond:
+            self.frames.append({
+                "size": (self.output.size.columns, self.output.size.rows),
+                "full_screen": app.full_screen,
+                "border": len(ui._top_ctrl.text),
+                "history_size": ui._history_size,
+                "text": ui.buffer.text,
+                "cursor": ui.buffer.cursor_position,
+                "messages": ui._history.messages(),
+                "invalidates": self.invalidates,
+                "resizes": self.resizes,
+            })
+            self._cond.notify_all()
+
+    def wait_frame(self, predicate, after: int = 0, timeout: float = 10.0) -> dict:
+        """First frame (from index `after`) that satisfies the predicate."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for frame in self.frames[after:]:
+                    if predicate(frame):
+                        return frame
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"no matching frame; last: {self.frames[-1:]}")
+                self._cond.wait(left)
+
+    def resize(self, rows: int, columns: int) -> dict:
+        """Change the terminal size and return the first frame rendered at it."""
+        after = len(self.frames)
+        self.output.size = Size(rows=rows, columns=columns)
+        # SIGWINCH only reaches the main thread: request the redraw ourselves
+        self.ui.app.invalidate()
+        return self.wait_frame(lambda frame: frame["size"] == (columns, rows), after)
+
+    def redraw(self) -> dict:
+        after = len(self.frames)
+        self.ui.app.invalidate()
+        return self.wait_frame(lambda frame: True, after)
+
+    def exit(self) -> None:
+        self.inp.send_text("\x04")  # Ctrl+D
+        self.thread.join(10)
+        assert not self.thread.is_alive()
+
+
+@pytest.fixture(autouse=True)
+def fresh_bus(monkeypatch):
+    monkeypatch.setattr(UIEventBus, "_instance", None)
+
+
+@pytest.fixture
+def headless():
+    with create_pipe_input() as inp:
+        started = []
+
+        def start(**kwargs) -> HeadlessUI:
+            started.append(HeadlessUI(inp, **kwargs))
+            started[-1].wait_frame(lambda frame: True)
+            return started[-1]
+
+        yield start
+        for ui in started:
+            if ui.thread.is_alive():
+                ui.exit()
+
+
+def test_first_resize_switches_to_fullscreen_in_the_same_frame(headless):
+    ui = headless(history_text="welcome")
+    first = ui.frames[0]
+    assert not first["full_screen"] and first["border"] == 80
+
+    before = ui.invalidates
+    frame = ui.resize(rows=30, columns=100)
+    assert frame["full_screen"] and ui.ui.app.full_screen
+    assert frame["resizes"] == 1
+    # The layout was recomputed before this frame was drawn, without asking for another one
+    assert frame["border"] == 100 and frame["history_size"][0] == 100
+    assert frame["invalidates"] == before
+
+
+def test_later_resizes_recompute_without_extra_invalidate(headless):
+    ui = headless(history_text="\n".join(f"line {i}" for i in range(40)))
+    ui.resize(rows=30, columns=100)
+
+    for rows, columns in ((20, 60), (50, 120), (12, 40)):
+        before = ui.invalidates
+        frame = ui.resize(rows=rows, columns=columns)
+        assert frame["full_screen"]
+        assert frame["border"] == columns
+        # 40 history lines, at most what the 1-row input box and its borders leave
+        assert frame["history_size"] == (columns, min(40, rows - 3 - 1))
+        assert frame["invalidates"] == before
+
+    count = len(ui.frames)
+    time.sleep(0.2)
+    assert len(ui.frames) == count  # no follow-up redraw was requested
+    assert ui.resizes == 4
+
+
+def test_unchanged_size_does_nothing(headless):
+    ui = headless()
+    first = ui.frames[0]
+    frame = ui.redraw()
+    assert frame["size"] == first["size"]
+    assert ui.resizes == 0
+    assert not frame["full_screen"]
+    assert frame["invalidates"] == first["invalidates"]
+
+
+class FakeClient:
+    async def astream(self, prompt: str):
+        yield AssistantChunk(f"answer to {prompt}")
+
+
+class FakeSessionManager:
+    @asynccontextmanager
+    async def alease(self, name: str):
+        assert name == INTERACTIVE
+        yield SimpleNamespace(client=FakeClient())
+
+
+def test_send_resize_with_draft_and_bus_consumer_lifecycle(headless, monkeypatch):
+    consumers = []
+    set_consumer = UIEventBus.set_consumer
+
+    def recording_set_consumer(bus, consumer):
+        consumers.append(consumer)
+        set_consumer(bus, consumer)
+
+    monkeypatch.setattr(UIEventBus, "set_consumer", recording_set_consumer)
+    monkeypatch.setattr(prompt_ui, "get_session_manager", FakeSessionManager)
+    UIEventBus.instance().publish_assistant_message("queued before start")
+
+    ui = headless()
+    app = ui.ui.app
+    assert consumers == [ui.ui._apply_assistant_text]
+    ui.wait_frame(lambda frame: ("assistant", "queued before start") in frame["messages"])
+
+    # Submitted text goes to the agent through the same Application
+    ui.inp.send_text("hello\r")
+    frame = ui.wait_frame(lambda frame: ("assistant", "answer to hello") in frame["messages"])
+    assert frame["messages"][-3:] == [("assistant", "queued before start"), ("user", "hello"),
+                                      ("assistant", "answer to hello")]
+    assert frame["text"] == ""
+
+    # A draft with the cursor moved back survives the switch to fullscreen
+    ui.inp.send_text("draft text\x1b[D\x1b[D")
+    ui.wait_frame(lambda frame: frame["text"] == "draft text" and frame["cursor"] == 8)
+    frame = ui.resize(rows=30, columns=100)
+    assert frame["full_screen"]
+    assert (frame["text"], frame["cursor"]) == ("draft text", 8)
+    assert ui.ui.app is app
+
+    # Messages published by ambient code on other threads reach the running UI
+    after = len(ui.frames)
+    threading.Thread(target=UIEventBus.instance().publish_assistant_message, args=("\nfrom ambient",)).start()
+    ui.wait_frame(lambda frame: frame["messages"][-1] == ("assistant", "answer to hello\nfrom ambient"), after)
+
+    ui.exit()
+    assert ui.result is None
+    # Registered once for the whole session and released on exit
+    assert consumers == [ui.ui._apply_assistant_text, None]
+    UIEventBus.instance().publish_assistant_message("after exit")
+    assert UIEventBus.instance()._buffer == ["after exit"]
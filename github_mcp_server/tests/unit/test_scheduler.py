@@ -0,0 +1,99 @@
+"""
+Unit tests for InvocationScheduler: priority order, token-bucket budgets, preemption.
+"""
+
+import pytest
+
+from src.core import scheduler as scheduler_module
+from src.core.cursor_client import CancellationToken
+from src.core.scheduler import AMBIENT, BATCH, INTERACTIVE, InvocationScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_waiters_are_served_by_class_then_fifo():
+    sched = InvocationScheduler(max_concurrent=1)
+    running = sched.submit(BATCH)
+    batch, ambient_1, interactive, ambient_2 = (sched.submit(p) for p in (BATCH, AMBIENT, INTERACTIVE, AMBIENT))
+    assert running.granted
+    assert [sched.position(t) for t in (interactive, ambient_1, ambient_2, batch)] == [1, 2, 3, 4]
+    order = []
+    current = running
+    for _ in range(4):
+        sched.release(current)
+        current = next(t for t in (batch, ambient_1, interactive, ambient_2) if t.granted)
+        order.append(current)
+    assert order == [interactive, ambient_1, ambient_2, batch]
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_min=60, burst=2, clock=clock)
+    for _ in range(2):
+        assert bucket.ready(clock.now)
+        bucket.take(clock.now)
+    assert not bucket.ready(clock.now)
+    assert bucket.wait_time(clock.now) == pytest.approx(1.0)
+    clock.now += 1.0
+    assert bucket.ready(clock.now)
+
+
+def test_budget_defers_class_without_blocking_others():
+    clock = FakeClock()
+    sched = InvocationScheduler(max_concurrent=4, budgets={AMBIENT: (60, 1)}, clock=clock)
+    first = sched.submit(AMBIENT)
+    second = sched.submit(AMBIENT)
+    interactive = sched.submit(INTERACTIVE)
+    assert first.granted and not second.granted and interactive.granted
+    assert not sched.wait(second, timeout=0)     # no token yet: withdrawn on timeout
+    third = sched.submit(AMBIENT)
+    clock.now += 1.0
+    assert sched.wait(third, timeout=0)
+    assert third.waited == pytest.approx(1.0)
+
+
+def test_waiting_interactive_preempts_running_batch():
+    sched = InvocationScheduler(max_concurrent=1)
+    token = CancellationToken()
+    batch = sched.submit(BATCH, token)
+    interactive = sched.submit(INTERACTIVE, CancellationToken())
+    assert batch.preempted and token.cancelled
+    assert sched.stats["preempted"] == 1
+    assert not interactive.granted          # the slot frees only when the batch call releases it
+    sched.release(batch)
+    assert interactive.granted
+
+
+def test_ambient_is_not_preempted_by_default():
+    sched = InvocationScheduler(max_concurrent=1)
+    token = CancellationToken()
+    ambient = sched.submit(AMBIENT, token)
+    sched.submit(INTERACTIVE, CancellationToken())
+    assert not ambient.preempted and not token.cancelled
+
+
+def test_cancelled_waiter_is_withdrawn():
+    sched = InvocationScheduler(max_concurrent=1)
+    sched.submit(AMBIENT)
+    token = CancellationToken()
+    waiter = sched.submit(AMBIENT, token)
+    token.cancel()
+    assert not sched.wait(waiter)
+    assert sched.stats["abandoned"] == 1 and sched.snapshot()["waiting"] == {}
+
+
+def test_env_configures_budgets(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "_SCHEDULER", None)
+    monkeypatch.setenv("CURSOR_AGENT_RATE_AMBIENT", "12")
+    monkeypatch.setenv("CURSOR_AGENT_BURST_AMBIENT", "8")
+    monkeypatch.setenv("CURSOR_AGENT_RATE_BATCH", "0")
+    sched = scheduler_module.get_scheduler()
+    assert sched._buckets[AMBIENT].burst == 8
+    assert sched._buckets[AMBIENT].rate == pytest.approx(0.2)
+    assert BATCH not in sched._buckets
@@ -0,0 +1,84 @@
+"""
+Unit tests for the spilling, paged Scrollback of the prompt UI.
+"""
+
+from src.ui.scrollback import PAGE_SIZE, Scrollback, SpillFile
+
+WIDTH, HEIGHT = 80, 5
+
+
+def visible(scrollback: Scrollback, width: int = WIDTH, height: int = HEIGHT) -> list:
+    fragments = scrollback.fragments(width, height)
+    return fragments[0][1].split("\n")[-height:] if fragments else []
+
+
+def filled(count: int, **kwargs) -> Scrollback:
+    scrollback = Scrollback(max_messages=10, margin=2, **kwargs)
+    for i in range(count):
+        scrollback.append("assistant", f"m{i}")
+        scrollback.rows(WIDTH)  # the UI renders between messages
+    return scrollback
+
+
+def test_spill_file_pages_round_trip(tmp_path):
+    spill = SpillFile(tmp_path / "spill.jsonl")
+    for i in range(PAGE_SIZE + 3):
+        spill.append("user", f"текст {i}\nвторая строка")
+    assert len(spill) == PAGE_SIZE + 3
+    assert spill.read_page(1) == [("user", f"текст {i}\nвторая строка") for i in range(PAGE_SIZE, PAGE_SIZE + 3)]
+    assert spill.read_page(2) == []
+    spill.close()
+
+
+def test_old_messages_are_spilled_beyond_the_cap():
+    scrollback = filled(300)
+    assert len(scrollback) == 300 and scrollback.spilled == 290
+    assert [text for _, text in scrollback.messages()] == [f"m{i}" for i in range(290, 300)]
+    assert scrollback.rows(WIDTH) == 300
+    scrollback.close()
+
+
+def test_char_cap_keeps_newest_message():
+    scrollback = Scrollback(max_messages=100, max_chars=10)
+    scrollback.append("user", "x" * 8)
+    scrollback.append("assistant", "y" * 20)
+    assert scrollback.messages() == [("assistant", "y" * 20)] and scrollback.spilled == 1
+    scrollback.close()
+
+
+def test_bottom_view_never_reads_spilled_pages():
+    scrollback = filled(300)
+    assert visible(scrollback) == [f"m{i}" for i in range(295, 300)]
+    assert scrollback.page_loads == 0
+    scrollback.close()
+
+
+def test_scrolling_to_the_top_reads_only_the_pages_it_shows():
+    scrollback = filled(5 * PAGE_SIZE)
+    scrollback.scroll(10 ** 6, WIDTH, HEIGHT)
+    assert visible(scrollback) == [f"m{i}" for i in range(HEIGHT)]
+    assert scrollback.page_loads == 1
+    scrollback.scroll(-PAGE_SIZE, WIDTH, HEIGHT)
+    assert visible(scrollback) == [f"m{i}" for i in range(PAGE_SIZE, PAGE_SIZE + HEIGHT)]
+    scrollback.close()
+
+
+def test_view_stays_put_while_new_text_arrives():
+    scrollback = filled(50)
+    scrollback.scroll(20, WIDTH, HEIGHT)
+    before = visible(scrollback)
+    scrollback.append("assistant", "new")
+    assert visible(scrollback) == before
+    scrollback.scroll_to_bottom()
+    assert visible(scrollback)[-1] == "new"
+    scrollback.close()
+
+
+def test_width_change_recounts_spilled_rows():
+    scrollback = filled(100)
+    long_width = 2
+    scrollback.scroll(1, long_width, HEIGHT)      # "m10" etc. wrap to two rows at width 2
+    assert scrollback.rows(long_width) > 100
+    scrollback.scroll(10 ** 6, long_width, HEIGHT)
+    assert visible(scrollback, long_width)[0] == "m0"
+    scrollback.close()
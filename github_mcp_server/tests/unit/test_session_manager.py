@@ -0,0 +1,113 @@
+"""
+Unit tests for SessionManager: per-session serialization, priorities, cap and reaping.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.core import scheduler
+from src.core.session_manager import AMBIENT_CI, AMBIENT_PR, INTERACTIVE, SessionManager
+
+
+class FakeClient:
+    """Stands in for CursorAgentClient; records overlapping calls."""
+
+    def __init__(self) -> None:
+        self.priority = None
+        self.session_id = None
+        self.active = 0
+        self.max_active = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.lock = threading.Lock()
+
+    def send_stream(self, prompt, on_user=None, on_chunk=None, on_result=None, **options):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.release.wait(5)
+        if on_chunk:
+            on_chunk(prompt)
+        with self.lock:
+            self.active -= 1
+        return True
+
+    def attach_session(self, session_id):
+        self.session_id = session_id
+
+    def get_session_id(self):
+        return self.session_id
+
+
+def test_sessions_get_scheduler_class_by_name():
+    manager = SessionManager(client_factory=FakeClient)
+    assert manager.session(INTERACTIVE).client.priority == scheduler.INTERACTIVE
+    assert manager.session(AMBIENT_CI).client.priority == scheduler.AMBIENT
+    assert manager.session(AMBIENT_CI) is manager.session(AMBIENT_CI)
+
+
+def test_requests_to_one_session_are_serialized():
+    manager = SessionManager(client_factory=FakeClient)
+    client = manager.session(AMBIENT_CI).client
+    client.release.clear()
+    threads = [threading.Thread(target=manager.send_stream, args=(AMBIENT_CI, f"p{i}")) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    client.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert client.max_active == 1
+
+
+def test_different_sessions_run_in_parallel():
+    manager = SessionManager(client_factory=FakeClient)
+    with manager.lease(AMBIENT_CI):
+        out = []
+        assert manager.send_stream(AMBIENT_PR, "review", on_chunk=out.append)
+        assert out == ["review"]
+
+
+def test_busy_session_lease_times_out():
+    manager = SessionManager(client_factory=FakeClient)
+    with manager.lease(AMBIENT_CI):
+        with pytest.raises(TimeoutError):
+            with manager.lease(AMBIENT_CI, timeout=0.05):
+                pass
+
+
+def test_cap_evicts_least_recently_used_idle_unpinned_session():
+    manager = SessionManager(max_sessions=2, client_factory=FakeClient)
+    manager.session(INTERACTIVE)
+    manager.session(AMBIENT_CI)
+    manager.session(AMBIENT_PR)
+    assert manager.names() == [INTERACTIVE, AMBIENT_PR]
+
+
+def test_full_cap_waits_for_a_lease_to_end():
+    manager = SessionManager(max_sessions=1, pinned=(), client_factory=FakeClient)
+    created = threading.Event()
+    with manager.lease(AMBIENT_CI):
+        thread = threading.Thread(target=lambda: (manager.session(AMBIENT_PR), created.set()))
+        thread.start()
+        assert not created.wait(0.1)
+    assert created.wait(5)
+    thread.join(5)
+    assert manager.names() == [AMBIENT_PR]
+
+
+def test_reap_idle_keeps_pinned_and_leased_sessions():
+    manager = SessionManager(idle_ttl=10, client_factory=FakeClient)
+    for name in (INTERACTIVE, AMBIENT_CI, AMBIENT_PR):
+        manager.session(name)
+    with manager.lease(AMBIENT_PR):
+        assert manager.reap_idle(now=time.monotonic() + 60) == 1
+    assert manager.names() == [INTERACTIVE, AMBIENT_PR]
+
+
+def test_attach_binds_session_id():
+    manager = SessionManager(client_factory=FakeClient)
+    manager.attach(AMBIENT_CI, "sid-1")
+    assert manager.session(AMBIENT_CI).get_session_id() == "sid-1"
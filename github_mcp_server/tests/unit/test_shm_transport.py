@@ -0,0 +1,229 @@
+"""
+Юнит-тесты shm-транспорта: фрагментация больших событий, отказ по размеру, учёт потерь
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.ambient import shm_transport
+from src.ambient.event_system import Event, EventType
+from src.ambient.shm_transport import (
+    BridgeStats,
+    Reassembler,
+    ShmEventEmitter,
+    ShmUIPublisher,
+    bridge_to_event_system,
+    decode_message,
+    encode_event,
+    split_message,
+)
+from src.core.shm_ring_buffer import ShmRingBuffer
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    errors = []
+    monkeypatch.setattr(shm_transport.BaseWizard, "print_error", lambda self, message: errors.append(message))
+    return errors
+
+
+@pytest.fixture
+def ring():
+    ring = ShmRingBuffer(capacity=64, slot_size=512)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def make_event(size: int) -> Event:
+    return Event(type=EventType.GITHUB_WORKFLOW_EVENT, data={"logs": "x" * size, "run_id": 7},
+                 timestamp=1.0, source="test", priority=3)
+
+
+class Sink:
+    def __init__(self, fail: bool = False) -> None:
+        self.events = []
+        self.fail = fail
+        self.got = threading.Event()
+
+    def emit(self, event: Event) -> None:
+        self.got.set()
+        if self.fail:
+            raise RuntimeError("boom")
+        self.events.append(event)
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_split_and_reassemble_round_trip():
+    payload = encode_event(make_event(5000))
+    fragments = split_message(payload, 512, message_id=42)
+    assert len(fragments) > 1 and all(len(f) <= 512 for f in fragments)
+    reassembler = Reassembler()
+    results = [reassembler.add(f) for f in reversed(fragments)]
+    assert results[:-1] == [None] * (len(fragments) - 1)
+    assert decode_message(results[-1]).data["logs"] == "x" * 5000
+
+
+def test_reassembler_evicts_incomplete_messages():
+    reassembler = Reassembler(max_pending=2)
+    for message_id in range(3):
+        reassembler.add(split_message(b"E" + b"y" * 2000, 512, message_id)[0])
+    assert reassembler.evicted == 1
+
+
+def test_large_event_crosses_the_ring(ring):
+    sink = Sink()
+    stats = BridgeStats()
+    stop = bridge_to_event_system(ring, sink, stats=stats)
+    try:
+        emitter = ShmEventEmitter(ring)
+        assert emitter.emit(make_event(20000))
+        assert emitter.fragmented == 1
+        assert wait_until(lambda: sink.events)
+        assert sink.events[0].data["logs"] == "x" * 20000
+        assert stats.delivered == 1
+    finally:
+        stop.set()
+
+
+def test_oversized_event_is_rejected_with_error(ring, quiet):
+    emitter = ShmEventEmitter(ring, max_message_size=1000)
+    assert not emitter.emit(make_event(5000))
+    assert emitter.rejected == 1
+    assert quiet and "не отправлено" in quiet[0]
+    assert len(ring) == 0
+
+
+def test_emitter_counts_timeouts(quiet):
+    small = ShmRingBuffer(capacity=2, slot_size=512)
+    try:
+        emitter = ShmEventEmitter(small, timeout=0.01)
+        assert not emitter.emit(make_event(3000))  # фрагментов больше, чем слотов, и никто не читает
+        assert emitter.dropped == 1 and quiet
+    finally:
+        small.close()
+        small.unlink()
+
+
+def test_ui_publisher_reports_drops(quiet):
+    small = ShmRingBuffer(capacity=2, slot_size=64)
+    try:
+        publisher = ShmUIPublisher(small, timeout=0.01)
+        publisher.publish_assistant_message("z" * 1000)
+        assert publisher.dropped == 1
+        assert quiet and "Кольцо UI переполнено" in quiet[0]
+    finally:
+        small.close()
+        small.unlink()
+
+
+def test_bridge_counts_delivery_errors(ring, quiet):
+    sink = Sink(fail=True)
+    stats = BridgeStats()
+    stop = bridge_to_event_system(ring, sink, stats=stats)
+    try:
+        ShmEventEmitter(ring).emit(make_event(10))
+        assert wait_until(lambda: stats.failed == 1)
+        assert any("Ошибка доставки" in message for message in quiet)
+    finally:
+        stop.set()
+
+
+class FakeMonitor:
+    """GitHubMonitor без сети: при старте сообщает об одном упавшем и одном завершённом run"""
+
+    instances = []
+
+    def __init__(self, event_system, env_manager) -> None:
+        self.event_system = event_system
+        self.run_listeners = []
+        self.monitoring = False
+        self.stopped = threading.Event()
+        FakeMonitor.instances.append(self)
+
+    def start_monitoring(self) -> bool:
+        self.monitoring = True
+        self.event_system.emit_simple(EventType.GITHUB_WORKFLOW_EVENT, {"run_id": 1}, source="github_monitor")
+        for listener in self.run_listeners:
+            listener({"id": 1, "workflow_id": 7, "conclusion": "success"})
+        return True
+
+    def wait(self, timeout=None) -> bool:
+        return self.stopped.wait(timeout)
+
+    def stop_monitoring(self) -> None:
+        self.monitoring = False
+        self.stopped.set()
+
+
+def test_monitor_process_forwards_events_and_stops_on_flag(ring, tmp_path, monkeypatch):
+    from src.ambient import github_monitor
+    monkeypatch.setattr(github_monitor, "GitHubMonitor", FakeMonitor)
+    sink = Sink()
+    stop_bridge = bridge_to_event_system(ring, sink)
+    stop = threading.Event()
+    worker = threading.Thread(target=shm_transport.run_monitor_process, args=(ring.name, tmp_path, None, stop))
+    try:
+        worker.start()
+        assert wait_until(lambda: len(sink.events) == 2)
+        assert [e.type for e in sink.events] == [EventType.GITHUB_WORKFLOW_EVENT, EventType.GITHUB_RUN_COMPLETED]
+        assert sink.events[1].data["workflow_id"] == 7
+        stop.set()
+        worker.join(5)
+        assert not worker.is_alive() and FakeMonitor.instances[-1].stopped.is_set()
+    finally:
+        stop.set()
+        stop_bridge.set()
+
+
+def test_github_monitor_wait_reports_stop(monkeypatch):
+    from src.ambient.github_monitor import GitHubMonitor
+    monkeypatch.setattr(GitHubMonitor, "detect_repo_name", lambda self: None)
+    env = type("Env", (), {"get_env_var": lambda self, name: None})()
+    monitor = GitHubMonitor(event_system=None, env_manager=env)
+    monitor.monitoring = True
+    assert not monitor.wait(0.01)
+    monitor.stop_monitoring()
+    assert monitor.wait(0)
+
+
+def fake_monitor_process(ring_name, donut_dir, lock=None, stop=None) -> None:
+    """Цель дочернего процесса в тесте AmbientAgent: одно событие в кольцо, затем ждать stop"""
+    ring = ShmRingBuffer.attach(ring_name, lock=lock)
+    ShmEventEmitter(ring).emit_simple(EventType.GITHUB_RUN_COMPLETED, {"id": 3, "conclusion": "success"})
+    stop.wait(30)
+    ring.close()
+
+
+def test_ambient_agent_opt_in_runs_monitor_in_a_process(tmp_path, monkeypatch):
+    from src.ambient import ambient_agent
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("AMBIENT_SHM_TRANSPORT", "1")
+    monkeypatch.setenv("AMBIENT_SHM_CAPACITY", "16")
+    monkeypatch.setattr(ambient_agent, "run_monitor_process", fake_monitor_process)
+    agent = ambient_agent.AmbientAgent(tmp_path, install_signal_handlers=False)
+    observed = []
+    agent.flaky_triage.observe_run = observed.append
+    agent.event_system.start_processing()
+    try:
+        assert agent.start_monitor_process()
+        process, ring_name = agent._monitor_process, agent._ring.name
+        assert wait_until(lambda: observed, timeout=30)
+        assert observed[0]["id"] == 3
+        agent.stop_monitor_process()
+        assert not process.is_alive()
+        with pytest.raises(FileNotFoundError):
+            ShmRingBuffer.attach(ring_name)
+    finally:
+        agent.stop_monitor_process()
+        agent.event_system.stop_processing()
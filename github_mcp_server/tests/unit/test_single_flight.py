@@ -0,0 +1,93 @@
+"""
+Юнит-тесты SingleFlight: один вызов на ключ, окно переиспользования, ошибки
+"""
+
+import threading
+
+import pytest
+
+from src.ambient.single_flight import SingleFlight, workflow_request_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    assert flight.in_flight() == 1
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert calls == [1]
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+
+
+def test_result_reused_within_ttl_then_expires():
+    clock = FakeClock()
+    flight = SingleFlight(result_ttl=10, clock=clock)
+    assert flight.do("k", lambda: "a") == ("a", False)
+    clock.now = 9
+    assert flight.do("k", lambda: "b") == ("a", True)
+    clock.now = 11
+    assert not flight.contains("k")
+    assert flight.do("k", lambda: "b") == ("b", False)
+
+
+def test_empty_results_and_errors_are_not_cached():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: "") == ("", False)
+    assert not flight.contains("k")
+    with pytest.raises(RuntimeError):
+        flight.do("k", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flight.do("k", lambda: "ok") == ("ok", False)
+
+
+def test_put_seeds_result_without_overwriting_in_flight_call():
+    flight = SingleFlight()
+    flight.put("seeded", "batched")
+    assert flight.do("seeded", lambda: "fresh") == ("batched", True)
+    flight.put("empty", "")
+    assert not flight.contains("empty")
+
+    started, release = threading.Event(), threading.Event()
+    thread = threading.Thread(target=lambda: flight.do("busy", lambda: started.set() or release.wait(5) and "live"))
+    thread.start()
+    assert started.wait(5)
+    flight.put("busy", "stale")
+    release.set()
+    thread.join(5)
+    assert flight.do("busy", lambda: "again") == ("live", True)
+
+
+def test_forget_drops_finished_result():
+    flight = SingleFlight()
+    flight.do("k", lambda: "a")
+    flight.forget("k")
+    assert flight.do("k", lambda: "b") == ("b", False)
+
+
+def test_workflow_request_key_normalizes():
+    data = {"run_id": 42, "head_commit": {"id": "ABC"}, "workflow_name": " CI "}
+    assert workflow_request_key(data) == ("42", "abc", "ci")
+    assert workflow_request_key({"workflow_name": "CI"}) is None
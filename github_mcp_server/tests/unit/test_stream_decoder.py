@@ -0,0 +1,123 @@
+"""
+Unit tests for the stream-json decoder and ChunkCoalescer.
+"""
+
+import json
+import threading
+
+from src.core.stream_decoder import ASSISTANT, OTHER, RESULT, USER, ChunkCoalescer, decode_line
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def line(obj) -> bytes:
+    return json.dumps(obj).encode("utf-8") + b"\n"
+
+
+def test_decode_known_shapes():
+    assistant = decode_line(line({"type": "assistant", "session_id": "s",
+                                  "message": {"role": "assistant", "content": [{"type": "text", "text": "hi"},
+                                                                               {"type": "text", "text": "!"}]}}))
+    assert (assistant.kind, assistant.text, assistant.session_id) == (ASSISTANT, "hi!", "s")
+    user = decode_line(line({"type": "user", "message": {"role": "user", "content": "prompt"}}))
+    assert (user.kind, user.text) == (USER, "prompt")
+    result = decode_line(line({"type": "result", "result": "done"}))
+    assert (result.kind, result.text) == (RESULT, "done")
+    assert decode_line(line({"type": "tool_call"})).kind == OTHER
+    assert decode_line(b"{not json\n") is None
+    assert decode_line(b"  \n") is None
+
+
+def test_first_chunk_is_emitted_immediately_then_batched():
+    clock = FakeClock()
+    out = []
+    coalescer = ChunkCoalescer(out.append, max_delay=60.0, max_chars=100, clock=clock)
+    coalescer.push("a")
+    coalescer.push("b")
+    coalescer.push("c")
+    assert out == ["a"]
+    coalescer.flush()
+    assert out == ["a", "bc"] and coalescer.batches == 2
+
+
+def test_max_chars_forces_emission():
+    clock = FakeClock()
+    out = []
+    coalescer = ChunkCoalescer(out.append, max_delay=60.0, max_chars=4, clock=clock)
+    for part in ("x", "yy", "zz", "w"):
+        coalescer.push(part)
+    assert out == ["x", "yyzz"]
+    coalescer.flush()
+    assert out == ["x", "yyzz", "w"]
+
+
+def test_quiet_period_allows_next_immediate_emission():
+    clock = FakeClock()
+    out = []
+    coalescer = ChunkCoalescer(out.append, max_delay=1.0, clock=clock)
+    coalescer.push("a")
+    clock.now = 5.0
+    coalescer.push("b")
+    assert out == ["a", "b"]
+
+
+def test_buffered_text_goes_out_with_first_push_after_interval():
+    clock = FakeClock()
+    out = []
+    coalescer = ChunkCoalescer(out.append, max_delay=1.0, clock=clock)
+    coalescer.push("a")
+    clock.now = 0.5
+    coalescer.push("b")
+    coalescer.push("c")
+    assert out == ["a"]
+    clock.now = 1.0
+    coalescer.push("d")
+    assert out == ["a", "bcd"]
+    # Without flush_on_stall nothing but the reader loop ever emits
+    assert coalescer._flusher is None
+
+
+def test_stall_flusher_emits_buffered_text_when_stream_stalls():
+    emitted = threading.Event()
+    out = []
+    coalescer = ChunkCoalescer(lambda text: (out.append(text), emitted.set()), max_delay=0.05,
+                               flush_on_stall=True)
+    for _ in range(3):
+        emitted.clear()
+        coalescer.push("a")  # quiet period: emitted at once by the caller
+        assert emitted.wait(2)
+        emitted.clear()
+        coalescer.push("b")  # inside the interval: only the stall flusher can emit it
+        assert emitted.wait(2)
+    assert out == ["a", "b"] * 3
+    # One long-lived thread serves every interval
+    assert [t for t in threading.enumerate() if t.name == "chunk-coalescer"] == [coalescer._flusher]
+    coalescer.close()
+    assert not coalescer._flusher.is_alive()
+
+
+def test_close_flushes_and_stops_flusher():
+    clock = FakeClock()
+    out = []
+    coalescer = ChunkCoalescer(out.append, max_delay=60.0, clock=clock, flush_on_stall=True)
+    coalescer.push("a")
+    coalescer.push("b")
+    coalescer.close()
+    assert out == ["a", "b"]
+    assert not coalescer._flusher.is_alive()
+    coalescer.close()  # idempotent
+
+
+def test_zero_delay_passes_chunks_through():
+    out = []
+    coalescer = ChunkCoalescer(out.append, max_delay=0)
+    coalescer.push("a")
+    coalescer.push("")
+    coalescer.push("b")
+    assert out == ["a", "b"]
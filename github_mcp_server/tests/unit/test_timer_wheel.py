@@ -0,0 +1,86 @@
+"""
+Юнит-тесты TimerWheel: срабатывание, отмена, периодические таймеры, каскад уровней
+"""
+
+from src.ambient.timer_wheel import TimerWheel
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_wheel(**kwargs):
+    clock = FakeClock()
+    return TimerWheel(tick=0.01, clock=clock, **kwargs), clock
+
+
+def test_fires_after_delay_not_before():
+    wheel, clock = make_wheel()
+    fired = []
+    wheel.schedule(0.05, lambda: fired.append("a"))
+    clock.now = 0.04
+    assert wheel.advance() == []
+    clock.now = 0.051
+    for timer in wheel.advance():
+        timer.callback()
+    assert fired == ["a"]
+    assert len(wheel) == 0
+
+
+def test_cancelled_timer_is_not_returned():
+    wheel, clock = make_wheel()
+    keep = wheel.schedule(0.02, lambda: None)
+    drop = wheel.schedule(0.02, lambda: None)
+    drop.cancel()
+    clock.now = 0.05
+    assert wheel.advance() == [keep]
+    assert len(wheel) == 0
+
+
+def test_expiry_order_across_delays():
+    wheel, clock = make_wheel()
+    timers = {delay: wheel.schedule(delay, lambda: None) for delay in (0.3, 0.01, 0.1)}
+    clock.now = 1.0
+    assert wheel.advance() == [timers[0.01], timers[0.1], timers[0.3]]
+
+
+def test_periodic_timer_is_rescheduled():
+    wheel, clock = make_wheel()
+    timer = wheel.schedule(0.1, lambda: None, interval=0.1)
+    fired = 0
+    for step in range(1, 6):
+        clock.now = step * 0.1 + 0.001
+        fired += len(wheel.advance())
+    assert fired == 5
+    assert len(wheel) == 1
+    timer.cancel()
+    clock.now = 1.0
+    assert wheel.advance() == []
+
+
+def test_cascade_from_upper_levels_and_overflow():
+    # 4 слота на уровень и 2 уровня: горизонт 16 тиков, дальше — overflow
+    wheel, clock = make_wheel(slot_bits=2, levels=2)
+    near = wheel.schedule(0.07, lambda: None)      # уровень 1
+    far = wheel.schedule(0.40, lambda: None)       # overflow
+    clock.now = 0.069
+    assert wheel.advance() == []
+    clock.now = 0.071
+    assert wheel.advance() == [near]
+    clock.now = 0.39
+    assert wheel.advance() == []
+    clock.now = 0.41
+    assert wheel.advance() == [far]
+
+
+def test_time_until_next_is_bounded_by_limit():
+    wheel, clock = make_wheel()
+    assert wheel.time_until_next(5.0) == 5.0
+    wheel.schedule(0.05, lambda: None)
+    assert 0.0 < wheel.time_until_next(5.0) <= 0.05 + 1e-9
+    clock.now = 0.2
+    assert wheel.time_until_next(5.0) == 0.0
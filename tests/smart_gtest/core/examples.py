@@ -22,6 +22,11 @@ def get_examples_text():
         {"id": "shell1", "type": "Shell", "params": {"command": "ls -la logs/"}}
         {"id": "shell2", "type": "Shell", "params": {"command": "cat test.log | grep ERROR"}}
 
+        LogScan node (for large gtest/benchmark logs):
+        {"id": "scan1", "type": "LogScan", "params": {"path": "test.log"}}
+        {"id": "scan2", "type": "LogScan", "params": {"path": "test.log", "status": "FAILED", "limit": 10}}
+        {"id": "scan3", "type": "LogScan", "params": {"path": "bench.log", "kind": "throughput"}}
+
         LLMFormat node (for formatting data):
         {"id": "format1", "type": "LLMFormat", "params": {"prompt": "Summarize test results", "format": "summary"}}
         {"id": "format2", "type": "LLMFormat", "params": {"prompt": "Create detailed report", "format": "report"}}
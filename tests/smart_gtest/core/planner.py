@@ -38,6 +38,10 @@ def ask_planner(task: str, error_msg: str = "") -> Dict[str, Any]:
         4. Shell - Execute safe shell commands (ls, cat, grep, head, tail, find)
         params: {{"command": "ls -la logs/"}}
 
+        4a. LogScan - Fast structured scan of large gtest / buffer_runner log files (prefer over Shell cat|grep for logs)
+        params: {{"path": "logs/all-tests.log", "status": "FAILED|PASSED|SKIPPED|INCOMPLETE|ALL", "kind": "test|smart|throughput", "limit": 20}}
+        - Without status/kind returns a summary: test counts by status, failed tests with output, items/sec stats
+
         5. Join - Join results from multiple inputs  
         params: {{"mode": "all" | "any", "separator": "\\n---\\n"}}
         - "all": Wait for ALL incoming results (default)
@@ -6,7 +6,7 @@ from typing import Dict, Any
 from collections import Counter
 from langchain_community.utilities import SQLDatabase
 
-from tools import SafeSQLTool, SafeShellTool, UserTaskTool, JoinTool, LLMFormatTool, ChatTool
+from tools import SafeSQLTool, SafeShellTool, UserTaskTool, JoinTool, LLMFormatTool, ChatTool, LogScanTool
 
 def create_tools(db_engine, user_task: str):
     """Create tool instances for graph execution"""
@@ -15,7 +15,8 @@ def create_tools(db_engine, user_task: str):
         'user_task': UserTaskTool(user_task),
         'join': JoinTool(),
         'llm_format': LLMFormatTool(),
-        'chat': ChatTool(user_task)
+        'chat': ChatTool(user_task),
+        'log_scan': LogScanTool()
     }
     
     # Add SQL tool only if database is available
@@ -31,6 +32,7 @@ def create_tool_mapping(tools: Dict) -> Dict[str, Any]:
         'UserTask': tools['user_task'],
         'Chat': tools['chat'],
         'Shell': tools['shell'],
+        'LogScan': tools['log_scan'],
         'Join': tools['join'],
         'LLMFormat': tools['llm_format']
     }
@@ -9,5 +9,6 @@ from .user_task import UserTaskTool
 from .join_tool import JoinTool
 from .llm_format_tool import LLMFormatTool
 from .chat_tool import ChatTool
+from .log_scan_tool import LogScanTool
 
-__all__ = ['SafeSQLTool', 'SafeShellTool', 'UserTaskTool', 'JoinTool', 'LLMFormatTool', 'ChatTool'] 
\ No newline at end of file
+__all__ = ['SafeSQLTool', 'SafeShellTool', 'UserTaskTool', 'JoinTool', 'LLMFormatTool', 'ChatTool', 'LogScanTool'] 
\ No newline at end of file
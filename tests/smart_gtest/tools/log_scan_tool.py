@@ -0,0 +1,83 @@
+"""LogScanTool for fast structured analysis of large local gtest/benchmark logs"""
+
+import sys
+from pathlib import Path
+from typing import Dict, Any
+
+# Сканер логов живёт в github_mcp_server/src/core и не имеет внешних зависимостей
+_MCP_ROOT = Path(__file__).resolve().parents[3] / "github_mcp_server"
+if str(_MCP_ROOT) not in sys.path:
+    sys.path.append(str(_MCP_ROOT))
+
+from src.core.gtest_log import iter_log_records, summarize_log
+
+
+class LogScanTool:
+    """Tool that scans gtest / buffer_runner logs via mmap instead of `cat | grep`"""
+
+    def __init__(self, base_dir: Path = None):
+        self.name = "log_scan"
+        self.description = "Structured scan of large gtest/benchmark logs: failed tests, durations, items/sec"
+        self.base_dir = Path(base_dir) if base_dir else Path.cwd()
+
+    def execute(self, params: Dict[str, Any]) -> str:
+        """Execute log scan
+
+        Args:
+            params: Dictionary with 'path' (log file), optional 'status'
+                    (FAILED|PASSED|SKIPPED|INCOMPLETE|ALL), 'kind' (test|smart|throughput)
+                    and 'limit' (max records to list)
+        """
+        try:
+            path = Path(params.get('path', ''))
+            if not path.is_absolute():
+                path = self.base_dir / path
+            if not path.is_file():
+                return f"❌ Log file not found: {path}"
+
+            status = str(params.get('status', '')).upper()
+            kind = params.get('kind', '')
+            limit = int(params.get('limit', 20))
+
+            if not status and not kind:
+                return self.format_summary(path, summarize_log(path, max_failures=limit))
+
+            lines = []
+            for record in iter_log_records(path, kinds=(kind,) if kind else ("test",)):
+                if status and status != "ALL" and record.status != status:
+                    continue
+                if len(lines) >= limit:
+                    lines.append(f"... (limit {limit} reached)")
+                    break
+                lines.append(self.format_record(record))
+            return "\n".join(lines) if lines else "No matching records"
+        except Exception as e:
+            return f"❌ Log scan error: {str(e)}"
+
+    def format_summary(self, path: Path, summary: Dict[str, Any]) -> str:
+        """Format summarize_log() result as text"""
+        statuses = ", ".join(f"{k}: {v}" for k, v in sorted(summary["statuses"].items())) or "no gtest blocks"
+        lines = [f"Log: {path}", f"Tests: {statuses}"]
+        throughput = summary["throughput"]
+        if throughput["count"]:
+            lines.append(
+                f"Throughput: {throughput['count']} samples, "
+                f"min {throughput['min']:.2f}, avg {throughput['avg']:.2f}, max {throughput['max']:.2f} items/sec"
+            )
+        for record in summary["failures"]:
+            lines.append(self.format_record(record))
+        return "\n".join(lines)
+
+    def format_record(self, record) -> str:
+        """Format one LogRecord"""
+        if record.kind == "throughput":
+            return f"[throughput] {record.value:.2f} items/sec: {record.text}"
+        if record.kind == "smart":
+            return f"[SMART] {record.text}"
+        duration = f" ({record.duration_ms} ms)" if record.duration_ms is not None else ""
+        text = f"\n{record.text[-2000:]}" if record.text else ""
+        return f"[{record.status}] {record.test}{duration}{text}"
+
+    def run(self, **kwargs) -> str:
+        """Standard run interface"""
+        return self.execute(kwargs)